@@ -0,0 +1,301 @@
+"""
+Smart Supply Chain Risk Intelligence - API Load Benchmark
+Drives every /api/* route with concurrent clients and reports latency percentiles,
+throughput and the server's peak RSS as JSON, so runs can be compared between commits.
+
+Usage:
+    python SCRI/bench/run_benchmark.py --spawn --clients 16 --duration 30 --output before.json
+    python SCRI/bench/run_benchmark.py --url http://localhost:5000 --server-pid 1234
+    python SCRI/bench/run_benchmark.py --compare before.json after.json
+    python SCRI/bench/run_benchmark.py --spawn --server asgi --cpus 0 --clients 64 --output async.json
+
+--spawn starts app.py (threaded Flask server, no reloader) or, with --server asgi, serve.py
+(uvicorn, one worker) against the DB_* database and stops it afterwards; --cpus pins the
+spawned server to those cores. Otherwise an already running server is used. Write routes and
+full-table exports are only exercised with --writes / --exports.
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# (name, method, path, JSON body, kind); {supplier_id}/{shipment_id} are filled from live data
+ROUTES = [
+    ('health', 'GET', '/api/health', None, 'read'),
+    ('metrics', 'GET', '/api/metrics', None, 'read'),
+    ('suppliers', 'GET', '/api/suppliers', None, 'read'),
+    ('supplier', 'GET', '/api/suppliers/{supplier_id}', None, 'read'),
+    ('supplier metrics', 'GET', '/api/suppliers/{supplier_id}/metrics', None, 'read'),
+    ('products', 'GET', '/api/products', None, 'read'),
+    ('shipments', 'GET', '/api/shipments', None, 'read'),
+    ('shipments in transit', 'GET', '/api/shipments?status=IN_TRANSIT', None, 'read'),
+    ('shipments page 1000', 'GET', '/api/shipments?limit=1000', None, 'read'),
+    ('shipments page 1000 columns', 'GET', '/api/shipments?limit=1000&shape=columns', None, 'read'),
+    ('shipment events', 'GET', '/api/shipments/{shipment_id}/events', None, 'read'),
+    ('shipment eta', 'GET', '/api/shipments/{shipment_id}/eta', None, 'read'),
+    ('inventory', 'GET', '/api/inventory', None, 'read'),
+    ('inventory page 1000 columns', 'GET', '/api/inventory?limit=1000&shape=columns', None, 'read'),
+    ('inventory forecast', 'GET', '/api/inventory/forecast?within=30', None, 'read'),
+    ('alerts', 'GET', '/api/alerts', None, 'read'),
+    ('warehouses', 'GET', '/api/warehouses', None, 'read'),
+    ('dashboard metrics', 'GET', '/api/dashboard/metrics', None, 'read'),
+    ('dashboard supplier risk', 'GET', '/api/dashboard/supplier-risk', None, 'read'),
+    ('dashboard delayed shipments', 'GET', '/api/dashboard/delayed-shipments', None, 'read'),
+    ('analytics delay rate', 'GET', '/api/analytics/delay-rate', None, 'read'),
+    ('analytics supplier delay rate', 'GET', '/api/analytics/delay-rate?supplier_id={supplier_id}', None, 'read'),
+    ('analytics alerts', 'GET', '/api/analytics/alerts?bucket=day', None, 'read'),
+    ('analytics stockouts', 'GET', '/api/analytics/stockouts', None, 'read'),
+    ('risk simulate', 'POST', '/api/risk/simulate', {'weights': {'on_time': 60}, 'limit': 50}, 'read'),
+    ('supplier impact', 'GET', '/api/risk/impact/{supplier_id}', None, 'read'),
+    ('impact sweep', 'GET', '/api/risk/impact?limit=50', None, 'read'),
+    ('compute risk', 'POST', '/api/suppliers/{supplier_id}/compute-risk', None, 'write'),
+    ('recompute all risk', 'POST', '/api/risk/recompute-all', None, 'write'),
+    ('recompute dirty risk', 'POST', '/api/risk/recompute-dirty', None, 'write'),
+    ('refresh rollups', 'POST', '/api/analytics/refresh', None, 'write'),
+    ('refresh forecast', 'POST', '/api/inventory/forecast/refresh', None, 'write'),
+    ('score eta', 'POST', '/api/shipments/eta/score', None, 'write'),
+    ('export shipments', 'GET', '/api/export/shipments?format=ndjson', None, 'export'),
+    ('export inventory', 'GET', '/api/export/inventory?format=csv', None, 'export')
+]
+
+
+def http(base_url, method, path, body=None, timeout=60):
+    """Issue one request and return (status, elapsed seconds, bytes read)"""
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(base_url + path, data=data, method=method,
+                                 headers={'Content-Type': 'application/json'} if data else {})
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            size = len(resp.read())
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        size = len(e.read())
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        size = 0
+        status = 0
+    return status, time.perf_counter() - started, size
+
+
+def sample_ids(base_url):
+    """First supplier and shipment ids, used to fill the per-entity routes"""
+    ids = {'supplier_id': 1, 'shipment_id': 1}
+    for key, path in (('supplier_id', '/api/suppliers'), ('shipment_id', '/api/shipments?limit=1')):
+        try:
+            with urllib.request.urlopen(base_url + path, timeout=30) as resp:
+                rows = json.loads(resp.read()).get('data') or []
+            if rows:
+                ids[key] = rows[0][key]
+        except (urllib.error.URLError, OSError, ValueError):
+            pass
+    return ids
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(samples, elapsed):
+    """Latency percentiles (ms), error count and throughput for a list of (status, seconds, bytes)"""
+    latencies = sorted(seconds * 1000 for _, seconds, _ in samples)
+    errors = sum(1 for status, _, _ in samples if status == 0 or status >= 500)
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 50), 2) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95), 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99), 2) if latencies else None,
+        'max_ms': round(latencies[-1], 2) if latencies else None,
+        'mean_ms': round(sum(latencies) / len(latencies), 2) if latencies else None,
+        'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else None,
+        'bytes': sum(size for _, _, size in samples)
+    }
+
+
+def peak_rss_mb(pid):
+    """Peak resident set size of a process from /proc (Linux); None where unavailable"""
+    if pid is None:
+        return None
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def run_route(base_url, method, path, body, clients, duration, max_requests):
+    """Hammer one route from ``clients`` threads until the duration or request budget runs out"""
+    samples = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+    remaining = [max_requests]
+
+    def client():
+        local = []
+        while time.monotonic() < deadline:
+            with lock:
+                if remaining[0] is not None:
+                    if remaining[0] <= 0:
+                        break
+                    remaining[0] -= 1
+            local.append(http(base_url, method, path, body))
+        with lock:
+            samples.extend(local)
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(samples, time.monotonic() - started), samples
+
+
+SERVER_COMMANDS = {
+    'flask': ['-m', 'flask', '--app', 'app', 'run', '--no-reload', '--no-debugger', '--with-threads', '--port'],
+    'asgi': ['serve.py', '--workers', '1', '--port']
+}
+
+
+def spawn_server(port, server='flask', cpus=None):
+    """Start the sync (threaded Flask) or async (uvicorn) server, optionally pinned to ``cpus``"""
+    env = dict(os.environ, PYTHONUNBUFFERED='1')
+    pin = (lambda: os.sched_setaffinity(0, cpus)) if cpus else None
+    proc = subprocess.Popen(
+        [sys.executable, *SERVER_COMMANDS[server], str(port)],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, preexec_fn=pin
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    for _ in range(100):
+        if proc.poll() is not None:
+            raise RuntimeError(f'server exited with status {proc.returncode}')
+        if http(base_url, 'GET', '/api/health', timeout=2)[0]:
+            return proc, base_url
+        time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError('server did not start within 10s')
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(before_path, after_path):
+    """Print per-route p50/p95/throughput deltas between two result files"""
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{'route':32} {'p50 ms':>18} {'p95 ms':>18} {'req/s':>18}")
+    for name, new in after['routes'].items():
+        old = before['routes'].get(name)
+        if not old:
+            continue
+        cells = []
+        for key in ('p50_ms', 'p95_ms', 'throughput_rps'):
+            if old[key] is None or new[key] is None:
+                cells.append(f"{'-':>18}")
+                continue
+            change = (new[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+            cells.append(f"{old[key]:>7} → {new[key]:<7}{change:+.0f}%".rjust(18))
+        print(f"{name:32} {' '.join(cells)}")
+    print(f"peak RSS MB: {before.get('peak_rss_mb')} → {after.get('peak_rss_mb')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the SCRI Flask API')
+    parser.add_argument('--url', default=os.getenv('BENCH_URL', 'http://127.0.0.1:5000'))
+    parser.add_argument('--spawn', action='store_true', help='start app.py for the run')
+    parser.add_argument('--port', type=int, default=5055, help='port for --spawn')
+    parser.add_argument('--server', choices=sorted(SERVER_COMMANDS), default='flask',
+                        help='server started by --spawn: flask (sync, threaded) or asgi (async, uvicorn)')
+    parser.add_argument('--cpus', help='comma-separated cores to pin the spawned server to, e.g. 0')
+    parser.add_argument('--server-pid', type=int, help='pid of the server when not spawned (for peak RSS)')
+    parser.add_argument('--clients', type=int, default=8, help='concurrent clients per route')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per route')
+    parser.add_argument('--requests', type=int, help='stop a route after this many requests')
+    parser.add_argument('--routes', help='comma-separated route names to run (default: all enabled)')
+    parser.add_argument('--writes', action='store_true', help='include write routes (compute-risk, recompute-all, recompute-dirty, analytics refresh)')
+    parser.add_argument('--exports', action='store_true', help='include full-table export routes')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='diff two reports and exit')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    kinds = {'read'} | ({'write'} if args.writes else set()) | ({'export'} if args.exports else set())
+    selected = set(args.routes.split(',')) if args.routes else None
+    routes = [r for r in ROUTES if r[4] in kinds and (selected is None or r[0] in selected)]
+
+    proc = None
+    base_url = args.url.rstrip('/')
+    server_pid = args.server_pid
+    if args.spawn:
+        cpus = {int(cpu) for cpu in args.cpus.split(',')} if args.cpus else None
+        proc, base_url = spawn_server(args.port, args.server, cpus)
+        server_pid = proc.pid
+
+    try:
+        ids = sample_ids(base_url)
+        results = {}
+        all_samples = []
+        started = time.monotonic()
+        for name, method, path, body, _ in routes:
+            path = path.format(**ids)
+            print(f"→ {name} ({method} {path})", file=sys.stderr)
+            results[name], samples = run_route(base_url, method, path, body, args.clients,
+                                               args.duration, args.requests)
+            all_samples.extend(samples)
+        total = summarize(all_samples, time.monotonic() - started)
+        rss = peak_rss_mb(server_pid)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'config': {'url': base_url, 'server': args.server if args.spawn else None,
+                   'cpus': args.cpus if args.spawn else None, 'clients': args.clients,
+                   'duration_s': args.duration, 'max_requests': args.requests, 'ids': ids},
+        'routes': results,
+        'total': total,
+        'peak_rss_mb': rss,
+        'client_peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+        print(f"✓ Wrote {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
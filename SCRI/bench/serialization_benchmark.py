@@ -0,0 +1,122 @@
+"""
+Smart Supply Chain Risk Intelligence - Response Serialization Benchmark
+Fetches full pages of the large list endpoints from the DB_* database (e.g. one filled by
+generate_data.py) and measures, per response path, the CPU time spent fetching and encoding
+a page and the size of the body on the wire.
+
+Usage:
+    python SCRI/bench/serialization_benchmark.py --repeat 50
+    python SCRI/bench/serialization_benchmark.py --limit 1000 --output serialization.json
+
+Paths compared, each on the same page of rows:
+    baseline      dict rows, Flask's default JSON provider (the old jsonify path)
+    stdlib        dict rows, json_codec with the stdlib encoder
+    orjson        dict rows, json_codec with orjson
+    tuples        tuple rows turned into objects at encode time, best available encoder
+    columns       tuple rows in ?shape=columns, best available encoder
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.datastructures import MultiDict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+
+import app as scri  # noqa: E402  (pages are built by the same query builders the routes use)
+from json_codec import ENCODERS, FastJSONProvider, Rows, orjson  # noqa: E402
+
+# (name, page query builder) of the endpoints measured
+ENDPOINTS = [
+    ('shipments', scri.shipments_page_query),
+    ('inventory', scri.inventory_page_query),
+    ('alerts', scri.alerts_page_query)
+]
+
+
+def fetch(cursor, query, params, tuples):
+    """Rows of one page as dicts or as a Rows of tuples, like db_query"""
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    return Rows(cursor.column_names, rows) if tuples else rows
+
+
+def measure(conn, build, limit, repeat, tuples, encode, shape='rows'):
+    """Mean CPU ms to fetch and to encode one page, and the body size raw and gzipped"""
+    query, params, limit, key = build(MultiDict({'limit': limit}))
+    fetch_cpu = encode_cpu = 0.0
+    body = b''
+    cursor = conn.cursor(dictionary=not tuples)
+    try:
+        for _ in range(repeat):
+            started = time.process_time()
+            rows = fetch(cursor, query, params, tuples)
+            fetch_cpu += time.process_time() - started
+            conn.rollback()
+
+            started = time.process_time()
+            body = encode(scri.page_payload(rows, limit, key, shape))
+            encode_cpu += time.process_time() - started
+    finally:
+        cursor.close()
+    return {
+        'rows': min(len(rows), limit),
+        'fetch_cpu_ms': round(fetch_cpu * 1000 / repeat, 2),
+        'encode_cpu_ms': round(encode_cpu * 1000 / repeat, 2),
+        'total_cpu_ms': round((fetch_cpu + encode_cpu) * 1000 / repeat, 2),
+        'bytes': len(body),
+        'gzip_bytes': len(gzip.compress(body, 6))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the JSON response paths of the list endpoints')
+    parser.add_argument('--limit', type=int, default=scri.MAX_PAGE_LIMIT, help='rows per page')
+    parser.add_argument('--repeat', type=int, default=20, help='pages fetched and encoded per path')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    baseline = DefaultJSONProvider(scri.app)
+    best = FastJSONProvider(scri.app)
+    paths = [
+        ('baseline', False, lambda payload: baseline.dumps(payload).encode(), 'rows'),
+        ('stdlib', False, ENCODERS['stdlib'][0], 'rows'),
+        ('orjson', False, ENCODERS['orjson'][0], 'rows') if orjson is not None else None,
+        ('tuples', True, best.dumpb, 'rows'),
+        ('columns', True, best.dumpb, 'columns')
+    ]
+
+    report = {'encoder': best.encoder, 'limit': args.limit, 'repeat': args.repeat, 'endpoints': {}}
+    with scri.app.app_context(), scri.db_pool.connection() as conn:
+        for name, build in ENDPOINTS:
+            results = {}
+            for path, tuples, encode, shape in filter(None, paths):
+                results[path] = measure(conn, build, args.limit, args.repeat, tuples, encode, shape)
+            base = results['baseline']
+            for result in results.values():
+                result['cpu_vs_baseline'] = round(result['total_cpu_ms'] / base['total_cpu_ms'], 2) if base['total_cpu_ms'] else None
+                result['bytes_vs_baseline'] = round(result['bytes'] / base['bytes'], 2) if base['bytes'] else None
+            report['endpoints'][name] = results
+            print(f"{name}: {base['rows']} rows", file=sys.stderr)
+            for path, result in results.items():
+                print(f"  {path:9} fetch {result['fetch_cpu_ms']:>8} ms  encode {result['encode_cpu_ms']:>8} ms  "
+                      f"{result['bytes']:>9} B ({result['gzip_bytes']} gzipped)  x{result['cpu_vs_baseline']} CPU",
+                      file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+        print(f"✓ Wrote {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+"""
+Smart Supply Chain Risk Intelligence - Query Plan Regression Check
+Loads the schema into a scratch MySQL/MariaDB database, seeds it with generated rows and
+runs EXPLAIN on every hot query in app.py. Exits non-zero if any of them falls back to a
+full table scan or a filesort that the index pack is supposed to prevent.
+
+Usage:
+    python SCRI/db/check_query_plans.py [--database scri_plan_check] [--keep]
+
+Connection settings come from the same DB_HOST/DB_USER/DB_PASSWORD/DB_PORT variables as
+app.py. The scratch database is dropped afterwards unless --keep is given.
+"""
+
+import argparse
+import os
+import sys
+from datetime import date, datetime, timedelta
+
+import mysql.connector
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SCHEMA_FILE = os.path.join(ROOT, 'SCRI', 'db', 'smart_supply_chain.sql')
+sys.path.insert(0, ROOT)
+
+import app  # noqa: E402  (the hot queries are checked as app.py actually builds them)
+import eta_model  # noqa: E402
+import exposure_graph  # noqa: E402
+from generate_data import generate, scaled_volumes  # noqa: E402
+
+# Volumes generated for the check; large enough that the optimizer prefers indexes over scans
+PLAN_CHECK_VOLUMES = scaled_volumes(suppliers=500, warehouses=20, products=2000, shipments=50000,
+                                    events_per_shipment=2)
+
+
+def load_schema(cursor, database):
+    """Run smart_supply_chain.sql against ``database``, honouring DELIMITER blocks"""
+    with open(SCHEMA_FILE) as f:
+        sql = f.read().replace('smart_supply_chain', database)
+
+    delimiter = ';'
+    statement = []
+    for line in sql.splitlines():
+        stripped = line.strip()
+        if stripped.upper().startswith('DELIMITER'):
+            delimiter = stripped.split()[1]
+            continue
+        statement.append(line)
+        if stripped.endswith(delimiter):
+            text = '\n'.join(statement).strip()
+            text = text[:-len(delimiter)]
+            if text.strip():
+                cursor.execute(text)
+            statement = []
+
+
+def hot_queries():
+    """(name, sql, params, allowed full scans, filesort allowed) for every hot read path"""
+    page = app.DEFAULT_PAGE_LIMIT + 1
+    cursor_date = (date.today() - timedelta(days=30)).isoformat()
+    cursor_time = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d %H:%M:%S')
+    return [
+        ('shipments first page',
+         f"{app.SHIPMENTS_SELECT} ORDER BY sh.ship_date DESC, sh.shipment_id DESC LIMIT %s",
+         (page,), set(), False),
+        ('shipments cursor page',
+         f"{app.SHIPMENTS_SELECT} WHERE (sh.ship_date < %s OR (sh.ship_date = %s AND sh.shipment_id < %s)) "
+         "ORDER BY sh.ship_date DESC, sh.shipment_id DESC LIMIT %s",
+         (cursor_date, cursor_date, 10 ** 9, page), set(), False),
+        ('shipments by status',
+         f"{app.SHIPMENTS_SELECT} WHERE sh.status = %s ORDER BY sh.ship_date DESC, sh.shipment_id DESC LIMIT %s",
+         ('IN_TRANSIT', page), set(), False),
+        ('inventory first page',
+         f"{app.INVENTORY_SELECT} ORDER BY i.last_updated DESC, i.inventory_id DESC LIMIT %s",
+         (page,), set(), False),
+        ('inventory cursor page',
+         f"{app.INVENTORY_SELECT} WHERE (i.last_updated < %s OR (i.last_updated = %s AND i.inventory_id < %s)) "
+         "ORDER BY i.last_updated DESC, i.inventory_id DESC LIMIT %s",
+         (cursor_time, cursor_time, 10 ** 9, page), set(), False),
+        ('open alerts page',
+         f"{app.ALERTS_SELECT} WHERE resolved = %s ORDER BY created_at DESC, alert_id DESC LIMIT %s",
+         (0, page), set(), False),
+        ('alerts cursor page',
+         f"{app.ALERTS_SELECT} WHERE resolved = %s AND (created_at < %s OR (created_at = %s AND alert_id < %s)) "
+         "ORDER BY created_at DESC, alert_id DESC LIMIT %s",
+         (1, cursor_time, cursor_time, 10 ** 9, page), set(), False),
+        ('products page',
+         "SELECT p.*, s.name as supplier_name FROM products p JOIN suppliers s ON p.supplier_id = s.supplier_id "
+         "WHERE p.product_id > %s ORDER BY p.product_id LIMIT %s",
+         (100, page), set(), False),
+        ('shipment events',
+         "SELECT * FROM shipment_events WHERE shipment_id = %s ORDER BY event_time DESC",
+         (1000,), set(), False),
+        ('supplier metrics history',
+         "SELECT * FROM supplier_metrics WHERE supplier_id = %s ORDER BY record_date DESC LIMIT 30",
+         (10,), set(), False),
+        ('suppliers list',
+         "SELECT s.*, COALESCE(m.risk_score, 0) as risk_score, COALESCE(m.risk_level, 'LOW') as risk_level "
+         "FROM suppliers s LEFT JOIN supplier_risk_current m ON m.supplier_id = s.supplier_id ORDER BY s.supplier_id",
+         (), {'s'}, False),
+        ('supplier risk summary',
+         "SELECT * FROM supplier_risk_summary ORDER BY risk_score DESC",
+         (), {'s'}, True),
+        # Sorted by a computed delay; the OR over status/expected_arrival_date may legitimately
+        # scan when a large share of shipments is overdue, so only filesort/scan of sh is allowed
+        ('delayed shipments overview',
+         "SELECT * FROM delayed_shipments_overview ORDER BY delay_days DESC",
+         (), {'sh'}, True),
+        ('dashboard metrics', app.DASHBOARD_METRICS_QUERY, (), {'suppliers'}, False),
+        ('stream new alerts',
+         f"{app.ALERTS_SELECT} WHERE alert_id > %s ORDER BY alert_id LIMIT %s",
+         (1000, app.STREAM_BATCH_LIMIT), set(), False),
+        ('stream resolved alerts',
+         "SELECT alert_id, resolved_at FROM alerts WHERE resolved_at >= %s ORDER BY resolved_at, alert_id LIMIT %s",
+         (cursor_time, app.STREAM_BATCH_LIMIT), set(), False),
+        ('alert pipeline open-alert lookup',
+         "SELECT alert_id, alert_type, entity_type, entity_id, severity FROM alerts "
+         "WHERE resolved = 0 AND created_at >= NOW() - INTERVAL %s SECOND "
+         "AND (alert_type, entity_type, entity_id) IN ((%s, %s, %s), (%s, %s, %s))",
+         (86400, 'LOW_INVENTORY', 'INVENTORY', 5, 'SHIPMENT_DELAY', 'SHIPMENT', 1000), set(), False),
+        ('risk window per supplier',
+         "SELECT COUNT(*) FROM shipments WHERE supplier_id = %s AND ship_date >= CURDATE() - INTERVAL 90 DAY "
+         "AND status IN ('DELIVERED','DELAYED')",
+         (10,), set(), False),
+        # Whole-fleet aggregation: reads every supplier and the full 90-day window by design
+        ('batch risk aggregation', app.SUPPLIER_RISK_QUERY, (), {'s', 'shipments'}, True),
+        ('risk simulator features', app.RISK_FEATURES_QUERY, (), {'s'}, False),
+        ('risk counters dirty batch',
+         "SELECT supplier_id, change_seq FROM supplier_risk_counters WHERE dirty = 1 AND supplier_id > %s "
+         "ORDER BY supplier_id LIMIT %s",
+         (0, app.RISK_BATCH_SIZE), set(), False),
+        # One day of buckets leaves the window per night; DISTINCT over that range may sort
+        ('risk counters aged days',
+         "SELECT DISTINCT supplier_id FROM supplier_risk_daily WHERE ship_date < CURDATE() - INTERVAL 90 DAY "
+         "ORDER BY supplier_id LIMIT %s",
+         (app.RISK_BATCH_SIZE,), set(), True),
+        ('incremental risk scoring', app.SUPPLIER_RISK_COUNTERS_QUERY.format(ids='%s, %s, %s'),
+         (10, 20, 30, 10, 20, 30), set(), False),
+        # One year of rollup rows grouped by week; the grouping may sort
+        ('analytics delay rate', *app.delay_rate_query({})[:2], set(), True),
+        ('analytics supplier delay rate', *app.delay_rate_query({'supplier_id': '10'})[:2], set(), False),
+        ('analytics alerts', *app.alert_trend_query({})[:2], set(), True),
+        ('analytics stockouts', *app.stockout_query({})[:2], set(), True),
+        # Keyset batches of the incremental snapshot export (snapshot.py)
+        *[(f'snapshot {table}',
+           f"SELECT * FROM {table} WHERE {column} >= %s AND ({column} > %s OR {key} > %s) ORDER BY {column}, {key} LIMIT %s",
+           (cursor_time, cursor_time, 0, app.SNAPSHOT_BATCH_SIZE), set(), False)
+          for table, key, column in (('shipments', 'shipment_id', 'updated_at'), ('alerts', 'alert_id', 'updated_at'),
+                                     ('inventory', 'inventory_id', 'last_updated'))],
+        ('inventory forecast', *app.forecast_page_query({})[:2], set(), False),
+        ('inventory forecast by warehouse', *app.forecast_page_query({'warehouse_id': '3', 'within': '14'})[:2], set(), False),
+        ('eta scoring batch',
+         eta_model.SCORING_QUERY.format(after='AND (sh.ship_date > %s OR (sh.ship_date = %s AND sh.shipment_id > %s))'),
+         (cursor_date, cursor_date, 0, app.ETA_SCORE_BATCH_SIZE), set(), False),
+        # Incremental refresh of the supplier impact graph (exposure_graph.py)
+        ('exposure changed inventory', exposure_graph.POSITIONS_QUERY.format(where='WHERE i.last_updated >= %s'),
+         (cursor_time,), set(), False),
+        ('exposure changed shipments', exposure_graph.CHANGED_SHIPMENT_POSITIONS_QUERY, (cursor_time,), set(), False)
+    ]
+
+
+def check_plan(cursor, name, sql, params, allowed_scans, allow_filesort):
+    """EXPLAIN one query and return a list of problems found in its plan"""
+    cursor.execute(f"EXPLAIN {sql}", params)
+    problems = []
+    for row in cursor.fetchall():
+        table = row.get('table') or ''
+        access = (row.get('type') or '').upper()
+        extra = row.get('Extra') or ''
+        if table.startswith('<'):
+            continue  # derived tables and unions are materialized results, not base tables
+        if access == 'ALL' and table not in allowed_scans:
+            problems.append(f"full table scan on {table} (~{row.get('rows')} rows)")
+        if 'Using filesort' in extra and not allow_filesort:
+            problems.append(f"filesort on {table}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--database', default=os.getenv('PLAN_CHECK_DB', 'scri_plan_check'))
+    parser.add_argument('--keep', action='store_true', help='keep the scratch database afterwards')
+    args = parser.parse_args()
+
+    conn = mysql.connector.connect(
+        host=app.DB_CONFIG['host'],
+        user=app.DB_CONFIG['user'],
+        password=app.DB_CONFIG['password'],
+        port=app.DB_CONFIG['port'],
+        autocommit=True
+    )
+    cursor = conn.cursor(dictionary=True)
+    try:
+        print(f"Loading schema into scratch database {args.database}...")
+        cursor.execute(f"DROP DATABASE IF EXISTS `{args.database}`")
+        load_schema(cursor, args.database)
+        conn.autocommit = False
+        print("Seeding generated data...")
+        generate(conn, PLAN_CHECK_VOLUMES, days=365, batch_size=2000, progress=lambda message: None)
+
+        failures = 0
+        for name, sql, params, allowed_scans, allow_filesort in hot_queries():
+            problems = check_plan(cursor, name, sql, params, allowed_scans, allow_filesort)
+            if problems:
+                failures += 1
+                print(f"✗ {name}: {'; '.join(problems)}")
+            else:
+                print(f"✓ {name}")
+    finally:
+        if not args.keep:
+            cursor.execute(f"DROP DATABASE IF EXISTS `{args.database}`")
+        cursor.close()
+        conn.close()
+
+    if failures:
+        print(f"\n{failures} hot queries regressed")
+        sys.exit(1)
+    print("\nAll hot query plans use indexes")
+
+
+if __name__ == '__main__':
+    main()
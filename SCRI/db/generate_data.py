@@ -0,0 +1,378 @@
+"""
+Smart Supply Chain Risk Intelligence - Synthetic Data Generator
+Bulk-loads production-scale suppliers, products, inventory, shipments, shipment events,
+alerts and supplier metrics with realistic delay and status distributions.
+
+Usage:
+    python SCRI/db/generate_data.py --suppliers 50000 --shipments 5000000 --events-per-shipment 4
+    python SCRI/db/generate_data.py --scale 0.01          # 1% of the default volumes
+
+Connection settings come from the DB_HOST/DB_NAME/DB_USER/DB_PASSWORD/DB_PORT variables
+used by app.py. Rows are appended after the existing ones; pass --truncate to clear the
+tables first.
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+import mysql.connector
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+
+from risk_counters import RiskCounters  # noqa: E402
+from rollups import Rollups  # noqa: E402
+from forecasting import StockoutForecaster  # noqa: E402
+
+# Default volumes (--scale multiplies all of them)
+DEFAULT_VOLUMES = {
+    'suppliers': 50000,
+    'warehouses': 200,
+    'products': 250000,
+    'warehouses_per_product': 3,
+    'shipments': 5000000,
+    'events_per_shipment': 4,
+    'metric_days': 7
+}
+
+# Tables in dependency order (children are cleared first on --truncate)
+TABLES = ['suppliers', 'warehouses', 'products', 'inventory', 'shipments', 'shipment_events',
+          'supplier_metrics', 'supplier_risk_current', 'supplier_risk_counters', 'supplier_risk_daily',
+          'supplier_open_delays', 'alerts', 'audit_logs', 'rollup_shipments_daily',
+          'rollup_supplier_shipments_weekly', 'rollup_alerts_daily', 'rollup_warehouse_stock_daily',
+          'inventory_history', 'inventory_forecast', 'shipment_eta', 'shipments_archive',
+          'shipment_events_archive', 'alerts_archive', 'audit_logs_archive']
+
+
+def scaled_volumes(scale=1.0, **overrides):
+    """Default volumes multiplied by ``scale``, with explicit per-table overrides applied last"""
+    volumes = {}
+    for key, value in DEFAULT_VOLUMES.items():
+        if key in ('warehouses_per_product', 'events_per_shipment', 'metric_days'):
+            volumes[key] = value
+        else:
+            volumes[key] = max(1, int(value * scale))
+    volumes.update({key: value for key, value in overrides.items() if value is not None})
+    volumes['warehouses_per_product'] = min(volumes['warehouses_per_product'], volumes['warehouses'])
+    return volumes
+
+
+class BulkWriter:
+    """Buffers rows for one table and flushes them as multi-row INSERTs"""
+
+    def __init__(self, conn, table, columns, batch_size):
+        self.conn = conn
+        self.table = table
+        self.columns = columns
+        self.batch_size = batch_size
+        self.rows = []
+        self.written = 0
+        self._placeholders = '(' + ', '.join(['%s'] * len(columns)) + ')'
+
+    def add(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        cursor = self.conn.cursor()
+        values = ', '.join([self._placeholders] * len(self.rows))
+        params = [value for row in self.rows for value in row]
+        cursor.execute(f"INSERT INTO {self.table} ({', '.join(self.columns)}) VALUES {values}", params)
+        cursor.close()
+        self.conn.commit()
+        self.written += len(self.rows)
+        self.rows = []
+
+
+def next_id(conn, table, column):
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT COALESCE(MAX({column}), 0) + 1 FROM {table}")
+    value = int(cursor.fetchone()[0])
+    cursor.close()
+    return value
+
+
+def truncate(conn):
+    cursor = conn.cursor()
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+    for table in reversed(TABLES):
+        cursor.execute(f"TRUNCATE TABLE {table}")
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+    cursor.close()
+
+
+def shipment_timeline(rng, today, ship_date, transit_days, reliability):
+    """Expected/actual arrival, status and delay for one shipment.
+
+    Suppliers with lower reliability are late more often; late deliveries follow an
+    exponential tail averaging three days, with the occasional week-plus delay.
+    """
+    expected = ship_date + timedelta(days=transit_days)
+    delay = 0
+    if rng.random() > reliability:
+        delay = max(1, int(math.ceil(rng.expovariate(1 / 3.0))))
+    arrival = expected + timedelta(days=delay)
+
+    if rng.random() < 0.02:
+        return expected, None, 'CANCELLED', delay
+    if arrival <= today:
+        return expected, arrival, 'DELIVERED', delay
+    if (today - ship_date).days < 1 and rng.random() < 0.5:
+        return expected, None, 'CREATED', delay
+    if expected < today:
+        return expected, None, 'DELAYED', delay
+    return expected, None, 'IN_TRANSIT', delay
+
+
+def generate(conn, volumes, seed=42, days=365, batch_size=5000, progress=print):
+    """Append generated rows for every table to the database behind ``conn``"""
+    rng = random.Random(seed)
+    today = date.today()
+    now = datetime.now()
+    started = time.monotonic()
+
+    cursor = conn.cursor()
+    # Bulk-load settings for this session only; ids are assigned here, so FK checks are redundant
+    cursor.execute("SET SESSION FOREIGN_KEY_CHECKS = 0")
+    cursor.execute("SET SESSION UNIQUE_CHECKS = 0")
+    cursor.close()
+
+    def report(label, count):
+        progress(f"  {label}: {count:,} rows ({time.monotonic() - started:.1f}s)")
+
+    # Suppliers: reliability drives their share of late shipments
+    first_supplier = next_id(conn, 'suppliers', 'supplier_id')
+    supplier_ids = list(range(first_supplier, first_supplier + volumes['suppliers']))
+    reliability = {sid: rng.betavariate(8, 2) for sid in supplier_ids}
+    writer = BulkWriter(conn, 'suppliers', ['supplier_id', 'name', 'contact_email', 'phone', 'rating'], batch_size)
+    for sid in supplier_ids:
+        writer.add((sid, f'Supplier {sid}', f'supplier{sid}@example.com', f'+1-202-555-{sid % 10000:04d}',
+                    round(min(5.0, 2.0 + reliability[sid] * 3.2), 2)))
+    writer.flush()
+    report('suppliers', writer.written)
+
+    first_warehouse = next_id(conn, 'warehouses', 'warehouse_id')
+    warehouse_ids = list(range(first_warehouse, first_warehouse + volumes['warehouses']))
+    writer = BulkWriter(conn, 'warehouses', ['warehouse_id', 'name', 'location'], batch_size)
+    for wid in warehouse_ids:
+        writer.add((wid, f'Warehouse {wid}', f'Region {wid % 50}'))
+    writer.flush()
+    report('warehouses', writer.written)
+
+    # Products: a few suppliers carry large catalogues (Pareto-distributed popularity)
+    first_product = next_id(conn, 'products', 'product_id')
+    product_ids = list(range(first_product, first_product + volumes['products']))
+    supplier_weights = [rng.paretovariate(1.5) for _ in supplier_ids]
+    product_supplier = dict(zip(product_ids, rng.choices(supplier_ids, supplier_weights, k=len(product_ids))))
+    lead_time = {pid: rng.randint(2, 21) for pid in product_ids}
+    writer = BulkWriter(conn, 'products',
+                        ['product_id', 'supplier_id', 'name', 'sku', 'category', 'unit_cost', 'lead_time_days'],
+                        batch_size)
+    for pid in product_ids:
+        writer.add((pid, product_supplier[pid], f'Product {pid}', f'GEN-{seed}-{pid}',
+                    rng.choice(['Widgets', 'Gizmos', 'Components', 'Raw Materials', 'Packaging']),
+                    round(rng.lognormvariate(3, 1), 2), lead_time[pid]))
+    writer.flush()
+    report('products', writer.written)
+
+    # Inventory: most positions healthy, ~10% below reorder threshold, ~4% below safety stock
+    writer = BulkWriter(conn, 'inventory',
+                        ['product_id', 'warehouse_id', 'quantity', 'reorder_threshold', 'safety_stock', 'last_updated'],
+                        batch_size)
+    low_positions = []
+    for pid in product_ids:
+        for wid in rng.sample(warehouse_ids, volumes['warehouses_per_product']):
+            threshold = rng.randint(20, 500)
+            safety = int(threshold * rng.uniform(0.4, 0.7))
+            roll = rng.random()
+            if roll < 0.04:
+                quantity = rng.randint(0, max(0, safety - 1))
+            elif roll < 0.10:
+                quantity = rng.randint(safety, threshold - 1)
+            else:
+                quantity = rng.randint(threshold, threshold * 4)
+            if quantity < threshold:
+                low_positions.append((pid, wid, quantity < safety))
+            writer.add((pid, wid, quantity, threshold, safety, now - timedelta(minutes=rng.randint(0, 60 * 24 * 30))))
+    writer.flush()
+    report('inventory', writer.written)
+
+    # Shipments and their event timelines, streamed so memory stays flat
+    first_shipment = next_id(conn, 'shipments', 'shipment_id')
+    shipments = BulkWriter(conn, 'shipments',
+                           ['shipment_id', 'supplier_id', 'product_id', 'warehouse_id', 'quantity', 'ship_date',
+                            'expected_arrival_date', 'actual_arrival_date', 'status'],
+                           batch_size)
+    events = BulkWriter(conn, 'shipment_events', ['shipment_id', 'event_time', 'event_type', 'details'], batch_size)
+    alerts = BulkWriter(conn, 'alerts',
+                        ['created_at', 'alert_type', 'severity', 'entity_type', 'entity_id', 'message',
+                         'resolved', 'resolved_at'],
+                        batch_size)
+    per_shipment = max(1, volumes['events_per_shipment'])
+    for offset in range(volumes['shipments']):
+        sid = first_shipment + offset
+        pid = rng.choice(product_ids)
+        supplier_id = product_supplier[pid]
+        ship_date = today - timedelta(days=int(rng.triangular(0, days, 0)))
+        transit = max(1, lead_time[pid] + rng.randint(-2, 3))
+        expected, actual, status, delay = shipment_timeline(rng, today, ship_date, transit, reliability[supplier_id])
+        shipments.add((sid, supplier_id, pid, rng.choice(warehouse_ids), rng.randint(10, 1000),
+                       ship_date, expected, actual, status))
+
+        # Timeline: CREATED, checkpoints spread over the trip so far, DELAY_RISK if late, ARRIVED if delivered
+        start = datetime.combine(ship_date, datetime.min.time()) + timedelta(hours=rng.randint(6, 18))
+        end = datetime.combine(actual, datetime.min.time()) + timedelta(hours=rng.randint(8, 20)) if actual else now
+        end = max(end, start + timedelta(hours=1))
+        if status == 'DELIVERED':
+            count = per_shipment
+        elif status in ('CREATED', 'CANCELLED'):
+            count = 1
+        else:
+            count = max(1, per_shipment - 1)
+        span = end - start
+        for n in range(count):
+            if n == 0:
+                event_type, details = 'CREATED', 'created'
+            elif status == 'DELIVERED' and n == count - 1:
+                event_type, details = 'ARRIVED', 'arrived'
+            elif delay and n == count - 2:
+                event_type, details = 'DELAY_RISK', rng.choice(['weather', 'carrier capacity', 'customs', 'port congestion'])
+            else:
+                event_type, details = 'CHECKPOINT', 'in transit'
+            events.add((sid, start + span * (n / max(1, count - 1)) if count > 1 else start, event_type, details))
+
+        if status == 'DELAYED' or (delay and rng.random() < 0.5):
+            created = datetime.combine(expected, datetime.min.time()) + timedelta(hours=1)
+            resolved = status == 'DELIVERED'
+            alerts.add((created, 'SHIPMENT_DELAY', 'WARN', 'SHIPMENT', sid, f'Shipment {sid} behind schedule',
+                        1 if resolved else 0, end if resolved else None))
+
+        if (offset + 1) % 500000 == 0:
+            report('shipments', offset + 1)
+    shipments.flush()
+    events.flush()
+    report('shipments', shipments.written)
+    report('shipment_events', events.written)
+
+    cursor = conn.cursor()
+    cursor.execute("SELECT inventory_id, product_id, warehouse_id FROM inventory WHERE quantity < reorder_threshold")
+    inventory_ids = {(pid, wid): iid for iid, pid, wid in cursor.fetchall()}
+    cursor.close()
+    for pid, wid, critical in low_positions:
+        iid = inventory_ids.get((pid, wid))
+        if iid is not None:
+            alerts.add((now - timedelta(minutes=rng.randint(0, 60 * 24 * 7)), 'LOW_INVENTORY',
+                        'CRITICAL' if critical else 'WARN', 'INVENTORY', iid,
+                        f'Inventory low for product {pid} at warehouse {wid}', 0, None))
+    alerts.flush()
+    report('alerts', alerts.written)
+
+    # Daily metrics history consistent with each supplier's reliability
+    writer = BulkWriter(conn, 'supplier_metrics',
+                        ['supplier_id', 'record_date', 'on_time_rate', 'avg_delay_days', 'defect_rate',
+                         'risk_score', 'risk_level', 'notes'],
+                        batch_size)
+    for sid in supplier_ids:
+        defect = round(rng.uniform(0.0, 0.06), 4)
+        for day in range(volumes['metric_days'], 0, -1):
+            on_time = round(min(1.0, max(0.0, reliability[sid] + rng.gauss(0, 0.02))), 4)
+            avg_delay = round((1 - on_time) * rng.uniform(2, 5), 2)
+            score = round(min(100, max(0, 50 * (1 - on_time) + 30 * (avg_delay / 10) + 20 * defect)), 2)
+            level = 'LOW' if score < 30 else 'MEDIUM' if score < 60 else 'HIGH'
+            writer.add((sid, today - timedelta(days=day), on_time, avg_delay, defect, score, level, 'generated'))
+    writer.flush()
+    report('supplier_metrics', writer.written)
+
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO supplier_risk_current(supplier_id, record_date, on_time_rate, avg_delay_days, defect_rate, risk_score, risk_level)
+        SELECT supplier_id, record_date, on_time_rate, avg_delay_days, defect_rate, risk_score, risk_level
+        FROM supplier_metrics
+        WHERE supplier_id BETWEEN %s AND %s AND record_date = CURDATE() - INTERVAL 1 DAY
+        ON DUPLICATE KEY UPDATE record_date=VALUES(record_date), on_time_rate=VALUES(on_time_rate),
+            avg_delay_days=VALUES(avg_delay_days), defect_rate=VALUES(defect_rate),
+            risk_score=VALUES(risk_score), risk_level=VALUES(risk_level)
+    """, (supplier_ids[0], supplier_ids[-1]))
+    conn.commit()
+
+    # Rows were inserted directly, so the incremental risk counters are rebuilt from shipments
+    RiskCounters(batch_size=batch_size).rebuild(cursor)
+    conn.commit()
+    progress(f"  supplier_risk_counters: rebuilt ({time.monotonic() - started:.1f}s)")
+
+    Rollups(batch_size=batch_size).refresh(cursor)
+    conn.commit()
+    progress(f"  analytics rollups: rebuilt ({time.monotonic() - started:.1f}s)")
+
+    # No stock history yet, so usage comes from deliveries until the forecast job has run for a week
+    forecaster = StockoutForecaster(batch_size=batch_size)
+    forecast_cursor = conn.cursor(dictionary=True)
+    forecaster.snapshot_history(forecast_cursor)
+    forecast = forecaster.compute(forecast_cursor)
+    forecaster.write(forecast_cursor, forecast)
+    forecast_cursor.close()
+    conn.commit()
+    progress(f"  inventory forecast: {len(forecast['inventory_id'])} positions ({time.monotonic() - started:.1f}s)")
+
+    # Every list changed under the app, so invalidate the ETags clients hold
+    cursor.execute("UPDATE table_versions SET version = version + 1")
+    conn.commit()
+
+    for table in TABLES:
+        cursor.execute(f"ANALYZE TABLE {table}")
+        cursor.fetchall()
+    cursor.execute("SET SESSION FOREIGN_KEY_CHECKS = 1")
+    cursor.execute("SET SESSION UNIQUE_CHECKS = 1")
+    cursor.close()
+    progress(f"✓ Generated data in {time.monotonic() - started:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk-load synthetic supply chain data')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiplier for the default volumes')
+    parser.add_argument('--suppliers', type=int)
+    parser.add_argument('--warehouses', type=int)
+    parser.add_argument('--products', type=int)
+    parser.add_argument('--shipments', type=int)
+    parser.add_argument('--events-per-shipment', type=int)
+    parser.add_argument('--days', type=int, default=365, help='history window for ship dates')
+    parser.add_argument('--batch-size', type=int, default=5000, help='rows per INSERT statement')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--truncate', action='store_true', help='empty every table before loading')
+    args = parser.parse_args()
+
+    volumes = scaled_volumes(args.scale, suppliers=args.suppliers, warehouses=args.warehouses,
+                             products=args.products, shipments=args.shipments,
+                             events_per_shipment=args.events_per_shipment)
+
+    conn = mysql.connector.connect(
+        host=os.getenv('DB_HOST', 'localhost'),
+        database=os.getenv('DB_NAME', 'smart_supply_chain'),
+        user=os.getenv('DB_USER', 'root'),
+        password=os.getenv('DB_PASSWORD', ''),
+        port=int(os.getenv('DB_PORT', 3306)),
+        autocommit=False
+    )
+    try:
+        if args.truncate:
+            print("Clearing existing rows...")
+            truncate(conn)
+        print(f"Generating {volumes}")
+        generate(conn, volumes, seed=args.seed, days=args.days, batch_size=args.batch_size)
+    except mysql.connector.Error as e:
+        print(f"✗ Data generation failed: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+-- Migration 001: set-based daily_update_supplier_risks
+-- Replaces the per-supplier cursor loop with one grouped aggregation and bulk writes,
+-- and makes compute_supplier_risk store avg_delay_days = 0 (not NULL) for suppliers
+-- without deliveries in the last 90 days, so both procedures score them identically.
+USE smart_supply_chain;
+
+DROP PROCEDURE IF EXISTS compute_supplier_risk;
+DROP PROCEDURE IF EXISTS daily_update_supplier_risks;
+
+DELIMITER //
+CREATE PROCEDURE compute_supplier_risk(IN p_supplier_id INT)
+BEGIN
+  DECLARE v_total_delivered INT DEFAULT 0;
+  DECLARE v_delayed INT DEFAULT 0;
+  DECLARE v_on_time_rate DECIMAL(6,4) DEFAULT 1.0000;
+  DECLARE v_avg_delay DECIMAL(10,2) DEFAULT 0;
+  DECLARE v_defect_rate DECIMAL(6,4) DEFAULT 0.0000;
+  DECLARE v_score DECIMAL(10,2) DEFAULT 0.00;
+  DECLARE v_level VARCHAR(16) DEFAULT 'LOW';
+
+  SELECT COUNT(*) INTO v_total_delivered
+  FROM shipments
+  WHERE supplier_id = p_supplier_id
+    AND ship_date >= CURDATE() - INTERVAL 90 DAY
+    AND status IN ('DELIVERED','DELAYED');
+
+  SELECT COUNT(*) INTO v_delayed
+  FROM shipments
+  WHERE supplier_id = p_supplier_id
+    AND ship_date >= CURDATE() - INTERVAL 90 DAY
+    AND (status = 'DELAYED' OR (actual_arrival_date IS NOT NULL AND actual_arrival_date > expected_arrival_date));
+
+  IF v_total_delivered > 0 THEN
+    SET v_on_time_rate = (v_total_delivered - v_delayed) / v_total_delivered;
+  ELSE
+    SET v_on_time_rate = 1.0000;
+  END IF;
+
+  SELECT AVG(GREATEST(DATEDIFF(COALESCE(actual_arrival_date, CURDATE()), expected_arrival_date),0)) INTO v_avg_delay
+  FROM shipments
+  WHERE supplier_id = p_supplier_id
+    AND ship_date >= CURDATE() - INTERVAL 90 DAY
+    AND status IN ('DELIVERED','DELAYED');
+
+  IF v_avg_delay IS NULL THEN
+    SET v_avg_delay = 0;
+  END IF;
+
+  SELECT defect_rate INTO v_defect_rate
+  FROM supplier_metrics
+  WHERE supplier_id = p_supplier_id
+  ORDER BY record_date DESC
+  LIMIT 1;
+
+  IF v_defect_rate IS NULL THEN
+    SET v_defect_rate = 0.0200;
+  END IF;
+
+  SET v_score = LEAST(100, GREATEST(0, 50*(1 - v_on_time_rate) + 30*(v_avg_delay/10) + 20*(v_defect_rate)));
+
+  IF v_score < 30 THEN
+    SET v_level = 'LOW';
+  ELSEIF v_score < 60 THEN
+    SET v_level = 'MEDIUM';
+  ELSE
+    SET v_level = 'HIGH';
+  END IF;
+
+  INSERT INTO supplier_metrics(supplier_id, record_date, on_time_rate, avg_delay_days, defect_rate, risk_score, risk_level, notes)
+  VALUES(p_supplier_id, CURDATE(), v_on_time_rate, v_avg_delay, v_defect_rate, v_score, v_level, 'auto')
+  ON DUPLICATE KEY UPDATE on_time_rate=VALUES(on_time_rate), avg_delay_days=VALUES(avg_delay_days), defect_rate=VALUES(defect_rate), risk_score=VALUES(risk_score), risk_level=VALUES(risk_level), notes=VALUES(notes);
+
+  INSERT INTO audit_logs(occurred_at, action, entity_type, entity_id, details)
+  VALUES (NOW(), 'COMPUTE_SUPPLIER_RISK', 'SUPPLIER', p_supplier_id, CONCAT('score=', v_score, ', level=', v_level));
+END//
+DELIMITER ;
+
+DELIMITER //
+CREATE PROCEDURE daily_update_supplier_risks()
+BEGIN
+  -- Same inputs and formula as compute_supplier_risk, for every supplier in one grouped pass
+  DROP TEMPORARY TABLE IF EXISTS tmp_supplier_risk;
+  CREATE TEMPORARY TABLE tmp_supplier_risk AS
+  SELECT f.supplier_id, f.on_time_rate, f.avg_delay_days, f.defect_rate, f.risk_score,
+         CASE WHEN f.risk_score < 30 THEN 'LOW'
+              WHEN f.risk_score < 60 THEN 'MEDIUM'
+              ELSE 'HIGH' END AS risk_level
+  FROM (
+    SELECT r.*,
+           CAST(LEAST(100, GREATEST(0, 50*(1 - r.on_time_rate) + 30*(r.avg_delay_days/10) + 20*(r.defect_rate))) AS DECIMAL(10,2)) AS risk_score
+    FROM (
+      SELECT s.supplier_id,
+             CAST(IF(COALESCE(agg.total_delivered, 0) > 0,
+                     (agg.total_delivered - agg.delayed_count) / agg.total_delivered,
+                     1) AS DECIMAL(6,4)) AS on_time_rate,
+             CAST(COALESCE(agg.avg_delay, 0) AS DECIMAL(10,2)) AS avg_delay_days,
+             CAST(IF(latest.supplier_id IS NULL, 0, COALESCE(m.defect_rate, 0.02)) AS DECIMAL(6,4)) AS defect_rate
+      FROM suppliers s
+      LEFT JOIN (
+        SELECT supplier_id,
+               SUM(status IN ('DELIVERED','DELAYED')) AS total_delivered,
+               SUM(status = 'DELAYED' OR (actual_arrival_date IS NOT NULL AND actual_arrival_date > expected_arrival_date)) AS delayed_count,
+               AVG(CASE WHEN status IN ('DELIVERED','DELAYED')
+                        THEN GREATEST(DATEDIFF(COALESCE(actual_arrival_date, CURDATE()), expected_arrival_date), 0) END) AS avg_delay
+        FROM shipments
+        WHERE ship_date >= CURDATE() - INTERVAL 90 DAY
+        GROUP BY supplier_id
+      ) agg ON agg.supplier_id = s.supplier_id
+      LEFT JOIN (
+        SELECT supplier_id, MAX(record_date) AS record_date
+        FROM supplier_metrics
+        GROUP BY supplier_id
+      ) latest ON latest.supplier_id = s.supplier_id
+      LEFT JOIN supplier_metrics m
+        ON m.supplier_id = latest.supplier_id AND m.record_date = latest.record_date
+    ) r
+  ) f;
+
+  INSERT INTO supplier_metrics(supplier_id, record_date, on_time_rate, avg_delay_days, defect_rate, risk_score, risk_level, notes)
+  SELECT supplier_id, CURDATE(), on_time_rate, avg_delay_days, defect_rate, risk_score, risk_level, 'auto'
+  FROM tmp_supplier_risk
+  ON DUPLICATE KEY UPDATE on_time_rate=VALUES(on_time_rate), avg_delay_days=VALUES(avg_delay_days), defect_rate=VALUES(defect_rate), risk_score=VALUES(risk_score), risk_level=VALUES(risk_level), notes=VALUES(notes);
+
+  INSERT INTO audit_logs(occurred_at, action, entity_type, entity_id, details)
+  SELECT NOW(), 'COMPUTE_SUPPLIER_RISK', 'SUPPLIER', supplier_id, CONCAT('score=', risk_score, ', level=', risk_level)
+  FROM tmp_supplier_risk;
+
+  DROP TEMPORARY TABLE tmp_supplier_risk;
+
+  INSERT INTO audit_logs(occurred_at, action, entity_type, entity_id, details)
+  VALUES (NOW(), 'DAILY_RISK_UPDATE', 'SYSTEM', 0, 'completed');
+END//
+DELIMITER ;
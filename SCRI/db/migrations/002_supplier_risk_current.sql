@@ -0,0 +1,163 @@
+-- Migration 002: supplier_risk_current projection
+-- One row per supplier holding its latest supplier_metrics values, so read paths join on the
+-- primary key instead of a correlated MAX(record_date) subquery per supplier.
+USE smart_supply_chain;
+
+-- Latest supplier_metrics row per supplier, kept in step by every metrics writer
+CREATE TABLE IF NOT EXISTS supplier_risk_current (
+  supplier_id INT PRIMARY KEY,
+  record_date DATE NOT NULL,
+  on_time_rate DECIMAL(6,4) DEFAULT 1.0000,
+  avg_delay_days DECIMAL(10,2) DEFAULT 0,
+  defect_rate DECIMAL(6,4) DEFAULT 0,
+  risk_score DECIMAL(10,2) DEFAULT 0,
+  risk_level VARCHAR(16) DEFAULT 'LOW',
+  updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  CONSTRAINT fk_supplier_risk_current_suppliers FOREIGN KEY (supplier_id) REFERENCES suppliers(supplier_id)
+);
+
+-- Backfill from the latest metrics row of every supplier
+INSERT INTO supplier_risk_current(supplier_id, record_date, on_time_rate, avg_delay_days, defect_rate, risk_score, risk_level)
+SELECT m.supplier_id, m.record_date, m.on_time_rate, m.avg_delay_days, m.defect_rate, m.risk_score, m.risk_level
+FROM supplier_metrics m
+JOIN (
+  SELECT supplier_id, MAX(record_date) AS record_date
+  FROM supplier_metrics
+  GROUP BY supplier_id
+) latest ON latest.supplier_id = m.supplier_id AND latest.record_date = m.record_date
+ON DUPLICATE KEY UPDATE record_date=VALUES(record_date), on_time_rate=VALUES(on_time_rate), avg_delay_days=VALUES(avg_delay_days), defect_rate=VALUES(defect_rate), risk_score=VALUES(risk_score), risk_level=VALUES(risk_level);
+
+-- Metric writers also maintain the projection
+DROP PROCEDURE IF EXISTS compute_supplier_risk;
+DROP PROCEDURE IF EXISTS daily_update_supplier_risks;
+
+DELIMITER //
+CREATE PROCEDURE compute_supplier_risk(IN p_supplier_id INT)
+BEGIN
+  DECLARE v_total_delivered INT DEFAULT 0;
+  DECLARE v_delayed INT DEFAULT 0;
+  DECLARE v_on_time_rate DECIMAL(6,4) DEFAULT 1.0000;
+  DECLARE v_avg_delay DECIMAL(10,2) DEFAULT 0;
+  DECLARE v_defect_rate DECIMAL(6,4) DEFAULT 0.0000;
+  DECLARE v_score DECIMAL(10,2) DEFAULT 0.00;
+  DECLARE v_level VARCHAR(16) DEFAULT 'LOW';
+
+  SELECT COUNT(*) INTO v_total_delivered
+  FROM shipments
+  WHERE supplier_id = p_supplier_id
+    AND ship_date >= CURDATE() - INTERVAL 90 DAY
+    AND status IN ('DELIVERED','DELAYED');
+
+  SELECT COUNT(*) INTO v_delayed
+  FROM shipments
+  WHERE supplier_id = p_supplier_id
+    AND ship_date >= CURDATE() - INTERVAL 90 DAY
+    AND (status = 'DELAYED' OR (actual_arrival_date IS NOT NULL AND actual_arrival_date > expected_arrival_date));
+
+  IF v_total_delivered > 0 THEN
+    SET v_on_time_rate = (v_total_delivered - v_delayed) / v_total_delivered;
+  ELSE
+    SET v_on_time_rate = 1.0000;
+  END IF;
+
+  SELECT AVG(GREATEST(DATEDIFF(COALESCE(actual_arrival_date, CURDATE()), expected_arrival_date),0)) INTO v_avg_delay
+  FROM shipments
+  WHERE supplier_id = p_supplier_id
+    AND ship_date >= CURDATE() - INTERVAL 90 DAY
+    AND status IN ('DELIVERED','DELAYED');
+
+  IF v_avg_delay IS NULL THEN
+    SET v_avg_delay = 0;
+  END IF;
+
+  SELECT defect_rate INTO v_defect_rate
+  FROM supplier_risk_current
+  WHERE supplier_id = p_supplier_id;
+
+  IF v_defect_rate IS NULL THEN
+    SET v_defect_rate = 0.0200;
+  END IF;
+
+  SET v_score = LEAST(100, GREATEST(0, 50*(1 - v_on_time_rate) + 30*(v_avg_delay/10) + 20*(v_defect_rate)));
+
+  IF v_score < 30 THEN
+    SET v_level = 'LOW';
+  ELSEIF v_score < 60 THEN
+    SET v_level = 'MEDIUM';
+  ELSE
+    SET v_level = 'HIGH';
+  END IF;
+
+  INSERT INTO supplier_metrics(supplier_id, record_date, on_time_rate, avg_delay_days, defect_rate, risk_score, risk_level, notes)
+  VALUES(p_supplier_id, CURDATE(), v_on_time_rate, v_avg_delay, v_defect_rate, v_score, v_level, 'auto')
+  ON DUPLICATE KEY UPDATE on_time_rate=VALUES(on_time_rate), avg_delay_days=VALUES(avg_delay_days), defect_rate=VALUES(defect_rate), risk_score=VALUES(risk_score), risk_level=VALUES(risk_level), notes=VALUES(notes);
+
+  INSERT INTO supplier_risk_current(supplier_id, record_date, on_time_rate, avg_delay_days, defect_rate, risk_score, risk_level)
+  VALUES(p_supplier_id, CURDATE(), v_on_time_rate, v_avg_delay, v_defect_rate, v_score, v_level)
+  ON DUPLICATE KEY UPDATE record_date=VALUES(record_date), on_time_rate=VALUES(on_time_rate), avg_delay_days=VALUES(avg_delay_days), defect_rate=VALUES(defect_rate), risk_score=VALUES(risk_score), risk_level=VALUES(risk_level);
+
+  INSERT INTO audit_logs(occurred_at, action, entity_type, entity_id, details)
+  VALUES (NOW(), 'COMPUTE_SUPPLIER_RISK', 'SUPPLIER', p_supplier_id, CONCAT('score=', v_score, ', level=', v_level));
+END//
+DELIMITER ;
+
+DELIMITER //
+CREATE PROCEDURE daily_update_supplier_risks()
+BEGIN
+  -- Same inputs and formula as compute_supplier_risk, for every supplier in one grouped pass
+  DROP TEMPORARY TABLE IF EXISTS tmp_supplier_risk;
+  CREATE TEMPORARY TABLE tmp_supplier_risk AS
+  SELECT f.supplier_id, f.on_time_rate, f.avg_delay_days, f.defect_rate, f.risk_score,
+         CASE WHEN f.risk_score < 30 THEN 'LOW'
+              WHEN f.risk_score < 60 THEN 'MEDIUM'
+              ELSE 'HIGH' END AS risk_level
+  FROM (
+    SELECT r.*,
+           CAST(LEAST(100, GREATEST(0, 50*(1 - r.on_time_rate) + 30*(r.avg_delay_days/10) + 20*(r.defect_rate))) AS DECIMAL(10,2)) AS risk_score
+    FROM (
+      SELECT s.supplier_id,
+             CAST(IF(COALESCE(agg.total_delivered, 0) > 0,
+                     (agg.total_delivered - agg.delayed_count) / agg.total_delivered,
+                     1) AS DECIMAL(6,4)) AS on_time_rate,
+             CAST(COALESCE(agg.avg_delay, 0) AS DECIMAL(10,2)) AS avg_delay_days,
+             CAST(IF(c.supplier_id IS NULL, 0, COALESCE(c.defect_rate, 0.02)) AS DECIMAL(6,4)) AS defect_rate
+      FROM suppliers s
+      LEFT JOIN (
+        SELECT supplier_id,
+               SUM(status IN ('DELIVERED','DELAYED')) AS total_delivered,
+               SUM(status = 'DELAYED' OR (actual_arrival_date IS NOT NULL AND actual_arrival_date > expected_arrival_date)) AS delayed_count,
+               AVG(CASE WHEN status IN ('DELIVERED','DELAYED')
+                        THEN GREATEST(DATEDIFF(COALESCE(actual_arrival_date, CURDATE()), expected_arrival_date), 0) END) AS avg_delay
+        FROM shipments
+        WHERE ship_date >= CURDATE() - INTERVAL 90 DAY
+        GROUP BY supplier_id
+      ) agg ON agg.supplier_id = s.supplier_id
+      LEFT JOIN supplier_risk_current c ON c.supplier_id = s.supplier_id
+    ) r
+  ) f;
+
+  INSERT INTO supplier_metrics(supplier_id, record_date, on_time_rate, avg_delay_days, defect_rate, risk_score, risk_level, notes)
+  SELECT supplier_id, CURDATE(), on_time_rate, avg_delay_days, defect_rate, risk_score, risk_level, 'auto'
+  FROM tmp_supplier_risk
+  ON DUPLICATE KEY UPDATE on_time_rate=VALUES(on_time_rate), avg_delay_days=VALUES(avg_delay_days), defect_rate=VALUES(defect_rate), risk_score=VALUES(risk_score), risk_level=VALUES(risk_level), notes=VALUES(notes);
+
+  INSERT INTO supplier_risk_current(supplier_id, record_date, on_time_rate, avg_delay_days, defect_rate, risk_score, risk_level)
+  SELECT supplier_id, CURDATE(), on_time_rate, avg_delay_days, defect_rate, risk_score, risk_level
+  FROM tmp_supplier_risk
+  ON DUPLICATE KEY UPDATE record_date=VALUES(record_date), on_time_rate=VALUES(on_time_rate), avg_delay_days=VALUES(avg_delay_days), defect_rate=VALUES(defect_rate), risk_score=VALUES(risk_score), risk_level=VALUES(risk_level);
+
+  INSERT INTO audit_logs(occurred_at, action, entity_type, entity_id, details)
+  SELECT NOW(), 'COMPUTE_SUPPLIER_RISK', 'SUPPLIER', supplier_id, CONCAT('score=', risk_score, ', level=', risk_level)
+  FROM tmp_supplier_risk;
+
+  DROP TEMPORARY TABLE tmp_supplier_risk;
+
+  INSERT INTO audit_logs(occurred_at, action, entity_type, entity_id, details)
+  VALUES (NOW(), 'DAILY_RISK_UPDATE', 'SYSTEM', 0, 'completed');
+END//
+DELIMITER ;
+
+CREATE OR REPLACE VIEW supplier_risk_summary AS
+SELECT s.supplier_id, s.name, c.record_date, c.risk_score, c.risk_level, c.on_time_rate, c.avg_delay_days, c.defect_rate
+FROM suppliers s
+LEFT JOIN supplier_risk_current c ON c.supplier_id = s.supplier_id;
@@ -0,0 +1,32 @@
+-- Migration 003: indexes for the hot queries in app.py and the risk procedures
+-- Every index is built online (ALGORITHM=INPLACE, LOCK=NONE). Foreign-key indexes that a new
+-- composite index now covers are dropped afterwards so writes do not maintain both.
+USE smart_supply_chain;
+
+-- /api/shipments keyset pages: ORDER BY ship_date DESC, shipment_id DESC
+ALTER TABLE shipments ADD INDEX ix_shipments_ship_date (ship_date, shipment_id), ALGORITHM=INPLACE, LOCK=NONE;
+-- ?status= filter and the dashboard IN_TRANSIT count
+ALTER TABLE shipments ADD INDEX ix_shipments_status_ship_date (status, ship_date), ALGORITHM=INPLACE, LOCK=NONE;
+-- compute_supplier_risk and the batch engine: 90-day window per supplier, covering every column they read
+ALTER TABLE shipments ADD INDEX ix_shipments_supplier_ship_date (supplier_id, ship_date, status, expected_arrival_date, actual_arrival_date), ALGORITHM=INPLACE, LOCK=NONE;
+-- ?warehouse_id= filter
+ALTER TABLE shipments ADD INDEX ix_shipments_warehouse_ship_date (warehouse_id, ship_date), ALGORITHM=INPLACE, LOCK=NONE;
+-- delayed_shipments_overview: expected_arrival_date < CURDATE() AND status <> 'DELIVERED'
+ALTER TABLE shipments ADD INDEX ix_shipments_expected_arrival (expected_arrival_date, status), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE shipments DROP INDEX fk_shipments_suppliers, DROP INDEX fk_shipments_warehouses, ALGORITHM=INPLACE, LOCK=NONE;
+
+-- /api/shipments/<id>/events: WHERE shipment_id = ? ORDER BY event_time DESC
+ALTER TABLE shipment_events ADD INDEX ix_shipment_events_shipment_time (shipment_id, event_time), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE shipment_events DROP INDEX fk_shipment_events_shipments, ALGORITHM=INPLACE, LOCK=NONE;
+
+-- /api/alerts pages and the dashboard open-alert count: WHERE resolved = ? ORDER BY created_at DESC, alert_id DESC
+ALTER TABLE alerts ADD INDEX ix_alerts_resolved_created (resolved, created_at), ALGORITHM=INPLACE, LOCK=NONE;
+
+-- /api/inventory keyset pages: ORDER BY last_updated DESC, inventory_id DESC (optionally per warehouse)
+ALTER TABLE inventory ADD INDEX ix_inventory_last_updated (last_updated), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE inventory ADD INDEX ix_inventory_warehouse_last_updated (warehouse_id, last_updated), ALGORITHM=INPLACE, LOCK=NONE;
+ALTER TABLE inventory DROP INDEX fk_inventory_warehouses, ALGORITHM=INPLACE, LOCK=NONE;
+-- Dashboard critical count (quantity < safety_stock) reads this narrow index instead of the table
+ALTER TABLE inventory ADD INDEX ix_inventory_stock_levels (safety_stock, quantity), ALGORITHM=INPLACE, LOCK=NONE;
+
+ANALYZE TABLE shipments, shipment_events, alerts, inventory;
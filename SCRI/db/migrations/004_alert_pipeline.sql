@@ -0,0 +1,13 @@
+-- Migration 004: move alert generation from triggers to the application alert pipeline
+-- tr_shipment_delay_alert and tr_inventory_threshold added an alerts INSERT to every qualifying
+-- UPDATE, re-alerting on each inventory write while stock stayed low. alert_pipeline.py now
+-- evaluates the same rules in batches and skips entities that already have an open alert.
+USE smart_supply_chain;
+
+DROP TRIGGER IF EXISTS tr_shipment_delay_alert;
+DROP TRIGGER IF EXISTS tr_inventory_threshold;
+
+-- Open-alert lookup used for deduplication: (alert_type, entity_type, entity_id) with resolved = 0
+ALTER TABLE alerts ADD INDEX ix_alerts_entity_open (alert_type, entity_type, entity_id, resolved, created_at), ALGORITHM=INPLACE, LOCK=NONE;
+
+ANALYZE TABLE alerts;
@@ -0,0 +1,7 @@
+-- Migration 005: index for the /api/stream resolved-alert check
+-- The shared stream loop reads alerts resolved since its last pass (resolved_at >= ?) every few seconds.
+USE smart_supply_chain;
+
+ALTER TABLE alerts ADD INDEX ix_alerts_resolved_at (resolved_at), ALGORITHM=INPLACE, LOCK=NONE;
+
+ANALYZE TABLE alerts;
@@ -0,0 +1,73 @@
+-- Migration 006: incremental supplier risk counters
+-- supplier_risk_counters keeps each supplier's delivered/delayed counts and delay-day sum for the
+-- 90-day window, updated by the shipment write paths in the same transaction. supplier_risk_daily
+-- holds the same totals per ship date so days leaving the window are subtracted without scanning
+-- shipments. compute-risk and the nightly job (flask --app app recompute-risk) score from these
+-- counters and only rescore suppliers marked dirty.
+USE smart_supply_chain;
+
+CREATE TABLE IF NOT EXISTS supplier_risk_counters (
+  supplier_id INT PRIMARY KEY,
+  window_start DATE NOT NULL,
+  delivered_count INT NOT NULL DEFAULT 0,
+  delayed_count INT NOT NULL DEFAULT 0,
+  delay_day_sum BIGINT NOT NULL DEFAULT 0,
+  dirty TINYINT(1) NOT NULL DEFAULT 0,
+  change_seq BIGINT NOT NULL DEFAULT 0,
+  CONSTRAINT fk_supplier_risk_counters_suppliers FOREIGN KEY (supplier_id) REFERENCES suppliers(supplier_id) ON DELETE CASCADE,
+  KEY ix_supplier_risk_counters_dirty (dirty, supplier_id)
+);
+
+CREATE TABLE IF NOT EXISTS supplier_risk_daily (
+  supplier_id INT NOT NULL,
+  ship_date DATE NOT NULL,
+  delivered_count INT NOT NULL DEFAULT 0,
+  delayed_count INT NOT NULL DEFAULT 0,
+  delay_day_sum BIGINT NOT NULL DEFAULT 0,
+  PRIMARY KEY (supplier_id, ship_date),
+  KEY ix_supplier_risk_daily_ship_date (ship_date, supplier_id)
+);
+
+CREATE TABLE IF NOT EXISTS supplier_open_delays (
+  shipment_id INT PRIMARY KEY,
+  supplier_id INT NOT NULL,
+  ship_date DATE NOT NULL,
+  expected_arrival_date DATE NOT NULL,
+  KEY ix_supplier_open_delays_supplier (supplier_id, ship_date, expected_arrival_date),
+  KEY ix_supplier_open_delays_expected (expected_arrival_date, supplier_id)
+);
+
+-- Backfill from the current 90-day window. Every supplier starts dirty, so the first nightly
+-- run rescores all of them; later runs only rescore suppliers with changes.
+DELETE FROM supplier_open_delays;
+DELETE FROM supplier_risk_daily;
+
+INSERT INTO supplier_risk_daily(supplier_id, ship_date, delivered_count, delayed_count, delay_day_sum)
+SELECT supplier_id, ship_date,
+       SUM(status IN ('DELIVERED','DELAYED')),
+       SUM(status = 'DELAYED' OR (actual_arrival_date IS NOT NULL AND actual_arrival_date > expected_arrival_date)),
+       SUM(CASE WHEN status IN ('DELIVERED','DELAYED') AND actual_arrival_date IS NOT NULL
+                THEN GREATEST(DATEDIFF(actual_arrival_date, expected_arrival_date), 0) ELSE 0 END)
+FROM shipments
+WHERE ship_date >= CURDATE() - INTERVAL 90 DAY
+GROUP BY supplier_id, ship_date;
+
+INSERT INTO supplier_open_delays(shipment_id, supplier_id, ship_date, expected_arrival_date)
+SELECT shipment_id, supplier_id, ship_date, expected_arrival_date
+FROM shipments
+WHERE ship_date >= CURDATE() - INTERVAL 90 DAY
+  AND status IN ('DELIVERED','DELAYED') AND actual_arrival_date IS NULL;
+
+INSERT INTO supplier_risk_counters(supplier_id, window_start, delivered_count, delayed_count, delay_day_sum, dirty)
+SELECT s.supplier_id, CURDATE() - INTERVAL 90 DAY,
+       COALESCE(d.delivered_count, 0), COALESCE(d.delayed_count, 0), COALESCE(d.delay_day_sum, 0), 1
+FROM suppliers s
+LEFT JOIN (
+  SELECT supplier_id, SUM(delivered_count) AS delivered_count, SUM(delayed_count) AS delayed_count, SUM(delay_day_sum) AS delay_day_sum
+  FROM supplier_risk_daily
+  GROUP BY supplier_id
+) d ON d.supplier_id = s.supplier_id
+ON DUPLICATE KEY UPDATE window_start=VALUES(window_start), delivered_count=VALUES(delivered_count),
+    delayed_count=VALUES(delayed_count), delay_day_sum=VALUES(delay_day_sum), dirty=1, change_seq=change_seq+1;
+
+ANALYZE TABLE supplier_risk_counters, supplier_risk_daily, supplier_open_delays;
@@ -0,0 +1,75 @@
+-- Migration 007: analytics rollup tables
+-- Daily and weekly aggregates behind /api/analytics/*: shipments and delays per ship date and per
+-- supplier and week, alerts raised per day by severity and type, and a daily stock snapshot per
+-- warehouse. The write paths keep them current; flask --app app refresh-rollups recomputes recent
+-- days from the raw tables and takes the day's stock snapshot. Stock history starts with this
+-- migration.
+USE smart_supply_chain;
+
+ALTER TABLE alerts ADD INDEX ix_alerts_created (created_at, severity, alert_type), ALGORITHM=INPLACE, LOCK=NONE;
+
+CREATE TABLE IF NOT EXISTS rollup_shipments_daily (
+  ship_date DATE PRIMARY KEY,
+  shipment_count INT NOT NULL DEFAULT 0,
+  delayed_count INT NOT NULL DEFAULT 0,
+  delay_day_sum BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS rollup_supplier_shipments_weekly (
+  supplier_id INT NOT NULL,
+  week_start DATE NOT NULL,
+  shipment_count INT NOT NULL DEFAULT 0,
+  delayed_count INT NOT NULL DEFAULT 0,
+  delay_day_sum BIGINT NOT NULL DEFAULT 0,
+  PRIMARY KEY (supplier_id, week_start),
+  CONSTRAINT fk_rollup_supplier_shipments_suppliers FOREIGN KEY (supplier_id) REFERENCES suppliers(supplier_id) ON DELETE CASCADE,
+  KEY ix_rollup_supplier_shipments_week (week_start, supplier_id)
+);
+
+CREATE TABLE IF NOT EXISTS rollup_alerts_daily (
+  alert_date DATE NOT NULL,
+  severity ENUM('INFO','WARN','CRITICAL') NOT NULL,
+  alert_type ENUM('SHIPMENT_DELAY','LOW_INVENTORY','RESTOCK_NEEDED','CUSTOM') NOT NULL,
+  raised_count INT NOT NULL DEFAULT 0,
+  PRIMARY KEY (alert_date, severity, alert_type)
+);
+
+-- One snapshot per warehouse and day: positions out of stock / below safety stock
+CREATE TABLE IF NOT EXISTS rollup_warehouse_stock_daily (
+  warehouse_id INT NOT NULL,
+  stock_date DATE NOT NULL,
+  position_count INT NOT NULL DEFAULT 0,
+  stockout_count INT NOT NULL DEFAULT 0,
+  below_safety_count INT NOT NULL DEFAULT 0,
+  PRIMARY KEY (warehouse_id, stock_date),
+  CONSTRAINT fk_rollup_warehouse_stock_warehouses FOREIGN KEY (warehouse_id) REFERENCES warehouses(warehouse_id) ON DELETE CASCADE,
+  KEY ix_rollup_warehouse_stock_date (stock_date, warehouse_id)
+);
+
+INSERT INTO rollup_shipments_daily(ship_date, shipment_count, delayed_count, delay_day_sum)
+SELECT ship_date, COUNT(*),
+       SUM(IF(status = 'DELAYED' OR actual_arrival_date > expected_arrival_date, 1, 0)),
+       SUM(IF(actual_arrival_date > expected_arrival_date, DATEDIFF(actual_arrival_date, expected_arrival_date), 0))
+FROM shipments
+WHERE NOT (status <=> 'CANCELLED')
+GROUP BY ship_date;
+
+INSERT INTO rollup_supplier_shipments_weekly(supplier_id, week_start, shipment_count, delayed_count, delay_day_sum)
+SELECT supplier_id, ship_date - INTERVAL WEEKDAY(ship_date) DAY AS shipment_week, COUNT(*),
+       SUM(IF(status = 'DELAYED' OR actual_arrival_date > expected_arrival_date, 1, 0)),
+       SUM(IF(actual_arrival_date > expected_arrival_date, DATEDIFF(actual_arrival_date, expected_arrival_date), 0))
+FROM shipments
+WHERE NOT (status <=> 'CANCELLED')
+GROUP BY supplier_id, shipment_week;
+
+INSERT INTO rollup_warehouse_stock_daily(warehouse_id, stock_date, position_count, stockout_count, below_safety_count)
+SELECT warehouse_id, CURDATE(), COUNT(*), SUM(quantity <= 0), SUM(quantity < safety_stock)
+FROM inventory
+GROUP BY warehouse_id;
+
+INSERT INTO rollup_alerts_daily(alert_date, severity, alert_type, raised_count)
+SELECT DATE(created_at) AS created_date, severity, alert_type, COUNT(*)
+FROM alerts
+GROUP BY created_date, severity, alert_type;
+
+ANALYZE TABLE alerts, rollup_shipments_daily, rollup_supplier_shipments_weekly, rollup_alerts_daily, rollup_warehouse_stock_daily;
@@ -0,0 +1,23 @@
+-- Migration 008: change tracking for the columnar snapshot export
+-- The snapshot job (flask --app app export-snapshot) reads shipments, alerts and inventory
+-- incrementally by the time each row last changed, and supplier_metrics by record_date.
+-- Existing rows get the migration time as their updated_at, so the first export takes them all.
+USE smart_supply_chain;
+
+ALTER TABLE shipments
+  ADD COLUMN updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  ADD INDEX ix_shipments_updated_at (updated_at),
+  ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE alerts
+  ADD COLUMN updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  ADD INDEX ix_alerts_updated_at (updated_at),
+  ALGORITHM=INPLACE, LOCK=NONE;
+
+-- PUT /api/inventory/<id> did not touch last_updated; make every change move it
+ALTER TABLE inventory
+  MODIFY COLUMN last_updated DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP;
+
+ALTER TABLE supplier_metrics ADD INDEX ix_supplier_metrics_record_date (record_date), ALGORITHM=INPLACE, LOCK=NONE;
+
+ANALYZE TABLE shipments, alerts, inventory, supplier_metrics;
@@ -0,0 +1,42 @@
+-- Migration 009: stockout forecast tables
+-- inventory_history keeps one stock reading per position and day, taken by the forecast job
+-- (flask --app app refresh-forecast); usage is derived from it once a position has a week of
+-- history, and from deliveries until then. inventory_forecast holds the job's latest output,
+-- served by GET /api/inventory/forecast. History starts with this migration.
+USE smart_supply_chain;
+
+-- Daily stock of every position, the usage history behind the stockout forecast (forecasting.py)
+CREATE TABLE IF NOT EXISTS inventory_history (
+  inventory_id INT NOT NULL,
+  stock_date DATE NOT NULL,
+  quantity INT NOT NULL,
+  PRIMARY KEY (inventory_id, stock_date),
+  CONSTRAINT fk_inventory_history_inventory FOREIGN KEY (inventory_id) REFERENCES inventory(inventory_id) ON DELETE CASCADE,
+  KEY ix_inventory_history_stock_date (stock_date)
+);
+
+-- Latest stockout forecast per position, rewritten by flask --app app refresh-forecast.
+-- days_to_stockout/stockout_date are NULL for positions without usage.
+CREATE TABLE IF NOT EXISTS inventory_forecast (
+  inventory_id INT PRIMARY KEY,
+  product_id INT NOT NULL,
+  warehouse_id INT NOT NULL,
+  quantity INT NOT NULL,
+  inbound_quantity INT NOT NULL DEFAULT 0,
+  daily_usage DECIMAL(12,3) NOT NULL DEFAULT 0,
+  usage_source ENUM('HISTORY','DELIVERIES') NOT NULL,
+  days_to_stockout DECIMAL(10,1) NULL,
+  stockout_date DATE NULL,
+  reorder_in_days DECIMAL(10,1) NULL,
+  reorder_quantity INT NOT NULL DEFAULT 0,
+  risk_level VARCHAR(16) NOT NULL DEFAULT 'LOW',
+  computed_at DATETIME NOT NULL,
+  CONSTRAINT fk_inventory_forecast_inventory FOREIGN KEY (inventory_id) REFERENCES inventory(inventory_id) ON DELETE CASCADE,
+  KEY ix_inventory_forecast_stockout (days_to_stockout, inventory_id),
+  KEY ix_inventory_forecast_warehouse (warehouse_id, days_to_stockout, inventory_id),
+  KEY ix_inventory_forecast_product (product_id, days_to_stockout, inventory_id),
+  KEY ix_inventory_forecast_computed (computed_at)
+);
+
+INSERT IGNORE INTO inventory_history (inventory_id, stock_date, quantity)
+SELECT inventory_id, CURDATE(), quantity FROM inventory;
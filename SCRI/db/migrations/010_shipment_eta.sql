@@ -0,0 +1,18 @@
+-- Migration 010: predicted shipment arrivals
+-- flask --app app train-eta fits a per-lane delay model from delivered shipments and their event
+-- timelines; flask --app app score-eta re-scores every IN_TRANSIT shipment into this table. Scores
+-- live outside shipments so a scoring run does not bump shipments.updated_at (migration 008).
+USE smart_supply_chain;
+
+-- Predicted arrival of each in-transit shipment, rewritten by flask --app app score-eta (eta_model.py)
+CREATE TABLE IF NOT EXISTS shipment_eta (
+  shipment_id INT PRIMARY KEY,
+  predicted_arrival_date DATE NOT NULL,
+  predicted_delay_days DECIMAL(8,2) NOT NULL,
+  delay_probability DECIMAL(5,4) NOT NULL,
+  model_version VARCHAR(32) NOT NULL,
+  scored_at DATETIME NOT NULL,
+  CONSTRAINT fk_shipment_eta_shipments FOREIGN KEY (shipment_id) REFERENCES shipments(shipment_id) ON DELETE CASCADE,
+  KEY ix_shipment_eta_probability (delay_probability, shipment_id),
+  KEY ix_shipment_eta_scored_at (scored_at)
+);
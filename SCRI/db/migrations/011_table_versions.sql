@@ -0,0 +1,15 @@
+-- Migration 011: version counters behind the list endpoints' ETags
+-- The write routes bump a table's counter after their transaction commits. GET /api/suppliers,
+-- /api/products, /api/warehouses, /api/shipments and /api/alerts derive their ETag from the
+-- counters of the tables they read, so a revalidation costs one primary-key lookup and a 304
+-- instead of the list query.
+USE smart_supply_chain;
+
+CREATE TABLE IF NOT EXISTS table_versions (
+  table_name VARCHAR(64) PRIMARY KEY,
+  version BIGINT UNSIGNED NOT NULL DEFAULT 0,
+  updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+INSERT IGNORE INTO table_versions(table_name) VALUES
+('suppliers'), ('supplier_risk_current'), ('products'), ('warehouses'), ('shipments'), ('alerts');
@@ -0,0 +1,114 @@
+-- Migration 012: monthly partitions and archive tables for the append-heavy tables
+-- shipment_events, alerts and audit_logs are range-partitioned by month on their timestamp, so
+-- recent-first reads prune old months and emptied months are dropped instead of deleted row by row.
+-- flask --app app archive-data moves rows past their retention window (RETENTION_*_DAYS) into the
+-- compressed *_archive tables in short batches, adds the coming months' partitions and drops empty
+-- expired ones. shipments is archived but not partitioned: MySQL cannot partition a table with
+-- foreign keys or one referenced by them (shipment_eta), and the write paths rely on shipment_id
+-- alone being unique.
+--
+-- Partitioned tables cannot have foreign keys and every unique key must contain the partitioning
+-- column, so shipment_events loses fk_shipment_events_shipments (the write paths already check
+-- shipment ids) and the three tables get (id, timestamp) primary keys. Each ALTER rebuilds its
+-- table: run this migration in a maintenance window.
+USE smart_supply_chain;
+
+-- Archive tables: the same columns in the same order as their source (so SELECT * of both can be
+-- combined with UNION ALL), no foreign keys, compressed pages
+CREATE TABLE IF NOT EXISTS shipments_archive (
+  shipment_id INT PRIMARY KEY,
+  supplier_id INT NOT NULL,
+  product_id INT NOT NULL,
+  warehouse_id INT NOT NULL,
+  quantity INT NOT NULL,
+  ship_date DATE NOT NULL,
+  expected_arrival_date DATE NOT NULL,
+  actual_arrival_date DATE,
+  status ENUM('CREATED','IN_TRANSIT','DELIVERED','DELAYED','CANCELLED') DEFAULT 'CREATED',
+  updated_at DATETIME NOT NULL,
+  KEY ix_shipments_archive_ship_date (ship_date, shipment_id),
+  KEY ix_shipments_archive_supplier (supplier_id, ship_date)
+) ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8;
+
+CREATE TABLE IF NOT EXISTS shipment_events_archive (
+  event_id INT PRIMARY KEY,
+  shipment_id INT NOT NULL,
+  event_time DATETIME NOT NULL,
+  event_type VARCHAR(64) NOT NULL,
+  details VARCHAR(256),
+  KEY ix_shipment_events_archive_shipment_time (shipment_id, event_time)
+) ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8;
+
+CREATE TABLE IF NOT EXISTS alerts_archive (
+  alert_id INT PRIMARY KEY,
+  created_at DATETIME NOT NULL,
+  alert_type ENUM('SHIPMENT_DELAY','LOW_INVENTORY','RESTOCK_NEEDED','CUSTOM') NOT NULL,
+  severity ENUM('INFO','WARN','CRITICAL') NOT NULL,
+  entity_type ENUM('SHIPMENT','INVENTORY','SUPPLIER','SYSTEM') NOT NULL,
+  entity_id INT NOT NULL,
+  message VARCHAR(256) NOT NULL,
+  resolved TINYINT(1) DEFAULT 0,
+  resolved_at DATETIME NULL,
+  updated_at DATETIME NOT NULL,
+  KEY ix_alerts_archive_resolved_created (resolved, created_at)
+) ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8;
+
+CREATE TABLE IF NOT EXISTS audit_logs_archive (
+  audit_id INT PRIMARY KEY,
+  occurred_at DATETIME NOT NULL,
+  action VARCHAR(64) NOT NULL,
+  entity_type VARCHAR(32) NOT NULL,
+  entity_id INT NOT NULL,
+  details VARCHAR(256),
+  KEY ix_audit_logs_archive_occurred (occurred_at)
+) ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8;
+
+ALTER TABLE shipment_events DROP FOREIGN KEY fk_shipment_events_shipments;
+ALTER TABLE shipment_events
+  DROP PRIMARY KEY, ADD PRIMARY KEY (event_id, event_time),
+  ADD INDEX ix_shipment_events_time (event_time);
+
+ALTER TABLE alerts DROP PRIMARY KEY, ADD PRIMARY KEY (alert_id, created_at);
+
+ALTER TABLE audit_logs
+  DROP PRIMARY KEY, ADD PRIMARY KEY (audit_id, occurred_at),
+  ADD INDEX ix_audit_logs_occurred (occurred_at);
+
+DROP PROCEDURE IF EXISTS partition_by_month;
+
+-- Range-partition p_table by month of p_column, from the month of its oldest row to p_months_ahead
+-- months from now, plus a catch-all pmax. Later months are added by the archive job.
+DELIMITER //
+CREATE PROCEDURE partition_by_month(IN p_table VARCHAR(64), IN p_column VARCHAR(64), IN p_months_ahead INT)
+BEGIN
+  DECLARE v_month DATE;
+  DECLARE v_last DATE;
+  DECLARE v_partitions TEXT DEFAULT '';
+
+  SET @first_value = NULL;
+  SET @partition_sql = CONCAT('SELECT MIN(', p_column, ') INTO @first_value FROM ', p_table);
+  PREPARE stmt FROM @partition_sql;
+  EXECUTE stmt;
+  DEALLOCATE PREPARE stmt;
+
+  SET v_month = DATE_FORMAT(COALESCE(@first_value, CURDATE()), '%Y-%m-01');
+  SET v_last = DATE_FORMAT(CURDATE() + INTERVAL p_months_ahead MONTH, '%Y-%m-01');
+  WHILE v_month <= v_last DO
+    SET v_partitions = CONCAT(v_partitions, 'PARTITION p', DATE_FORMAT(v_month, '%Y%m'),
+                              ' VALUES LESS THAN (''', v_month + INTERVAL 1 MONTH, '''), ');
+    SET v_month = v_month + INTERVAL 1 MONTH;
+  END WHILE;
+
+  SET @partition_sql = CONCAT('ALTER TABLE ', p_table, ' PARTITION BY RANGE COLUMNS(', p_column, ') (',
+                              v_partitions, 'PARTITION pmax VALUES LESS THAN (MAXVALUE))');
+  PREPARE stmt FROM @partition_sql;
+  EXECUTE stmt;
+  DEALLOCATE PREPARE stmt;
+END//
+DELIMITER ;
+
+CALL partition_by_month('shipment_events', 'event_time', 3);
+CALL partition_by_month('alerts', 'created_at', 3);
+CALL partition_by_month('audit_logs', 'occurred_at', 3);
+
+ANALYZE TABLE shipment_events, alerts, audit_logs;
@@ -1,12 +1,28 @@
 CREATE DATABASE IF NOT EXISTS smart_supply_chain;
 USE smart_supply_chain;
 
+DROP TABLE IF EXISTS inventory_forecast;
+DROP TABLE IF EXISTS inventory_history;
+DROP TABLE IF EXISTS rollup_warehouse_stock_daily;
+DROP TABLE IF EXISTS rollup_alerts_daily;
+DROP TABLE IF EXISTS rollup_supplier_shipments_weekly;
+DROP TABLE IF EXISTS rollup_shipments_daily;
 DROP TABLE IF EXISTS alerts;
 DROP TABLE IF EXISTS audit_logs;
+DROP TABLE IF EXISTS alerts_archive;
+DROP TABLE IF EXISTS audit_logs_archive;
+DROP TABLE IF EXISTS shipment_events_archive;
+DROP TABLE IF EXISTS shipments_archive;
+DROP TABLE IF EXISTS table_versions;
+DROP TABLE IF EXISTS shipment_eta;
 DROP TABLE IF EXISTS shipment_events;
 DROP TABLE IF EXISTS shipments;
 DROP TABLE IF EXISTS inventory;
 DROP TABLE IF EXISTS products;
+DROP TABLE IF EXISTS supplier_open_delays;
+DROP TABLE IF EXISTS supplier_risk_daily;
+DROP TABLE IF EXISTS supplier_risk_counters;
+DROP TABLE IF EXISTS supplier_risk_current;
 DROP TABLE IF EXISTS supplier_metrics;
 DROP TABLE IF EXISTS warehouses;
 DROP TABLE IF EXISTS suppliers;
@@ -43,10 +59,13 @@ CREATE TABLE inventory (
   quantity INT NOT NULL,
   reorder_threshold INT NOT NULL,
   safety_stock INT NOT NULL,
-  last_updated DATETIME DEFAULT CURRENT_TIMESTAMP,
+  last_updated DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   CONSTRAINT fk_inventory_products FOREIGN KEY (product_id) REFERENCES products(product_id),
   CONSTRAINT fk_inventory_warehouses FOREIGN KEY (warehouse_id) REFERENCES warehouses(warehouse_id),
-  UNIQUE KEY uq_inventory_product_warehouse (product_id, warehouse_id)
+  UNIQUE KEY uq_inventory_product_warehouse (product_id, warehouse_id),
+  KEY ix_inventory_last_updated (last_updated),
+  KEY ix_inventory_warehouse_last_updated (warehouse_id, last_updated),
+  KEY ix_inventory_stock_levels (safety_stock, quantity)
 );
 
 CREATE TABLE shipments (
@@ -59,18 +78,41 @@ CREATE TABLE shipments (
   expected_arrival_date DATE NOT NULL,
   actual_arrival_date DATE,
   status ENUM('CREATED','IN_TRANSIT','DELIVERED','DELAYED','CANCELLED') DEFAULT 'CREATED',
+  updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   CONSTRAINT fk_shipments_suppliers FOREIGN KEY (supplier_id) REFERENCES suppliers(supplier_id),
   CONSTRAINT fk_shipments_products FOREIGN KEY (product_id) REFERENCES products(product_id),
-  CONSTRAINT fk_shipments_warehouses FOREIGN KEY (warehouse_id) REFERENCES warehouses(warehouse_id)
+  CONSTRAINT fk_shipments_warehouses FOREIGN KEY (warehouse_id) REFERENCES warehouses(warehouse_id),
+  KEY ix_shipments_ship_date (ship_date, shipment_id),
+  KEY ix_shipments_status_ship_date (status, ship_date),
+  KEY ix_shipments_supplier_ship_date (supplier_id, ship_date, status, expected_arrival_date, actual_arrival_date),
+  KEY ix_shipments_warehouse_ship_date (warehouse_id, ship_date),
+  KEY ix_shipments_expected_arrival (expected_arrival_date, status),
+  KEY ix_shipments_updated_at (updated_at)
 );
 
+-- Partitioned by month of event_time (partition_by_month below), so no foreign key to shipments
 CREATE TABLE shipment_events (
-  event_id INT AUTO_INCREMENT PRIMARY KEY,
+  event_id INT AUTO_INCREMENT,
   shipment_id INT NOT NULL,
   event_time DATETIME NOT NULL,
   event_type VARCHAR(64) NOT NULL,
   details VARCHAR(256),
-  CONSTRAINT fk_shipment_events_shipments FOREIGN KEY (shipment_id) REFERENCES shipments(shipment_id)
+  PRIMARY KEY (event_id, event_time),
+  KEY ix_shipment_events_shipment_time (shipment_id, event_time),
+  KEY ix_shipment_events_time (event_time)
+);
+
+-- Predicted arrival of each in-transit shipment, rewritten by flask --app app score-eta (eta_model.py)
+CREATE TABLE shipment_eta (
+  shipment_id INT PRIMARY KEY,
+  predicted_arrival_date DATE NOT NULL,
+  predicted_delay_days DECIMAL(8,2) NOT NULL,
+  delay_probability DECIMAL(5,4) NOT NULL,
+  model_version VARCHAR(32) NOT NULL,
+  scored_at DATETIME NOT NULL,
+  CONSTRAINT fk_shipment_eta_shipments FOREIGN KEY (shipment_id) REFERENCES shipments(shipment_id) ON DELETE CASCADE,
+  KEY ix_shipment_eta_probability (delay_probability, shipment_id),
+  KEY ix_shipment_eta_scored_at (scored_at)
 );
 
 CREATE TABLE supplier_metrics (
@@ -84,11 +126,61 @@ CREATE TABLE supplier_metrics (
   risk_level VARCHAR(16) DEFAULT 'LOW',
   notes VARCHAR(256),
   CONSTRAINT fk_supplier_metrics_suppliers FOREIGN KEY (supplier_id) REFERENCES suppliers(supplier_id),
-  UNIQUE KEY uq_supplier_metrics_supplier_date (supplier_id, record_date)
+  UNIQUE KEY uq_supplier_metrics_supplier_date (supplier_id, record_date),
+  KEY ix_supplier_metrics_record_date (record_date)
+);
+
+-- Latest supplier_metrics row per supplier, kept in step by every metrics writer
+CREATE TABLE supplier_risk_current (
+  supplier_id INT PRIMARY KEY,
+  record_date DATE NOT NULL,
+  on_time_rate DECIMAL(6,4) DEFAULT 1.0000,
+  avg_delay_days DECIMAL(10,2) DEFAULT 0,
+  defect_rate DECIMAL(6,4) DEFAULT 0,
+  risk_score DECIMAL(10,2) DEFAULT 0,
+  risk_level VARCHAR(16) DEFAULT 'LOW',
+  updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  CONSTRAINT fk_supplier_risk_current_suppliers FOREIGN KEY (supplier_id) REFERENCES suppliers(supplier_id)
+);
+
+-- Running totals of each supplier's 90-day shipment window (ship_date >= window_start), kept
+-- in step by the application's shipment write paths; dirty suppliers are rescored by the nightly job
+CREATE TABLE supplier_risk_counters (
+  supplier_id INT PRIMARY KEY,
+  window_start DATE NOT NULL,
+  delivered_count INT NOT NULL DEFAULT 0,
+  delayed_count INT NOT NULL DEFAULT 0,
+  delay_day_sum BIGINT NOT NULL DEFAULT 0,
+  dirty TINYINT(1) NOT NULL DEFAULT 0,
+  change_seq BIGINT NOT NULL DEFAULT 0,
+  CONSTRAINT fk_supplier_risk_counters_suppliers FOREIGN KEY (supplier_id) REFERENCES suppliers(supplier_id) ON DELETE CASCADE,
+  KEY ix_supplier_risk_counters_dirty (dirty, supplier_id)
+);
+
+-- The same totals per ship date, subtracted from supplier_risk_counters as days leave the window
+CREATE TABLE supplier_risk_daily (
+  supplier_id INT NOT NULL,
+  ship_date DATE NOT NULL,
+  delivered_count INT NOT NULL DEFAULT 0,
+  delayed_count INT NOT NULL DEFAULT 0,
+  delay_day_sum BIGINT NOT NULL DEFAULT 0,
+  PRIMARY KEY (supplier_id, ship_date),
+  KEY ix_supplier_risk_daily_ship_date (ship_date, supplier_id)
 );
 
+-- Delivered/delayed shipments without an actual_arrival_date; their delay grows with CURDATE()
+CREATE TABLE supplier_open_delays (
+  shipment_id INT PRIMARY KEY,
+  supplier_id INT NOT NULL,
+  ship_date DATE NOT NULL,
+  expected_arrival_date DATE NOT NULL,
+  KEY ix_supplier_open_delays_supplier (supplier_id, ship_date, expected_arrival_date),
+  KEY ix_supplier_open_delays_expected (expected_arrival_date, supplier_id)
+);
+
+-- Partitioned by month of created_at (partition_by_month below)
 CREATE TABLE alerts (
-  alert_id INT AUTO_INCREMENT PRIMARY KEY,
+  alert_id INT AUTO_INCREMENT,
   created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
   alert_type ENUM('SHIPMENT_DELAY','LOW_INVENTORY','RESTOCK_NEEDED','CUSTOM') NOT NULL,
   severity ENUM('INFO','WARN','CRITICAL') NOT NULL,
@@ -96,18 +188,162 @@ CREATE TABLE alerts (
   entity_id INT NOT NULL,
   message VARCHAR(256) NOT NULL,
   resolved TINYINT(1) DEFAULT 0,
-  resolved_at DATETIME NULL
+  resolved_at DATETIME NULL,
+  updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (alert_id, created_at),
+  KEY ix_alerts_resolved_created (resolved, created_at),
+  KEY ix_alerts_entity_open (alert_type, entity_type, entity_id, resolved, created_at),
+  KEY ix_alerts_resolved_at (resolved_at),
+  KEY ix_alerts_created (created_at, severity, alert_type),
+  KEY ix_alerts_updated_at (updated_at)
+);
+
+-- Analytics rollups (rollups.py): kept current by the write paths, recomputed for recent days by
+-- flask --app app refresh-rollups. Cancelled shipments are not counted.
+CREATE TABLE rollup_shipments_daily (
+  ship_date DATE PRIMARY KEY,
+  shipment_count INT NOT NULL DEFAULT 0,
+  delayed_count INT NOT NULL DEFAULT 0,
+  delay_day_sum BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE rollup_supplier_shipments_weekly (
+  supplier_id INT NOT NULL,
+  week_start DATE NOT NULL,
+  shipment_count INT NOT NULL DEFAULT 0,
+  delayed_count INT NOT NULL DEFAULT 0,
+  delay_day_sum BIGINT NOT NULL DEFAULT 0,
+  PRIMARY KEY (supplier_id, week_start),
+  CONSTRAINT fk_rollup_supplier_shipments_suppliers FOREIGN KEY (supplier_id) REFERENCES suppliers(supplier_id) ON DELETE CASCADE,
+  KEY ix_rollup_supplier_shipments_week (week_start, supplier_id)
 );
 
+CREATE TABLE rollup_alerts_daily (
+  alert_date DATE NOT NULL,
+  severity ENUM('INFO','WARN','CRITICAL') NOT NULL,
+  alert_type ENUM('SHIPMENT_DELAY','LOW_INVENTORY','RESTOCK_NEEDED','CUSTOM') NOT NULL,
+  raised_count INT NOT NULL DEFAULT 0,
+  PRIMARY KEY (alert_date, severity, alert_type)
+);
+
+-- One snapshot per warehouse and day: positions out of stock / below safety stock
+CREATE TABLE rollup_warehouse_stock_daily (
+  warehouse_id INT NOT NULL,
+  stock_date DATE NOT NULL,
+  position_count INT NOT NULL DEFAULT 0,
+  stockout_count INT NOT NULL DEFAULT 0,
+  below_safety_count INT NOT NULL DEFAULT 0,
+  PRIMARY KEY (warehouse_id, stock_date),
+  CONSTRAINT fk_rollup_warehouse_stock_warehouses FOREIGN KEY (warehouse_id) REFERENCES warehouses(warehouse_id) ON DELETE CASCADE,
+  KEY ix_rollup_warehouse_stock_date (stock_date, warehouse_id)
+);
+
+-- Daily stock of every position, the usage history behind the stockout forecast (forecasting.py)
+CREATE TABLE inventory_history (
+  inventory_id INT NOT NULL,
+  stock_date DATE NOT NULL,
+  quantity INT NOT NULL,
+  PRIMARY KEY (inventory_id, stock_date),
+  CONSTRAINT fk_inventory_history_inventory FOREIGN KEY (inventory_id) REFERENCES inventory(inventory_id) ON DELETE CASCADE,
+  KEY ix_inventory_history_stock_date (stock_date)
+);
+
+-- Latest stockout forecast per position, rewritten by flask --app app refresh-forecast.
+-- days_to_stockout/stockout_date are NULL for positions without usage.
+CREATE TABLE inventory_forecast (
+  inventory_id INT PRIMARY KEY,
+  product_id INT NOT NULL,
+  warehouse_id INT NOT NULL,
+  quantity INT NOT NULL,
+  inbound_quantity INT NOT NULL DEFAULT 0,
+  daily_usage DECIMAL(12,3) NOT NULL DEFAULT 0,
+  usage_source ENUM('HISTORY','DELIVERIES') NOT NULL,
+  days_to_stockout DECIMAL(10,1) NULL,
+  stockout_date DATE NULL,
+  reorder_in_days DECIMAL(10,1) NULL,
+  reorder_quantity INT NOT NULL DEFAULT 0,
+  risk_level VARCHAR(16) NOT NULL DEFAULT 'LOW',
+  computed_at DATETIME NOT NULL,
+  CONSTRAINT fk_inventory_forecast_inventory FOREIGN KEY (inventory_id) REFERENCES inventory(inventory_id) ON DELETE CASCADE,
+  KEY ix_inventory_forecast_stockout (days_to_stockout, inventory_id),
+  KEY ix_inventory_forecast_warehouse (warehouse_id, days_to_stockout, inventory_id),
+  KEY ix_inventory_forecast_product (product_id, days_to_stockout, inventory_id),
+  KEY ix_inventory_forecast_computed (computed_at)
+);
+
+-- Partitioned by month of occurred_at (partition_by_month below)
 CREATE TABLE audit_logs (
-  audit_id INT AUTO_INCREMENT PRIMARY KEY,
+  audit_id INT AUTO_INCREMENT,
   occurred_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
   action VARCHAR(64) NOT NULL,
   entity_type VARCHAR(32) NOT NULL,
   entity_id INT NOT NULL,
-  details VARCHAR(256)
+  details VARCHAR(256),
+  PRIMARY KEY (audit_id, occurred_at),
+  KEY ix_audit_logs_occurred (occurred_at)
 );
 
+-- Rows past their retention window, moved here by flask --app app archive-data (retention.py): the same
+-- columns in the same order as their source (so SELECT * of both can be combined with UNION ALL), no
+-- foreign keys, compressed pages
+CREATE TABLE shipments_archive (
+  shipment_id INT PRIMARY KEY,
+  supplier_id INT NOT NULL,
+  product_id INT NOT NULL,
+  warehouse_id INT NOT NULL,
+  quantity INT NOT NULL,
+  ship_date DATE NOT NULL,
+  expected_arrival_date DATE NOT NULL,
+  actual_arrival_date DATE,
+  status ENUM('CREATED','IN_TRANSIT','DELIVERED','DELAYED','CANCELLED') DEFAULT 'CREATED',
+  updated_at DATETIME NOT NULL,
+  KEY ix_shipments_archive_ship_date (ship_date, shipment_id),
+  KEY ix_shipments_archive_supplier (supplier_id, ship_date)
+) ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8;
+
+CREATE TABLE shipment_events_archive (
+  event_id INT PRIMARY KEY,
+  shipment_id INT NOT NULL,
+  event_time DATETIME NOT NULL,
+  event_type VARCHAR(64) NOT NULL,
+  details VARCHAR(256),
+  KEY ix_shipment_events_archive_shipment_time (shipment_id, event_time)
+) ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8;
+
+CREATE TABLE alerts_archive (
+  alert_id INT PRIMARY KEY,
+  created_at DATETIME NOT NULL,
+  alert_type ENUM('SHIPMENT_DELAY','LOW_INVENTORY','RESTOCK_NEEDED','CUSTOM') NOT NULL,
+  severity ENUM('INFO','WARN','CRITICAL') NOT NULL,
+  entity_type ENUM('SHIPMENT','INVENTORY','SUPPLIER','SYSTEM') NOT NULL,
+  entity_id INT NOT NULL,
+  message VARCHAR(256) NOT NULL,
+  resolved TINYINT(1) DEFAULT 0,
+  resolved_at DATETIME NULL,
+  updated_at DATETIME NOT NULL,
+  KEY ix_alerts_archive_resolved_created (resolved, created_at)
+) ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8;
+
+CREATE TABLE audit_logs_archive (
+  audit_id INT PRIMARY KEY,
+  occurred_at DATETIME NOT NULL,
+  action VARCHAR(64) NOT NULL,
+  entity_type VARCHAR(32) NOT NULL,
+  entity_id INT NOT NULL,
+  details VARCHAR(256),
+  KEY ix_audit_logs_archive_occurred (occurred_at)
+) ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8;
+
+-- Version counters behind the list endpoints' ETags, bumped by the write routes after they commit
+CREATE TABLE table_versions (
+  table_name VARCHAR(64) PRIMARY KEY,
+  version BIGINT UNSIGNED NOT NULL DEFAULT 0,
+  updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+INSERT INTO table_versions(table_name) VALUES
+('suppliers'), ('supplier_risk_current'), ('products'), ('warehouses'), ('shipments'), ('alerts');
+
 INSERT INTO suppliers(name, contact_email, phone, rating) VALUES
 ('Alpha Manufacturing','alpha@example.com','+1-202-555-0101',4.5),
 ('Beta Logistics','beta@example.com','+1-202-555-0102',3.9),
@@ -151,29 +387,69 @@ INSERT INTO supplier_metrics(supplier_id, record_date, on_time_rate, avg_delay_d
 (2, DATE_SUB(CURDATE(), INTERVAL 1 DAY), 0.80, 1.2, 0.020, 35.0, 'MEDIUM', 'baseline'),
 (3, DATE_SUB(CURDATE(), INTERVAL 1 DAY), 0.70, 2.5, 0.030, 55.0, 'MEDIUM', 'baseline');
 
-DELIMITER //
-CREATE TRIGGER tr_shipment_delay_alert AFTER UPDATE ON shipments FOR EACH ROW
-BEGIN
-  IF NEW.status = 'DELAYED' AND OLD.status <> 'DELAYED' THEN
-    INSERT INTO alerts(created_at, alert_type, severity, entity_type, entity_id, message, resolved)
-    VALUES (NOW(), 'SHIPMENT_DELAY', 'WARN', 'SHIPMENT', NEW.shipment_id, CONCAT('Shipment ', NEW.shipment_id, ' delayed'), 0);
-  END IF;
-  IF NEW.expected_arrival_date < CURDATE() AND NEW.status <> 'DELIVERED' THEN
-    INSERT INTO alerts(created_at, alert_type, severity, entity_type, entity_id, message, resolved)
-    VALUES (NOW(), 'SHIPMENT_DELAY', 'WARN', 'SHIPMENT', NEW.shipment_id, CONCAT('Shipment ', NEW.shipment_id, ' behind schedule'), 0);
-  END IF;
-END//
-DELIMITER ;
-
-DELIMITER //
-CREATE TRIGGER tr_inventory_threshold AFTER UPDATE ON inventory FOR EACH ROW
-BEGIN
-  IF NEW.quantity < NEW.reorder_threshold THEN
-    INSERT INTO alerts(created_at, alert_type, severity, entity_type, entity_id, message, resolved)
-    VALUES (NOW(), 'LOW_INVENTORY', IF(NEW.quantity < NEW.safety_stock, 'CRITICAL', 'WARN'), 'INVENTORY', NEW.inventory_id, CONCAT('Inventory low for product ', NEW.product_id, ' at warehouse ', NEW.warehouse_id), 0);
-  END IF;
-END//
-DELIMITER ;
+INSERT INTO supplier_risk_current(supplier_id, record_date, on_time_rate, avg_delay_days, defect_rate, risk_score, risk_level)
+SELECT m.supplier_id, m.record_date, m.on_time_rate, m.avg_delay_days, m.defect_rate, m.risk_score, m.risk_level
+FROM supplier_metrics m
+JOIN (
+  SELECT supplier_id, MAX(record_date) AS record_date
+  FROM supplier_metrics
+  GROUP BY supplier_id
+) latest ON latest.supplier_id = m.supplier_id AND latest.record_date = m.record_date;
+
+-- Risk counters for the seed shipments (RiskCounters.rebuild in risk_counters.py)
+INSERT INTO supplier_risk_daily(supplier_id, ship_date, delivered_count, delayed_count, delay_day_sum)
+SELECT supplier_id, ship_date,
+       SUM(status IN ('DELIVERED','DELAYED')),
+       SUM(status = 'DELAYED' OR (actual_arrival_date IS NOT NULL AND actual_arrival_date > expected_arrival_date)),
+       SUM(CASE WHEN status IN ('DELIVERED','DELAYED') AND actual_arrival_date IS NOT NULL
+                THEN GREATEST(DATEDIFF(actual_arrival_date, expected_arrival_date), 0) ELSE 0 END)
+FROM shipments
+WHERE ship_date >= CURDATE() - INTERVAL 90 DAY
+GROUP BY supplier_id, ship_date;
+
+INSERT INTO supplier_open_delays(shipment_id, supplier_id, ship_date, expected_arrival_date)
+SELECT shipment_id, supplier_id, ship_date, expected_arrival_date
+FROM shipments
+WHERE ship_date >= CURDATE() - INTERVAL 90 DAY
+  AND status IN ('DELIVERED','DELAYED') AND actual_arrival_date IS NULL;
+
+INSERT INTO supplier_risk_counters(supplier_id, window_start, delivered_count, delayed_count, delay_day_sum, dirty)
+SELECT s.supplier_id, CURDATE() - INTERVAL 90 DAY,
+       COALESCE(d.delivered_count, 0), COALESCE(d.delayed_count, 0), COALESCE(d.delay_day_sum, 0), 1
+FROM suppliers s
+LEFT JOIN (
+  SELECT supplier_id, SUM(delivered_count) AS delivered_count, SUM(delayed_count) AS delayed_count, SUM(delay_day_sum) AS delay_day_sum
+  FROM supplier_risk_daily
+  GROUP BY supplier_id
+) d ON d.supplier_id = s.supplier_id;
+
+-- Analytics rollups for the seed data (Rollups.refresh in rollups.py)
+INSERT INTO rollup_shipments_daily(ship_date, shipment_count, delayed_count, delay_day_sum)
+SELECT ship_date, COUNT(*),
+       SUM(IF(status = 'DELAYED' OR actual_arrival_date > expected_arrival_date, 1, 0)),
+       SUM(IF(actual_arrival_date > expected_arrival_date, DATEDIFF(actual_arrival_date, expected_arrival_date), 0))
+FROM shipments
+WHERE NOT (status <=> 'CANCELLED')
+GROUP BY ship_date;
+
+INSERT INTO rollup_supplier_shipments_weekly(supplier_id, week_start, shipment_count, delayed_count, delay_day_sum)
+SELECT supplier_id, ship_date - INTERVAL WEEKDAY(ship_date) DAY AS shipment_week, COUNT(*),
+       SUM(IF(status = 'DELAYED' OR actual_arrival_date > expected_arrival_date, 1, 0)),
+       SUM(IF(actual_arrival_date > expected_arrival_date, DATEDIFF(actual_arrival_date, expected_arrival_date), 0))
+FROM shipments
+WHERE NOT (status <=> 'CANCELLED')
+GROUP BY supplier_id, shipment_week;
+
+INSERT INTO rollup_warehouse_stock_daily(warehouse_id, stock_date, position_count, stockout_count, below_safety_count)
+SELECT warehouse_id, CURDATE(), COUNT(*), SUM(quantity <= 0), SUM(quantity < safety_stock)
+FROM inventory
+GROUP BY warehouse_id;
+
+INSERT INTO inventory_history(inventory_id, stock_date, quantity)
+SELECT inventory_id, CURDATE(), quantity FROM inventory;
+
+-- Alerts for shipment and inventory state changes are raised by the application's alert
+-- pipeline (alert_pipeline.py), which deduplicates against open alerts, not by triggers
 
 DELIMITER //
 CREATE PROCEDURE compute_supplier_risk(IN p_supplier_id INT)
@@ -210,11 +486,13 @@ BEGIN
     AND ship_date >= CURDATE() - INTERVAL 90 DAY
     AND status IN ('DELIVERED','DELAYED');
 
+  IF v_avg_delay IS NULL THEN
+    SET v_avg_delay = 0;
+  END IF;
+
   SELECT defect_rate INTO v_defect_rate
-  FROM supplier_metrics
-  WHERE supplier_id = p_supplier_id
-  ORDER BY record_date DESC
-  LIMIT 1;
+  FROM supplier_risk_current
+  WHERE supplier_id = p_supplier_id;
 
   IF v_defect_rate IS NULL THEN
     SET v_defect_rate = 0.0200;
@@ -234,6 +512,10 @@ BEGIN
   VALUES(p_supplier_id, CURDATE(), v_on_time_rate, v_avg_delay, v_defect_rate, v_score, v_level, 'auto')
   ON DUPLICATE KEY UPDATE on_time_rate=VALUES(on_time_rate), avg_delay_days=VALUES(avg_delay_days), defect_rate=VALUES(defect_rate), risk_score=VALUES(risk_score), risk_level=VALUES(risk_level), notes=VALUES(notes);
 
+  INSERT INTO supplier_risk_current(supplier_id, record_date, on_time_rate, avg_delay_days, defect_rate, risk_score, risk_level)
+  VALUES(p_supplier_id, CURDATE(), v_on_time_rate, v_avg_delay, v_defect_rate, v_score, v_level)
+  ON DUPLICATE KEY UPDATE record_date=VALUES(record_date), on_time_rate=VALUES(on_time_rate), avg_delay_days=VALUES(avg_delay_days), defect_rate=VALUES(defect_rate), risk_score=VALUES(risk_score), risk_level=VALUES(risk_level);
+
   INSERT INTO audit_logs(occurred_at, action, entity_type, entity_id, details)
   VALUES (NOW(), 'COMPUTE_SUPPLIER_RISK', 'SUPPLIER', p_supplier_id, CONCAT('score=', v_score, ', level=', v_level));
 END//
@@ -242,32 +524,98 @@ DELIMITER ;
 DELIMITER //
 CREATE PROCEDURE daily_update_supplier_risks()
 BEGIN
-  DECLARE done INT DEFAULT 0;
-  DECLARE s_id INT;
-  DECLARE cur CURSOR FOR SELECT supplier_id FROM suppliers;
-  DECLARE CONTINUE HANDLER FOR NOT FOUND SET done = 1;
-
-  OPEN cur;
-  read_loop: LOOP
-    FETCH cur INTO s_id;
-    IF done = 1 THEN LEAVE read_loop; END IF;
-    CALL compute_supplier_risk(s_id);
-  END LOOP;
-  CLOSE cur;
+  -- Same inputs and formula as compute_supplier_risk, for every supplier in one grouped pass
+  DROP TEMPORARY TABLE IF EXISTS tmp_supplier_risk;
+  CREATE TEMPORARY TABLE tmp_supplier_risk AS
+  SELECT f.supplier_id, f.on_time_rate, f.avg_delay_days, f.defect_rate, f.risk_score,
+         CASE WHEN f.risk_score < 30 THEN 'LOW'
+              WHEN f.risk_score < 60 THEN 'MEDIUM'
+              ELSE 'HIGH' END AS risk_level
+  FROM (
+    SELECT r.*,
+           CAST(LEAST(100, GREATEST(0, 50*(1 - r.on_time_rate) + 30*(r.avg_delay_days/10) + 20*(r.defect_rate))) AS DECIMAL(10,2)) AS risk_score
+    FROM (
+      SELECT s.supplier_id,
+             CAST(IF(COALESCE(agg.total_delivered, 0) > 0,
+                     (agg.total_delivered - agg.delayed_count) / agg.total_delivered,
+                     1) AS DECIMAL(6,4)) AS on_time_rate,
+             CAST(COALESCE(agg.avg_delay, 0) AS DECIMAL(10,2)) AS avg_delay_days,
+             CAST(IF(c.supplier_id IS NULL, 0, COALESCE(c.defect_rate, 0.02)) AS DECIMAL(6,4)) AS defect_rate
+      FROM suppliers s
+      LEFT JOIN (
+        SELECT supplier_id,
+               SUM(status IN ('DELIVERED','DELAYED')) AS total_delivered,
+               SUM(status = 'DELAYED' OR (actual_arrival_date IS NOT NULL AND actual_arrival_date > expected_arrival_date)) AS delayed_count,
+               AVG(CASE WHEN status IN ('DELIVERED','DELAYED')
+                        THEN GREATEST(DATEDIFF(COALESCE(actual_arrival_date, CURDATE()), expected_arrival_date), 0) END) AS avg_delay
+        FROM shipments
+        WHERE ship_date >= CURDATE() - INTERVAL 90 DAY
+        GROUP BY supplier_id
+      ) agg ON agg.supplier_id = s.supplier_id
+      LEFT JOIN supplier_risk_current c ON c.supplier_id = s.supplier_id
+    ) r
+  ) f;
+
+  INSERT INTO supplier_metrics(supplier_id, record_date, on_time_rate, avg_delay_days, defect_rate, risk_score, risk_level, notes)
+  SELECT supplier_id, CURDATE(), on_time_rate, avg_delay_days, defect_rate, risk_score, risk_level, 'auto'
+  FROM tmp_supplier_risk
+  ON DUPLICATE KEY UPDATE on_time_rate=VALUES(on_time_rate), avg_delay_days=VALUES(avg_delay_days), defect_rate=VALUES(defect_rate), risk_score=VALUES(risk_score), risk_level=VALUES(risk_level), notes=VALUES(notes);
+
+  INSERT INTO supplier_risk_current(supplier_id, record_date, on_time_rate, avg_delay_days, defect_rate, risk_score, risk_level)
+  SELECT supplier_id, CURDATE(), on_time_rate, avg_delay_days, defect_rate, risk_score, risk_level
+  FROM tmp_supplier_risk
+  ON DUPLICATE KEY UPDATE record_date=VALUES(record_date), on_time_rate=VALUES(on_time_rate), avg_delay_days=VALUES(avg_delay_days), defect_rate=VALUES(defect_rate), risk_score=VALUES(risk_score), risk_level=VALUES(risk_level);
+
+  INSERT INTO audit_logs(occurred_at, action, entity_type, entity_id, details)
+  SELECT NOW(), 'COMPUTE_SUPPLIER_RISK', 'SUPPLIER', supplier_id, CONCAT('score=', risk_score, ', level=', risk_level)
+  FROM tmp_supplier_risk;
+
+  DROP TEMPORARY TABLE tmp_supplier_risk;
 
   INSERT INTO audit_logs(occurred_at, action, entity_type, entity_id, details)
   VALUES (NOW(), 'DAILY_RISK_UPDATE', 'SYSTEM', 0, 'completed');
 END//
 DELIMITER ;
 
+-- Range-partition p_table by month of p_column, from the month of its oldest row to p_months_ahead
+-- months from now, plus a catch-all pmax. Later months are added by the archive job.
+DELIMITER //
+CREATE PROCEDURE partition_by_month(IN p_table VARCHAR(64), IN p_column VARCHAR(64), IN p_months_ahead INT)
+BEGIN
+  DECLARE v_month DATE;
+  DECLARE v_last DATE;
+  DECLARE v_partitions TEXT DEFAULT '';
+
+  SET @first_value = NULL;
+  SET @partition_sql = CONCAT('SELECT MIN(', p_column, ') INTO @first_value FROM ', p_table);
+  PREPARE stmt FROM @partition_sql;
+  EXECUTE stmt;
+  DEALLOCATE PREPARE stmt;
+
+  SET v_month = DATE_FORMAT(COALESCE(@first_value, CURDATE()), '%Y-%m-01');
+  SET v_last = DATE_FORMAT(CURDATE() + INTERVAL p_months_ahead MONTH, '%Y-%m-01');
+  WHILE v_month <= v_last DO
+    SET v_partitions = CONCAT(v_partitions, 'PARTITION p', DATE_FORMAT(v_month, '%Y%m'),
+                              ' VALUES LESS THAN (''', v_month + INTERVAL 1 MONTH, '''), ');
+    SET v_month = v_month + INTERVAL 1 MONTH;
+  END WHILE;
+
+  SET @partition_sql = CONCAT('ALTER TABLE ', p_table, ' PARTITION BY RANGE COLUMNS(', p_column, ') (',
+                              v_partitions, 'PARTITION pmax VALUES LESS THAN (MAXVALUE))');
+  PREPARE stmt FROM @partition_sql;
+  EXECUTE stmt;
+  DEALLOCATE PREPARE stmt;
+END//
+DELIMITER ;
+
+CALL partition_by_month('shipment_events', 'event_time', 3);
+CALL partition_by_month('alerts', 'created_at', 3);
+CALL partition_by_month('audit_logs', 'occurred_at', 3);
+
 CREATE OR REPLACE VIEW supplier_risk_summary AS
-SELECT s.supplier_id, s.name, m.record_date, m.risk_score, m.risk_level, m.on_time_rate, m.avg_delay_days, m.defect_rate
+SELECT s.supplier_id, s.name, c.record_date, c.risk_score, c.risk_level, c.on_time_rate, c.avg_delay_days, c.defect_rate
 FROM suppliers s
-LEFT JOIN supplier_metrics m
-  ON m.supplier_id = s.supplier_id
- AND m.record_date = (
-   SELECT MAX(m2.record_date) FROM supplier_metrics m2 WHERE m2.supplier_id = s.supplier_id
- );
+LEFT JOIN supplier_risk_current c ON c.supplier_id = s.supplier_id;
 
 CREATE OR REPLACE VIEW delayed_shipments_overview AS
 SELECT sh.shipment_id, sh.supplier_id, sh.product_id, sh.warehouse_id, sh.expected_arrival_date, sh.actual_arrival_date, sh.status,
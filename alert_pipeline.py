@@ -0,0 +1,267 @@
+"""
+Smart Supply Chain Risk Intelligence - Alert Pipeline
+Background worker that turns shipment and inventory state changes into deduplicated alerts
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from datetime import date
+
+from mysql.connector import Error
+
+log = logging.getLogger('scri.alerts')
+
+SEVERITY_RANK = {'INFO': 0, 'WARN': 1, 'CRITICAL': 2}
+
+# Event kinds accepted by publish(); the key identifies the row whose current state is evaluated
+EVENT_KINDS = ('shipment', 'inventory', 'inventory_key')
+
+
+def shipment_alert(row, today, eta_probability=None):
+    """Alert due for a shipment's current state, or None (the rules of the old tr_shipment_delay_alert).
+    With ``eta_probability``, an in-transit shipment whose predicted delay probability reaches it
+    raises an INFO alert ahead of time."""
+    shipment_id = row['shipment_id']
+    if row['status'] == 'DELAYED':
+        return ('SHIPMENT_DELAY', 'WARN', 'SHIPMENT', shipment_id, f'Shipment {shipment_id} delayed')
+    if row['expected_arrival_date'] < today and row['status'] not in ('DELIVERED', 'CANCELLED'):
+        return ('SHIPMENT_DELAY', 'WARN', 'SHIPMENT', shipment_id, f'Shipment {shipment_id} behind schedule')
+    if (eta_probability is not None and row['status'] == 'IN_TRANSIT'
+            and row.get('delay_probability') is not None and row['delay_probability'] >= eta_probability):
+        return ('SHIPMENT_DELAY', 'INFO', 'SHIPMENT', shipment_id,
+                f"Shipment {shipment_id} likely delayed ({float(row['delay_probability']):.0%}), "
+                f"predicted arrival {row['predicted_arrival_date']}")
+    return None
+
+
+def inventory_alert(row):
+    """Alert due for an inventory position, or None (the rules of the old tr_inventory_threshold)"""
+    if row['quantity'] >= row['reorder_threshold']:
+        return None
+    severity = 'CRITICAL' if row['quantity'] < row['safety_stock'] else 'WARN'
+    return ('LOW_INVENTORY', severity, 'INVENTORY', row['inventory_id'],
+            f"Inventory low for product {row['product_id']} at warehouse {row['warehouse_id']}")
+
+
+class AlertPipeline:
+    """In-process queue of state-change events drained by one background worker.
+
+    Write paths call ``publish()``, which never blocks: when the queue is full the event is
+    dropped and counted. The worker collects events for up to ``flush_interval`` seconds
+    (or ``batch_size`` events), re-reads the current state of the affected rows, applies the
+    alert rules and writes the resulting alerts in one transaction. An alert is skipped when
+    an unresolved alert with the same (alert_type, entity_type, entity_id) was raised within
+    the last ``dedup_window`` seconds; if the new one is more severe, the open alert is
+    escalated instead. When ``rollups`` is given, the daily alert counts are moved along in the
+    same transaction. ``eta_probability`` enables the predicted-delay rule of ``shipment_alert()``
+    (scores from shipment_eta). Statements run through ``execute(cursor, query, params)``.
+    """
+
+    def __init__(self, connect, batch_size=500, flush_interval=1.0, dedup_window=86400,
+                 max_queue=10000, on_written=None, rollups=None, eta_probability=None, execute=None):
+        self.connect = connect
+        self.execute = execute or (lambda cursor, query, params=None: cursor.execute(query, params or ()))
+        self.rollups = rollups
+        self.eta_probability = eta_probability
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = float(flush_interval)
+        self.dedup_window = int(dedup_window)
+        self.on_written = on_written
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._process_lock = threading.Lock()
+        self._thread = None
+        self._stopping = threading.Event()
+        self._stats = {'published': 0, 'dropped': 0, 'batches': 0, 'evaluated': 0, 'written': 0,
+                       'escalated': 0, 'deduplicated': 0, 'errors': 0}
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def publish(self, kind, key):
+        """Queue a state change for evaluation; starts the worker on first use"""
+        if kind not in EVENT_KINDS:
+            raise ValueError(f'Unknown alert event kind: {kind}')
+        self.start()
+        try:
+            self._queue.put_nowait((kind, key))
+            self._count('published')
+        except queue.Full:
+            self._count('dropped')
+            log.warning("Alert queue full, dropped %s event for %s", kind, key)
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name='alert-pipeline', daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Stop the worker after it has drained the queue"""
+        self._stopping.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def flush(self):
+        """Process everything queued so far on the calling thread"""
+        events = self._drain(block=False)
+        if events:
+            self._process(events)
+
+    def evaluate(self, kind, keys):
+        """Evaluate many rows on the calling thread, batch_size at a time, bypassing the queue"""
+        if kind not in EVENT_KINDS:
+            raise ValueError(f'Unknown alert event kind: {kind}')
+        keys = list(keys)
+        for start in range(0, len(keys), self.batch_size):
+            self._process([(kind, key) for key in keys[start:start + self.batch_size]])
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, 'queued': self._queue.qsize(),
+                    'running': self._thread is not None and self._thread.is_alive()}
+
+    def _drain(self, block=True):
+        """Collect up to batch_size events, waiting at most flush_interval for the batch to fill"""
+        events = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(events) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if block and remaining > 0:
+                    events.append(self._queue.get(timeout=remaining))
+                else:
+                    events.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return events
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            events = self._drain()
+            if events:
+                try:
+                    self._process(events)
+                except Exception:
+                    self._count('errors')
+                    log.exception("Alert batch of %d events failed", len(events))
+
+    def _process(self, events):
+        shipment_ids = sorted({key for kind, key in events if kind == 'shipment'})
+        inventory_ids = sorted({key for kind, key in events if kind == 'inventory'})
+        inventory_keys = sorted({key for kind, key in events if kind == 'inventory_key'})
+
+        with self._process_lock, self.connect() as conn:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                candidates = {}
+                today = date.today()
+                for row in self._fetch(cursor, "SELECT sh.shipment_id, sh.status, sh.expected_arrival_date, "
+                                               "e.delay_probability, e.predicted_arrival_date FROM shipments sh "
+                                               "LEFT JOIN shipment_eta e ON e.shipment_id = sh.shipment_id "
+                                               "WHERE sh.shipment_id IN ({})", shipment_ids):
+                    self._offer(candidates, shipment_alert(row, today, self.eta_probability))
+                inventory_columns = "inventory_id, product_id, warehouse_id, quantity, reorder_threshold, safety_stock"
+                for row in self._fetch(cursor, f"SELECT {inventory_columns} FROM inventory "
+                                               "WHERE inventory_id IN ({})", inventory_ids):
+                    self._offer(candidates, inventory_alert(row))
+                for row in self._fetch(cursor, f"SELECT {inventory_columns} FROM inventory "
+                                               "WHERE (product_id, warehouse_id) IN ({})", inventory_keys, width=2):
+                    self._offer(candidates, inventory_alert(row))
+
+                written, escalated, deduplicated = self._write(cursor, candidates)
+                conn.commit()
+            except Error:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+        with self._lock:
+            self._stats['batches'] += 1
+            self._stats['evaluated'] += len(events)
+            self._stats['written'] += written
+            self._stats['escalated'] += escalated
+            self._stats['deduplicated'] += deduplicated
+        if written or escalated:
+            log.debug("Alert batch: %d events, %d written, %d escalated, %d deduplicated",
+                      len(events), written, escalated, deduplicated)
+            if self.on_written:
+                self.on_written(written + escalated)
+
+    def _fetch(self, cursor, query, keys, width=1):
+        """Rows for ``keys`` in chunks of batch_size, filling the IN (...) list of ``query``"""
+        placeholder = '%s' if width == 1 else '(' + ', '.join(['%s'] * width) + ')'
+        for start in range(0, len(keys), self.batch_size):
+            chunk = keys[start:start + self.batch_size]
+            params = chunk if width == 1 else [value for key in chunk for value in key]
+            self.execute(cursor, query.format(', '.join([placeholder] * len(chunk))), tuple(params))
+            yield from cursor.fetchall()
+
+    @staticmethod
+    def _offer(candidates, alert):
+        """Keep the most severe alert per (alert_type, entity_type, entity_id)"""
+        if alert is None:
+            return
+        key = (alert[0], alert[2], alert[3])
+        current = candidates.get(key)
+        if current is None or SEVERITY_RANK[alert[1]] > SEVERITY_RANK[current[1]]:
+            candidates[key] = alert
+
+    def _write(self, cursor, candidates):
+        """Insert new alerts and escalate open ones; returns (written, escalated, deduplicated)"""
+        if not candidates:
+            return 0, 0, 0
+
+        keys = list(candidates)
+        open_alerts = {}
+        for start in range(0, len(keys), self.batch_size):
+            chunk = keys[start:start + self.batch_size]
+            self.execute(cursor, f"""
+                SELECT alert_id, created_at, alert_type, entity_type, entity_id, severity
+                FROM alerts
+                WHERE resolved = 0 AND created_at >= NOW() - INTERVAL %s SECOND
+                  AND (alert_type, entity_type, entity_id) IN ({', '.join(['(%s, %s, %s)'] * len(chunk))})
+            """, (self.dedup_window, *[value for key in chunk for value in key]))
+            for row in cursor.fetchall():
+                key = (row['alert_type'], row['entity_type'], row['entity_id'])
+                known = open_alerts.get(key)
+                if known is None or SEVERITY_RANK[row['severity']] > SEVERITY_RANK[known['severity']]:
+                    open_alerts[key] = row
+
+        new_alerts, escalations = [], []
+        for key, alert in candidates.items():
+            existing = open_alerts.get(key)
+            if existing is None:
+                new_alerts.append(alert)
+            elif SEVERITY_RANK[alert[1]] > SEVERITY_RANK[existing['severity']]:
+                escalations.append((alert, existing))
+
+        for start in range(0, len(new_alerts), self.batch_size):
+            chunk = new_alerts[start:start + self.batch_size]
+            self.execute(cursor, f"""
+                INSERT INTO alerts(created_at, alert_type, severity, entity_type, entity_id, message, resolved)
+                VALUES {', '.join(["(NOW(), %s, %s, %s, %s, %s, 0)"] * len(chunk))}
+            """, tuple(value for alert in chunk for value in alert))
+        for alert, existing in escalations:
+            # created_at is part of the key and lets the UPDATE prune to the alert's month partition
+            self.execute(cursor, "UPDATE alerts SET severity = %s, message = %s WHERE alert_id = %s AND created_at = %s",
+                         (alert[1], alert[4], existing['alert_id'], existing['created_at']))
+
+        if self.rollups is not None:
+            # An escalated alert is recounted under its new severity on the day it was raised
+            deltas = Counter((None, alert[1], alert[0]) for alert in new_alerts)
+            for alert, existing in escalations:
+                raised = existing['created_at'].date()
+                deltas[(raised, existing['severity'], existing['alert_type'])] -= 1
+                deltas[(raised, alert[1], existing['alert_type'])] += 1
+            self.rollups.bump_alerts(cursor, deltas)
+
+        return len(new_alerts), len(escalations), len(candidates) - len(new_alerts) - len(escalations)
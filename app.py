@@ -3,14 +3,43 @@ Smart Supply Chain Risk Intelligence - Flask Application
 Main application file that connects to MySQL and serves frontend templates
 """
 
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+from flask import Flask, Response, render_template, request, jsonify, make_response, redirect, url_for, g, has_app_context, has_request_context
+import click
 import mysql.connector
 from mysql.connector import Error
-from datetime import datetime, date
+from datetime import datetime, date, timedelta, timezone
+import atexit
+import base64
+import csv
+import hashlib
+import io
 import json
+import logging
 import os
+import queue
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
 from functools import wraps
 
+import risk_scoring
+from alert_pipeline import AlertPipeline
+from eta_model import EtaModel, EtaScorer, train_model
+from exposure_graph import ExposureGraph
+from forecasting import StockoutForecaster, forecast_summary
+from http_cache import compress, compressible, negotiate_encoding, version_etag
+from json_codec import SHAPES, FastJSONProvider, Rows, column_arrays, row_dicts
+from ref_cache import RefCache, SharedTier
+from retention import RetentionJob, archived_page
+from risk_counters import NEW_SUPPLIER_QUERY, RiskCounters
+from rollups import Rollups, week_start
+from snapshot import SnapshotExporter
+from db_pool import ConnectionPool, PoolTimeout
+from db_router import READ_AFTER_WRITE_COOKIE, ReplicaRouter, is_read_statement, parse_replicas, pinned_to_primary
+from event_stream import StreamFull, StreamHub, format_event
+from metrics import Registry
+
 app = Flask(__name__)
 
 # Database configuration - will be set via environment or user input
@@ -22,133 +51,415 @@ DB_CONFIG = {
     'port': int(os.getenv('DB_PORT', 3306))
 }
 
-# Global database connection
-db_connection = None
-
-def get_db_connection():
-    """Get database connection with automatic reconnection"""
-    global db_connection
-    try:
-        # Always check if connection is alive and reconnect if needed
-        if db_connection is None:
-            print(f"Creating new MySQL connection: {DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}")
-            db_connection = mysql.connector.connect(
-                host=DB_CONFIG['host'],
-                database=DB_CONFIG['database'],
-                user=DB_CONFIG['user'],
-                password=DB_CONFIG['password'],
-                port=DB_CONFIG['port'],
-                autocommit=False,
-                connect_timeout=10,
-                pool_reset_session=True
-            )
-            print("✓ Database connection established")
-        else:
-            # Check if connection is still alive
-            try:
-                db_connection.ping(reconnect=True, attempts=3, delay=1)
-            except Error:
-                # Connection is dead, recreate it
-                print("Connection lost, recreating...")
-                try:
-                    db_connection.close()
-                except:
-                    pass
-                db_connection = None
-                return get_db_connection()  # Recursive call to create new connection
-        
-        return db_connection
+# Response JSON encoder: auto (orjson when it is installed), orjson or stdlib
+JSON_ENCODER = os.getenv('JSON_ENCODER', 'auto')
+app.json = FastJSONProvider(app, JSON_ENCODER)
+
+# Response compression: bodies of at least COMPRESS_MIN_SIZE bytes are gzip/brotli encoded for clients that accept it.
+# ETags of the versioned list endpoints also change every LIST_ETAG_TTL seconds, bounding staleness from unbumped writes.
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+LIST_ETAG_TTL = int(os.getenv('LIST_ETAG_TTL', 300))
+
+# Pagination settings for list endpoints
+DEFAULT_PAGE_LIMIT = int(os.getenv('API_PAGE_LIMIT', 100))
+MAX_PAGE_LIMIT = int(os.getenv('API_MAX_PAGE_LIMIT', 1000))
+
+# Rows fetched per round trip by the streaming export endpoints
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+
+# Record limit per bulk ingestion request and records written per transaction
+BULK_MAX_RECORDS = int(os.getenv('BULK_MAX_RECORDS', 10000))
+BULK_CHUNK_SIZE = int(os.getenv('BULK_CHUNK_SIZE', 1000))
+
+# Alert pipeline: events per batch, seconds a batch may wait to fill, open-alert dedup window
+ALERT_BATCH_SIZE = int(os.getenv('ALERT_BATCH_SIZE', 500))
+ALERT_FLUSH_INTERVAL = float(os.getenv('ALERT_FLUSH_INTERVAL', 1))
+ALERT_DEDUP_WINDOW = int(os.getenv('ALERT_DEDUP_WINDOW', 86400))
+ALERT_QUEUE_SIZE = int(os.getenv('ALERT_QUEUE_SIZE', 10000))
+
+# /api/stream: seconds between change checks, max clients, seconds between keepalives, rows per check
+STREAM_POLL_INTERVAL = float(os.getenv('STREAM_POLL_INTERVAL', 2))
+STREAM_MAX_CLIENTS = int(os.getenv('STREAM_MAX_CLIENTS', 100))
+STREAM_HEARTBEAT = float(os.getenv('STREAM_HEARTBEAT', 15))
+STREAM_BATCH_LIMIT = 500
+STREAM_RETRY_MS = 5000
+
+# Suppliers written per multi-row upsert by the batch risk engine
+RISK_BATCH_SIZE = int(os.getenv('RISK_BATCH_SIZE', 1000))
+
+# Days of shipment/alert rollups recomputed by refresh-rollups, longest range served by /api/analytics/*
+ROLLUP_REFRESH_DAYS = int(os.getenv('ROLLUP_REFRESH_DAYS', 35))
+ANALYTICS_MAX_DAYS = int(os.getenv('ANALYTICS_MAX_DAYS', 1830))
+
+# Columnar snapshot export: target directory, rows per query/row group, seconds re-read for late commits
+SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', 'snapshots')
+SNAPSHOT_BATCH_SIZE = int(os.getenv('SNAPSHOT_BATCH_SIZE', 50000))
+SNAPSHOT_OVERLAP = int(os.getenv('SNAPSHOT_OVERLAP', 300))
+
+# Data retention: days rows stay in each operational table before flask --app app archive-data moves them,
+# rows per archive transaction, seconds between batches, where rows go ('table' or 'parquet'), the Parquet
+# directory, months of partitions kept ahead of today
+RETENTION_DAYS = {
+    'shipments': int(os.getenv('RETENTION_SHIPMENTS_DAYS', 730)),
+    'shipment_events': int(os.getenv('RETENTION_SHIPMENT_EVENTS_DAYS', 730)),
+    'alerts': int(os.getenv('RETENTION_ALERTS_DAYS', 180)),
+    'audit_logs': int(os.getenv('RETENTION_AUDIT_LOGS_DAYS', 365))
+}
+RETENTION_BATCH_SIZE = int(os.getenv('RETENTION_BATCH_SIZE', 5000))
+RETENTION_BATCH_PAUSE = float(os.getenv('RETENTION_BATCH_PAUSE', 0.1))
+RETENTION_TARGET = os.getenv('RETENTION_TARGET', 'table')
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', 'archive')
+PARTITION_MONTHS_AHEAD = int(os.getenv('PARTITION_MONTHS_AHEAD', 3))
+
+# Stockout forecast: days of stock history behind usage rates, days of usage added to each reorder
+FORECAST_HISTORY_DAYS = int(os.getenv('FORECAST_HISTORY_DAYS', 28))
+FORECAST_REVIEW_DAYS = int(os.getenv('FORECAST_REVIEW_DAYS', 7))
+
+# Shipment ETA model: artifact directory, days of deliveries trained on, in-transit shipments read per batch,
+# predicted delay probability that raises an early SHIPMENT_DELAY alert
+ETA_MODEL_DIR = os.getenv('ETA_MODEL_DIR', 'models')
+ETA_TRAINING_DAYS = int(os.getenv('ETA_TRAINING_DAYS', 365))
+ETA_SCORE_BATCH_SIZE = int(os.getenv('ETA_SCORE_BATCH_SIZE', 50000))
+ETA_ALERT_PROBABILITY = float(os.getenv('ETA_ALERT_PROBABILITY', 0.7))
+
+# Seconds a computed set of dashboard counters is served before re-querying
+DASHBOARD_CACHE_TTL = float(os.getenv('DASHBOARD_CACHE_TTL', 10))
+
+# Reference data cache (suppliers, products, warehouses): in-process entries and the seconds each is served,
+# optional Redis-compatible URL of a tier shared by all workers with its entry lifetime, and the seconds
+# between checks for invalidations made by other workers
+REF_CACHE_SIZE = int(os.getenv('REF_CACHE_SIZE', 2000))
+REF_CACHE_TTL = float(os.getenv('REF_CACHE_TTL', 60))
+REF_CACHE_REDIS_URL = os.getenv('REF_CACHE_REDIS_URL', '')
+REF_CACHE_SHARED_TTL = int(os.getenv('REF_CACHE_SHARED_TTL', 300))
+REF_CACHE_SYNC_INTERVAL = float(os.getenv('REF_CACHE_SYNC_INTERVAL', 1))
+
+# Seconds the what-if simulator reuses loaded supplier features
+RISK_FEATURE_TTL = float(os.getenv('RISK_FEATURE_TTL', 60))
+
+# Supplier impact graph: seconds between incremental refreshes and full rebuilds, days of deliveries behind daily demand
+EXPOSURE_REFRESH_INTERVAL = float(os.getenv('EXPOSURE_REFRESH_INTERVAL', 30))
+EXPOSURE_REBUILD_INTERVAL = float(os.getenv('EXPOSURE_REBUILD_INTERVAL', 3600))
+EXPOSURE_DEMAND_DAYS = int(os.getenv('EXPOSURE_DEMAND_DAYS', 90))
+
+# Connection pool settings
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))
+DB_POOL_PING_INTERVAL = float(os.getenv('DB_POOL_PING_INTERVAL', 30))
+
+# Read replicas: comma-separated host[:port] list (same user/password/database as DB_CONFIG), seconds of
+# replication lag tolerated, seconds between health checks, seconds a client reads from the primary after writing
+DB_REPLICAS = parse_replicas(os.getenv('DB_REPLICAS', ''), DB_CONFIG)
+DB_REPLICA_POOL_SIZE = int(os.getenv('DB_REPLICA_POOL_SIZE', DB_POOL_SIZE))
+DB_REPLICA_MAX_LAG = float(os.getenv('DB_REPLICA_MAX_LAG', 5))
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv('DB_REPLICA_CHECK_INTERVAL', 5))
+DB_READ_AFTER_WRITE_WINDOW = float(os.getenv('DB_READ_AFTER_WRITE_WINDOW', 5))
+
+# Shared connection pool - each request checks out its own connection
+db_pool = ConnectionPool(
+    DB_CONFIG,
+    size=DB_POOL_SIZE,
+    timeout=DB_POOL_TIMEOUT,
+    ping_interval=DB_POOL_PING_INTERVAL
+)
+
+# db_query sends the read statements of GET requests here; with no DB_REPLICAS every read uses db_pool
+replica_router = ReplicaRouter(
+    DB_REPLICAS,
+    lambda config: ConnectionPool(config, size=DB_REPLICA_POOL_SIZE, timeout=DB_POOL_TIMEOUT,
+                                  ping_interval=DB_POOL_PING_INTERVAL),
+    max_lag=DB_REPLICA_MAX_LAG,
+    check_interval=DB_REPLICA_CHECK_INTERVAL
+)
+atexit.register(replica_router.stop)
+
+# Supplier, product and warehouse reads of the GET routes; the routes that change them invalidate it after committing
+ref_cache = RefCache(
+    max_entries=REF_CACHE_SIZE,
+    ttl=REF_CACHE_TTL,
+    shared=SharedTier(REF_CACHE_REDIS_URL, REF_CACHE_SHARED_TTL) if REF_CACHE_REDIS_URL else None,
+    sync_interval=REF_CACHE_SYNC_INTERVAL
+)
+
+# Daily/weekly aggregates behind /api/analytics/*; write paths and the alert pipeline apply their deltas through it
+rollups = Rollups(execute=lambda cursor, query, params=None: timed_execute(cursor, query, params))
+
+# Write paths publish state changes here; alerts are evaluated and written off the request path
+alert_pipeline = AlertPipeline(
+    db_pool.connection,
+    batch_size=ALERT_BATCH_SIZE,
+    flush_interval=ALERT_FLUSH_INTERVAL,
+    dedup_window=ALERT_DEDUP_WINDOW,
+    max_queue=ALERT_QUEUE_SIZE,
+    on_written=lambda count: (bump_table_versions('alerts'), invalidate_dashboard_metrics()),
+    rollups=rollups,
+    eta_probability=ETA_ALERT_PROBABILITY,
+    execute=lambda cursor, query, params=None: timed_execute(cursor, query, params)
+)
+atexit.register(alert_pipeline.stop)
+
+# Logging - LOG_LEVEL=DEBUG adds per-request and per-query detail
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+logging.basicConfig(level=LOG_LEVEL, format='%(asctime)s %(levelname)s %(name)s %(message)s')
+log = logging.getLogger('scri')
+slow_query_log = logging.getLogger('scri.slow_query')
+
+# Statements taking at least this long are written to the slow-query log
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', 500))
+
+# ==================== INSTRUMENTATION ====================
+
+# Served in Prometheus text format at /api/metrics
+metrics_registry = Registry()
+request_latency = metrics_registry.histogram(
+    'scri_http_request_duration_seconds', 'HTTP request latency by route', ('method', 'route', 'status'))
+query_latency = metrics_registry.histogram(
+    'scri_db_query_duration_seconds', 'Database statement latency by query fingerprint', ('query',))
+query_rows = metrics_registry.counter(
+    'scri_db_query_rows_total', 'Rows returned by reads or affected by writes', ('query',))
+query_errors = metrics_registry.counter(
+    'scri_db_query_errors_total', 'Statements that failed after all retries', ('query',))
+query_retries = metrics_registry.counter(
+    'scri_db_query_retries_total', 'Statement retries after a connection failure', ('query',))
+slow_queries = metrics_registry.counter(
+    'scri_db_slow_queries_total', 'Statements at or over SLOW_QUERY_THRESHOLD_MS', ('query',))
+db_reconnects = metrics_registry.counter(
+    'scri_db_reconnects_total', 'Pooled connections discarded after a connection error')
+db_reads = metrics_registry.counter(
+    'scri_db_reads_total', 'db_query reads by the server that answered them', ('target',))
+metrics_registry.gauge('scri_db_replicas_healthy', 'Read replicas that passed their last health check',
+                       lambda: sum(replica.healthy for replica in replica_router.replicas))
+for _stat in ('in_use', 'idle', 'created', 'discarded', 'timeouts'):
+    metrics_registry.gauge(f'scri_db_pool_{_stat}', f'Connection pool {_stat.replace("_", " ")}',
+                           lambda stat=_stat: db_pool.stats()[stat])
+for _stat in ('local_hits', 'shared_hits', 'misses', 'invalidations'):
+    metrics_registry.gauge(f'scri_ref_cache_{_stat}', f'Reference data cache {_stat.replace("_", " ")}',
+                           lambda stat=_stat: ref_cache.totals()[stat])
+for _stat in ('queued', 'published', 'dropped', 'written', 'escalated', 'deduplicated', 'errors'):
+    metrics_registry.gauge(f'scri_alert_pipeline_{_stat}', f'Alert pipeline events/alerts {_stat}',
+                           lambda stat=_stat: alert_pipeline.stats()[stat])
+
+def current_route():
+    """URL rule of the request being served, used as a low-cardinality label"""
+    rule = request.url_rule if has_request_context() else None
+    return rule.rule if rule is not None else 'unmatched'
+
+def record_query(query_id, statement, elapsed, rows, retries=0, route=None):
+    """Record one statement's latency and row count, logging it if it was slow"""
+    query_latency.observe(elapsed, query_id)
+    query_rows.inc(query_id, amount=rows)
+    if has_app_context():
+        g.db_queries = g.get('db_queries', 0) + 1
+        g.db_time = g.get('db_time', 0.0) + elapsed
+
+    elapsed_ms = elapsed * 1000
+    if elapsed_ms >= SLOW_QUERY_THRESHOLD_MS:
+        slow_queries.inc(query_id)
+        slow_query_log.warning("duration_ms=%.1f rows=%d retries=%d query=%s route=%s statement=%s",
+                               elapsed_ms, rows, retries, query_id, route or current_route(), statement[:500])
+    else:
+        log.debug("query duration_ms=%.1f rows=%d query=%s", elapsed_ms, rows, query_id)
+
+def timed_execute(cursor, query, params=None):
+    """cursor.execute() with the same instrumentation as db_query, for code that manages its own cursor"""
+    query_id, statement = metrics_registry.statement(query)
+    started = time.perf_counter()
+    try:
+        cursor.execute(query, params or ())
+    except Error:
+        query_errors.inc(query_id)
+        raise
+    record_query(query_id, statement, time.perf_counter() - started, max(cursor.rowcount, 0))
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    """Time every request; streamed responses are timed up to the first byte"""
+    started = g.get('request_started')
+    if started is not None:
+        elapsed = time.perf_counter() - started
+        route = current_route()
+        request_latency.observe(elapsed, request.method, route, str(response.status_code))
+        log.debug("request method=%s route=%s status=%d duration_ms=%.1f db_queries=%d db_ms=%.1f",
+                  request.method, route, response.status_code, elapsed * 1000,
+                  g.get('db_queries', 0), g.get('db_time', 0.0) * 1000)
+    return response
+
+@app.after_request
+def compress_response(response):
+    """gzip/brotli encode JSON and text bodies of at least COMPRESS_MIN_SIZE bytes; streamed responses are left alone"""
+    if (response.status_code != 200 or response.is_streamed or response.direct_passthrough
+            or 'Content-Encoding' in response.headers or not compressible(response.mimetype)):
+        return response
+    response.vary.add('Accept-Encoding')
+    if response.content_length is not None and response.content_length < COMPRESS_MIN_SIZE:
+        return response
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    if encoding is not None:
+        response.set_data(compress(response.get_data(), encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+@app.after_request
+def pin_writer_to_primary(response):
+    """After a successful write, send the client's reads to the primary for DB_READ_AFTER_WRITE_WINDOW seconds"""
+    if replica_router.enabled and request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400:
+        response.set_cookie(READ_AFTER_WRITE_COOKIE, f'{time.time() + DB_READ_AFTER_WRITE_WINDOW:.3f}',
+                            max_age=int(DB_READ_AFTER_WRITE_WINDOW) + 1, httponly=True, samesite='Lax')
+    return response
+
+def reads_from_replica(query):
+    """Whether db_query may send ``query`` to a replica: a plain read in a GET request from a client that has not just written"""
+    return (replica_router.enabled and has_request_context() and request.method in ('GET', 'HEAD')
+            and is_read_statement(query) and not pinned_to_primary(request.cookies.get(READ_AFTER_WRITE_COOKIE)))
+
+def get_replica_connection():
+    """Connection to the replica serving the current request's reads, or None to read from the primary"""
+    conn = g.get('db_replica_connection')
+    if conn is not None:
+        return conn
+    replica = replica_router.pick()
+    if replica is None:
+        return None
+    try:
+        conn = replica.pool.acquire()
+    except PoolTimeout as e:
+        log.warning("Replica %s pool exhausted, reading from the primary: %s", replica.name, e)
+        return None
+    except Error as e:
+        replica_router.mark_down(replica, e)
+        return None
+    g.db_replica, g.db_replica_connection = replica, conn
+    return conn
+
+def get_db_connection(read=False):
+    """Get the pooled connection checked out for the current request (a replica's when ``read`` and one is usable)"""
+    if read:
+        conn = get_replica_connection()
+        if conn is not None:
+            return conn
+    try:
+        conn = g.get('db_connection')
+        if conn is None:
+            conn = db_pool.acquire()
+            g.db_connection = conn
+        return conn
+    except PoolTimeout as e:
+        log.warning("Database pool exhausted: %s", e)
+        return None
     except Error as e:
-        print(f"✗ Error connecting to MySQL: {e}")
-        # Reset connection on error
-        db_connection = None
-        import traceback
-        traceback.print_exc()
+        log.exception("Error connecting to MySQL: %s", e)
         return None
     except Exception as e:
-        print(f"✗ Unexpected error connecting to MySQL: {e}")
-        db_connection = None
-        import traceback
-        traceback.print_exc()
+        log.exception("Unexpected error connecting to MySQL: %s", e)
         return None
 
+def discard_db_connection(conn=None):
+    """Drop the current request's connection (or its replica connection ``conn``) after a connection-level error"""
+    if conn is not None and conn is g.get('db_replica_connection'):
+        replica = g.pop('db_replica')
+        g.pop('db_replica_connection')
+        replica.pool.discard(conn)
+        replica_router.mark_down(replica, 'connection lost')
+        db_reconnects.inc()
+        return
+    conn = g.pop('db_connection', None)
+    if conn is not None:
+        db_pool.discard(conn)
+        db_reconnects.inc()
+
+@app.teardown_appcontext
+def release_db_connection(exception=None):
+    """Return the request's connections to their pools"""
+    conn = g.pop('db_connection', None)
+    if conn is not None:
+        db_pool.release(conn)
+    conn = g.pop('db_replica_connection', None)
+    if conn is not None:
+        g.pop('db_replica').pool.release(conn)
+
 def init_db_connection():
     """Initialize database connection on startup"""
-    conn = get_db_connection()
-    if conn:
-        print(f"✓ Connected to MySQL database: {DB_CONFIG['database']}")
+    try:
+        with db_pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                autoinc_settings(cursor)
+            finally:
+                cursor.close()
+        print(f"✓ Connected to MySQL database: {DB_CONFIG['database']} (pool size {DB_POOL_SIZE})")
         return True
-    else:
-        print("✗ Failed to connect to MySQL database")
+    except Error as e:
+        print(f"✗ Failed to connect to MySQL database: {e}")
         return False
 
-def db_query(query, params=None, fetch=True):
-    """Execute database query safely with automatic reconnection"""
-    global db_connection
+def db_query(query, params=None, fetch=True, tuples=False, primary=False):
+    """Execute database query safely on the request's pooled connection.
+
+    Reads return a list of dicts, or with ``tuples`` a json_codec.Rows of tuples (no dict per row).
+    ``primary`` keeps a read off the replicas, e.g. for rows that will be cached.
+    """
     max_retries = 2
     retry_count = 0
+    query_id, statement = metrics_registry.statement(query)
+    read = fetch and not primary and reads_from_replica(query)
     
     while retry_count <= max_retries:
+        conn = None
         try:
-            conn = get_db_connection()
+            conn = get_db_connection(read=read)
             if not conn:
-                print("No database connection available")
+                log.warning("No database connection available query=%s", query_id)
                 if retry_count < max_retries:
                     retry_count += 1
-                    print(f"Retrying connection (attempt {retry_count}/{max_retries})...")
-                    import time
+                    query_retries.inc(query_id)
+                    log.info("Retrying connection (attempt %d/%d)", retry_count, max_retries)
                     time.sleep(0.5)
                     continue
+                query_errors.inc(query_id)
                 return None
             
-            # Test connection with ping
-            try:
-                conn.ping(reconnect=True, attempts=1, delay=0.5)
-            except Error as ping_error:
-                print(f"Connection ping failed: {ping_error}, reconnecting...")
-                db_connection = None
-                if retry_count < max_retries:
-                    retry_count += 1
-                    continue
-                return None
-            
-            cursor = conn.cursor(dictionary=True)
+            started = time.perf_counter()
+            cursor = conn.cursor(dictionary=not tuples)
             cursor.execute(query, params or ())
             
             if fetch:
                 result = cursor.fetchall()
+                if tuples:
+                    result = Rows(cursor.column_names, result)
+                rows = len(result)
+                db_reads.inc(g.db_replica.name if conn is g.get('db_replica_connection') else 'primary')
             else:
                 conn.commit()
                 result = cursor.rowcount
+                rows = max(result, 0)
             
             cursor.close()
+            record_query(query_id, statement, time.perf_counter() - started, rows, retry_count)
             return result
             
         except Error as e:
             error_msg = str(e)
-            print(f"Database error: {e}")
-            print(f"Query: {query[:100]}...")  # Print first 100 chars of query
-            print(f"Params: {params}")
+            log.error("Database error query=%s: %s", query_id, e)
+            log.debug("Failed statement=%s params=%r", statement[:200], params)
             
             # Check if it's a connection error
             if "Lost connection" in error_msg or "connection" in error_msg.lower() or "2006" in error_msg or "2055" in error_msg:
-                print("Connection error detected, will retry...")
-                db_connection = None
+                discard_db_connection(conn)
                 if retry_count < max_retries:
                     retry_count += 1
-                    print(f"Retrying query (attempt {retry_count}/{max_retries})...")
-                    import time
+                    query_retries.inc(query_id)
+                    log.info("Connection error, retrying query (attempt %d/%d)", retry_count, max_retries)
                     time.sleep(0.5)
                     continue
-                else:
-                    if conn:
-                        try:
-                            conn.rollback()
-                        except:
-                            pass
-                    return None
+                query_errors.inc(query_id)
+                return None
             else:
                 # Other database errors, don't retry
+                query_errors.inc(query_id)
                 if conn:
                     try:
                         conn.rollback()
@@ -157,9 +468,8 @@ def db_query(query, params=None, fetch=True):
                 return None
                 
         except Exception as e:
-            print(f"Unexpected error in db_query: {e}")
-            import traceback
-            traceback.print_exc()
+            log.exception("Unexpected error in db_query query=%s: %s", query_id, e)
+            query_errors.inc(query_id)
             if conn:
                 try:
                     conn.rollback()
@@ -169,6 +479,223 @@ def db_query(query, params=None, fetch=True):
     
     return None
 
+# ==================== SHARED QUERIES ====================
+
+# Row shapes shared by the list and export endpoints
+SHIPMENTS_SELECT = """
+    SELECT sh.*, 
+           s.name as supplier_name,
+           p.name as product_name,
+           w.name as warehouse_name,
+           GREATEST(DATEDIFF(COALESCE(sh.actual_arrival_date, CURDATE()), sh.expected_arrival_date), 0) as delay_days
+    FROM shipments sh
+    JOIN suppliers s ON sh.supplier_id = s.supplier_id
+    JOIN products p ON sh.product_id = p.product_id
+    JOIN warehouses w ON sh.warehouse_id = w.warehouse_id
+"""
+
+INVENTORY_SELECT = """
+    SELECT i.*, 
+           p.name as product_name,
+           p.sku,
+           w.name as warehouse_name,
+           CASE 
+               WHEN i.quantity < i.safety_stock THEN 'CRITICAL'
+               WHEN i.quantity < i.reorder_threshold THEN 'LOW'
+               ELSE 'OK'
+           END as status
+    FROM inventory i
+    JOIN products p ON i.product_id = p.product_id
+    JOIN warehouses w ON i.warehouse_id = w.warehouse_id
+"""
+
+ALERTS_SELECT = "SELECT * FROM alerts"
+
+# Optional equality filters (?arg=value) accepted by list and export endpoints
+LIST_FILTERS = {
+    'shipments': {'status': 'sh.status', 'supplier_id': 'sh.supplier_id', 'warehouse_id': 'sh.warehouse_id'},
+    'inventory': {'product_id': 'i.product_id', 'warehouse_id': 'i.warehouse_id'},
+    'forecast': {'product_id': 'f.product_id', 'warehouse_id': 'f.warehouse_id'},
+    'alerts': {'alert_type': 'alert_type', 'severity': 'severity'}
+}
+
+# ==================== PAGINATION HELPERS ====================
+
+def encode_cursor(*values):
+    """Build an opaque keyset cursor from the sort key of the last row on a page"""
+    key = [str(v) if isinstance(v, (date, datetime)) else v for v in values]
+    raw = json.dumps(key, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor, size):
+    """Decode a cursor produced by encode_cursor, raising ValueError if it is malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(key, list) or len(key) != size:
+        raise ValueError('Invalid cursor')
+    return key
+
+def get_page_args(key_size, args=None):
+    """Read ?limit= and ?cursor= from the request, returning (limit, cursor_key or None); also checks ?shape="""
+    args = request.args if args is None else args
+    if args.get('shape', 'rows') not in SHAPES:
+        raise ValueError(f"shape must be one of {', '.join(SHAPES)}")
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_LIMIT))
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    limit = min(limit, MAX_PAGE_LIMIT)
+
+    cursor = args.get('cursor')
+    return limit, decode_cursor(cursor, key_size) if cursor else None
+
+def keyset_after(sort_column, id_column, key):
+    """WHERE fragment selecting rows after ``key`` in ``sort_column DESC, id_column DESC`` order"""
+    if key is None:
+        return None, []
+    sort_value, id_value = key
+    clause = f"({sort_column} < %s OR ({sort_column} = %s AND {id_column} < %s))"
+    return clause, [sort_value, sort_value, id_value]
+
+def include_archived(args=None):
+    """Whether a request opted into the rows moved to the archive tables (?include_archived=true)"""
+    args = request.args if args is None else args
+    return args.get('include_archived', 'false').lower() == 'true'
+
+def where_clause(conditions):
+    """Join WHERE conditions with AND, or return an empty string"""
+    return f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+def list_filters(entity, args=None, export=False):
+    """WHERE conditions and params for the filters a list/export request passed.
+
+    The alerts list shows open alerts unless ``?resolved`` is passed; an export is a full dump
+    and only filters on ``resolved`` when it is passed.
+    """
+    args = request.args if args is None else args
+    conditions, params = [], []
+    if entity == 'alerts' and not (export and args.get('resolved') is None):
+        resolved = args.get('resolved', 'false').lower() == 'true'
+        conditions.append("resolved = %s")
+        params.append(1 if resolved else 0)
+    for arg, column in LIST_FILTERS.get(entity, {}).items():
+        value = args.get(arg)
+        if value:
+            conditions.append(f"{column} = %s")
+            params.append(value)
+    return conditions, params
+
+def page_payload(rows, limit, key, shape='rows'):
+    """Response body for one page of rows (dicts or a Rows of tuples) fetched with LIMIT limit + 1.
+
+    ``shape='columns'`` sends data as {column: [values]} instead of one object per row.
+    """
+    columns = getattr(rows, 'columns', None)
+    rows = list(rows or [])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(*key(rows[-1] if columns is None else dict(zip(columns, rows[-1]))))
+    if shape == 'columns':
+        data = column_arrays(rows, columns)
+    else:
+        data = rows if columns is None else row_dicts(rows, columns)
+    return {'success': True, 'data': data, 'next_cursor': next_cursor}
+
+def page_response(rows, limit, key):
+    """JSON response for one page of rows fetched with LIMIT limit + 1, in the requested ?shape="""
+    return jsonify(page_payload(rows, limit, key, request.args.get('shape', 'rows')))
+
+# ==================== RESPONSE VALIDATORS ====================
+
+# Tables read by each versioned list endpoint; a response's ETag changes when any of their versions does
+LIST_VERSION_TABLES = {
+    '/api/suppliers': ('suppliers', 'supplier_risk_current'),
+    '/api/products': ('products', 'suppliers'),
+    '/api/warehouses': ('warehouses',),
+    '/api/shipments': ('shipments', 'suppliers', 'products', 'warehouses'),
+    '/api/alerts': ('alerts',)
+}
+
+# Lists whose table versions are cached: their tables only change through routes that invalidate ref_cache
+CACHED_VERSION_RULES = ('/api/suppliers', '/api/products', '/api/warehouses')
+CACHED_VERSION_TABLES = {table for rule in CACHED_VERSION_RULES for table in LIST_VERSION_TABLES[rule]}
+
+TABLE_VERSIONS_QUERY = "SELECT table_name, version FROM table_versions WHERE table_name IN ({})"
+BUMP_TABLE_VERSIONS_QUERY = "UPDATE table_versions SET version = version + 1 WHERE table_name IN ({})"
+
+def table_versions_query(rule):
+    """(query, params) reading the versions behind ``rule``'s ETag"""
+    tables = LIST_VERSION_TABLES[rule]
+    return TABLE_VERSIONS_QUERY.format(', '.join(['%s'] * len(tables))), tables
+
+def list_etag(rule, args, rows):
+    """ETag for a list request from its TABLE_VERSIONS_QUERY rows, or None when they could not be read"""
+    if not rows:
+        return None
+    return version_etag(rule, args.items(multi=True), {row['table_name']: row['version'] for row in rows}, LIST_ETAG_TTL)
+
+def list_versions(rule):
+    """TABLE_VERSIONS_QUERY rows for ``rule``; the reference data lists keep theirs in ref_cache"""
+    query, params = table_versions_query(rule)
+    if rule in CACHED_VERSION_RULES:
+        return ref_cache.get('versions', rule, lambda: db_query(query, params, primary=True))
+    return db_query(query, params)
+
+def versioned(view):
+    """Answer a list request with 304 when the client's If-None-Match still matches its table versions.
+
+    The versions are read before the list, on the same connection, so a response is never tagged
+    with versions newer than its rows.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        rule = request.url_rule.rule
+        etag = list_etag(rule, request.args, list_versions(rule))
+        if etag is not None and request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if etag is None or response.status_code != 200:
+                return response
+        response.set_etag(etag, weak=True)
+        response.cache_control.no_cache = True
+        return response
+    return wrapper
+
+def bump_table_versions(*tables):
+    """Move the versions of ``tables`` on, invalidating the list ETags that cover them; call after the write commits"""
+    query = BUMP_TABLE_VERSIONS_QUERY.format(', '.join(['%s'] * len(tables)))
+    if has_app_context():
+        db_query(query, tables, fetch=False)
+    else:
+        try:
+            with db_pool.connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    timed_execute(cursor, query, tables)
+                    conn.commit()
+                finally:
+                    cursor.close()
+        except Error as e:
+            log.error("Failed to bump table versions %s: %s", ', '.join(tables), e)
+    if CACHED_VERSION_TABLES.intersection(tables):
+        ref_cache.invalidate('versions')
+
+def page_cache_key(limit, args=None):
+    """ref_cache key of one page of a list: the arguments that change its rows"""
+    args = request.args if args is None else args
+    return f"{limit}:{args.get('cursor', '')}"
+
+def cached_rows(rows):
+    """A Rows result as a cache entry (tuples and column names, which survive the shared tier's JSON)"""
+    return None if rows is None else {'columns': rows.columns, 'rows': list(rows)}
+
 # ==================== FRONTEND ROUTES ====================
 
 @app.route('/')
@@ -206,36 +733,51 @@ def health_check():
     return jsonify({
         'success': True,
         'status': 'ok',
-        'database': db_status
+        'database': db_status,
+        'pool': db_pool.stats(),
+        'read_replicas': replica_router.stats(),
+        'ref_cache': ref_cache.stats(),
+        'alert_pipeline': alert_pipeline.stats(),
+        'stream': stream_hub.stats()
     })
 
+@app.route('/api/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Request and query latency histograms in Prometheus text format"""
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
 # ==================== SUPPLIERS API ====================
 
+# Read statements below are module constants so the async server (asgi.py) runs the same SQL
+SUPPLIERS_QUERY = """
+    SELECT s.*, 
+           COALESCE(m.risk_score, 0) as risk_score,
+           COALESCE(m.risk_level, 'LOW') as risk_level
+    FROM suppliers s
+    LEFT JOIN supplier_risk_current m ON m.supplier_id = s.supplier_id
+    ORDER BY s.supplier_id
+"""
+SUPPLIERS_FALLBACK_QUERY = "SELECT s.*, 0 as risk_score, 'LOW' as risk_level FROM suppliers s ORDER BY s.supplier_id"
+SUPPLIER_QUERY = "SELECT * FROM suppliers WHERE supplier_id = %s"
+SUPPLIER_METRICS_QUERY = """
+    SELECT * FROM supplier_metrics
+    WHERE supplier_id = %s
+    ORDER BY record_date DESC
+    LIMIT 30
+"""
+
 @app.route('/api/suppliers', methods=['GET'])
+@versioned
 def get_suppliers():
     """Get all suppliers"""
     try:
         # First try the complex query with metrics
-        query = """
-            SELECT s.*, 
-                   COALESCE(m.risk_score, 0) as risk_score,
-                   COALESCE(m.risk_level, 'LOW') as risk_level
-            FROM suppliers s
-            LEFT JOIN supplier_metrics m ON s.supplier_id = m.supplier_id
-            AND m.record_date = (
-                SELECT MAX(record_date) 
-                FROM supplier_metrics 
-                WHERE supplier_id = s.supplier_id
-            )
-            ORDER BY s.supplier_id
-        """
-        result = db_query(query)
+        result = ref_cache.get('suppliers', 'all', lambda: db_query(SUPPLIERS_QUERY, primary=True))
         
         # If that fails, try a simpler query
         if result is None:
-            print("Complex query failed, trying simple query...")
-            query = "SELECT s.*, 0 as risk_score, 'LOW' as risk_level FROM suppliers s ORDER BY s.supplier_id"
-            result = db_query(query)
+            log.warning("Complex suppliers query failed, trying simple query")
+            result = db_query(SUPPLIERS_FALLBACK_QUERY)
         
         if result is not None:
             # Ensure result is a list
@@ -244,12 +786,10 @@ def get_suppliers():
             else:
                 return jsonify({'success': True, 'data': []})
         else:
-            print("Both queries failed")
+            log.error("Both suppliers queries failed")
             return jsonify({'success': False, 'error': 'Database query failed - unable to fetch suppliers'}), 500
     except Exception as e:
-        import traceback
-        print(f"Error in get_suppliers: {e}")
-        print(traceback.format_exc())
+        log.exception("Error in get_suppliers: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/suppliers', methods=['POST'])
@@ -268,14 +808,17 @@ def create_supplier():
     )
     result = db_query(query, params, fetch=False)
     if result is not None:
+        db_query(NEW_SUPPLIER_QUERY, fetch=False)
+        ref_cache.invalidate('suppliers')
+        bump_table_versions('suppliers')
+        invalidate_dashboard_metrics()
         return jsonify({'success': True, 'message': 'Supplier created successfully'})
     return jsonify({'success': False, 'error': 'Failed to create supplier'}), 500
 
 @app.route('/api/suppliers/<int:supplier_id>', methods=['GET'])
 def get_supplier(supplier_id):
     """Get a specific supplier"""
-    query = "SELECT * FROM suppliers WHERE supplier_id = %s"
-    result = db_query(query, (supplier_id,))
+    result = ref_cache.get('supplier', supplier_id, lambda: db_query(SUPPLIER_QUERY, (supplier_id,), primary=True) or None)
     if result and len(result) > 0:
         return jsonify({'success': True, 'data': result[0]})
     return jsonify({'success': False, 'error': 'Supplier not found'}), 404
@@ -298,6 +841,8 @@ def update_supplier(supplier_id):
     )
     result = db_query(query, params, fetch=False)
     if result is not None:
+        ref_cache.invalidate('supplier', 'suppliers', 'products')
+        bump_table_versions('suppliers')
         return jsonify({'success': True, 'message': 'Supplier updated successfully'})
     return jsonify({'success': False, 'error': 'Failed to update supplier'}), 500
 
@@ -307,46 +852,454 @@ def delete_supplier(supplier_id):
     query = "DELETE FROM suppliers WHERE supplier_id = %s"
     result = db_query(query, (supplier_id,), fetch=False)
     if result is not None:
+        ref_cache.invalidate('supplier', 'suppliers', 'products')
+        bump_table_versions('suppliers')
+        invalidate_dashboard_metrics()
         return jsonify({'success': True, 'message': 'Supplier deleted successfully'})
     return jsonify({'success': False, 'error': 'Failed to delete supplier'}), 500
 
 @app.route('/api/suppliers/<int:supplier_id>/metrics', methods=['GET'])
 def get_supplier_metrics(supplier_id):
     """Get supplier metrics"""
-    query = """
-        SELECT * FROM supplier_metrics
-        WHERE supplier_id = %s
-        ORDER BY record_date DESC
-        LIMIT 30
-    """
-    result = db_query(query, (supplier_id,))
+    result = db_query(SUPPLIER_METRICS_QUERY, (supplier_id,))
     if result is not None:
         return jsonify({'success': True, 'data': result})
     return jsonify({'success': False, 'error': 'Failed to fetch metrics'}), 500
 
 @app.route('/api/suppliers/<int:supplier_id>/compute-risk', methods=['POST'])
 def compute_supplier_risk(supplier_id):
-    """Compute supplier risk score"""
-    query = "CALL compute_supplier_risk(%s)"
-    result = db_query(query, (supplier_id,), fetch=False)
-    if result is not None:
-        return jsonify({'success': True, 'message': 'Risk score computed successfully'})
-    return jsonify({'success': False, 'error': 'Failed to compute risk score'}), 500
+    """Compute supplier risk score from the supplier's running counters"""
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'success': False, 'error': 'Failed to compute risk score'}), 500
+    cursor = conn.cursor(dictionary=True)
+    try:
+        risk_counters.age_suppliers(cursor, [supplier_id])
+        rows = score_suppliers(cursor, [supplier_id])
+        conn.commit()
+    except Error as e:
+        conn.rollback()
+        log.error("Risk computation for supplier %s failed: %s", supplier_id, e)
+        return jsonify({'success': False, 'error': 'Failed to compute risk score'}), 500
+    finally:
+        cursor.close()
+    if not rows:
+        return jsonify({'success': False, 'error': 'Supplier not found'}), 404
+    ref_cache.invalidate('suppliers')
+    bump_table_versions('supplier_risk_current')
+    return jsonify({'success': True, 'message': 'Risk score computed successfully'})
+
+# ==================== RISK ENGINE ====================
+
+# Risk inputs, score and level for every supplier in one grouped pass over the last
+# 90 days of shipments. Mirrors compute_supplier_risk, including the DECIMAL rounding
+# of each intermediate value, so both paths store identical metrics.
+SUPPLIER_RISK_QUERY = """
+    SELECT f.supplier_id, f.on_time_rate, f.avg_delay_days, f.defect_rate, f.risk_score,
+           CASE WHEN f.risk_score < 30 THEN 'LOW'
+                WHEN f.risk_score < 60 THEN 'MEDIUM'
+                ELSE 'HIGH' END AS risk_level
+    FROM (
+        SELECT r.*,
+               CAST(LEAST(100, GREATEST(0, 50*(1 - r.on_time_rate) + 30*(r.avg_delay_days/10) + 20*(r.defect_rate)))
+                    AS DECIMAL(10,2)) AS risk_score
+        FROM (
+            SELECT s.supplier_id,
+                   CAST(IF(COALESCE(agg.total_delivered, 0) > 0,
+                           (agg.total_delivered - agg.delayed_count) / agg.total_delivered,
+                           1) AS DECIMAL(6,4)) AS on_time_rate,
+                   CAST(COALESCE(agg.avg_delay, 0) AS DECIMAL(10,2)) AS avg_delay_days,
+                   CAST(IF(c.supplier_id IS NULL, 0, COALESCE(c.defect_rate, 0.02)) AS DECIMAL(6,4)) AS defect_rate
+            FROM suppliers s
+            LEFT JOIN (
+                SELECT supplier_id,
+                       SUM(status IN ('DELIVERED','DELAYED')) AS total_delivered,
+                       SUM(status = 'DELAYED' OR (actual_arrival_date IS NOT NULL AND actual_arrival_date > expected_arrival_date)) AS delayed_count,
+                       AVG(CASE WHEN status IN ('DELIVERED','DELAYED')
+                                THEN GREATEST(DATEDIFF(COALESCE(actual_arrival_date, CURDATE()), expected_arrival_date), 0) END) AS avg_delay
+                FROM shipments
+                WHERE ship_date >= CURDATE() - INTERVAL 90 DAY
+                GROUP BY supplier_id
+            ) agg ON agg.supplier_id = s.supplier_id
+            LEFT JOIN supplier_risk_current c ON c.supplier_id = s.supplier_id
+        ) r
+    ) f
+    ORDER BY f.supplier_id
+"""
+
+# Same inputs, rounding and formula as SUPPLIER_RISK_QUERY, read from the running counters in
+# supplier_risk_counters (plus the still-growing delays of supplier_open_delays) instead of shipments
+SUPPLIER_RISK_COUNTERS_QUERY = """
+    SELECT f.supplier_id, f.change_seq, f.on_time_rate, f.avg_delay_days, f.defect_rate, f.risk_score,
+           CASE WHEN f.risk_score < 30 THEN 'LOW'
+                WHEN f.risk_score < 60 THEN 'MEDIUM'
+                ELSE 'HIGH' END AS risk_level
+    FROM (
+        SELECT r.*,
+               CAST(LEAST(100, GREATEST(0, 50*(1 - r.on_time_rate) + 30*(r.avg_delay_days/10) + 20*(r.defect_rate)))
+                    AS DECIMAL(10,2)) AS risk_score
+        FROM (
+            SELECT s.supplier_id, COALESCE(k.change_seq, 0) AS change_seq,
+                   CAST(IF(COALESCE(k.delivered_count, 0) > 0,
+                           (k.delivered_count - k.delayed_count) / k.delivered_count,
+                           1) AS DECIMAL(6,4)) AS on_time_rate,
+                   CAST(IF(COALESCE(k.delivered_count, 0) > 0,
+                           (k.delay_day_sum + COALESCE(o.open_delay, 0)) / k.delivered_count,
+                           0) AS DECIMAL(10,2)) AS avg_delay_days,
+                   CAST(IF(c.supplier_id IS NULL, 0, COALESCE(c.defect_rate, 0.02)) AS DECIMAL(6,4)) AS defect_rate
+            FROM suppliers s
+            LEFT JOIN supplier_risk_counters k ON k.supplier_id = s.supplier_id
+            LEFT JOIN (
+                SELECT od.supplier_id, SUM(GREATEST(DATEDIFF(CURDATE(), od.expected_arrival_date), 0)) AS open_delay
+                FROM supplier_open_delays od
+                JOIN supplier_risk_counters w ON w.supplier_id = od.supplier_id AND od.ship_date >= w.window_start
+                WHERE od.supplier_id IN ({ids})
+                GROUP BY od.supplier_id
+            ) o ON o.supplier_id = s.supplier_id
+            LEFT JOIN supplier_risk_current c ON c.supplier_id = s.supplier_id
+            WHERE s.supplier_id IN ({ids})
+        ) r
+    ) f
+    ORDER BY f.supplier_id
+"""
+
+def store_supplier_risks(cursor, rows):
+    """Upsert supplier_metrics, supplier_risk_current and audit rows for scored suppliers (no commit)"""
+    metric_params = []
+    audit_params = []
+    for row in rows:
+        metric_params.extend((row['supplier_id'], row['on_time_rate'], row['avg_delay_days'],
+                              row['defect_rate'], row['risk_score'], row['risk_level']))
+        audit_params.extend((row['supplier_id'], f"score={row['risk_score']}, level={row['risk_level']}"))
+
+    timed_execute(cursor, f"""
+        INSERT INTO supplier_metrics(supplier_id, record_date, on_time_rate, avg_delay_days, defect_rate, risk_score, risk_level, notes)
+        VALUES {', '.join(["(%s, CURDATE(), %s, %s, %s, %s, %s, 'auto')"] * len(rows))}
+        ON DUPLICATE KEY UPDATE on_time_rate=VALUES(on_time_rate), avg_delay_days=VALUES(avg_delay_days),
+            defect_rate=VALUES(defect_rate), risk_score=VALUES(risk_score), risk_level=VALUES(risk_level), notes=VALUES(notes)
+    """, tuple(metric_params))
+    timed_execute(cursor, f"""
+        INSERT INTO supplier_risk_current(supplier_id, record_date, on_time_rate, avg_delay_days, defect_rate, risk_score, risk_level)
+        VALUES {', '.join(["(%s, CURDATE(), %s, %s, %s, %s, %s)"] * len(rows))}
+        ON DUPLICATE KEY UPDATE record_date=VALUES(record_date), on_time_rate=VALUES(on_time_rate), avg_delay_days=VALUES(avg_delay_days),
+            defect_rate=VALUES(defect_rate), risk_score=VALUES(risk_score), risk_level=VALUES(risk_level)
+    """, tuple(metric_params))
+    timed_execute(cursor, f"""
+        INSERT INTO audit_logs(occurred_at, action, entity_type, entity_id, details)
+        VALUES {', '.join(["(NOW(), 'COMPUTE_SUPPLIER_RISK', 'SUPPLIER', %s, %s)"] * len(rows))}
+    """, tuple(audit_params))
+
+def score_suppliers(cursor, supplier_ids):
+    """Score ``supplier_ids`` from their counters, store the results and clear their dirty flags (no commit)"""
+    if not supplier_ids:
+        return []
+    ids = ', '.join(['%s'] * len(supplier_ids))
+    timed_execute(cursor, SUPPLIER_RISK_COUNTERS_QUERY.format(ids=ids), (*supplier_ids, *supplier_ids))
+    rows = cursor.fetchall()
+    if rows:
+        store_supplier_risks(cursor, rows)
+        risk_counters.clear_dirty(cursor, {row['supplier_id']: row['change_seq'] for row in rows})
+    return rows
+
+def risk_summary(rows, started, **extra):
+    levels = Counter(row['risk_level'] for row in rows)
+    return {
+        'suppliers': len(rows),
+        **extra,
+        'levels': {level: levels.get(level, 0) for level in ('LOW', 'MEDIUM', 'HIGH')},
+        'elapsed_ms': round((time.monotonic() - started) * 1000, 1)
+    }
+
+def recompute_all_supplier_risks():
+    """Rebuild the risk counters from shipments, then score every supplier in one aggregation"""
+    conn = get_db_connection()
+    if not conn:
+        raise Error(msg='No database connection available')
+
+    started = time.monotonic()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        risk_counters.rebuild(cursor, dirty=False)
+        conn.commit()
+
+        timed_execute(cursor, SUPPLIER_RISK_QUERY)
+        rows = cursor.fetchall()
+
+        # Commit per chunk; supplier_risk_current is written alongside supplier_metrics so a large run never holds locks on every supplier at once
+        for start in range(0, len(rows), RISK_BATCH_SIZE):
+            store_supplier_risks(cursor, rows[start:start + RISK_BATCH_SIZE])
+            conn.commit()
+
+        timed_execute(cursor, """
+            INSERT INTO audit_logs(occurred_at, action, entity_type, entity_id, details)
+            VALUES (NOW(), 'DAILY_RISK_UPDATE', 'SYSTEM', 0, 'completed')
+        """)
+        conn.commit()
+    except Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    ref_cache.invalidate('suppliers')
+    bump_table_versions('supplier_risk_current')
+    return risk_summary(rows, started)
+
+def recompute_dirty_supplier_risks():
+    """Age the counters out of the 90-day window and rescore only the suppliers marked dirty"""
+    conn = get_db_connection()
+    if not conn:
+        raise Error(msg='No database connection available')
+
+    started = time.monotonic()
+    cursor = conn.cursor(dictionary=True)
+    scored = []
+    aged = 0
+    try:
+        while True:
+            processed, changed = risk_counters.age_batch(cursor)
+            conn.commit()
+            if not processed:
+                break
+            aged += changed
+        overdue = risk_counters.mark_overdue(cursor)
+        conn.commit()
+
+        after_id = 0
+        while True:
+            versions = risk_counters.dirty_batch(cursor, after_id)
+            if not versions:
+                break
+            after_id = max(versions)
+            scored.extend(score_suppliers(cursor, sorted(versions)))
+            conn.commit()
+
+        timed_execute(cursor, """
+            INSERT INTO audit_logs(occurred_at, action, entity_type, entity_id, details)
+            VALUES (NOW(), 'DAILY_RISK_UPDATE', 'SYSTEM', 0, %s)
+        """, (f'incremental: {len(scored)} suppliers',))
+        conn.commit()
+    except Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    if scored:
+        ref_cache.invalidate('suppliers')
+        bump_table_versions('supplier_risk_current')
+    return risk_summary(scored, started, aged_out=aged, overdue=overdue)
+
+# Maintains the counters read by SUPPLIER_RISK_COUNTERS_QUERY; shipment writes apply their deltas through it
+risk_counters = RiskCounters(execute=timed_execute, batch_size=RISK_BATCH_SIZE)
+
+@app.route('/api/risk/recompute-all', methods=['POST'])
+def recompute_all_risks():
+    """Rebuild the risk counters and recompute risk scores for every supplier in one batch"""
+    try:
+        summary = recompute_all_supplier_risks()
+        return jsonify({
+            'success': True,
+            'message': f"Risk scores recomputed for {summary['suppliers']} suppliers",
+            'data': summary
+        })
+    except Error as e:
+        log.error("Batch risk recompute failed: %s", e)
+        return jsonify({'success': False, 'error': 'Failed to recompute risk scores'}), 500
+
+@app.route('/api/risk/recompute-dirty', methods=['POST'])
+def recompute_dirty_risks():
+    """Recompute risk scores for the suppliers whose shipments changed since the last run"""
+    try:
+        summary = recompute_dirty_supplier_risks()
+        return jsonify({
+            'success': True,
+            'message': f"Risk scores recomputed for {summary['suppliers']} changed suppliers",
+            'data': summary
+        })
+    except Error as e:
+        log.error("Incremental risk recompute failed: %s", e)
+        return jsonify({'success': False, 'error': 'Failed to recompute risk scores'}), 500
+
+@app.cli.command('recompute-risk')
+@click.option('--full', is_flag=True, help='rebuild the counters from shipments and rescore every supplier')
+def recompute_risk_command(full):
+    """Nightly job: rescore suppliers whose counters changed (flask --app app recompute-risk [--full])"""
+    if full:
+        summary = recompute_all_supplier_risks()
+        print(f"✓ Recomputed risk for {summary['suppliers']} suppliers in {summary['elapsed_ms']} ms: {summary['levels']}")
+    else:
+        summary = recompute_dirty_supplier_risks()
+        print(f"✓ Recomputed risk for {summary['suppliers']} changed suppliers in {summary['elapsed_ms']} ms "
+              f"({summary['aged_out']} aged out, {summary['overdue']} overdue): {summary['levels']}")
+
+# Latest stored risk inputs per supplier, as NumPy arrays for the simulator
+RISK_FEATURES_QUERY = """
+    SELECT s.supplier_id, c.on_time_rate, c.avg_delay_days, c.defect_rate
+    FROM suppliers s
+    LEFT JOIN supplier_risk_current c ON c.supplier_id = s.supplier_id
+    ORDER BY s.supplier_id
+"""
+
+_risk_features = {'loaded_at': 0.0, 'features': None}
+_risk_features_lock = threading.Lock()
+
+def get_risk_features():
+    """Supplier feature arrays, reloaded at most every RISK_FEATURE_TTL seconds"""
+    with _risk_features_lock:
+        if _risk_features['features'] is not None and time.monotonic() - _risk_features['loaded_at'] < RISK_FEATURE_TTL:
+            return _risk_features['features']
+        rows = db_query(RISK_FEATURES_QUERY)
+        if rows is None:
+            return None
+        _risk_features['features'] = risk_scoring.features_from_rows(rows)
+        _risk_features['loaded_at'] = time.monotonic()
+        return _risk_features['features']
+
+def parse_number_overrides(data, key, allowed):
+    """Read a {name: number} override dict from the request body"""
+    overrides = data.get(key) or {}
+    if not isinstance(overrides, dict):
+        raise ValueError(f'{key} must be an object')
+    unknown = set(overrides) - set(allowed)
+    if unknown:
+        raise ValueError(f"Unknown {key}: {', '.join(sorted(unknown))}")
+    try:
+        return {name: float(value) for name, value in overrides.items()}
+    except (TypeError, ValueError):
+        raise ValueError(f'{key} values must be numbers')
+
+@app.route('/api/risk/simulate', methods=['POST'])
+def simulate_risk():
+    """What-if scoring of all suppliers with alternative weights and thresholds (read-only)"""
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': 'Request body must be a JSON object'}), 400
+    try:
+        weights = parse_number_overrides(data, 'weights', risk_scoring.DEFAULT_WEIGHTS)
+        thresholds = parse_number_overrides(data, 'thresholds', risk_scoring.DEFAULT_THRESHOLDS)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    try:
+        limit = int(data.get('limit', 100))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'limit must be an integer'}), 400
+    merged = {**risk_scoring.DEFAULT_THRESHOLDS, **thresholds}
+    if merged['medium'] > merged['high']:
+        return jsonify({'success': False, 'error': 'medium threshold must not exceed high threshold'}), 400
+
+    features = get_risk_features()
+    if features is None:
+        return jsonify({'success': False, 'error': 'Database query failed'}), 500
+
+    started = time.monotonic()
+    result = risk_scoring.simulate(features, weights, thresholds, limit=max(0, limit))
+    result['elapsed_ms'] = round((time.monotonic() - started) * 1000, 2)
+    return jsonify({'success': True, 'data': result})
+
+exposure_graph = ExposureGraph(execute=timed_execute, batch_size=RISK_BATCH_SIZE, demand_days=EXPOSURE_DEMAND_DAYS)
+_exposure_state = {'built_at': 0.0, 'refreshed_at': 0.0}
+_exposure_lock = threading.Lock()
+
+def with_exposure_graph(compute):
+    """Run ``compute(graph)`` on the supplier impact graph, first rebuilding it every EXPOSURE_REBUILD_INTERVAL
+    seconds or applying recent changes every EXPOSURE_REFRESH_INTERVAL seconds; None if the database is unavailable"""
+    with _exposure_lock:
+        now = time.monotonic()
+        rebuild = exposure_graph.watermark is None or now - _exposure_state['built_at'] >= EXPOSURE_REBUILD_INTERVAL
+        if rebuild or now - _exposure_state['refreshed_at'] >= EXPOSURE_REFRESH_INTERVAL:
+            conn = get_db_connection()
+            if not conn:
+                return None
+            cursor = conn.cursor(dictionary=True)
+            try:
+                if rebuild:
+                    exposure_graph.load(cursor)
+                    _exposure_state['built_at'] = now
+                else:
+                    exposure_graph.refresh(cursor)
+                _exposure_state['refreshed_at'] = now
+                conn.rollback()  # read-only; end the snapshot so the next refresh sees new commits
+            except Error as e:
+                log.error("Exposure graph refresh failed: %s", e)
+                return None
+            finally:
+                cursor.close()
+        return compute(exposure_graph)
+
+def get_impact_args():
+    """Read ?horizon= (days, default unlimited) and ?limit= for the impact endpoints"""
+    try:
+        horizon = float(request.args['horizon']) if request.args.get('horizon') else None
+        limit = int(request.args.get('limit', DEFAULT_PAGE_LIMIT))
+    except ValueError:
+        raise ValueError('horizon must be a number and limit an integer')
+    if horizon is not None and horizon < 0:
+        raise ValueError('horizon must not be negative')
+    return horizon, max(0, min(limit, MAX_PAGE_LIMIT))
+
+@app.route('/api/risk/impact/<int:supplier_id>', methods=['GET'])
+def get_supplier_impact(supplier_id):
+    """Products and warehouses that drop below safety stock, and in how many days, if a supplier fails"""
+    try:
+        horizon, limit = get_impact_args()
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    started = time.monotonic()
+    result = with_exposure_graph(lambda graph: graph.impact(supplier_id, horizon=horizon, limit=limit) or {})
+    if result is None:
+        return jsonify({'success': False, 'error': 'Database query failed'}), 500
+    if not result:
+        return jsonify({'success': False, 'error': 'Supplier not found'}), 404
+    result['elapsed_ms'] = round((time.monotonic() - started) * 1000, 2)
+    return jsonify({'success': True, 'data': result})
+
+@app.route('/api/risk/impact', methods=['GET'])
+def get_impact_sweep():
+    """What-if sweep: the impact of each supplier failing on its own, worst first"""
+    try:
+        horizon, limit = get_impact_args()
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    started = time.monotonic()
+    result = with_exposure_graph(lambda graph: graph.sweep(horizon=horizon, limit=limit))
+    if result is None:
+        return jsonify({'success': False, 'error': 'Database query failed'}), 500
+    result['elapsed_ms'] = round((time.monotonic() - started) * 1000, 2)
+    return jsonify({'success': True, 'data': result})
 
 # ==================== PRODUCTS API ====================
 
-@app.route('/api/products', methods=['GET'])
-def get_products():
-    """Get all products"""
-    query = """
+def products_page_query(args=None):
+    """(query, params, limit, cursor key) for one page of products; ValueError on bad paging args"""
+    limit, after = get_page_args(1, args)
+    where_sql = "WHERE p.product_id > %s" if after else ""
+    params = list(after or []) + [limit + 1]
+    query = f"""
         SELECT p.*, s.name as supplier_name
         FROM products p
         JOIN suppliers s ON p.supplier_id = s.supplier_id
+        {where_sql}
         ORDER BY p.product_id
+        LIMIT %s
     """
-    result = db_query(query)
-    if result is not None:
-        return jsonify({'success': True, 'data': result})
+    return query, tuple(params), limit, lambda row: (row['product_id'],)
+
+@app.route('/api/products', methods=['GET'])
+@versioned
+def get_products():
+    """Get a page of products ordered by product_id"""
+    try:
+        query, params, limit, key = products_page_query()
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    cached = ref_cache.get('products', page_cache_key(limit),
+                           lambda: cached_rows(db_query(query, params, tuples=True, primary=True)))
+    if cached is not None:
+        return page_response(Rows(cached['columns'], cached['rows']), limit, key)
     return jsonify({'success': False, 'error': 'Database query failed'}), 500
 
 @app.route('/api/products', methods=['POST'])
@@ -367,60 +1320,92 @@ def create_product():
     )
     result = db_query(query, params, fetch=False)
     if result is not None:
+        ref_cache.invalidate('products')
+        bump_table_versions('products')
         return jsonify({'success': True, 'message': 'Product created successfully'})
     return jsonify({'success': False, 'error': 'Failed to create product'}), 500
 
 # ==================== SHIPMENTS API ====================
 
+# Fallback row shape without the delay calculation
+SHIPMENTS_FALLBACK_SELECT = """
+    SELECT sh.*, 
+           s.name as supplier_name,
+           p.name as product_name,
+           w.name as warehouse_name,
+           0 as delay_days
+    FROM shipments sh
+    JOIN suppliers s ON sh.supplier_id = s.supplier_id
+    JOIN products p ON sh.product_id = p.product_id
+    JOIN warehouses w ON sh.warehouse_id = w.warehouse_id
+"""
+SHIPMENT_EVENTS_QUERY = """
+    SELECT * FROM shipment_events
+    WHERE shipment_id = %s
+    ORDER BY event_time DESC
+"""
+SHIPMENT_EVENTS_ARCHIVED_QUERY = """
+    SELECT * FROM shipment_events WHERE shipment_id = %s
+    UNION ALL
+    SELECT * FROM shipment_events_archive WHERE shipment_id = %s
+    ORDER BY event_time DESC
+"""
+
+def shipment_events_query(shipment_id, args=None):
+    """(query, params) for a shipment's events, with the archived ones on ?include_archived=true"""
+    if include_archived(args):
+        return SHIPMENT_EVENTS_ARCHIVED_QUERY, (shipment_id, shipment_id)
+    return SHIPMENT_EVENTS_QUERY, (shipment_id,)
+
+def shipments_page_query(args=None, select=SHIPMENTS_SELECT):
+    """(query, params, limit, cursor key) for one page of shipments; ValueError on bad paging args"""
+    limit, after = get_page_args(2, args)
+    conditions, params = list_filters('shipments', args)
+    where, key_params = keyset_after('sh.ship_date', 'sh.shipment_id', after)
+    if where:
+        conditions.append(where)
+        params.extend(key_params)
+    query = f"""
+        {select}
+        {where_clause(conditions)}
+        ORDER BY sh.ship_date DESC, sh.shipment_id DESC
+        LIMIT %s
+    """
+    params = tuple(params + [limit + 1])
+    if include_archived(args):
+        query, params = archived_page(query, params, 'shipments', 'ship_date DESC, shipment_id DESC')
+    return query, params, limit, lambda row: (row['ship_date'], row['shipment_id'])
+
 @app.route('/api/shipments', methods=['GET'])
+@versioned
 def get_shipments():
-    """Get all shipments"""
+    """Get a page of shipments, newest ship_date first"""
+    try:
+        query, params, limit, key = shipments_page_query()
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
     try:
         # Try the full query with joins first
-        query = """
-            SELECT sh.*, 
-                   s.name as supplier_name,
-                   p.name as product_name,
-                   w.name as warehouse_name,
-                   GREATEST(DATEDIFF(COALESCE(sh.actual_arrival_date, CURDATE()), sh.expected_arrival_date), 0) as delay_days
-            FROM shipments sh
-            JOIN suppliers s ON sh.supplier_id = s.supplier_id
-            JOIN products p ON sh.product_id = p.product_id
-            JOIN warehouses w ON sh.warehouse_id = w.warehouse_id
-            ORDER BY sh.ship_date DESC
-        """
-        result = db_query(query)
+        result = db_query(query, params, tuples=True)
         
         # If that fails, try a simpler query without delay calculation
         if result is None:
-            print("Complex shipments query failed, trying simple query...")
-            query = """
-                SELECT sh.*, 
-                       s.name as supplier_name,
-                       p.name as product_name,
-                       w.name as warehouse_name,
-                       0 as delay_days
-                FROM shipments sh
-                JOIN suppliers s ON sh.supplier_id = s.supplier_id
-                JOIN products p ON sh.product_id = p.product_id
-                JOIN warehouses w ON sh.warehouse_id = w.warehouse_id
-                ORDER BY sh.ship_date DESC
-            """
-            result = db_query(query)
+            log.warning("Complex shipments query failed, trying simple query")
+            query, params, limit, key = shipments_page_query(select=SHIPMENTS_FALLBACK_SELECT)
+            result = db_query(query, params, tuples=True)
         
         if result is not None:
             # Ensure result is a list
             if isinstance(result, list):
-                return jsonify({'success': True, 'data': result})
+                return page_response(result, limit, key)
             else:
-                return jsonify({'success': True, 'data': []})
+                return jsonify({'success': True, 'data': [], 'next_cursor': None})
         else:
-            print("Both shipments queries failed")
+            log.error("Both shipments queries failed")
             return jsonify({'success': False, 'error': 'Database query failed - unable to fetch shipments'}), 500
     except Exception as e:
-        import traceback
-        print(f"Error in get_shipments: {e}")
-        traceback.print_exc()
+        log.exception("Error in get_shipments: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/shipments', methods=['POST'])
@@ -441,16 +1426,31 @@ def create_shipment():
         data.get('expected_arrival_date'),
         data.get('status', 'CREATED')
     )
-    result = db_query(query, params, fetch=False)
-    if result is not None:
-        # Create shipment event
-        event_query = """
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'success': False, 'error': 'Failed to create shipment'}), 500
+    # The shipment, its CREATED event and its risk counter and rollup deltas commit together
+    cursor = conn.cursor(dictionary=True)
+    try:
+        timed_execute(cursor, query, params)
+        shipment_id = cursor.lastrowid
+        timed_execute(cursor, """
             INSERT INTO shipment_events (shipment_id, event_time, event_type, details)
-            VALUES (LAST_INSERT_ID(), NOW(), 'CREATED', 'created')
-        """
-        db_query(event_query, fetch=False)
-        return jsonify({'success': True, 'message': 'Shipment created successfully'})
-    return jsonify({'success': False, 'error': 'Failed to create shipment'}), 500
+            VALUES (%s, NOW(), 'CREATED', 'created')
+        """, (shipment_id,))
+        after = risk_counters.fetch_shipments(cursor, [shipment_id])
+        risk_counters.apply_changes(cursor, [], after)
+        rollups.apply_shipment_changes(cursor, [], after)
+        conn.commit()
+    except Error as e:
+        conn.rollback()
+        log.error("Failed to create shipment: %s", e)
+        return jsonify({'success': False, 'error': 'Failed to create shipment'}), 500
+    finally:
+        cursor.close()
+    bump_table_versions('shipments')
+    invalidate_dashboard_metrics()
+    return jsonify({'success': True, 'message': 'Shipment created successfully'})
 
 @app.route('/api/shipments/<int:shipment_id>', methods=['PUT'])
 def update_shipment(shipment_id):
@@ -473,54 +1473,159 @@ def update_shipment(shipment_id):
         data.get('status'),
         shipment_id
     )
-    result = db_query(query, params, fetch=False)
-    if result is not None:
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'success': False, 'error': 'Failed to update shipment'}), 500
+    cursor = conn.cursor(dictionary=True)
+    try:
+        # Lock the stored row so the counters move from exactly what it was to what it becomes
+        before = risk_counters.fetch_shipments(cursor, [shipment_id], lock=True)
+        timed_execute(cursor, query, params)
         # Create event if status changed
         if 'status' in data:
-            event_query = """
+            timed_execute(cursor, """
                 INSERT INTO shipment_events (shipment_id, event_time, event_type, details)
                 VALUES (%s, NOW(), %s, %s)
-            """
-            db_query(event_query, (shipment_id, data.get('status'), 'status updated'), fetch=False)
-        return jsonify({'success': True, 'message': 'Shipment updated successfully'})
-    return jsonify({'success': False, 'error': 'Failed to update shipment'}), 500
+            """, (shipment_id, data.get('status'), 'status updated'))
+        after = risk_counters.fetch_shipments(cursor, [shipment_id])
+        risk_counters.apply_changes(cursor, before, after)
+        rollups.apply_shipment_changes(cursor, before, after)
+        conn.commit()
+    except Error as e:
+        conn.rollback()
+        log.error("Failed to update shipment %s: %s", shipment_id, e)
+        return jsonify({'success': False, 'error': 'Failed to update shipment'}), 500
+    finally:
+        cursor.close()
+    alert_pipeline.publish('shipment', shipment_id)
+    bump_table_versions('shipments')
+    invalidate_dashboard_metrics()
+    return jsonify({'success': True, 'message': 'Shipment updated successfully'})
 
 @app.route('/api/shipments/<int:shipment_id>/events', methods=['GET'])
 def get_shipment_events(shipment_id):
     """Get events for a shipment"""
-    query = """
-        SELECT * FROM shipment_events
-        WHERE shipment_id = %s
-        ORDER BY event_time DESC
-    """
-    result = db_query(query, (shipment_id,))
+    result = db_query(*shipment_events_query(shipment_id))
     if result is not None:
         return jsonify({'success': True, 'data': result})
     return jsonify({'success': False, 'error': 'Failed to fetch events'}), 500
 
+SHIPMENT_ETA_QUERY = """
+    SELECT sh.shipment_id, sh.status, sh.expected_arrival_date, e.predicted_arrival_date,
+           e.predicted_delay_days, e.delay_probability, e.model_version, e.scored_at
+    FROM shipments sh
+    LEFT JOIN shipment_eta e ON e.shipment_id = sh.shipment_id
+    WHERE sh.shipment_id = %s
+"""
+
+@app.route('/api/shipments/<int:shipment_id>/eta', methods=['GET'])
+def get_shipment_eta(shipment_id):
+    """Predicted arrival and delay probability of a shipment (from the last scoring run)"""
+    result = db_query(SHIPMENT_ETA_QUERY, (shipment_id,))
+    if result is None:
+        return jsonify({'success': False, 'error': 'Database query failed'}), 500
+    if not result:
+        return jsonify({'success': False, 'error': 'Shipment not found'}), 404
+    return jsonify({'success': True, 'data': result[0]})
+
+def train_eta_model(days=ETA_TRAINING_DAYS):
+    """Train the ETA model on the last ``days`` days of deliveries and save it to ETA_MODEL_DIR"""
+    with db_pool.connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            model = train_model(cursor, date.today() - timedelta(days=days), execute=timed_execute)
+        finally:
+            cursor.close()
+    model.save(ETA_MODEL_DIR)
+    return model
+
+def score_in_transit_shipments():
+    """Re-score every IN_TRANSIT shipment with the saved ETA model and raise alerts for newly likely delays.
+    Raises LookupError when no model has been trained."""
+    model = EtaModel.load(ETA_MODEL_DIR)
+    if model is None:
+        raise LookupError('No ETA model trained yet (flask --app app train-eta)')
+    scorer = EtaScorer(model, execute=timed_execute, read_batch_size=ETA_SCORE_BATCH_SIZE,
+                       alert_probability=ETA_ALERT_PROBABILITY)
+
+    started = time.monotonic()
+    with db_pool.connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            summary, crossed = scorer.score(cursor, commit=conn.commit)
+            scorer.prune(cursor, summary['scored_at'])
+            conn.commit()
+        except Error:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+    scored_ms = round((time.monotonic() - started) * 1000, 1)
+    alert_pipeline.evaluate('shipment', crossed)
+    return {**summary, 'model_version': model.version, 'alerts_evaluated': len(crossed), 'scored_ms': scored_ms,
+            'elapsed_ms': round((time.monotonic() - started) * 1000, 1)}
+
+@app.route('/api/shipments/eta/score', methods=['POST'])
+def score_shipment_etas():
+    """Re-score all in-transit shipments with the current ETA model"""
+    try:
+        summary = score_in_transit_shipments()
+    except LookupError as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
+    except Error as e:
+        log.error("ETA scoring failed: %s", e)
+        return jsonify({'success': False, 'error': 'Failed to score shipments'}), 500
+    return jsonify({'success': True, 'message': f"Scored {summary['scored']} in-transit shipments", 'data': summary})
+
+@app.cli.command('train-eta')
+@click.option('--days', type=int, default=ETA_TRAINING_DAYS, show_default=True, help='train on deliveries of this many days')
+def train_eta_command(days):
+    """Offline job: fit the per-lane ETA model and save it to ETA_MODEL_DIR (flask --app app train-eta)"""
+    model = train_eta_model(days)
+    print(f"✓ Trained ETA model {model.version} on {model.meta['shipments']:,} deliveries "
+          f"over {model.meta['lanes']:,} lanes -> {ETA_MODEL_DIR}")
+
+@app.cli.command('score-eta')
+def score_eta_command():
+    """Periodic job: re-score in-transit shipments (flask --app app score-eta)"""
+    try:
+        summary = score_in_transit_shipments()
+    except LookupError as e:
+        raise click.ClickException(str(e))
+    print(f"✓ Scored {summary['scored']:,} in-transit shipments in {summary['scored_ms']} ms with model "
+          f"{summary['model_version']}: {summary['likely_delayed']:,} likely delayed, "
+          f"{summary['alerts_evaluated']:,} newly evaluated for alerts")
+
 # ==================== INVENTORY API ====================
 
+def inventory_page_query(args=None):
+    """(query, params, limit, cursor key) for one page of inventory; ValueError on bad paging args"""
+    limit, after = get_page_args(2, args)
+    conditions, params = list_filters('inventory', args)
+    where, key_params = keyset_after('i.last_updated', 'i.inventory_id', after)
+    if where:
+        conditions.append(where)
+        params.extend(key_params)
+    params.append(limit + 1)
+    query = f"""
+        {INVENTORY_SELECT}
+        {where_clause(conditions)}
+        ORDER BY i.last_updated DESC, i.inventory_id DESC
+        LIMIT %s
+    """
+    return query, tuple(params), limit, lambda row: (row['last_updated'], row['inventory_id'])
+
 @app.route('/api/inventory', methods=['GET'])
 def get_inventory():
-    """Get all inventory"""
-    query = """
-        SELECT i.*, 
-               p.name as product_name,
-               p.sku,
-               w.name as warehouse_name,
-               CASE 
-                   WHEN i.quantity < i.safety_stock THEN 'CRITICAL'
-                   WHEN i.quantity < i.reorder_threshold THEN 'LOW'
-                   ELSE 'OK'
-               END as status
-        FROM inventory i
-        JOIN products p ON i.product_id = p.product_id
-        JOIN warehouses w ON i.warehouse_id = w.warehouse_id
-        ORDER BY i.last_updated DESC
-    """
-    result = db_query(query)
+    """Get a page of inventory, most recently updated first"""
+    try:
+        query, params, limit, key = inventory_page_query()
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    result = db_query(query, params, tuples=True)
     if result is not None:
-        return jsonify({'success': True, 'data': result})
+        return page_response(result, limit, key)
     return jsonify({'success': False, 'error': 'Database query failed'}), 500
 
 @app.route('/api/inventory', methods=['POST'])
@@ -543,10 +1648,28 @@ def create_inventory():
         data.get('reorder_threshold'),
         data.get('safety_stock')
     )
-    result = db_query(query, params, fetch=False)
-    if result is not None:
-        return jsonify({'success': True, 'message': 'Inventory updated successfully'})
-    return jsonify({'success': False, 'error': 'Failed to update inventory'}), 500
+    try:
+        position = (int(data['product_id']), int(data['warehouse_id']))
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'product_id and warehouse_id must be integers'}), 400
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'success': False, 'error': 'Failed to update inventory'}), 500
+    cursor = conn.cursor(dictionary=True)
+    try:
+        before = rollups.fetch_stock(cursor, positions=[position], lock=True)
+        timed_execute(cursor, query, params)
+        rollups.apply_inventory_changes(cursor, before, rollups.fetch_stock(cursor, positions=[position]))
+        conn.commit()
+    except Error as e:
+        conn.rollback()
+        log.error("Failed to update inventory: %s", e)
+        return jsonify({'success': False, 'error': 'Failed to update inventory'}), 500
+    finally:
+        cursor.close()
+    alert_pipeline.publish('inventory_key', position)
+    invalidate_dashboard_metrics()
+    return jsonify({'success': True, 'message': 'Inventory updated successfully'})
 
 @app.route('/api/inventory/<int:inventory_id>', methods=['PUT'])
 def update_inventory(inventory_id):
@@ -563,216 +1686,1218 @@ def update_inventory(inventory_id):
         data.get('safety_stock'),
         inventory_id
     )
-    result = db_query(query, params, fetch=False)
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'success': False, 'error': 'Failed to update inventory'}), 500
+    cursor = conn.cursor(dictionary=True)
+    try:
+        before = rollups.fetch_stock(cursor, inventory_ids=[inventory_id], lock=True)
+        timed_execute(cursor, query, params)
+        rollups.apply_inventory_changes(cursor, before, rollups.fetch_stock(cursor, inventory_ids=[inventory_id]))
+        conn.commit()
+    except Error as e:
+        conn.rollback()
+        log.error("Failed to update inventory %s: %s", inventory_id, e)
+        return jsonify({'success': False, 'error': 'Failed to update inventory'}), 500
+    finally:
+        cursor.close()
+    alert_pipeline.publish('inventory', inventory_id)
+    invalidate_dashboard_metrics()
+    return jsonify({'success': True, 'message': 'Inventory updated successfully'})
+
+# Projects days-to-stockout and reorder quantities into inventory_forecast; run by refresh-forecast
+stockout_forecaster = StockoutForecaster(execute=timed_execute, history_days=FORECAST_HISTORY_DAYS,
+                                         review_days=FORECAST_REVIEW_DAYS)
+
+FORECAST_SELECT = """
+    SELECT f.*, p.name AS product_name, p.sku, w.name AS warehouse_name
+    FROM inventory_forecast f
+    JOIN products p ON p.product_id = f.product_id
+    JOIN warehouses w ON w.warehouse_id = f.warehouse_id
+"""
+
+def forecast_page_query(args=None):
+    """(query, params, limit, cursor key) for one page of projected stockouts, soonest first"""
+    args = request.args if args is None else args
+    limit, after = get_page_args(2, args)
+    conditions, params = list_filters('forecast', args)
+    conditions.append('f.days_to_stockout IS NOT NULL')
+    if args.get('within'):
+        try:
+            conditions.append('f.days_to_stockout <= %s')
+            params.append(float(args['within']))
+        except ValueError:
+            raise ValueError('within must be a number of days')
+    if args.get('reorder', '').lower() == 'true':
+        conditions.append('f.reorder_quantity > 0')
+    if after is not None:
+        conditions.append('(f.days_to_stockout > %s OR (f.days_to_stockout = %s AND f.inventory_id > %s))')
+        params.extend([after[0], after[0], after[1]])
+    params.append(limit + 1)
+    query = f"""
+        {FORECAST_SELECT}
+        {where_clause(conditions)}
+        ORDER BY f.days_to_stockout, f.inventory_id
+        LIMIT %s
+    """
+    return query, tuple(params), limit, lambda row: (float(row['days_to_stockout']), row['inventory_id'])
+
+@app.route('/api/inventory/forecast', methods=['GET'])
+def get_inventory_forecast():
+    """Get a page of projected stockouts with reorder quantities (?within=days, ?reorder=true)"""
+    try:
+        query, params, limit, key = forecast_page_query()
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    result = db_query(query, params, tuples=True)
     if result is not None:
-        return jsonify({'success': True, 'message': 'Inventory updated successfully'})
-    return jsonify({'success': False, 'error': 'Failed to update inventory'}), 500
+        return page_response(result, limit, key)
+    return jsonify({'success': False, 'error': 'Database query failed'}), 500
+
+def refresh_inventory_forecast():
+    """Record today's stock, re-project every position and rewrite inventory_forecast"""
+    conn = get_db_connection()
+    if not conn:
+        raise Error(msg='No database connection available')
+
+    started = time.monotonic()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        stockout_forecaster.snapshot_history(cursor)
+        conn.commit()
+        forecast = stockout_forecaster.compute(cursor)
+        computed_ms = round((time.monotonic() - started) * 1000, 1)
+
+        # Commit every few batches so a large run never holds locks on the whole table
+        step = stockout_forecaster.batch_size * 10
+        for start in range(0, len(forecast['inventory_id']), step):
+            stockout_forecaster.write(cursor, forecast, start, start + step)
+            conn.commit()
+        stockout_forecaster.prune(cursor, forecast)
+        conn.commit()
+    except Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    return {
+        **forecast_summary(forecast),
+        'computed_ms': computed_ms,
+        'elapsed_ms': round((time.monotonic() - started) * 1000, 1)
+    }
+
+@app.route('/api/inventory/forecast/refresh', methods=['POST'])
+def refresh_forecast():
+    """Recompute the stockout forecast of every position"""
+    try:
+        summary = refresh_inventory_forecast()
+        return jsonify({'success': True, 'message': f"Forecast refreshed for {summary['positions']} positions", 'data': summary})
+    except Error as e:
+        log.error("Forecast refresh failed: %s", e)
+        return jsonify({'success': False, 'error': 'Failed to refresh forecast'}), 500
+
+@app.cli.command('refresh-forecast')
+def refresh_forecast_command():
+    """Periodic job: snapshot stock and re-project stockouts (flask --app app refresh-forecast)"""
+    summary = refresh_inventory_forecast()
+    print(f"✓ Forecast {summary['positions']} positions in {summary['elapsed_ms']} ms "
+          f"(projection {summary['computed_ms']} ms): {summary['projected_stockouts']} projected stockouts, "
+          f"{summary['reorder_now']} to reorder now")
+
+# ==================== BULK INGESTION API ====================
+
+SHIPMENT_STATUSES = ('CREATED', 'IN_TRANSIT', 'DELIVERED', 'DELAYED', 'CANCELLED')
+
+# field -> (kind, required, option); kinds are parsed by parse_bulk_value
+BULK_FIELDS = {
+    'shipments': {
+        'supplier_id': ('id', True, None),
+        'product_id': ('id', True, None),
+        'warehouse_id': ('id', True, None),
+        'quantity': ('count', True, None),
+        'ship_date': ('date', True, None),
+        'expected_arrival_date': ('date', True, None),
+        'actual_arrival_date': ('date', False, None),
+        'status': ('enum', False, SHIPMENT_STATUSES)
+    },
+    'shipment_events': {
+        'shipment_id': ('id', True, None),
+        'event_time': ('datetime', False, None),
+        'event_type': ('str', True, 64),
+        'details': ('str', False, 256)
+    },
+    'inventory': {
+        'product_id': ('id', True, None),
+        'warehouse_id': ('id', True, None),
+        'quantity': ('count', True, None),
+        'reorder_threshold': ('count', True, None),
+        'safety_stock': ('count', True, None)
+    }
+}
+
+SHIPMENT_COLUMNS = ['supplier_id', 'product_id', 'warehouse_id', 'quantity', 'ship_date',
+                    'expected_arrival_date', 'actual_arrival_date', 'status']
+
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+def read_bulk_records():
+    """Records from a JSON array, a {"records": [...]} object or an NDJSON body.
+
+    Returns (records, parse_errors); an NDJSON line that is not valid JSON becomes a None
+    record with its error keyed by index. Raises ValueError if the body is unusable.
+    """
+    body = request.get_data(as_text=True)
+    records, parse_errors = None, {}
+
+    if request.mimetype not in NDJSON_MIMETYPES:
+        try:
+            payload = json.loads(body)
+            if isinstance(payload, dict) and isinstance(payload.get('records'), list):
+                payload = payload['records']
+            if not isinstance(payload, list):
+                raise ValueError('Body must be a JSON array, {"records": [...]} or NDJSON')
+            records = payload
+        except json.JSONDecodeError:
+            if '\n' not in body.strip():
+                raise ValueError('Body is not valid JSON')
+
+    if records is None:
+        records = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                parse_errors[len(records)] = f'invalid JSON: {e.msg}'
+                records.append(None)
+
+    if not records:
+        raise ValueError('No records in request body')
+    if len(records) > BULK_MAX_RECORDS:
+        raise ValueError(f'At most {BULK_MAX_RECORDS} records per request')
+    return records, parse_errors
+
+def parse_bulk_value(kind, value, option):
+    """Convert one field to the type its column expects, raising ValueError if it cannot"""
+    if kind in ('id', 'count'):
+        if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+            raise ValueError('must be an integer')
+        number = int(value)
+        if number < (1 if kind == 'id' else 0):
+            raise ValueError('must be positive' if kind == 'id' else 'must not be negative')
+        return number
+    if kind == 'date':
+        return date.fromisoformat(str(value)[:10])
+    if kind == 'datetime':
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).replace(tzinfo=None)
+    if kind == 'enum':
+        value = str(value).upper()
+        if value not in option:
+            raise ValueError(f"must be one of {', '.join(option)}")
+        return value
+    value = str(value)
+    if len(value) > option:
+        raise ValueError(f'must be at most {option} characters')
+    return value
+
+def validate_bulk_record(record, fields, partial=False):
+    """Parsed values and a list of field errors for one record"""
+    if not isinstance(record, dict):
+        return None, ['record must be a JSON object']
+    clean, errors = {}, []
+    for field, (kind, required, option) in fields.items():
+        value = record.get(field)
+        if value is None or value == '':
+            if required and (not partial or field in record):
+                errors.append(f'{field} is required')
+            elif field in record:
+                clean[field] = None
+            continue
+        try:
+            clean[field] = parse_bulk_value(kind, value, option)
+        except (TypeError, ValueError) as e:
+            errors.append(f'{field} {e}' if str(e).startswith('must') else f'{field} is invalid')
+    return clean, errors
+
+def existing_ids(cursor, table, column, ids):
+    """Subset of ``ids`` present in ``table``"""
+    found = set()
+    ids = list(ids)
+    for start in range(0, len(ids), BULK_CHUNK_SIZE):
+        chunk = ids[start:start + BULK_CHUNK_SIZE]
+        timed_execute(cursor, f"SELECT {column} FROM {table} WHERE {column} IN ({', '.join(['%s'] * len(chunk))})",
+                      tuple(chunk))
+        found.update(row[column] for row in cursor.fetchall())
+    return found
+
+def check_references(cursor, valid, references):
+    """Flag records whose foreign keys point at missing rows; references maps field -> (table, column)"""
+    for field, (table, column) in references.items():
+        wanted = {clean[field] for clean in valid.values() if clean.get(field) is not None}
+        missing = wanted - existing_ids(cursor, table, column, wanted) if wanted else set()
+        for index, clean in list(valid.items()):
+            if clean.get(field) in missing:
+                yield index, f'{field} {clean[field]} does not exist'
+
+def multi_row_insert(cursor, table, columns, rows, update_columns=()):
+    """One INSERT for all ``rows``, upserting ``update_columns`` on duplicate keys; returns lastrowid"""
+    placeholders = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES {', '.join([placeholders] * len(rows))}"
+    if update_columns:
+        query += " ON DUPLICATE KEY UPDATE " + ', '.join(f"{c} = VALUES({c})" for c in update_columns)
+    timed_execute(cursor, query, tuple(value for row in rows for value in row))
+    return cursor.lastrowid
+
+# (innodb_autoinc_lock_mode, auto_increment_increment) of the primary, read once
+_autoinc_settings = {}
+
+def autoinc_settings(cursor):
+    if not _autoinc_settings:
+        timed_execute(cursor, "SELECT @@innodb_autoinc_lock_mode AS lock_mode, @@auto_increment_increment AS increment")
+        row = cursor.fetchone()
+        if isinstance(row, dict):
+            row = (row['lock_mode'], row['increment'])
+        _autoinc_settings.update(lock_mode=int(row[0]), increment=int(row[1]))
+        if _autoinc_settings['lock_mode'] not in (0, 1):
+            log.warning("innodb_autoinc_lock_mode=%d: bulk creates insert one row per statement to read their ids "
+                        "(set it to 1 for multi-row inserts)", _autoinc_settings['lock_mode'])
+    return _autoinc_settings
+
+def insert_rows(cursor, table, columns, rows):
+    """INSERT ``rows``; returns their AUTO_INCREMENT ids in order.
+
+    Under innodb_autoinc_lock_mode 0 or 1, a multi-row INSERT with a known row count gets
+    consecutive ids, auto_increment_increment apart, starting at lastrowid, so one statement is
+    used. Mode 2 (MySQL 8's default) may interleave concurrent statements' ids, so there each
+    row is inserted on its own and its lastrowid read.
+    """
+    settings = autoinc_settings(cursor)
+    if settings['lock_mode'] in (0, 1):
+        first_id = multi_row_insert(cursor, table, columns, rows)
+        return [first_id + offset * settings['increment'] for offset in range(len(rows))]
+    query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    ids = []
+    for row in rows:
+        timed_execute(cursor, query, tuple(row))
+        ids.append(cursor.lastrowid)
+    return ids
+
+def run_bulk(records, parse_errors, fields, prepare, write, partial=None, committed=None):
+    """Validate every record, then write the valid ones in BULK_CHUNK_SIZE transactions.
+
+    ``prepare(cursor, valid, results)`` runs database-side checks before anything is written
+    and may mark records invalid; ``write(cursor, chunk, results)`` writes one chunk of
+    (index, clean) pairs and fills in their results; ``committed(chunk, results)`` runs after each
+    chunk's commit. Returns the JSON response.
+    """
+    results = [{'index': i, 'status': 'pending'} for i in range(len(records))]
+    valid = {}
+    for index, record in enumerate(records):
+        if index in parse_errors:
+            results[index].update(status='invalid', errors=[parse_errors[index]])
+            continue
+        clean, errors = validate_bulk_record(record, fields, partial(record) if partial else False)
+        if errors:
+            results[index].update(status='invalid', errors=errors)
+        else:
+            valid[index] = clean
+
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'success': False, 'error': 'Database unavailable'}), 503
+
+    cursor = conn.cursor(dictionary=True)
+    try:
+        if valid:
+            prepare(cursor, valid, results)
+            for index in [i for i in valid if results[i]['status'] == 'invalid']:
+                del valid[index]
+
+        pending = list(valid.items())
+        for start in range(0, len(pending), BULK_CHUNK_SIZE):
+            chunk = pending[start:start + BULK_CHUNK_SIZE]
+            try:
+                write(cursor, chunk, results)
+                conn.commit()
+                if committed:
+                    committed(chunk, results)
+            except Error as e:
+                conn.rollback()
+                log.error("Bulk chunk of %d records failed: %s", len(chunk), e)
+                for index, _ in chunk:
+                    results[index] = {'index': index, 'status': 'failed', 'errors': [str(e)]}
+    except Error as e:
+        conn.rollback()
+        log.error("Bulk validation query failed: %s", e)
+        return jsonify({'success': False, 'error': 'Database query failed'}), 500
+    finally:
+        cursor.close()
+
+    counts = Counter(result['status'] for result in results)
+    written = counts['created'] + counts['updated']
+    if written:
+        invalidate_dashboard_metrics()
+    summary = {
+        'received': len(records),
+        'created': counts['created'],
+        'updated': counts['updated'],
+        'invalid': counts['invalid'],
+        'failed': counts['failed'],
+        'results': results
+    }
+    success = written == len(records)
+    status = 200 if written or not records else (400 if counts['invalid'] == len(records) else 500)
+    return jsonify({'success': success, 'data': summary}), status
+
+@app.route('/api/shipments/bulk', methods=['POST'])
+def bulk_shipments():
+    """Create or update up to BULK_MAX_RECORDS shipments (records with shipment_id update that shipment)"""
+    try:
+        records, parse_errors = read_bulk_records()
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    current = {}  # shipment_id -> stored row, merged with updates as they are applied
+
+    def prepare(cursor, valid, results):
+        update_ids = {}
+        for index, clean in valid.items():
+            try:
+                shipment_id = parse_bulk_value('id', records[index]['shipment_id'], None) \
+                    if records[index].get('shipment_id') is not None else None
+            except (TypeError, ValueError):
+                results[index].update(status='invalid', errors=['shipment_id is invalid'])
+                continue
+            if shipment_id is not None:
+                clean['shipment_id'] = shipment_id
+                update_ids.setdefault(shipment_id, []).append(index)
+
+        ids = list(update_ids)
+        for start in range(0, len(ids), BULK_CHUNK_SIZE):
+            chunk = ids[start:start + BULK_CHUNK_SIZE]
+            timed_execute(cursor, f"""
+                SELECT shipment_id, {', '.join(SHIPMENT_COLUMNS)} FROM shipments
+                WHERE shipment_id IN ({', '.join(['%s'] * len(chunk))})
+            """, tuple(chunk))
+            current.update((row['shipment_id'], row) for row in cursor.fetchall())
+        for shipment_id, indexes in update_ids.items():
+            if shipment_id not in current:
+                for index in indexes:
+                    results[index].update(status='invalid', errors=[f'shipment_id {shipment_id} does not exist'])
+
+        checked = {i: c for i, c in valid.items() if results[i]['status'] != 'invalid'}
+        for index, error in check_references(cursor, checked, {
+            'supplier_id': ('suppliers', 'supplier_id'),
+            'product_id': ('products', 'product_id'),
+            'warehouse_id': ('warehouses', 'warehouse_id')
+        }):
+            results[index].update(status='invalid', errors=[error])
+
+    def write(cursor, chunk, results):
+        before = risk_counters.fetch_shipments(
+            cursor, [clean['shipment_id'] for _, clean in chunk if 'shipment_id' in clean], lock=True)
+        creates, updates, events = [], [], []
+        staged = {}  # merged rows for this chunk; a later record for the same shipment builds on an earlier one
+        for index, clean in chunk:
+            if 'shipment_id' in clean:
+                row = {**(staged.get(clean['shipment_id']) or current[clean['shipment_id']]), **clean}
+                staged[clean['shipment_id']] = row
+                updates.append((index, row))
+                if 'status' in clean:
+                    events.append((clean['shipment_id'], row['status'], 'status updated'))
+            else:
+                creates.append((index, {**clean, 'status': clean.get('status') or 'CREATED'}))
+
+        if updates:
+            multi_row_insert(cursor, 'shipments', ['shipment_id'] + SHIPMENT_COLUMNS,
+                             [[row['shipment_id']] + [row.get(c) for c in SHIPMENT_COLUMNS] for _, row in updates],
+                             SHIPMENT_COLUMNS)
+        if creates:
+            ids = insert_rows(cursor, 'shipments', SHIPMENT_COLUMNS,
+                              [[row.get(c) for c in SHIPMENT_COLUMNS] for _, row in creates])
+            for (index, _), shipment_id in zip(creates, ids):
+                results[index].update(status='created', shipment_id=shipment_id)
+                events.append((shipment_id, 'CREATED', 'created'))
+        if events:
+            multi_row_insert(cursor, 'shipment_events', ['shipment_id', 'event_time', 'event_type', 'details'],
+                             [(shipment_id, datetime.now(), event_type, details)
+                              for shipment_id, event_type, details in events])
+        for index, row in updates:
+            results[index].update(status='updated', shipment_id=row['shipment_id'])
+        after = risk_counters.fetch_shipments(cursor, {results[index]['shipment_id'] for index, _ in chunk})
+        risk_counters.apply_changes(cursor, before, after)
+        rollups.apply_shipment_changes(cursor, before, after)
+        current.update(staged)
+
+    def committed(chunk, results):
+        for index, _ in chunk:
+            alert_pipeline.publish('shipment', results[index]['shipment_id'])
+        bump_table_versions('shipments')
+
+    return run_bulk(records, parse_errors, BULK_FIELDS['shipments'], prepare, write,
+                    partial=lambda record: isinstance(record, dict) and record.get('shipment_id') is not None,
+                    committed=committed)
+
+@app.route('/api/shipments/events/bulk', methods=['POST'])
+def bulk_shipment_events():
+    """Append up to BULK_MAX_RECORDS shipment events (event_time defaults to now)"""
+    try:
+        records, parse_errors = read_bulk_records()
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    def prepare(cursor, valid, results):
+        for index, error in check_references(cursor, valid, {'shipment_id': ('shipments', 'shipment_id')}):
+            results[index].update(status='invalid', errors=[error])
+
+    def write(cursor, chunk, results):
+        now = datetime.now()
+        multi_row_insert(cursor, 'shipment_events', ['shipment_id', 'event_time', 'event_type', 'details'],
+                         [(clean['shipment_id'], clean.get('event_time') or now, clean['event_type'],
+                           clean.get('details')) for _, clean in chunk])
+        for index, _ in chunk:
+            results[index].update(status='created')
+
+    return run_bulk(records, parse_errors, BULK_FIELDS['shipment_events'], prepare, write)
+
+@app.route('/api/inventory/bulk', methods=['POST'])
+def bulk_inventory():
+    """Upsert up to BULK_MAX_RECORDS inventory snapshots keyed by (product_id, warehouse_id)"""
+    try:
+        records, parse_errors = read_bulk_records()
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    stored = set()  # (product_id, warehouse_id) pairs that already have a row
+
+    def prepare(cursor, valid, results):
+        for index, error in check_references(cursor, valid, {
+            'product_id': ('products', 'product_id'),
+            'warehouse_id': ('warehouses', 'warehouse_id')
+        }):
+            results[index].update(status='invalid', errors=[error])
+
+        products = list({clean['product_id'] for clean in valid.values()})
+        for start in range(0, len(products), BULK_CHUNK_SIZE):
+            chunk = products[start:start + BULK_CHUNK_SIZE]
+            timed_execute(cursor, f"""
+                SELECT product_id, warehouse_id FROM inventory
+                WHERE product_id IN ({', '.join(['%s'] * len(chunk))})
+            """, tuple(chunk))
+            stored.update((row['product_id'], row['warehouse_id']) for row in cursor.fetchall())
+
+    def write(cursor, chunk, results):
+        positions = {(clean['product_id'], clean['warehouse_id']) for _, clean in chunk}
+        before = rollups.fetch_stock(cursor, positions=positions, lock=True)
+        multi_row_insert(cursor, 'inventory',
+                         ['product_id', 'warehouse_id', 'quantity', 'reorder_threshold', 'safety_stock', 'last_updated'],
+                         [(clean['product_id'], clean['warehouse_id'], clean['quantity'], clean['reorder_threshold'],
+                           clean['safety_stock'], datetime.now()) for _, clean in chunk],
+                         ['quantity', 'reorder_threshold', 'safety_stock', 'last_updated'])
+        for index, clean in chunk:
+            key = (clean['product_id'], clean['warehouse_id'])
+            results[index].update(status='updated' if key in stored else 'created')
+            stored.add(key)
+        rollups.apply_inventory_changes(cursor, before, rollups.fetch_stock(cursor, positions=positions))
+
+    def committed(chunk, results):
+        for _, clean in chunk:
+            alert_pipeline.publish('inventory_key', (clean['product_id'], clean['warehouse_id']))
+
+    return run_bulk(records, parse_errors, BULK_FIELDS['inventory'], prepare, write, committed=committed)
 
 # ==================== ALERTS API ====================
 
+def alerts_page_query(args=None):
+    """(query, params, limit, cursor key) for one page of alerts; ValueError on bad paging args"""
+    limit, after = get_page_args(2, args)
+    conditions, params = list_filters('alerts', args)
+    where, key_params = keyset_after('created_at', 'alert_id', after)
+    if where:
+        conditions.append(where)
+        params.extend(key_params)
+    params.append(limit + 1)
+    query = f"""
+        {ALERTS_SELECT}
+        {where_clause(conditions)}
+        ORDER BY created_at DESC, alert_id DESC
+        LIMIT %s
+    """
+    params = tuple(params)
+    if include_archived(args):
+        query, params = archived_page(query, params, 'alerts', 'created_at DESC, alert_id DESC')
+    return query, params, limit, lambda row: (row['created_at'], row['alert_id'])
+
 @app.route('/api/alerts', methods=['GET'])
+@versioned
 def get_alerts():
-    """Get all alerts"""
+    """Get a page of alerts, newest first"""
     try:
-        resolved = request.args.get('resolved', 'false').lower() == 'true'
-        query = """
-            SELECT * FROM alerts
-            WHERE resolved = %s
-            ORDER BY created_at DESC
-        """
-        result = db_query(query, (1 if resolved else 0,))
+        query, params, limit, key = alerts_page_query()
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    try:
+        result = db_query(query, params, tuples=True)
         if result is not None:
-            return jsonify({'success': True, 'data': result if result else []})
+            return page_response(result, limit, key)
         return jsonify({'success': False, 'error': 'Database query failed'}), 500
     except Exception as e:
-        print(f"Error in get_alerts: {e}")
+        log.exception("Error in get_alerts: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/alerts/<int:alert_id>/resolve', methods=['POST'])
 def resolve_alert(alert_id):
-    """Resolve an alert"""
+    """Resolve an alert; a JSON body {"created_at": ...} (from the alert row) limits the UPDATE to its month's partition"""
+    data = request.get_json(silent=True)
+    created_at = data.get('created_at') if isinstance(data, dict) else None
     query = """
         UPDATE alerts 
         SET resolved = 1, resolved_at = NOW()
         WHERE alert_id = %s
     """
-    result = db_query(query, (alert_id,), fetch=False)
-    if result is not None:
-        return jsonify({'success': True, 'message': 'Alert resolved successfully'})
-    return jsonify({'success': False, 'error': 'Failed to resolve alert'}), 500
+    result = 0
+    if created_at is not None:
+        try:
+            created_at = datetime.fromisoformat(str(created_at))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'created_at must be an ISO 8601 datetime'}), 400
+        result = db_query(query + "  AND created_at = %s\n", (alert_id, created_at), fetch=False)
+    if result == 0:
+        # No created_at, or a stale one: match the id alone, probing every partition
+        result = db_query(query, (alert_id,), fetch=False)
+    if result is None:
+        return jsonify({'success': False, 'error': 'Failed to resolve alert'}), 500
+    if not result:
+        return jsonify({'success': False, 'error': 'Alert not found'}), 404
+    bump_table_versions('alerts')
+    invalidate_dashboard_metrics()
+    return jsonify({'success': True, 'message': 'Alert resolved successfully'})
+
+def insert_alerts(cursor, alerts):
+    """Insert (alert_type, severity, entity_type, entity_id, message) alerts raised now and count them in the rollups"""
+    timed_execute(cursor, f"""
+        INSERT INTO alerts (created_at, alert_type, severity, entity_type, entity_id, message, resolved)
+        VALUES {', '.join(['(NOW(), %s, %s, %s, %s, %s, 0)'] * len(alerts))}
+    """, tuple(value for alert in alerts for value in alert))
+    rollups.bump_alerts(cursor, Counter((None, alert[1], alert[0]) for alert in alerts))
 
 @app.route('/api/alerts', methods=['POST'])
 def create_alert():
     """Create a new alert manually (for testing)"""
     data = request.json
-    query = """
-        INSERT INTO alerts (created_at, alert_type, severity, entity_type, entity_id, message, resolved)
-        VALUES (NOW(), %s, %s, %s, %s, %s, 0)
-    """
-    params = (
+    alert = (
         data.get('alert_type', 'CUSTOM'),
         data.get('severity', 'INFO'),
         data.get('entity_type', 'SYSTEM'),
         data.get('entity_id', 0),
         data.get('message', 'Custom alert')
     )
-    result = db_query(query, params, fetch=False)
-    if result is not None:
-        return jsonify({'success': True, 'message': 'Alert created successfully'})
-    return jsonify({'success': False, 'error': 'Failed to create alert'}), 500
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'success': False, 'error': 'Failed to create alert'}), 500
+    cursor = conn.cursor(dictionary=True)
+    try:
+        insert_alerts(cursor, [alert])
+        conn.commit()
+    except Error as e:
+        conn.rollback()
+        log.error("Failed to create alert: %s", e)
+        return jsonify({'success': False, 'error': 'Failed to create alert'}), 500
+    finally:
+        cursor.close()
+    bump_table_versions('alerts')
+    invalidate_dashboard_metrics()
+    return jsonify({'success': True, 'message': 'Alert created successfully'})
+
+TEST_ALERTS = [
+    ('Shipment delay alert', ('SHIPMENT_DELAY', 'WARN', 'SHIPMENT', 1, 'Test: Shipment #1 is delayed')),
+    ('Low inventory alert', ('LOW_INVENTORY', 'WARN', 'INVENTORY', 1, 'Test: Inventory low for product at warehouse')),
+    ('Critical inventory alert', ('LOW_INVENTORY', 'CRITICAL', 'INVENTORY', 2, 'Test: CRITICAL - Inventory below safety stock'))
+]
 
 @app.route('/api/alerts/generate-test', methods=['POST'])
 def generate_test_alerts():
     """Generate test alerts for demonstration"""
     try:
-        alerts_created = []
-        
-        # Create a shipment delay alert
-        query1 = """
-            INSERT INTO alerts (created_at, alert_type, severity, entity_type, entity_id, message, resolved)
-            VALUES (NOW(), 'SHIPMENT_DELAY', 'WARN', 'SHIPMENT', 1, 'Test: Shipment #1 is delayed', 0)
-        """
-        if db_query(query1, fetch=False) is not None:
-            alerts_created.append('Shipment delay alert')
-        
-        # Create a low inventory alert
-        query2 = """
-            INSERT INTO alerts (created_at, alert_type, severity, entity_type, entity_id, message, resolved)
-            VALUES (NOW(), 'LOW_INVENTORY', 'WARN', 'INVENTORY', 1, 'Test: Inventory low for product at warehouse', 0)
-        """
-        if db_query(query2, fetch=False) is not None:
-            alerts_created.append('Low inventory alert')
-        
-        # Create a critical alert
-        query3 = """
-            INSERT INTO alerts (created_at, alert_type, severity, entity_type, entity_id, message, resolved)
-            VALUES (NOW(), 'LOW_INVENTORY', 'CRITICAL', 'INVENTORY', 2, 'Test: CRITICAL - Inventory below safety stock', 0)
-        """
-        if db_query(query3, fetch=False) is not None:
-            alerts_created.append('Critical inventory alert')
-        
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({'success': False, 'error': 'No database connection available'}), 500
+        cursor = conn.cursor(dictionary=True)
+        try:
+            insert_alerts(cursor, [alert for _, alert in TEST_ALERTS])
+            conn.commit()
+        except Error:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+        alerts_created = [name for name, _ in TEST_ALERTS]
+
+        bump_table_versions('alerts')
+        invalidate_dashboard_metrics()
         return jsonify({
             'success': True, 
             'message': f'Created {len(alerts_created)} test alerts',
             'alerts': alerts_created
         })
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        log.exception("Error generating test alerts: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 # ==================== DASHBOARD METRICS API ====================
 
+# All four dashboard counters in one round trip
+DASHBOARD_METRICS_QUERY = """
+    SELECT (SELECT COUNT(*) FROM suppliers) AS suppliers,
+           (SELECT COUNT(*) FROM shipments WHERE status = 'IN_TRANSIT') AS transit,
+           (SELECT COUNT(*) FROM alerts WHERE resolved = 0) AS alerts,
+           (SELECT COUNT(*) FROM inventory WHERE quantity < safety_stock) AS critical_inventory
+"""
+
+# Last computed counters; 'etag' and 'last_modified' only move when the counters change.
+# 'generation' is bumped by every invalidation so a query that raced a write is not cached.
+_dashboard_cache = {'data': None, 'computed_at': 0.0, 'etag': None, 'last_modified': None, 'generation': 0}
+_dashboard_cache_lock = threading.Lock()
+
+def invalidate_dashboard_metrics():
+    """Force the next dashboard poll to re-query the counters"""
+    with _dashboard_cache_lock:
+        _dashboard_cache['computed_at'] = 0.0
+        _dashboard_cache['generation'] += 1
+    stream_hub.notify()
+
+def peek_dashboard_metrics():
+    """(fresh cache entry or None, generation to pass to store_dashboard_metrics)"""
+    with _dashboard_cache_lock:
+        if _dashboard_cache['data'] is not None and time.monotonic() - _dashboard_cache['computed_at'] < DASHBOARD_CACHE_TTL:
+            return dict(_dashboard_cache), _dashboard_cache['generation']
+        return None, _dashboard_cache['generation']
+
+def store_dashboard_metrics(row, generation):
+    """Cache the counters from a DASHBOARD_METRICS_QUERY row and return the cache entry"""
+    critical_count = int(row['critical_inventory'] or 0)
+    metrics = {
+        'suppliers': int(row['suppliers'] or 0),
+        'transit': int(row['transit'] or 0),
+        'alerts': int(row['alerts'] or 0),
+        'inventory': f'{critical_count} Critical' if critical_count > 0 else 'OK'
+    }
+    etag = hashlib.sha1(json.dumps(metrics, sort_keys=True).encode()).hexdigest()
+
+    with _dashboard_cache_lock:
+        if etag != _dashboard_cache['etag']:
+            _dashboard_cache['etag'] = etag
+            _dashboard_cache['last_modified'] = datetime.now(timezone.utc).replace(microsecond=0)
+        _dashboard_cache['data'] = metrics
+        if generation == _dashboard_cache['generation']:
+            _dashboard_cache['computed_at'] = time.monotonic()
+        return dict(_dashboard_cache)
+
+def get_cached_dashboard_metrics():
+    """Dashboard counters, recomputed at most every DASHBOARD_CACHE_TTL seconds"""
+    cached, generation = peek_dashboard_metrics()
+    if cached is not None:
+        return cached
+    result = db_query(DASHBOARD_METRICS_QUERY)
+    if not result:
+        return None
+    return store_dashboard_metrics(result[0], generation)
+
 @app.route('/api/dashboard/metrics', methods=['GET'])
 def get_dashboard_metrics():
-    """Get dashboard metrics"""
-    metrics = {}
-    
-    # Active suppliers count
-    query = "SELECT COUNT(*) as count FROM suppliers"
-    result = db_query(query)
-    if result:
-        metrics['suppliers'] = result[0]['count']
-    
-    # Shipments in transit
-    query = "SELECT COUNT(*) as count FROM shipments WHERE status = 'IN_TRANSIT'"
-    result = db_query(query)
-    if result:
-        metrics['transit'] = result[0]['count']
-    
-    # Open alerts
-    query = "SELECT COUNT(*) as count FROM alerts WHERE resolved = 0"
-    result = db_query(query)
-    if result:
-        metrics['alerts'] = result[0]['count']
-    
-    # Inventory health
-    query = """
-        SELECT COUNT(*) as count FROM inventory 
-        WHERE quantity < safety_stock
-    """
-    result = db_query(query)
-    if result:
-        critical_count = result[0]['count']
-        if critical_count > 0:
-            metrics['inventory'] = f'{critical_count} Critical'
-        else:
-            metrics['inventory'] = 'OK'
-    
-    return jsonify({'success': True, 'data': metrics})
+    """Get dashboard metrics (cached, supports If-None-Match / If-Modified-Since)"""
+    cached = get_cached_dashboard_metrics()
+    if cached is None:
+        return jsonify({'success': False, 'error': 'Database query failed'}), 500
+
+    response = jsonify({'success': True, 'data': cached['data']})
+    response.set_etag(cached['etag'])
+    response.last_modified = cached['last_modified']
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+SUPPLIER_RISK_SUMMARY_QUERY = """
+    SELECT * FROM supplier_risk_summary
+    ORDER BY risk_score DESC
+"""
+SUPPLIER_RISK_FALLBACK_QUERY = """
+    SELECT s.supplier_id, s.name, 
+           COALESCE(m.record_date, CURDATE()) as record_date,
+           COALESCE(m.risk_score, 0) as risk_score,
+           COALESCE(m.risk_level, 'LOW') as risk_level,
+           COALESCE(m.on_time_rate, 1.0) as on_time_rate,
+           COALESCE(m.avg_delay_days, 0) as avg_delay_days,
+           COALESCE(m.defect_rate, 0) as defect_rate
+    FROM suppliers s
+    LEFT JOIN supplier_risk_current m ON m.supplier_id = s.supplier_id
+    ORDER BY COALESCE(m.risk_score, 0) DESC
+"""
+DELAYED_SHIPMENTS_QUERY = """
+    SELECT * FROM delayed_shipments_overview
+    ORDER BY delay_days DESC
+"""
 
 @app.route('/api/dashboard/supplier-risk', methods=['GET'])
 def get_supplier_risk_summary():
     """Get supplier risk summary"""
     try:
         # Try using the view first
-        query = """
-            SELECT * FROM supplier_risk_summary
-            ORDER BY risk_score DESC
-        """
-        result = db_query(query)
+        result = db_query(SUPPLIER_RISK_SUMMARY_QUERY)
         
         # If view doesn't exist or query fails, use a direct query
         if result is None:
-            print("View query failed, trying direct query...")
-            query = """
-                SELECT s.supplier_id, s.name, 
-                       COALESCE(m.record_date, CURDATE()) as record_date,
-                       COALESCE(m.risk_score, 0) as risk_score,
-                       COALESCE(m.risk_level, 'LOW') as risk_level,
-                       COALESCE(m.on_time_rate, 1.0) as on_time_rate,
-                       COALESCE(m.avg_delay_days, 0) as avg_delay_days,
-                       COALESCE(m.defect_rate, 0) as defect_rate
-                FROM suppliers s
-                LEFT JOIN supplier_metrics m ON s.supplier_id = m.supplier_id
-                AND m.record_date = (
-                    SELECT MAX(record_date) 
-                    FROM supplier_metrics 
-                    WHERE supplier_id = s.supplier_id
-                )
-                ORDER BY COALESCE(m.risk_score, 0) DESC
-            """
-            result = db_query(query)
+            log.warning("Supplier risk view query failed, trying direct query")
+            result = db_query(SUPPLIER_RISK_FALLBACK_QUERY)
         
         if result is not None:
             return jsonify({'success': True, 'data': result if result else []})
         return jsonify({'success': False, 'error': 'Database query failed'}), 500
     except Exception as e:
-        import traceback
-        print(f"Error in get_supplier_risk_summary: {e}")
-        traceback.print_exc()
+        log.exception("Error in get_supplier_risk_summary: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/dashboard/delayed-shipments', methods=['GET'])
 def get_delayed_shipments():
     """Get delayed shipments overview"""
     try:
-        query = """
-            SELECT * FROM delayed_shipments_overview
-            ORDER BY delay_days DESC
-        """
-        result = db_query(query)
+        result = db_query(DELAYED_SHIPMENTS_QUERY)
         if result is not None:
             return jsonify({'success': True, 'data': result if result else []})
         return jsonify({'success': False, 'error': 'Database query failed'}), 500
     except Exception as e:
-        print(f"Error in get_delayed_shipments: {e}")
+        log.exception("Error in get_delayed_shipments: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# ==================== ANALYTICS API ====================
+
+# Period expression per ?bucket=; weeks start on Monday
+ANALYTICS_BUCKETS = {'day': '{0}', 'week': '{0} - INTERVAL WEEKDAY({0}) DAY'}
+ALERT_SEVERITIES = ('INFO', 'WARN', 'CRITICAL')
+
+def get_range_args(args=None):
+    """Read ?from=, ?to= and ?bucket= (default: the last 365 days by week), returning (start, end, bucket)"""
+    args = request.args if args is None else args
+    try:
+        end = date.fromisoformat(args['to']) if args.get('to') else date.today()
+        start = date.fromisoformat(args['from']) if args.get('from') else end - timedelta(days=364)
+    except ValueError:
+        raise ValueError('from and to must be dates (YYYY-MM-DD)')
+    bucket = args.get('bucket', 'week')
+    if bucket not in ANALYTICS_BUCKETS:
+        raise ValueError('bucket must be day or week')
+    if bucket == 'week':
+        start = week_start(start)
+    if start > end:
+        raise ValueError('from must not be after to')
+    if (end - start).days >= ANALYTICS_MAX_DAYS:
+        raise ValueError(f'range must be shorter than {ANALYTICS_MAX_DAYS} days')
+    return start, end, bucket
+
+def get_id_arg(name, args=None):
+    args = request.args if args is None else args
+    if not args.get(name):
+        return None
+    try:
+        return int(args[name])
+    except ValueError:
+        raise ValueError(f'{name} must be an integer')
+
+def range_payload(data, start, end, bucket, **extra):
+    """Analytics response body; periods are ISO dates (the first day of the bucket)"""
+    return {'success': True, 'data': data, 'from': start.isoformat(), 'to': end.isoformat(), 'bucket': bucket, **extra}
+
+def delay_rate_query(args=None):
+    """(query, params, payload builder) for shipment delay rates per period, overall or for ?supplier_id="""
+    start, end, bucket = get_range_args(args)
+    supplier_id = get_id_arg('supplier_id', args)
+    if supplier_id is not None:
+        if bucket != 'week':
+            raise ValueError('delay rates per supplier are only available by week')
+        query = """
+            SELECT week_start AS period, shipment_count, delayed_count, delay_day_sum
+            FROM rollup_supplier_shipments_weekly
+            WHERE supplier_id = %s AND week_start BETWEEN %s AND %s
+            ORDER BY week_start
+        """
+        params = (supplier_id, start, end)
+    else:
+        query = f"""
+            SELECT {ANALYTICS_BUCKETS[bucket].format('ship_date')} AS period, SUM(shipment_count) AS shipment_count,
+                   SUM(delayed_count) AS delayed_count, SUM(delay_day_sum) AS delay_day_sum
+            FROM rollup_shipments_daily
+            WHERE ship_date BETWEEN %s AND %s
+            GROUP BY period
+            ORDER BY period
+        """
+        params = (start, end)
+
+    def payload(rows):
+        data = []
+        for row in rows:
+            shipments, delayed = int(row['shipment_count']), int(row['delayed_count'])
+            data.append({
+                'period': row['period'].isoformat(),
+                'shipment_count': shipments,
+                'delayed_count': delayed,
+                'delay_rate': round(delayed / shipments, 4) if shipments else None,
+                'avg_delay_days': round(int(row['delay_day_sum']) / delayed, 2) if delayed else 0
+            })
+        return range_payload(data, start, end, bucket, supplier_id=supplier_id)
+    return query, params, payload
+
+def alert_trend_query(args=None):
+    """(query, params, payload builder) for alerts raised per period by severity, optionally for one ?alert_type="""
+    start, end, bucket = get_range_args(args)
+    args = request.args if args is None else args
+    conditions, params = ['alert_date BETWEEN %s AND %s'], [start, end]
+    alert_type = args.get('alert_type')
+    if alert_type:
+        conditions.append('alert_type = %s')
+        params.append(alert_type)
+    query = f"""
+        SELECT {ANALYTICS_BUCKETS[bucket].format('alert_date')} AS period, severity, SUM(raised_count) AS alert_count
+        FROM rollup_alerts_daily
+        {where_clause(conditions)}
+        GROUP BY period, severity
+        ORDER BY period
+    """
+
+    def payload(rows):
+        periods = {}
+        for row in rows:
+            counts = periods.setdefault(row['period'].isoformat(), dict.fromkeys(ALERT_SEVERITIES, 0))
+            counts[row['severity']] = int(row['alert_count'])
+        data = [{'period': period, **counts, 'total': sum(counts.values())} for period, counts in periods.items()]
+        return range_payload(data, start, end, bucket, alert_type=alert_type or None)
+    return query, tuple(params), payload
+
+def stockout_query(args=None):
+    """(query, params, payload builder) for stockout and below-safety-stock position-days per warehouse and period"""
+    start, end, bucket = get_range_args(args)
+    warehouse_id = get_id_arg('warehouse_id', args)
+    conditions, params = ['r.stock_date BETWEEN %s AND %s'], [start, end]
+    if warehouse_id is not None:
+        conditions.append('r.warehouse_id = %s')
+        params.append(warehouse_id)
+    query = f"""
+        SELECT {ANALYTICS_BUCKETS[bucket].format('r.stock_date')} AS period, r.warehouse_id, w.name AS warehouse_name,
+               SUM(r.stockout_count) AS stockout_days, SUM(r.below_safety_count) AS below_safety_days,
+               COUNT(*) AS days_recorded
+        FROM rollup_warehouse_stock_daily r
+        JOIN warehouses w ON w.warehouse_id = r.warehouse_id
+        {where_clause(conditions)}
+        GROUP BY period, r.warehouse_id, w.name
+        ORDER BY period, r.warehouse_id
+    """
+
+    def payload(rows):
+        data = [{**row, 'period': row['period'].isoformat(), 'stockout_days': int(row['stockout_days']), 'below_safety_days': int(row['below_safety_days'])}
+                for row in rows]
+        return range_payload(data, start, end, bucket, warehouse_id=warehouse_id)
+    return query, tuple(params), payload
+
+def analytics_response(build):
+    """Run an analytics query builder against the rollup tables"""
+    try:
+        query, params, payload = build()
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    result = db_query(query, params)
+    if result is None:
+        return jsonify({'success': False, 'error': 'Database query failed'}), 500
+    return jsonify(payload(result))
+
+@app.route('/api/analytics/delay-rate', methods=['GET'])
+def get_delay_rate_trend():
+    """Shipment delay rate per day or week, overall or for one supplier"""
+    return analytics_response(delay_rate_query)
+
+@app.route('/api/analytics/alerts', methods=['GET'])
+def get_alert_trend():
+    """Alerts raised per day or week by severity"""
+    return analytics_response(alert_trend_query)
+
+@app.route('/api/analytics/stockouts', methods=['GET'])
+def get_stockout_trend():
+    """Stockout days per warehouse per day or week"""
+    return analytics_response(stockout_query)
+
+def refresh_analytics_rollups(days=ROLLUP_REFRESH_DAYS):
+    """Recompute the shipment and alert rollups of the last ``days`` days (all when None) and snapshot today's stock"""
+    conn = get_db_connection()
+    if not conn:
+        raise Error(msg='No database connection available')
+
+    started = time.monotonic()
+    start = date.today() - timedelta(days=days) if days is not None else None
+    cursor = conn.cursor(dictionary=True)
+    try:
+        rollups.refresh(cursor, start)
+        conn.commit()
+    except Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return {'from': week_start(start).isoformat() if start else None,
+            'elapsed_ms': round((time.monotonic() - started) * 1000, 1)}
+
+@app.route('/api/analytics/refresh', methods=['POST'])
+def refresh_rollups():
+    """Recompute recent rollups from the raw tables (?days=N, ?full=true for everything)"""
+    full = request.args.get('full', '').lower() in ('1', 'true', 'yes')
+    try:
+        days = None if full else int(request.args.get('days', ROLLUP_REFRESH_DAYS))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'days must be an integer'}), 400
+    try:
+        summary = refresh_analytics_rollups(days)
+        return jsonify({'success': True, 'message': 'Analytics rollups refreshed', 'data': summary})
+    except Error as e:
+        log.error("Rollup refresh failed: %s", e)
+        return jsonify({'success': False, 'error': 'Failed to refresh analytics rollups'}), 500
+
+@app.cli.command('refresh-rollups')
+@click.option('--days', type=int, default=ROLLUP_REFRESH_DAYS, show_default=True,
+              help='recompute shipment and alert rollups of this many recent days')
+@click.option('--full', is_flag=True, help='recompute every rollup from the raw tables')
+def refresh_rollups_command(days, full):
+    """Daily job: refresh recent analytics rollups and snapshot today's stock (flask --app app refresh-rollups)"""
+    summary = refresh_analytics_rollups(None if full else days)
+    print(f"✓ Refreshed analytics rollups from {summary['from'] or 'the beginning'} in {summary['elapsed_ms']} ms")
+
+# ==================== LIVE STREAM (SSE) ====================
+
+# Change watermarks of the shared /api/stream loop
+_stream_state = {'last_alert_id': 0, 'resolved_since': None, 'resolved_ids': set(), 'metrics_etag': None}
+
+def reset_stream_state():
+    """Start change detection from the current state when the stream loop (re)starts"""
+    with app.app_context():
+        result = db_query("SELECT COALESCE(MAX(alert_id), 0) AS last_alert_id, NOW() AS now FROM alerts")
+        cached = get_cached_dashboard_metrics()
+    if result:
+        _stream_state['last_alert_id'] = int(result[0]['last_alert_id'])
+        _stream_state['resolved_since'] = result[0]['now']
+        _stream_state['resolved_ids'] = set()
+    _stream_state['metrics_etag'] = cached['etag'] if cached else None
+
+def poll_stream_changes():
+    """One change-detection pass shared by every /api/stream client"""
+    messages = []
+    with app.app_context():
+        new_alerts = db_query(f"{ALERTS_SELECT} WHERE alert_id > %s ORDER BY alert_id LIMIT %s",
+                              (_stream_state['last_alert_id'], STREAM_BATCH_LIMIT))
+        for row in new_alerts or []:
+            messages.append(format_event('alert', app.json.dumps(row)))
+            _stream_state['last_alert_id'] = row['alert_id']
+
+        # resolved_at has one-second precision: re-read the last second and skip ids already sent
+        since = _stream_state['resolved_since']
+        if since is not None:
+            resolved = db_query("""
+                SELECT alert_id, resolved_at FROM alerts
+                WHERE resolved_at >= %s
+                ORDER BY resolved_at, alert_id
+                LIMIT %s
+            """, (since, STREAM_BATCH_LIMIT))
+            for row in resolved or []:
+                if row['resolved_at'] == since and row['alert_id'] in _stream_state['resolved_ids']:
+                    continue
+                if row['resolved_at'] != since:
+                    since = row['resolved_at']
+                    _stream_state['resolved_ids'] = set()
+                _stream_state['resolved_ids'].add(row['alert_id'])
+                messages.append(format_event('alert_resolved', app.json.dumps(row)))
+            _stream_state['resolved_since'] = since
+
+        cached = get_cached_dashboard_metrics()
+        if cached and cached['etag'] != _stream_state['metrics_etag']:
+            _stream_state['metrics_etag'] = cached['etag']
+            messages.append(format_event('metrics', app.json.dumps(cached['data'])))
+    return messages
+
+stream_hub = StreamHub(
+    poll_stream_changes,
+    start=reset_stream_state,
+    interval=STREAM_POLL_INTERVAL,
+    max_clients=STREAM_MAX_CLIENTS
+)
+
+@app.route('/api/stream', methods=['GET'])
+def stream_events():
+    """Server-Sent Events: new alerts, resolved alerts and changed dashboard counters"""
+    cached = get_cached_dashboard_metrics()
+    snapshot = format_event('metrics', app.json.dumps(cached['data'])) if cached else None
+    try:
+        subscriber = stream_hub.subscribe()
+    except StreamFull as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
+
+    def generate():
+        yield f"retry: {STREAM_RETRY_MS}\n\n"
+        if snapshot:
+            yield snapshot
+        while True:
+            try:
+                message = subscriber.get(timeout=STREAM_HEARTBEAT)
+            except queue.Empty:
+                yield ": keepalive\n\n"
+                continue
+            if message is None:
+                return
+            yield message
+
+    response = Response(generate(), mimetype='text/event-stream')
+    # Runs when the server closes the response, also for a client gone before the first chunk
+    response.call_on_close(lambda: stream_hub.unsubscribe(subscriber))
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# ==================== EXPORT API ====================
+
+# Full-table dumps streamed in primary key order
+EXPORT_QUERIES = {
+    'shipments': (SHIPMENTS_SELECT, 'sh.shipment_id'),
+    'inventory': (INVENTORY_SELECT, 'i.inventory_id'),
+    'alerts': (ALERTS_SELECT, 'alert_id')
+}
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+def export_value(value):
+    """JSON fallback for the column types MySQL returns"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def export_rows(cursor, columns, fmt):
+    """Yield the export body one fetchmany() batch at a time"""
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        yield buffer.getvalue()
+
+    while True:
+        rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+        if not rows:
+            break
+        if fmt == 'csv':
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(rows)
+            yield buffer.getvalue()
+        else:
+            yield ''.join(json.dumps(dict(zip(columns, row)), default=export_value) + '\n' for row in rows)
+
+@app.route('/api/export/<entity>', methods=['GET'])
+def export_table(entity):
+    """Stream a full table as NDJSON or CSV without buffering it in memory"""
+    if entity not in EXPORT_QUERIES:
+        return jsonify({'success': False, 'error': f'Unknown export: {entity}'}), 404
+    fmt = request.args.get('format', 'ndjson').lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'success': False, 'error': 'format must be ndjson or csv'}), 400
+
+    select, order_column = EXPORT_QUERIES[entity]
+    conditions, params = list_filters(entity, export=True)
+    query = f"{select} {where_clause(conditions)} ORDER BY {order_column}"
+
+    # The export holds its own connection for as long as the client keeps reading,
+    # so it is borrowed directly from the pool rather than tied to the request
+    try:
+        conn = db_pool.acquire()
+    except Error as e:
+        log.warning("Export could not get a database connection: %s", e)
+        return jsonify({'success': False, 'error': 'Database unavailable'}), 503
+
+    try:
+        # Unbuffered cursor: rows stay on the server until fetchmany() pulls them
+        cursor = conn.cursor(buffered=False)
+        timed_execute(cursor, query, tuple(params))
+        columns = [column[0] for column in cursor.description]
+    except Exception as e:
+        log.error("Export query failed: %s", e)
+        db_pool.release(conn)
+        return jsonify({'success': False, 'error': 'Database query failed'}), 500
+
+    def cleanup():
+        # Closing with unread rows fails; release() then discards the connection
+        try:
+            cursor.close()
+        except Exception:
+            pass
+        db_pool.release(conn)
+
+    response = Response(export_rows(cursor, columns, fmt), mimetype=EXPORT_FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename={entity}.{fmt}'
+    response.call_on_close(cleanup)
+    return response
+
+@app.cli.command('export-snapshot')
+@click.option('--dir', 'directory', default=SNAPSHOT_DIR, show_default=True, help='snapshot directory')
+@click.option('--table', 'tables', multiple=True, help='export only these tables (repeatable)')
+def export_snapshot_command(directory, tables):
+    """Append changed rows to the Parquet snapshots read by offline_analytics.py (flask --app app export-snapshot)"""
+    started = time.monotonic()
+    exporter = SnapshotExporter(db_pool.connection, directory, batch_size=SNAPSHOT_BATCH_SIZE,
+                                overlap=SNAPSHOT_OVERLAP, execute=timed_execute)
+    written = exporter.export(tables or None)
+    for table, rows in written.items():
+        print(f"  {table}: {rows:,} rows")
+    print(f"✓ Snapshot written to {directory} in {time.monotonic() - started:.1f}s")
+
+# ==================== DATA RETENTION ====================
+
+def run_retention(tables=None):
+    """Archive the rows past their retention window and maintain the monthly partitions (retention.py)"""
+    job = RetentionJob(db_pool.connection, RETENTION_DAYS, batch_size=RETENTION_BATCH_SIZE, pause=RETENTION_BATCH_PAUSE,
+                       target=RETENTION_TARGET, directory=ARCHIVE_DIR, months_ahead=PARTITION_MONTHS_AHEAD,
+                       execute=timed_execute)
+    results = job.run(tables)
+    changed = [table for table in ('shipments', 'alerts') if results.get(table, {}).get('archived')]
+    if changed:
+        bump_table_versions(*changed)
+    return results
+
+@app.cli.command('archive-data')
+@click.option('--table', 'tables', multiple=True, help='archive only these tables (repeatable)')
+def archive_data_command(tables):
+    """Nightly job: move rows past their retention window to the archive and roll the partitions (flask --app app archive-data)"""
+    started = time.monotonic()
+    for table, result in run_retention(tables or None).items():
+        print(f"  {table}: {result['archived']:,} rows before {result['cutoff']} in {result['batches']} batches, "
+              f"partitions +{len(result['partitions_added'])} -{len(result['partitions_dropped'])}")
+    target = ARCHIVE_DIR if RETENTION_TARGET == 'parquet' else 'the archive tables'
+    print(f"✓ Archived to {target} in {time.monotonic() - started:.1f}s")
+
 # ==================== WAREHOUSES API ====================
 
+WAREHOUSES_QUERY = "SELECT * FROM warehouses ORDER BY warehouse_id"
+
 @app.route('/api/warehouses', methods=['GET'])
+@versioned
 def get_warehouses():
     """Get all warehouses"""
     try:
-        query = "SELECT * FROM warehouses ORDER BY warehouse_id"
-        result = db_query(query)
+        result = ref_cache.get('warehouses', 'all', lambda: db_query(WAREHOUSES_QUERY, primary=True))
         if result is not None:
             # If no warehouses exist, return empty array instead of error
             return jsonify({'success': True, 'data': result if result else []})
         return jsonify({'success': False, 'error': 'Database query failed'}), 500
     except Exception as e:
-        print(f"Error in get_warehouses: {e}")
+        log.exception("Error in get_warehouses: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/warehouses', methods=['POST'])
@@ -783,6 +2908,8 @@ def create_warehouse():
     params = (data.get('name'), data.get('location'))
     result = db_query(query, params, fetch=False)
     if result is not None:
+        ref_cache.invalidate('warehouses')
+        bump_table_versions('warehouses')
         return jsonify({'success': True, 'message': 'Warehouse created successfully'})
     return jsonify({'success': False, 'error': 'Failed to create warehouse'}), 500
 
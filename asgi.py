@@ -0,0 +1,600 @@
+"""
+Smart Supply Chain Risk Intelligence - ASGI Application
+Async handlers for the read-only /api/* routes on an aiomysql pool; every other route is served
+by the Flask app through a WSGI bridge. Run it with serve.py (uvicorn).
+"""
+
+import asyncio
+import logging
+import os
+import queue
+import re
+import time
+from functools import wraps
+from urllib.parse import parse_qsl
+
+import aiomysql
+from asgiref.wsgi import WsgiToAsgi
+from pymysql.err import InterfaceError, MySQLError, OperationalError
+from werkzeug.datastructures import MultiDict
+from werkzeug.http import http_date, is_resource_modified, parse_cookie, parse_etags
+
+import app as scri
+from db_router import READ_AFTER_WRITE_COOKIE, pinned_to_primary
+from http_cache import compress, compressible, negotiate_encoding
+from json_codec import Rows
+from ref_cache import MISSING
+from event_stream import StreamFull, format_event
+
+log = logging.getLogger('scri.asgi')
+
+# Async pool; defaults to the size of the sync pool used by the bridged Flask routes
+ASYNC_DB_POOL_SIZE = int(os.getenv('ASYNC_DB_POOL_SIZE', scri.DB_POOL_SIZE))
+ASYNC_DB_POOL_RECYCLE = int(os.getenv('ASYNC_DB_POOL_RECYCLE', 3600))
+
+# Same retry policy as db_query
+MAX_RETRIES = 2
+RETRY_DELAY = 0.5
+
+# How often an /api/stream connection checks its subscriber queue
+STREAM_QUEUE_POLL = 0.25
+
+# MySQL client errors meaning the connection is gone rather than the statement being wrong
+CONNECTION_ERRORS = {2003, 2006, 2013, 2055}
+
+
+class AsyncDatabase:
+    """aiomysql pool with the retry behaviour and instrumentation of app.db_query.
+
+    A replica's pool is given its ``replica`` entry from app.replica_router and the primary's
+    pool as ``fallback``: when the replica connection is lost the replica is marked down and
+    the statement is answered by the primary instead of being retried on the replica.
+    """
+
+    def __init__(self, config, size, recycle, replica=None, fallback=None):
+        self.config = config
+        self.size = size
+        self.recycle = recycle
+        self.replica = replica
+        self.fallback = fallback
+        self.pool = None
+        self._lock = asyncio.Lock()
+
+    async def start(self):
+        async with self._lock:
+            if self.pool is None:
+                self.pool = await aiomysql.create_pool(
+                    host=self.config['host'], port=self.config['port'], user=self.config['user'],
+                    password=self.config['password'], db=self.config['database'],
+                    minsize=1, maxsize=self.size, pool_recycle=self.recycle, autocommit=True
+                )
+        return self.pool
+
+    async def stop(self):
+        if self.pool is not None:
+            self.pool.close()
+            await self.pool.wait_closed()
+            self.pool = None
+
+    def stats(self):
+        if self.pool is None:
+            return {'size': 0, 'idle': 0, 'max_size': self.size}
+        return {'size': self.pool.size, 'idle': self.pool.freesize, 'max_size': self.size}
+
+    async def query(self, query, params=None, route=None, tuples=False):
+        """Rows of a read statement (dicts, or a json_codec.Rows with ``tuples``), or None on failure (logged and counted like db_query)"""
+        query_id, statement = scri.metrics_registry.statement(query)
+        retry_count = 0
+        while True:
+            conn = None
+            try:
+                pool = self.pool or await self.start()
+                conn = await pool.acquire()
+                started = time.perf_counter()
+                async with conn.cursor(aiomysql.Cursor if tuples else aiomysql.DictCursor) as cursor:
+                    await cursor.execute(query, params or ())
+                    rows = await cursor.fetchall()
+                    rows = Rows([column[0] for column in cursor.description], rows) if tuples else list(rows)
+                scri.record_query(query_id, statement, time.perf_counter() - started, len(rows), retry_count, route)
+                scri.db_reads.inc(self.replica.name if self.replica is not None else 'primary')
+                return rows
+            except (OperationalError, InterfaceError) as e:
+                connection_lost = isinstance(e, InterfaceError) or (e.args and e.args[0] in CONNECTION_ERRORS)
+                log.error("Database error query=%s: %s", query_id, e)
+                if connection_lost:
+                    if conn is not None:
+                        conn.close()
+                        scri.db_reconnects.inc()
+                    if self.replica is not None:
+                        scri.replica_router.mark_down(self.replica, e)
+                        return await self.fallback.query(query, params, route, tuples)
+                    if retry_count < MAX_RETRIES:
+                        retry_count += 1
+                        scri.query_retries.inc(query_id)
+                        log.info("Connection error, retrying query (attempt %d/%d)", retry_count, MAX_RETRIES)
+                        await asyncio.sleep(RETRY_DELAY)
+                        continue
+                scri.query_errors.inc(query_id)
+                return None
+            except MySQLError as e:
+                log.error("Database error query=%s: %s", query_id, e)
+                log.debug("Failed statement=%s params=%r", statement[:200], params)
+                scri.query_errors.inc(query_id)
+                return None
+            finally:
+                if conn is not None and self.pool is not None:
+                    self.pool.release(conn)
+
+
+db = AsyncDatabase(scri.DB_CONFIG, ASYNC_DB_POOL_SIZE, ASYNC_DB_POOL_RECYCLE)
+replica_dbs = {replica.name: AsyncDatabase(replica.config, ASYNC_DB_POOL_SIZE, ASYNC_DB_POOL_RECYCLE, replica, db)
+               for replica in scri.replica_router.replicas}
+for _stat in ('size', 'idle'):
+    scri.metrics_registry.gauge(f'scri_async_db_pool_{_stat}', f'Async connection pool {_stat}',
+                                lambda stat=_stat: db.stats()[stat])
+
+# ==================== REQUESTS AND RESPONSES ====================
+
+class AsyncRequest:
+    """The parts of an ASGI HTTP scope the handlers read"""
+
+    def __init__(self, scope, rule, view_args):
+        self.method = scope['method']
+        self.rule = rule
+        self.view_args = view_args
+        self.args = MultiDict(parse_qsl(scope.get('query_string', b'').decode('latin-1'), keep_blank_values=True))
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1')
+                        for name, value in scope.get('headers', [])}
+        self.database = None
+
+
+def reader(req):
+    """Database for a handler's reads: a replica picked by app.replica_router unless the client has just written.
+
+    The pick is kept for the rest of the request, so every read of one request sees the same server.
+    """
+    if req.database is None:
+        req.database = db
+        if scri.replica_router.enabled and not pinned_to_primary(parse_cookie(req.headers.get('cookie', '')).get(READ_AFTER_WRITE_COOKIE)):
+            replica = scri.replica_router.pick()
+            if replica is not None:
+                req.database = replica_dbs[replica.name]
+    return req.database
+
+
+class Reply:
+    """Status, headers and either a complete body or an async iterator of str chunks.
+
+    ``on_close`` is called once a stream has been sent or abandoned, whether or not it was started.
+    """
+
+    def __init__(self, status, body=b'', headers=(), stream=None, on_close=None):
+        self.status = status
+        self.body = body
+        self.headers = list(headers)
+        self.stream = stream
+        self.on_close = on_close
+
+
+def json_reply(payload, status=200, headers=()):
+    """Same body and content type as flask.jsonify"""
+    body = scri.app.json.dumpb(payload) + b'\n'
+    return Reply(status, body, [('Content-Type', 'application/json'), *headers])
+
+
+def error_reply(message, status=500):
+    return json_reply({'success': False, 'error': message}, status)
+
+
+async def cached(namespace, key, load):
+    """app.ref_cache.get for a coroutine ``load``; with a shared tier the cache is called off the event loop"""
+    cache = scri.ref_cache
+    if cache.shared is None:
+        value, token = cache.lookup(namespace, key)
+    else:
+        value, token = await asyncio.to_thread(cache.lookup, namespace, key)
+    if value is not MISSING:
+        return value
+    value = await load()
+    if value is not None:
+        if cache.shared is None:
+            cache.store(namespace, key, value, token)
+        else:
+            await asyncio.to_thread(cache.store, namespace, key, value, token)
+    return value
+
+
+async def list_versions(req):
+    """app.list_versions on the async pools"""
+    query, params = scri.table_versions_query(req.rule)
+    if req.rule in scri.CACHED_VERSION_RULES:
+        return await cached('versions', req.rule, lambda: db.query(query, params, route=req.rule))
+    return await reader(req).query(query, params, route=req.rule)
+
+
+def versioned(handler):
+    """app.versioned for the async handlers: 304 while the client's ETag matches the table versions"""
+    @wraps(handler)
+    async def wrapper(req):
+        etag = scri.list_etag(req.rule, req.args, await list_versions(req))
+        if etag is None:
+            return await handler(req)
+        headers = [('ETag', f'W/"{etag}"'), ('Cache-Control', 'no-cache')]
+        if parse_etags(req.headers.get('if-none-match')).contains_weak(etag):
+            return Reply(304, b'', headers)
+        reply = await handler(req)
+        if reply.status == 200:
+            reply.headers.extend(headers)
+        return reply
+    return wrapper
+
+
+def compress_reply(req, reply):
+    """app.compress_response for a complete async reply"""
+    content_type = next((value for name, value in reply.headers if name.lower() == 'content-type'), '')
+    if reply.stream is not None or reply.status != 200 or not compressible(content_type):
+        return reply
+    reply.headers.append(('Vary', 'Accept-Encoding'))
+    if len(reply.body) < scri.COMPRESS_MIN_SIZE:
+        return reply
+    encoding = negotiate_encoding(req.headers.get('accept-encoding'))
+    if encoding is not None:
+        reply.body = compress(reply.body, encoding)
+        reply.headers.append(('Content-Encoding', encoding))
+    return reply
+
+
+ROUTES = []
+
+
+def route(rule):
+    """Register an async GET handler for a Flask-style rule (only <int:name> converters)"""
+    pattern = re.compile('^' + re.sub(r'<int:(\w+)>', r'(?P<\1>\\d+)', rule) + '$')
+
+    def decorator(handler):
+        ROUTES.append((pattern, rule, handler))
+        return handler
+    return decorator
+
+
+def match_route(method, path):
+    if method != 'GET':
+        return None, None, None
+    for pattern, rule, handler in ROUTES:
+        found = pattern.match(path)
+        if found:
+            return rule, handler, {name: int(value) for name, value in found.groupdict().items()}
+    return None, None, None
+
+# ==================== ASYNC ROUTES ====================
+
+@route('/api/health')
+async def health_check(req):
+    """Health check endpoint"""
+    rows = await db.query("SELECT 1 AS ok", route=req.rule)
+    return json_reply({
+        'success': True,
+        'status': 'ok',
+        'database': 'connected' if rows else 'disconnected',
+        'pool': scri.db_pool.stats(),
+        'async_pool': db.stats(),
+        'read_replicas': scri.replica_router.stats(),
+        'ref_cache': scri.ref_cache.stats(),
+        'alert_pipeline': scri.alert_pipeline.stats(),
+        'stream': scri.stream_hub.stats()
+    })
+
+
+@route('/api/metrics')
+async def prometheus_metrics(req):
+    """Request and query latency histograms in Prometheus text format"""
+    return Reply(200, scri.metrics_registry.render().encode(), [('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')])
+
+
+@route('/api/suppliers')
+@versioned
+async def get_suppliers(req):
+    """Get all suppliers"""
+    result = await cached('suppliers', 'all', lambda: db.query(scri.SUPPLIERS_QUERY, route=req.rule))
+    if result is None:
+        log.warning("Complex suppliers query failed, trying simple query")
+        result = await reader(req).query(scri.SUPPLIERS_FALLBACK_QUERY, route=req.rule)
+    if result is None:
+        log.error("Both suppliers queries failed")
+        return error_reply('Database query failed - unable to fetch suppliers')
+    return json_reply({'success': True, 'data': result})
+
+
+@route('/api/suppliers/<int:supplier_id>')
+async def get_supplier(req):
+    """Get a specific supplier"""
+    supplier_id = req.view_args['supplier_id']
+
+    async def load():
+        return await db.query(scri.SUPPLIER_QUERY, (supplier_id,), route=req.rule) or None
+
+    result = await cached('supplier', supplier_id, load)
+    if result:
+        return json_reply({'success': True, 'data': result[0]})
+    return error_reply('Supplier not found', 404)
+
+
+@route('/api/suppliers/<int:supplier_id>/metrics')
+async def get_supplier_metrics(req):
+    """Get supplier metrics"""
+    result = await reader(req).query(scri.SUPPLIER_METRICS_QUERY, (req.view_args['supplier_id'],), route=req.rule)
+    if result is not None:
+        return json_reply({'success': True, 'data': result})
+    return error_reply('Failed to fetch metrics')
+
+
+async def page_reply(req, build, fallback=None, namespace=None):
+    """Run a *_page_query builder from app.py and answer with one page, kept in app.ref_cache under ``namespace`` if given"""
+    try:
+        query, params, limit, key = build(req.args)
+    except ValueError as e:
+        return error_reply(str(e), 400)
+    if namespace is not None:
+        async def load():
+            return scri.cached_rows(await db.query(query, params, route=req.rule, tuples=True))
+
+        entry = await cached(namespace, scri.page_cache_key(limit, req.args), load)
+        result = Rows(entry['columns'], entry['rows']) if entry is not None else None
+    else:
+        result = await reader(req).query(query, params, route=req.rule, tuples=True)
+    if result is None and fallback is not None:
+        log.warning("Complex %s query failed, trying simple query", req.rule)
+        query, params, limit, key = fallback(req.args)
+        result = await reader(req).query(query, params, route=req.rule, tuples=True)
+    if result is None:
+        return error_reply('Database query failed')
+    return json_reply(scri.page_payload(result, limit, key, req.args.get('shape', 'rows')))
+
+
+@route('/api/products')
+@versioned
+async def get_products(req):
+    """Get a page of products ordered by product_id"""
+    return await page_reply(req, scri.products_page_query, namespace='products')
+
+
+@route('/api/shipments')
+@versioned
+async def get_shipments(req):
+    """Get a page of shipments, newest ship_date first"""
+    return await page_reply(req, scri.shipments_page_query,
+                            lambda args: scri.shipments_page_query(args, select=scri.SHIPMENTS_FALLBACK_SELECT))
+
+
+@route('/api/shipments/<int:shipment_id>/events')
+async def get_shipment_events(req):
+    """Get events for a shipment"""
+    result = await reader(req).query(*scri.shipment_events_query(req.view_args['shipment_id'], req.args), route=req.rule)
+    if result is not None:
+        return json_reply({'success': True, 'data': result})
+    return error_reply('Failed to fetch events')
+
+
+@route('/api/inventory')
+async def get_inventory(req):
+    """Get a page of inventory, most recently updated first"""
+    return await page_reply(req, scri.inventory_page_query)
+
+
+@route('/api/inventory/forecast')
+async def get_inventory_forecast(req):
+    """Get a page of projected stockouts, soonest first"""
+    return await page_reply(req, scri.forecast_page_query)
+
+
+@route('/api/alerts')
+@versioned
+async def get_alerts(req):
+    """Get a page of alerts, newest first"""
+    return await page_reply(req, scri.alerts_page_query)
+
+
+@route('/api/warehouses')
+@versioned
+async def get_warehouses(req):
+    """Get all warehouses"""
+    result = await cached('warehouses', 'all', lambda: db.query(scri.WAREHOUSES_QUERY, route=req.rule))
+    if result is not None:
+        return json_reply({'success': True, 'data': result})
+    return error_reply('Database query failed')
+
+
+async def get_cached_dashboard_metrics(req):
+    """app.get_cached_dashboard_metrics on the async pool, sharing its cache"""
+    cached, generation = scri.peek_dashboard_metrics()
+    if cached is not None:
+        return cached
+    result = await reader(req).query(scri.DASHBOARD_METRICS_QUERY, route=req.rule)
+    if not result:
+        return None
+    return scri.store_dashboard_metrics(result[0], generation)
+
+
+@route('/api/dashboard/metrics')
+async def get_dashboard_metrics(req):
+    """Get dashboard metrics (cached, supports If-None-Match / If-Modified-Since)"""
+    cached = await get_cached_dashboard_metrics(req)
+    if cached is None:
+        return error_reply('Database query failed')
+
+    headers = [('ETag', f'"{cached["etag"]}"'), ('Last-Modified', http_date(cached['last_modified'])),
+               ('Cache-Control', 'no-cache')]
+    environ = {'REQUEST_METHOD': req.method}
+    for header in ('if-none-match', 'if-modified-since'):
+        if header in req.headers:
+            environ['HTTP_' + header.upper().replace('-', '_')] = req.headers[header]
+    if not is_resource_modified(environ, etag=cached['etag'], last_modified=cached['last_modified']):
+        return Reply(304, b'', headers)
+    return json_reply({'success': True, 'data': cached['data']}, headers=headers)
+
+
+@route('/api/dashboard/supplier-risk')
+async def get_supplier_risk_summary(req):
+    """Get supplier risk summary"""
+    result = await reader(req).query(scri.SUPPLIER_RISK_SUMMARY_QUERY, route=req.rule)
+    if result is None:
+        log.warning("Supplier risk view query failed, trying direct query")
+        result = await reader(req).query(scri.SUPPLIER_RISK_FALLBACK_QUERY, route=req.rule)
+    if result is not None:
+        return json_reply({'success': True, 'data': result})
+    return error_reply('Database query failed')
+
+
+@route('/api/dashboard/delayed-shipments')
+async def get_delayed_shipments(req):
+    """Get delayed shipments overview"""
+    result = await reader(req).query(scri.DELAYED_SHIPMENTS_QUERY, route=req.rule)
+    if result is not None:
+        return json_reply({'success': True, 'data': result})
+    return error_reply('Database query failed')
+
+
+async def analytics_reply(req, build):
+    """Run an analytics query builder from app.py against the rollup tables"""
+    try:
+        query, params, payload = build(req.args)
+    except ValueError as e:
+        return error_reply(str(e), 400)
+    result = await reader(req).query(query, params, route=req.rule)
+    if result is None:
+        return error_reply('Database query failed')
+    return json_reply(payload(result))
+
+
+@route('/api/analytics/delay-rate')
+async def get_delay_rate_trend(req):
+    """Shipment delay rate per day or week, overall or for one supplier"""
+    return await analytics_reply(req, scri.delay_rate_query)
+
+
+@route('/api/analytics/alerts')
+async def get_alert_trend(req):
+    """Alerts raised per day or week by severity"""
+    return await analytics_reply(req, scri.alert_trend_query)
+
+
+@route('/api/analytics/stockouts')
+async def get_stockout_trend(req):
+    """Stockout days per warehouse per day or week"""
+    return await analytics_reply(req, scri.stockout_query)
+
+
+@route('/api/stream')
+async def stream_events(req):
+    """Server-Sent Events from the shared StreamHub without holding a thread per client"""
+    cached = await get_cached_dashboard_metrics(req)
+    try:
+        subscriber = scri.stream_hub.subscribe()
+    except StreamFull as e:
+        return error_reply(str(e), 503)
+
+    async def generate():
+        yield f"retry: {scri.STREAM_RETRY_MS}\n\n"
+        if cached:
+            yield format_event('metrics', scri.app.json.dumps(cached['data']))
+        last_sent = time.monotonic()
+        while True:
+            try:
+                message = subscriber.get_nowait()
+            except queue.Empty:
+                if time.monotonic() - last_sent >= scri.STREAM_HEARTBEAT:
+                    last_sent = time.monotonic()
+                    yield ": keepalive\n\n"
+                await asyncio.sleep(STREAM_QUEUE_POLL)
+                continue
+            if message is None:
+                return
+            last_sent = time.monotonic()
+            yield message
+
+    headers = [('Content-Type', 'text/event-stream; charset=utf-8'), ('Cache-Control', 'no-cache'),
+               ('X-Accel-Buffering', 'no')]
+    return Reply(200, headers=headers, stream=generate(),
+                 on_close=lambda: scri.stream_hub.unsubscribe(subscriber))
+
+# ==================== ASGI ENTRY POINT ====================
+
+flask_bridge = WsgiToAsgi(scri.app)
+
+
+async def send_reply(reply, send, receive):
+    headers = [(name.lower().encode('latin-1'), str(value).encode('latin-1')) for name, value in reply.headers]
+    if reply.stream is None:
+        headers.append((b'content-length', str(len(reply.body)).encode()))
+        await send({'type': 'http.response.start', 'status': reply.status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': reply.body})
+        return
+
+    async def pump():
+        async for chunk in reply.stream:
+            await send({'type': 'http.response.body', 'body': chunk.encode(), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def disconnected():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    tasks = []
+    try:
+        await send({'type': 'http.response.start', 'status': reply.status, 'headers': headers})
+        tasks = [asyncio.ensure_future(pump()), asyncio.ensure_future(disconnected())]
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await reply.stream.aclose()
+        if reply.on_close is not None:
+            reply.on_close()
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            try:
+                await db.start()
+                log.info("Async pool connected to MySQL database: %s", scri.DB_CONFIG['database'])
+                for replica_db in replica_dbs.values():
+                    await replica_db.start()
+            except Exception as e:
+                # Like the Flask app, keep serving and connect on the first query
+                log.warning("Async pool could not connect at startup: %s", e)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await db.stop()
+            for replica_db in replica_dbs.values():
+                await replica_db.stop()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    """ASGI callable: async handlers for the hot read routes, the Flask app for everything else"""
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    rule, handler, view_args = match_route(scope['method'], scope['path'])
+    if handler is None:
+        return await flask_bridge(scope, receive, send)
+
+    started = time.perf_counter()
+    req = AsyncRequest(scope, rule, view_args)
+    try:
+        reply = compress_reply(req, await handler(req))
+    except Exception as e:
+        log.exception("Error in %s: %s", handler.__name__, e)
+        reply = error_reply(str(e))
+    # Streamed responses are timed up to the first byte, as in the Flask app
+    elapsed = time.perf_counter() - started
+    scri.request_latency.observe(elapsed, scope['method'], rule, str(reply.status))
+    log.debug("request method=%s route=%s status=%d duration_ms=%.1f", scope['method'], rule, reply.status,
+              elapsed * 1000)
+    await send_reply(reply, send, receive)
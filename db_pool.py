@@ -0,0 +1,183 @@
+"""
+Smart Supply Chain Risk Intelligence - MySQL Connection Pool
+Thread-safe pool of mysql.connector connections shared by the Flask workers
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import mysql.connector
+from mysql.connector import Error
+
+
+class PoolTimeout(Error):
+    """Raised when no connection could be checked out within the wait timeout"""
+
+
+class ConnectionPool:
+    """Bounded pool of MySQL connections with health checks on borrow.
+
+    Connections are created lazily up to ``size``. A borrower that finds the
+    pool exhausted waits up to ``timeout`` seconds for a connection to be
+    returned before giving up with ``PoolTimeout``. Idle connections are only
+    pinged when they have been sitting unused for longer than
+    ``ping_interval`` seconds, so hot connections are handed out without an
+    extra round trip.
+    """
+
+    def __init__(self, config, size=10, timeout=5.0, ping_interval=30.0):
+        self.config = dict(config)
+        self.size = max(1, int(size))
+        self.timeout = float(timeout)
+        self.ping_interval = float(ping_interval)
+
+        self._lock = threading.Condition(threading.Lock())
+        self._idle = deque()  # (connection, returned_at)
+        self._in_use = 0
+
+        # Counters reported through stats()
+        self._created = 0
+        self._discarded = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+
+    def _connect(self):
+        return mysql.connector.connect(
+            host=self.config['host'],
+            database=self.config['database'],
+            user=self.config['user'],
+            password=self.config['password'],
+            port=self.config['port'],
+            autocommit=False,
+            connect_timeout=10
+        )
+
+    def _is_healthy(self, conn, returned_at):
+        """Ping a connection only if it has been idle long enough to go stale"""
+        if time.monotonic() - returned_at < self.ping_interval:
+            return True
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Error:
+            return False
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self, timeout=None):
+        """Check out a connection, waiting up to ``timeout`` seconds for one"""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        waited = False
+
+        with self._lock:
+            while not self._idle and self._in_use >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        msg=f"Timed out after {timeout:.1f}s waiting for a database connection "
+                            f"({self._in_use}/{self.size} in use)"
+                    )
+                waited = True
+                self._lock.wait(remaining)
+
+            if waited:
+                wait_time = time.monotonic() - started
+                self._waits += 1
+                self._wait_time_total += wait_time
+                self._wait_time_max = max(self._wait_time_max, wait_time)
+
+            entry = self._idle.pop() if self._idle else None
+            self._in_use += 1
+            self._checkouts += 1
+
+        # Health checks and connects happen outside the lock
+        try:
+            if entry is not None:
+                conn, returned_at = entry
+                if self._is_healthy(conn, returned_at):
+                    return conn
+                self._close_quietly(conn)
+                with self._lock:
+                    self._discarded += 1
+            conn = self._connect()
+            with self._lock:
+                self._created += 1
+            return conn
+        except Exception:
+            with self._lock:
+                self._in_use -= 1
+                self._lock.notify()
+            raise
+
+    def release(self, conn):
+        """Return a connection to the pool, ending any open transaction"""
+        try:
+            conn.rollback()
+            healthy = True
+        except Exception:
+            healthy = False
+
+        with self._lock:
+            self._in_use -= 1
+            if healthy:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._discarded += 1
+            self._lock.notify()
+
+        if not healthy:
+            self._close_quietly(conn)
+
+    def discard(self, conn):
+        """Drop a broken connection and free its slot for a fresh one"""
+        self._close_quietly(conn)
+        with self._lock:
+            self._in_use -= 1
+            self._discarded += 1
+            self._lock.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Borrow a connection for the duration of a ``with`` block"""
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close_idle(self):
+        """Close every idle connection (e.g. on shutdown)"""
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    def stats(self):
+        """Snapshot of pool usage for /api/health"""
+        with self._lock:
+            return {
+                'size': self.size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'created': self._created,
+                'discarded': self._discarded,
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'timeouts': self._timeouts,
+                'wait_time_total_ms': round(self._wait_time_total * 1000, 2),
+                'wait_time_max_ms': round(self._wait_time_max * 1000, 2),
+                'wait_time_avg_ms': round(self._wait_time_total * 1000 / self._waits, 2) if self._waits else 0.0
+            }
@@ -0,0 +1,189 @@
+"""
+Smart Supply Chain Risk Intelligence - Read Replica Routing
+Picks a healthy, caught-up replica for read statements; everything else stays on the primary
+"""
+
+import logging
+import re
+import threading
+import time
+
+from mysql.connector import Error
+
+log = logging.getLogger('scri.db_router')
+
+# Cookie holding the time (epoch seconds) until which a client that wrote reads from the primary
+READ_AFTER_WRITE_COOKIE = 'scri_primary_until'
+
+# Statements a replica may answer; locking reads, CALLs and writes go to the primary
+READ_STATEMENT = re.compile(r'^\s*(?:\(\s*)*(SELECT|WITH|SHOW)\b', re.IGNORECASE)
+LOCKING_READ = re.compile(r'\bFOR\s+(?:UPDATE|SHARE)\b|\bLOCK\s+IN\s+SHARE\s+MODE\b', re.IGNORECASE)
+
+# Seconds-behind columns of SHOW REPLICA STATUS (8.0.22+) and SHOW SLAVE STATUS
+LAG_COLUMNS = ('Seconds_Behind_Source', 'Seconds_Behind_Master')
+
+
+def is_read_statement(query):
+    """True for a plain SELECT/WITH/SHOW that takes no row locks"""
+    return bool(READ_STATEMENT.match(query)) and not LOCKING_READ.search(query)
+
+
+def parse_replicas(value, primary):
+    """Connection configs for a comma-separated ``host[:port]`` list; user, password and database come from ``primary``"""
+    replicas = []
+    for item in (value or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        host, _, port = item.rpartition(':') if ':' in item else (item, '', '')
+        replicas.append({**primary, 'host': host, 'port': int(port) if port else primary['port']})
+    return replicas
+
+
+def pinned_to_primary(cookie_value, now=None):
+    """Whether a READ_AFTER_WRITE_COOKIE value is still inside its window"""
+    if not cookie_value:
+        return False
+    try:
+        return float(cookie_value) > (time.time() if now is None else now)
+    except ValueError:
+        return False
+
+
+class Replica:
+    """One read replica: its connection pool and the result of the last health check"""
+
+    def __init__(self, config, pool):
+        self.name = f"{config['host']}:{config['port']}"
+        self.config = config
+        self.pool = pool
+        self.healthy = False
+        self.lag = None
+        self.error = None
+        self.checked_at = None
+        self.reads = 0
+
+    def stats(self):
+        return {'name': self.name, 'healthy': self.healthy, 'lag_seconds': self.lag, 'error': self.error,
+                'checked_at': self.checked_at, 'reads': self.reads, 'pool': self.pool.stats()}
+
+
+class ReplicaRouter:
+    """Load-balances reads over the replicas that passed their last health check.
+
+    A background thread checks every replica each ``check_interval`` seconds: it borrows a
+    connection from the replica's pool and reads the replication lag. A replica whose SQL thread
+    is stopped or that is more than ``max_lag`` seconds behind is left out until a later check
+    passes; a server with no replication status (a standalone copy) counts as caught up.
+    ``pick`` returns the healthy replica with the fewest borrowed connections, rotating between
+    equally busy ones, or None when reads should stay on the primary. Replicas start unchecked,
+    so reads use the primary until the first check has run.
+    """
+
+    def __init__(self, configs, make_pool, max_lag=5.0, check_interval=5.0, check_timeout=2.0):
+        self.replicas = [Replica(config, make_pool(config)) for config in configs]
+        self.max_lag = float(max_lag)
+        self.check_interval = float(check_interval)
+        self.check_timeout = float(check_timeout)
+
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopping = threading.Event()
+        self._turn = 0
+        self._primary_reads = 0
+
+    @property
+    def enabled(self):
+        return bool(self.replicas)
+
+    def start(self):
+        with self._lock:
+            if self.replicas and (self._thread is None or not self._thread.is_alive()):
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name='replica-health', daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        for replica in self.replicas:
+            replica.pool.close_idle()
+
+    def pick(self):
+        """Healthy replica to read from, or None (counted as a primary read)"""
+        if not self.replicas:
+            return None
+        self.start()
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        with self._lock:
+            if not healthy:
+                self._primary_reads += 1
+                return None
+            self._turn = (self._turn + 1) % len(healthy)
+            rotated = healthy[self._turn:] + healthy[:self._turn]
+            replica = min(rotated, key=lambda candidate: candidate.pool.stats()['in_use'])
+            replica.reads += 1
+        return replica
+
+    def find(self, name):
+        return next((replica for replica in self.replicas if replica.name == name), None)
+
+    def mark_down(self, replica, error):
+        """Stop routing to ``replica`` until its next successful health check"""
+        if replica.healthy:
+            log.warning("Replica %s marked down: %s", replica.name, error)
+        replica.healthy = False
+        replica.error = str(error)
+
+    def check(self):
+        """Run one health check of every replica"""
+        for replica in self.replicas:
+            try:
+                lag = self._lag(replica)
+            except Error as e:
+                replica.lag = None
+                self.mark_down(replica, e)
+            else:
+                replica.lag = lag
+                healthy = lag is not None and lag <= self.max_lag
+                if healthy != replica.healthy:
+                    log.info("Replica %s %s (lag %ss)", replica.name, 'available' if healthy else 'lagging', lag)
+                replica.healthy = healthy
+                replica.error = None if healthy else ('replication stopped' if lag is None else 'lagging')
+            replica.checked_at = time.time()
+
+    def stats(self):
+        with self._lock:
+            primary_reads = self._primary_reads
+        return {'max_lag_seconds': self.max_lag, 'primary_reads': primary_reads,
+                'replicas': [replica.stats() for replica in self.replicas]}
+
+    def _lag(self, replica):
+        """Seconds behind the source, 0 for a server that is not replicating, None if replication is stopped"""
+        with replica.pool.connection(self.check_timeout) as conn:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                try:
+                    cursor.execute('SHOW REPLICA STATUS')
+                except Error:
+                    cursor.execute('SHOW SLAVE STATUS')  # before 8.0.22
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
+        if not rows:
+            return 0
+        for column in LAG_COLUMNS:
+            if column in rows[0]:
+                lag = rows[0][column]
+                return None if lag is None else int(lag)
+        return None
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self.check()
+            except Exception:
+                log.exception("Replica health check failed")
+            self._stopping.wait(self.check_interval)
@@ -0,0 +1,269 @@
+"""
+Smart Supply Chain Risk Intelligence - Shipment ETA Model
+Per-lane arrival delay model trained offline from delivered shipments, and a vectorized scorer for shipments in transit
+"""
+
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+
+MODEL_FILE = 'eta_model.npz'
+META_FILE = 'eta_model.json'
+
+# Event types that mark a shipment as at risk of running late
+RISK_EVENT_TYPES = ('DELAY_RISK',)
+
+# Delivered shipments per lane (supplier → warehouse) and whether their timeline had a risk event:
+# count, days late in total (early arrivals count negative) and how many arrived late
+TRAINING_QUERY = f"""
+    SELECT t.supplier_id, t.warehouse_id, t.delay_risk, COUNT(*) AS shipments,
+           SUM(t.delay_days) AS delay_day_sum, SUM(t.delay_days > 0) AS late_count
+    FROM (
+        SELECT sh.supplier_id, sh.warehouse_id, DATEDIFF(sh.actual_arrival_date, sh.expected_arrival_date) AS delay_days,
+               EXISTS(SELECT 1 FROM shipment_events ev
+                      WHERE ev.shipment_id = sh.shipment_id
+                        AND ev.event_type IN ({', '.join(f"'{t}'" for t in RISK_EVENT_TYPES)})) AS delay_risk
+        FROM shipments sh
+        WHERE sh.status = 'DELIVERED' AND sh.actual_arrival_date IS NOT NULL AND sh.ship_date >= %s
+    ) t
+    GROUP BY t.supplier_id, t.warehouse_id, t.delay_risk
+"""
+
+# One keyset batch of in-transit shipments with their risk-event flag and previous score
+SCORING_QUERY = f"""
+    SELECT sh.shipment_id, sh.supplier_id, sh.warehouse_id, sh.ship_date, sh.expected_arrival_date,
+           EXISTS(SELECT 1 FROM shipment_events ev
+                  WHERE ev.shipment_id = sh.shipment_id
+                    AND ev.event_type IN ({', '.join(f"'{t}'" for t in RISK_EVENT_TYPES)})) AS delay_risk,
+           e.delay_probability AS previous_probability
+    FROM shipments sh
+    LEFT JOIN shipment_eta e ON e.shipment_id = sh.shipment_id
+    WHERE sh.status = 'IN_TRANSIT' {{after}}
+    ORDER BY sh.ship_date, sh.shipment_id
+    LIMIT %s
+"""
+
+ETA_COLUMNS = ('shipment_id', 'predicted_arrival_date', 'predicted_delay_days', 'delay_probability',
+               'model_version', 'scored_at')
+
+
+def column(rows, key, dtype):
+    return np.fromiter((row[key] or 0 for row in rows), dtype=dtype, count=len(rows))
+
+
+def lookup(sorted_keys, keys):
+    """Index of every key in ``sorted_keys``, -1 where it is missing"""
+    if not len(sorted_keys):
+        return np.full(len(keys), -1, dtype=np.int64)
+    slots = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+    return np.where(sorted_keys[slots] == keys, slots, -1)
+
+
+def shrink(keys, flags, counts, sums, prior, prior_weight):
+    """Per-key estimates for both flag values, pulled toward ``prior`` (indexed like the distinct
+    keys, or one value per flag) by ``prior_weight`` pseudo-shipments"""
+    distinct, inverse = np.unique(keys, return_inverse=True)
+    n = np.zeros((len(distinct), 2))
+    total = np.zeros((len(distinct), 2))
+    np.add.at(n, (inverse, flags), counts)
+    np.add.at(total, (inverse, flags), sums)
+    prior = np.broadcast_to(prior, n.shape)
+    return distinct, inverse, (total + prior_weight * prior) / (n + prior_weight)
+
+
+class EtaModel:
+    """Expected delay (days after expected_arrival_date) and probability of arriving late.
+
+    Estimates are kept per lane (supplier → warehouse), per supplier, per warehouse and overall,
+    each split by whether the shipment has had a risk event (``RISK_EVENT_TYPES``). Lane
+    estimates are shrunk toward their supplier's and supplier/warehouse estimates toward the
+    overall ones by ``prior_weight`` pseudo-shipments, so thin lanes borrow from their parents.
+    A shipment is scored from the most specific level that has seen its lane, supplier or
+    warehouse. The model is a handful of NumPy arrays saved as ``eta_model.npz``.
+    """
+
+    LEVELS = ('lane', 'supplier', 'warehouse')
+
+    def __init__(self, arrays, meta):
+        self.arrays = arrays
+        self.meta = meta
+
+    @property
+    def version(self):
+        return self.meta['version']
+
+    @classmethod
+    def train(cls, rows, prior_weight=20.0):
+        """Fit the model to TRAINING_QUERY rows"""
+        supplier = column(rows, 'supplier_id', np.int64)
+        warehouse = column(rows, 'warehouse_id', np.int64)
+        flags = column(rows, 'delay_risk', np.int64).clip(0, 1)
+        counts = column(rows, 'shipments', np.float64)
+        delay = column(rows, 'delay_day_sum', np.float64)
+        late = column(rows, 'late_count', np.float64)
+
+        n = np.bincount(flags, weights=counts, minlength=2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            overall = {'delay': np.where(n > 0, np.bincount(flags, weights=delay, minlength=2) / n, 0.0),
+                       'late': np.where(n > 0, np.bincount(flags, weights=late, minlength=2) / n, 0.0)}
+        # With no risk-flagged history at all, flagged shipments are scored like the rest
+        for target in overall.values():
+            if not n[1]:
+                target[1] = target[0]
+
+        arrays = {'overall_delay': overall['delay'], 'overall_late': overall['late']}
+        for name, keys in (('supplier', supplier), ('warehouse', warehouse)):
+            arrays[f'{name}_keys'], _, arrays[f'{name}_delay'] = shrink(keys, flags, counts, delay, overall['delay'], prior_weight)
+            _, _, arrays[f'{name}_late'] = shrink(keys, flags, counts, late, overall['late'], prior_weight)
+
+        lanes = (supplier << 32) | warehouse
+        lane_keys = np.unique(lanes)
+        parent = np.searchsorted(arrays['supplier_keys'], lane_keys >> 32)
+        arrays['lane_keys'], _, arrays['lane_delay'] = shrink(lanes, flags, counts, delay, arrays['supplier_delay'][parent], prior_weight)
+        _, _, arrays['lane_late'] = shrink(lanes, flags, counts, late, arrays['supplier_late'][parent], prior_weight)
+
+        trained_at = datetime.now().replace(microsecond=0)
+        meta = {'version': trained_at.strftime('%Y%m%d%H%M%S'), 'trained_at': trained_at.isoformat(),
+                'shipments': int(counts.sum()), 'lanes': int(len(lane_keys)), 'prior_weight': prior_weight,
+                'overall_delay_days': [round(float(v), 3) for v in overall['delay']],
+                'overall_late_rate': [round(float(v), 4) for v in overall['late']]}
+        return cls(arrays, meta)
+
+    def save(self, directory):
+        """Write the model files to ``directory`` (replacing the previous model atomically)"""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, MODEL_FILE)
+        with open(path + '.tmp', 'wb') as f:
+            np.savez_compressed(f, **self.arrays)
+        with open(os.path.join(directory, META_FILE) + '.tmp', 'w') as f:
+            json.dump(self.meta, f, indent=2)
+        os.replace(path + '.tmp', path)
+        os.replace(os.path.join(directory, META_FILE) + '.tmp', os.path.join(directory, META_FILE))
+
+    @classmethod
+    def load(cls, directory):
+        """Model saved in ``directory``, or None if none has been trained"""
+        path = os.path.join(directory, MODEL_FILE)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in data.files}
+        with open(os.path.join(directory, META_FILE)) as f:
+            meta = json.load(f)
+        return cls(arrays, meta)
+
+    def predict(self, supplier_ids, warehouse_ids, delay_risk):
+        """(expected delay days, probability of arriving late) for each shipment"""
+        flags = np.asarray(delay_risk, dtype=np.int64).clip(0, 1)
+        delay = self.arrays['overall_delay'][flags].copy()
+        late = self.arrays['overall_late'][flags].copy()
+        keys = {'lane': (np.asarray(supplier_ids, dtype=np.int64) << 32) | np.asarray(warehouse_ids, dtype=np.int64),
+                'supplier': np.asarray(supplier_ids, dtype=np.int64),
+                'warehouse': np.asarray(warehouse_ids, dtype=np.int64)}
+        done = np.zeros(len(flags), dtype=bool)
+        for level in self.LEVELS:
+            index = lookup(self.arrays[f'{level}_keys'], keys[level])
+            use = (index >= 0) & ~done
+            delay[use] = self.arrays[f'{level}_delay'][index[use], flags[use]]
+            late[use] = self.arrays[f'{level}_late'][index[use], flags[use]]
+            done |= use
+        return delay, late
+
+
+class EtaScorer:
+    """Re-scores every IN_TRANSIT shipment with an ``EtaModel`` into shipment_eta.
+
+    Shipments are read in keyset batches of ``read_batch_size`` (ship_date, shipment_id) and
+    scored a batch at a time with array operations; scores are written with multi-row upserts of
+    ``batch_size`` rows. A shipment already past its expected arrival date is late for certain
+    and is predicted to arrive no earlier than tomorrow. Every method takes a dictionary cursor;
+    committing is left to the caller.
+    """
+
+    def __init__(self, model, execute=None, batch_size=1000, read_batch_size=50000, alert_probability=0.7):
+        self.model = model
+        self.execute = execute or (lambda cursor, query, params=None: cursor.execute(query, params or ()))
+        self.batch_size = max(1, int(batch_size))
+        self.read_batch_size = max(1, int(read_batch_size))
+        self.alert_probability = alert_probability
+
+    def batches(self, cursor):
+        """Yield in-transit shipment rows one keyset batch at a time"""
+        last = None
+        while True:
+            if last is None:
+                after, params = '', ()
+            else:
+                after = 'AND (sh.ship_date > %s OR (sh.ship_date = %s AND sh.shipment_id > %s))'
+                params = (last['ship_date'], last['ship_date'], last['shipment_id'])
+            self.execute(cursor, SCORING_QUERY.format(after=after), (*params, self.read_batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                return
+            yield rows
+            if len(rows) < self.read_batch_size:
+                return
+            last = rows[-1]
+
+    def score_rows(self, rows, today):
+        """Scores of a batch as arrays: shipment_id, predicted arrival (datetime64[D]), delay days, probability"""
+        shipment_ids = column(rows, 'shipment_id', np.int64)
+        expected = np.array([row['expected_arrival_date'] for row in rows], dtype='datetime64[D]')
+        delay, probability = self.model.predict(column(rows, 'supplier_id', np.int64),
+                                                column(rows, 'warehouse_id', np.int64),
+                                                column(rows, 'delay_risk', np.int64))
+        overdue = (np.datetime64(today, 'D') - expected).astype(np.int64)
+        late = overdue > 0
+        delay = np.where(late, np.maximum(delay, overdue + 1), delay)
+        probability = np.where(late, 1.0, np.clip(probability, 0.0, 1.0))
+        days = np.round(delay).astype(np.int64)
+        return shipment_ids, expected + days.astype('timedelta64[D]'), np.round(delay, 2), np.round(probability, 4)
+
+    def score(self, cursor, commit=None):
+        """Score every in-transit shipment; returns (summary, ids newly at or over alert_probability).
+        ``commit`` is called after each written batch."""
+        now = self._now(cursor)
+        summary = {'scored': 0, 'likely_delayed': 0, 'scored_at': now}
+        crossed = []
+        for rows in self.batches(cursor):
+            shipment_ids, arrival, delay, probability = self.score_rows(rows, now.date())
+            self.write(cursor, shipment_ids, arrival, delay, probability, now)
+            if commit:
+                commit()
+
+            summary['scored'] += len(rows)
+            if self.alert_probability is not None:
+                previous = np.fromiter((-1.0 if row['previous_probability'] is None else row['previous_probability']
+                                        for row in rows), dtype=np.float64, count=len(rows))
+                likely = probability >= self.alert_probability
+                summary['likely_delayed'] += int(likely.sum())
+                crossed.extend(shipment_ids[likely & (previous < self.alert_probability)].tolist())
+        return summary, crossed
+
+    def write(self, cursor, shipment_ids, arrival, delay, probability, scored_at):
+        rows = list(zip(shipment_ids.tolist(), arrival.tolist(), delay.tolist(), probability.tolist(),
+                        [self.model.version] * len(shipment_ids), [scored_at] * len(shipment_ids)))
+        placeholder = '(' + ', '.join(['%s'] * len(ETA_COLUMNS)) + ')'
+        for start in range(0, len(rows), self.batch_size):
+            chunk = rows[start:start + self.batch_size]
+            self.execute(cursor, f"""
+                INSERT INTO shipment_eta ({', '.join(ETA_COLUMNS)})
+                VALUES {', '.join([placeholder] * len(chunk))}
+                ON DUPLICATE KEY UPDATE {', '.join(f'{c} = VALUES({c})' for c in ETA_COLUMNS[1:])}
+            """, tuple(value for row in chunk for value in row))
+
+    def prune(self, cursor, scored_at):
+        """Drop scores of shipments that were not re-scored (no longer in transit)"""
+        self.execute(cursor, "DELETE FROM shipment_eta WHERE scored_at < %s", (scored_at,))
+
+    def _now(self, cursor):
+        self.execute(cursor, "SELECT NOW() AS now")
+        return cursor.fetchall()[0]['now']
+
+
+def train_model(cursor, since, prior_weight=20.0, execute=None):
+    """Train an EtaModel on shipments delivered from ``since`` on"""
+    (execute or (lambda c, q, p=None: c.execute(q, p or ())))(cursor, TRAINING_QUERY, (since,))
+    return EtaModel.train(cursor.fetchall(), prior_weight=prior_weight)
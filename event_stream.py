@@ -0,0 +1,118 @@
+"""
+Smart Supply Chain Risk Intelligence - Server-Sent Events Hub
+One shared change-detection loop fanning events out to every connected /api/stream client
+"""
+
+import json
+import logging
+import queue
+import threading
+import time
+
+log = logging.getLogger('scri.stream')
+
+
+class StreamFull(Exception):
+    """Raised when the hub already serves max_clients subscribers"""
+
+
+def format_event(event, data):
+    """Encode one SSE message"""
+    return f"event: {event}\ndata: {data if isinstance(data, str) else json.dumps(data)}\n\n"
+
+
+class StreamHub:
+    """Fan-out of change events to SSE subscribers.
+
+    A single background loop calls ``poll()`` every ``interval`` seconds (or sooner after
+    ``notify()``, but never more often than every ``min_interval`` seconds) while at least
+    one client is subscribed, so the database sees the same load for one open tab as for a
+    hundred. ``poll()`` returns a list of already encoded SSE messages; ``start()`` is called whenever the loop (re)starts so the caller can
+    reset its change watermarks. A subscriber whose queue fills up is disconnected and
+    resynchronises when its EventSource reconnects.
+    """
+
+    def __init__(self, poll, start=None, interval=2.0, min_interval=0.5, max_clients=100, queue_size=100):
+        self.poll = poll
+        self.on_start = start
+        self.interval = float(interval)
+        self.min_interval = float(min_interval)
+        self.max_clients = int(max_clients)
+        self.queue_size = int(queue_size)
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._subscribers = set()
+        self._thread = None
+        self._polls = 0
+        self._messages = 0
+        self._dropped_clients = 0
+
+    def subscribe(self):
+        """Register a client and return the queue its messages arrive on"""
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            if len(self._subscribers) >= self.max_clients:
+                raise StreamFull(f'{self.max_clients} stream clients already connected')
+            self._subscribers.add(subscriber)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='event-stream', daemon=True)
+                self._thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def notify(self):
+        """Run the change-detection loop now instead of waiting for the next interval"""
+        self._wake.set()
+
+    def stats(self):
+        with self._lock:
+            return {'clients': len(self._subscribers), 'polls': self._polls, 'messages': self._messages,
+                    'dropped_clients': self._dropped_clients}
+
+    def _run(self):
+        if self.on_start:
+            try:
+                self.on_start()
+            except Exception:
+                log.exception("Stream start hook failed")
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                messages = self.poll()
+            except Exception:
+                log.exception("Stream change detection failed")
+                continue
+            self._broadcast(messages)
+            time.sleep(self.min_interval)
+
+    def _broadcast(self, messages):
+        with self._lock:
+            self._polls += 1
+            subscribers = list(self._subscribers)
+        if not messages:
+            return
+        for subscriber in subscribers:
+            try:
+                for message in messages:
+                    subscriber.put_nowait(message)
+            except queue.Full:
+                with self._lock:
+                    self._subscribers.discard(subscriber)
+                    self._dropped_clients += 1
+                # Wake the client's generator so it notices and closes the connection
+                try:
+                    subscriber.get_nowait()
+                    subscriber.put_nowait(None)
+                except (queue.Empty, queue.Full):
+                    pass
+        with self._lock:
+            self._messages += len(messages) * len(subscribers)
@@ -0,0 +1,342 @@
+"""
+Smart Supply Chain Risk Intelligence - Exposure Graph
+In-memory supplier → inventory position graph answering "what if this supplier fails" for one or all suppliers
+"""
+
+from datetime import timedelta
+
+import numpy as np
+
+SUPPLIERS_QUERY = "SELECT supplier_id, name FROM suppliers WHERE supplier_id > %s ORDER BY supplier_id"
+
+# Inventory positions with the catalog supplier and lead time of their product
+POSITIONS_QUERY = """
+    SELECT i.inventory_id, i.product_id, i.warehouse_id, i.quantity, i.safety_stock,
+           p.supplier_id, COALESCE(p.lead_time_days, 0) AS lead_time_days
+    FROM inventory i
+    JOIN products p ON p.product_id = i.product_id
+    {where}
+"""
+
+# Per supplier and position: quantity still on its way, and quantity delivered since the start of
+# the demand window (stock is assumed to turn over at the rate it has been replenished)
+SHIPMENT_FLOWS_QUERY = """
+    SELECT supplier_id, product_id, warehouse_id,
+           SUM(IF(status IN ('CREATED', 'IN_TRANSIT', 'DELAYED'), quantity, 0)) AS open_quantity,
+           SUM(IF(status = 'DELIVERED' AND ship_date >= %s, quantity, 0)) AS delivered_quantity
+    FROM shipments
+    WHERE (status IN ('CREATED', 'IN_TRANSIT', 'DELAYED') OR ship_date >= %s) {positions}
+    GROUP BY supplier_id, product_id, warehouse_id
+"""
+
+CHANGED_SHIPMENT_POSITIONS_QUERY = "SELECT DISTINCT product_id, warehouse_id FROM shipments WHERE updated_at >= %s"
+
+# Position columns kept as parallel arrays, indexed by position number
+POSITION_COLUMNS = {
+    'inventory_id': np.int64, 'product_id': np.int64, 'warehouse_id': np.int64,
+    'quantity': np.float64, 'safety_stock': np.float64, 'supplier_id': np.int64, 'lead_time_days': np.float64
+}
+
+
+def position_keys(product_ids, warehouse_ids):
+    """One int64 key per (product_id, warehouse_id) pair"""
+    return (np.asarray(product_ids, dtype=np.int64) << 32) | np.asarray(warehouse_ids, dtype=np.int64)
+
+
+def days_until(stock, safety_stock, demand):
+    """Days until ``stock`` used at ``demand`` units/day falls below ``safety_stock`` (0 when it
+    already is, inf when there is no demand)"""
+    headroom = stock - safety_stock
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days = np.where(demand > 0, np.maximum(headroom, 0) / demand, np.inf)
+    return np.where(headroom < 0, 0.0, days)
+
+
+def group_first(keys, days):
+    """(distinct keys, count, smallest days) for ``days`` grouped by ``keys``"""
+    order = np.lexsort((days, keys))
+    keys, days = keys[order], days[order]
+    distinct, first, counts = np.unique(keys, return_index=True, return_counts=True)
+    return distinct, counts, days[first]
+
+
+def plain_days(days):
+    return None if np.isinf(days) else round(float(days), 1)
+
+
+class ExposureGraph:
+    """Suppliers linked to the inventory positions (product × warehouse) that depend on them.
+
+    A supplier is linked to every position of the products it is the catalog supplier of, and
+    to every position it has open shipments (CREATED, IN_TRANSIT, DELAYED) heading to. Links are
+    flat NumPy arrays sorted by supplier with per-supplier start/end offsets, so one supplier's
+    positions are a slice and a sweep over every supplier is a handful of array operations.
+
+    When a supplier fails its open shipments are lost and, for its catalog products, nothing
+    replaces the stock; a position drops below safety stock after (quantity + remaining inbound
+    - safety_stock) / daily demand days. It is at risk when that happens before another order
+    could arrive: never for the catalog supplier's products, within the product's lead time for
+    a position that only loses an inbound shipment. Daily demand is the quantity delivered to the
+    position over the last ``demand_days`` days.
+
+    ``load()`` reads everything; ``refresh()`` re-reads the positions whose inventory row or
+    shipments changed since the previous call (inventory.last_updated, shipments.updated_at),
+    ``overlap`` seconds early to catch late commits. Both take a dictionary cursor.
+    """
+
+    def __init__(self, execute=None, batch_size=1000, demand_days=90, overlap=60):
+        self.execute = execute or (lambda cursor, query, params=None: cursor.execute(query, params or ()))
+        self.batch_size = max(1, int(batch_size))
+        self.demand_days = max(1, int(demand_days))
+        self.overlap = int(overlap)
+        self._reset()
+
+    def _reset(self):
+        self.watermark = None
+        self.supplier_names = {}
+        self.supplier_ids = np.zeros(0, dtype=np.int64)
+        self.positions = {column: np.zeros(0, dtype=dtype) for column, dtype in POSITION_COLUMNS.items()}
+        self.inbound = np.zeros(0, dtype=np.float64)
+        self.demand = np.zeros(0, dtype=np.float64)
+        self._keys = np.zeros(0, dtype=np.int64)
+        self._key_order = np.zeros(0, dtype=np.int64)
+        self.edge_supplier = np.zeros(0, dtype=np.int64)
+        self.edge_position = np.zeros(0, dtype=np.int64)
+        self.edge_open = np.zeros(0, dtype=np.float64)
+        self._index_edges()
+
+    def _chunks(self, items):
+        items = list(items)
+        for start in range(0, len(items), self.batch_size):
+            yield items[start:start + self.batch_size]
+
+    def _fetch(self, cursor, query, params=()):
+        self.execute(cursor, query, params)
+        return cursor.fetchall()
+
+    @property
+    def position_count(self):
+        return len(self._keys)
+
+    @property
+    def edge_count(self):
+        return len(self.edge_supplier)
+
+    # ---- building ----
+
+    def load(self, cursor):
+        """(Re)build the whole graph"""
+        now = self._fetch(cursor, "SELECT NOW() AS now")[0]['now']
+        self._reset()
+        self._add_suppliers(self._fetch(cursor, SUPPLIERS_QUERY, (0,)))
+        touched = self._upsert_positions(self._fetch(cursor, POSITIONS_QUERY.format(where='')))
+        start = self._demand_start(now)
+        self._apply_flows(self._fetch(cursor, SHIPMENT_FLOWS_QUERY.format(positions=''), (start, start)), touched)
+        self.watermark = now
+        return len(touched)
+
+    def refresh(self, cursor):
+        """Apply the inventory and shipment changes since the last load/refresh; returns positions re-read"""
+        if self.watermark is None:
+            return self.load(cursor)
+        now = self._fetch(cursor, "SELECT NOW() AS now")[0]['now']
+        since = self.watermark - timedelta(seconds=self.overlap)
+
+        known = int(self.supplier_ids[-1]) if len(self.supplier_ids) else 0
+        self._add_suppliers(self._fetch(cursor, SUPPLIERS_QUERY, (known,)))
+
+        rows = self._fetch(cursor, POSITIONS_QUERY.format(where='WHERE i.last_updated >= %s'), (since,))
+        pairs = {(row['product_id'], row['warehouse_id']) for row in self._fetch(cursor, CHANGED_SHIPMENT_POSITIONS_QUERY, (since,))}
+        pairs.difference_update((row['product_id'], row['warehouse_id']) for row in rows)
+        # Positions that only saw shipment changes are re-read too, for their catalog supplier and lead time
+        for chunk in self._chunks(sorted(pairs)):
+            rows.extend(self._fetch(cursor, POSITIONS_QUERY.format(
+                where=f"WHERE (i.product_id, i.warehouse_id) IN ({', '.join(['(%s, %s)'] * len(chunk))})"),
+                tuple(value for pair in chunk for value in pair)))
+        touched = self._upsert_positions(rows)
+
+        start = self._demand_start(now)
+        flows = []
+        for chunk in self._chunks(touched):
+            pairs = zip(self.positions['product_id'][chunk].tolist(), self.positions['warehouse_id'][chunk].tolist())
+            flows.extend(self._fetch(cursor, SHIPMENT_FLOWS_QUERY.format(
+                positions=f"AND (product_id, warehouse_id) IN ({', '.join(['(%s, %s)'] * len(chunk))})"),
+                (start, start, *(value for pair in pairs for value in pair))))
+        self._apply_flows(flows, touched)
+        self.watermark = now
+        return len(touched)
+
+    def _demand_start(self, now):
+        return (now - timedelta(days=self.demand_days)).date()
+
+    def _add_suppliers(self, rows):
+        if not rows:
+            return
+        self.supplier_names.update((row['supplier_id'], row['name']) for row in rows)
+        self.supplier_ids = np.union1d(self.supplier_ids, [row['supplier_id'] for row in rows]).astype(np.int64)
+        self._index_edges()
+
+    def _find(self, keys):
+        """Position number of every key, -1 for unknown keys"""
+        if not len(self._keys):
+            return np.full(len(keys), -1, dtype=np.int64)
+        sorted_keys = self._keys[self._key_order]
+        slots = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+        return np.where(sorted_keys[slots] == keys, self._key_order[slots], -1)
+
+    def _upsert_positions(self, rows):
+        """Store position rows, appending unknown ones; returns their position numbers"""
+        if not rows:
+            return np.zeros(0, dtype=np.int64)
+        values = {column: np.fromiter((row[column] or 0 for row in rows), dtype=dtype, count=len(rows))
+                  for column, dtype in POSITION_COLUMNS.items()}
+        keys = position_keys(values['product_id'], values['warehouse_id'])
+        found = self._find(keys)
+
+        known = found >= 0
+        for column in POSITION_COLUMNS:
+            self.positions[column][found[known]] = values[column][known]
+
+        new_keys, first = np.unique(keys[~known], return_index=True)
+        if len(new_keys):
+            new_rows = np.flatnonzero(~known)[first]
+            for column in POSITION_COLUMNS:
+                self.positions[column] = np.concatenate([self.positions[column], values[column][new_rows]])
+            self.inbound = np.concatenate([self.inbound, np.zeros(len(new_keys))])
+            self.demand = np.concatenate([self.demand, np.zeros(len(new_keys))])
+            self._keys = np.concatenate([self._keys, new_keys])
+            self._key_order = np.argsort(self._keys, kind='stable')
+        return np.unique(self._find(keys))
+
+    def _apply_flows(self, rows, touched):
+        """Replace inbound, demand and links of the ``touched`` positions from shipment flow rows"""
+        touched = np.asarray(touched, dtype=np.int64)
+        self.inbound[touched] = 0
+        self.demand[touched] = 0
+
+        count = len(rows)
+        supplier = np.fromiter((row['supplier_id'] for row in rows), dtype=np.int64, count=count)
+        position = self._find(position_keys(
+            np.fromiter((row['product_id'] for row in rows), dtype=np.int64, count=count),
+            np.fromiter((row['warehouse_id'] for row in rows), dtype=np.int64, count=count)))
+        open_quantity = np.fromiter((row['open_quantity'] or 0 for row in rows), dtype=np.float64, count=count)
+        delivered = np.fromiter((row['delivered_quantity'] or 0 for row in rows), dtype=np.float64, count=count)
+        # Shipments to a product/warehouse pair without an inventory row have no stock to protect
+        has_position = position >= 0
+        supplier, position = supplier[has_position], position[has_position]
+        open_quantity, delivered = open_quantity[has_position], delivered[has_position]
+
+        np.add.at(self.inbound, position, open_quantity)
+        np.add.at(self.demand, position, delivered / self.demand_days)
+
+        # New links: open shipments, plus every touched position's catalog supplier
+        inbound_links = open_quantity > 0
+        supplier = np.concatenate([supplier[inbound_links], self.positions['supplier_id'][touched]])
+        position = np.concatenate([position[inbound_links], touched])
+        open_quantity = np.concatenate([open_quantity[inbound_links], np.zeros(len(touched))])
+        links, inverse = np.unique((supplier << 32) | position, return_inverse=True)
+
+        keep = ~np.isin(self.edge_position, touched)
+        self.edge_supplier = np.concatenate([self.edge_supplier[keep], links >> 32])
+        self.edge_position = np.concatenate([self.edge_position[keep], links & 0xFFFFFFFF])
+        self.edge_open = np.concatenate([self.edge_open[keep], np.bincount(inverse, weights=open_quantity,
+                                                                           minlength=len(links))])
+        self.supplier_ids = np.union1d(self.supplier_ids, self.edge_supplier).astype(np.int64)
+        self._index_edges()
+
+    def _index_edges(self):
+        """Sort links by supplier and compute each supplier's [start, end) slice"""
+        order = np.argsort(self.edge_supplier, kind='stable')
+        self.edge_supplier = self.edge_supplier[order]
+        self.edge_position = self.edge_position[order]
+        self.edge_open = self.edge_open[order]
+        self.edge_index = np.searchsorted(self.supplier_ids, self.edge_supplier)
+        self.starts = np.searchsorted(self.edge_supplier, self.supplier_ids, side='left')
+        self.ends = np.searchsorted(self.edge_supplier, self.supplier_ids, side='right')
+
+    # ---- what-if ----
+
+    def _evaluate(self, supplier, position, lost, horizon):
+        """Days to safety stock and at-risk flag of each link if its supplier fails"""
+        stock = self.positions['quantity'][position] + self.inbound[position] - lost
+        days = days_until(stock, self.positions['safety_stock'][position], self.demand[position])
+        sole = self.positions['supplier_id'][position] == supplier
+        cover = np.where(sole, np.inf, self.positions['lead_time_days'][position])
+        at_risk = (days < cover) & (days <= (np.inf if horizon is None else horizon))
+        return days, sole, at_risk
+
+    def impact(self, supplier_id, horizon=None, limit=None):
+        """Positions, products and warehouses that drop below safety stock if ``supplier_id`` fails
+        (None when the supplier is unknown)"""
+        slot = np.searchsorted(self.supplier_ids, supplier_id)
+        if slot >= len(self.supplier_ids) or self.supplier_ids[slot] != supplier_id:
+            return None
+        links = slice(self.starts[slot], self.ends[slot])
+        position, lost = self.edge_position[links], self.edge_open[links]
+        days, sole, at_risk = self._evaluate(supplier_id, position, lost, horizon)
+
+        risky = np.flatnonzero(at_risk)
+        risky = risky[np.argsort(days[risky], kind='stable')]
+        shown = risky if limit is None else risky[:limit]
+        p = self.positions
+        warehouses = group_first(p['warehouse_id'][position[risky]], days[risky])
+        products = group_first(p['product_id'][position[risky]], days[risky])
+        return {
+            'supplier_id': int(supplier_id),
+            'supplier_name': self.supplier_names.get(int(supplier_id)),
+            'horizon_days': horizon,
+            'positions_exposed': int(len(position)),
+            'positions_at_risk': int(len(risky)),
+            'lost_inbound': int(lost.sum()),
+            'first_breach_days': plain_days(days[risky[0]]) if len(risky) else None,
+            'warehouses': [{'warehouse_id': int(w), 'positions_at_risk': int(n), 'first_breach_days': plain_days(d)}
+                           for w, n, d in sorted(zip(*warehouses), key=lambda item: item[2])],
+            'products': [{'product_id': int(pid), 'warehouses_at_risk': int(n), 'first_breach_days': plain_days(d)}
+                         for pid, n, d in sorted(zip(*products), key=lambda item: item[2])],
+            'positions': [{
+                'inventory_id': int(p['inventory_id'][position[i]]),
+                'product_id': int(p['product_id'][position[i]]),
+                'warehouse_id': int(p['warehouse_id'][position[i]]),
+                'quantity': int(p['quantity'][position[i]]),
+                'safety_stock': int(p['safety_stock'][position[i]]),
+                'inbound': int(self.inbound[position[i]]),
+                'lost_inbound': int(lost[i]),
+                'daily_demand': round(float(self.demand[position[i]]), 2),
+                'sole_supplier': bool(sole[i]),
+                'days_to_safety_stock': plain_days(days[i])
+            } for i in shown]
+        }
+
+    def sweep(self, horizon=None, limit=None):
+        """Impact totals for every supplier failing on its own, most positions at risk first"""
+        days, _, at_risk = self._evaluate(self.edge_supplier, self.edge_position, self.edge_open, horizon)
+        count = len(self.supplier_ids)
+        supplier = self.edge_index[at_risk]
+        positions_at_risk = np.bincount(supplier, minlength=count)
+        first_breach = np.full(count, np.inf)
+        np.minimum.at(first_breach, supplier, days[at_risk])
+        warehouses = np.bincount(np.unique((supplier << 32) | self.positions['warehouse_id'][self.edge_position[at_risk]]) >> 32,
+                                 minlength=count)
+        products = np.bincount(np.unique((supplier << 32) | self.positions['product_id'][self.edge_position[at_risk]]) >> 32,
+                               minlength=count)
+        lost = np.bincount(self.edge_index, weights=self.edge_open, minlength=count)
+
+        ranked = np.lexsort((first_breach, -positions_at_risk))
+        ranked = ranked[positions_at_risk[ranked] > 0]
+        shown = ranked if limit is None else ranked[:limit]
+        return {
+            'suppliers': int(count),
+            'suppliers_with_impact': int(len(ranked)),
+            'horizon_days': horizon,
+            'positions': int(self.position_count),
+            'links': int(self.edge_count),
+            'impacts': [{
+                'supplier_id': int(self.supplier_ids[i]),
+                'supplier_name': self.supplier_names.get(int(self.supplier_ids[i])),
+                'positions_at_risk': int(positions_at_risk[i]),
+                'products_at_risk': int(products[i]),
+                'warehouses_at_risk': int(warehouses[i]),
+                'lost_inbound': int(lost[i]),
+                'first_breach_days': plain_days(first_breach[i])
+            } for i in shown]
+        }
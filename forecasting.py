@@ -0,0 +1,236 @@
+"""
+Smart Supply Chain Risk Intelligence - Stockout Forecasting
+Vectorized (NumPy) days-to-stockout and reorder quantities for every inventory position
+"""
+
+from datetime import timedelta
+
+import numpy as np
+
+# Lead times are stretched by the risk level of the product's supplier before sizing reorders
+RISK_LEAD_FACTORS = {'LOW': 1.0, 'MEDIUM': 1.25, 'HIGH': 1.5}
+
+# Deliveries shipped this many days before the usage window can still arrive inside it
+ARRIVAL_LOOKBACK_DAYS = 90
+
+HISTORY_SNAPSHOT_QUERY = """
+    INSERT INTO inventory_history (inventory_id, stock_date, quantity)
+    SELECT inventory_id, CURDATE(), quantity FROM inventory
+    ON DUPLICATE KEY UPDATE quantity = VALUES(quantity)
+"""
+
+# Every position with its product's lead time, its supplier's risk level and the oldest stock
+# snapshot of the usage window
+FORECAST_POSITIONS_QUERY = """
+    SELECT i.inventory_id, i.product_id, i.warehouse_id, i.quantity, i.safety_stock,
+           COALESCE(p.lead_time_days, 0) AS lead_time_days, COALESCE(c.risk_level, 'LOW') AS risk_level,
+           h.stock_date AS history_date, h.quantity AS history_quantity
+    FROM inventory i
+    JOIN products p ON p.product_id = i.product_id
+    LEFT JOIN supplier_risk_current c ON c.supplier_id = p.supplier_id
+    LEFT JOIN inventory_history h ON h.inventory_id = i.inventory_id
+        AND h.stock_date = (SELECT MIN(stock_date) FROM inventory_history
+                            WHERE inventory_id = i.inventory_id AND stock_date >= %s)
+    ORDER BY i.inventory_id
+"""
+
+# Delivered and still-open quantities per position and (expected) arrival date
+FORECAST_FLOWS_QUERY = """
+    SELECT product_id, warehouse_id, COALESCE(actual_arrival_date, expected_arrival_date) AS arrival_date,
+           SUM(IF(status = 'DELIVERED', quantity, 0)) AS delivered_quantity,
+           SUM(IF(status = 'DELIVERED', 0, quantity)) AS inbound_quantity
+    FROM shipments
+    WHERE status IN ('CREATED', 'IN_TRANSIT', 'DELAYED') OR (status = 'DELIVERED' AND ship_date >= %s)
+    GROUP BY product_id, warehouse_id, arrival_date
+"""
+
+FORECAST_COLUMNS = ('inventory_id', 'product_id', 'warehouse_id', 'quantity', 'inbound_quantity', 'daily_usage',
+                    'usage_source', 'days_to_stockout', 'stockout_date', 'reorder_in_days', 'reorder_quantity',
+                    'risk_level', 'computed_at')
+
+
+def column(rows, key, dtype, default=0):
+    return np.fromiter((default if row[key] is None else row[key] for row in rows), dtype=dtype, count=len(rows))
+
+
+def day_numbers(days):
+    """Dates as day ordinals (NaN for None)"""
+    return np.fromiter((np.nan if day is None else day.toordinal() for day in days), dtype=np.float64, count=len(days))
+
+
+def days_to_stockout(quantity, usage, arrival_position, arrival_day, arrival_quantity):
+    """Days until each position runs out, counting open shipments only from the day they arrive.
+
+    ``arrival_*`` describe inbound quantities per position sorted by (position, day); a position
+    runs dry before arrival k if its stock plus everything that arrived earlier is used up by
+    then. inf when the position has no usage.
+    """
+    count = len(quantity)
+    received = np.bincount(arrival_position, weights=arrival_quantity, minlength=count)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days = np.where(usage > 0, (quantity + received) / usage, np.inf)
+
+        # Quantity that arrived before each arrival of the same position
+        cumulative = np.cumsum(arrival_quantity)
+        first = np.searchsorted(arrival_position, arrival_position, side='left')
+        before = cumulative - arrival_quantity - (cumulative[first] - arrival_quantity[first])
+        stock = quantity[arrival_position] + before
+        short = (usage[arrival_position] > 0) & (stock < usage[arrival_position] * arrival_day)
+        early = np.full(count, np.inf)
+        np.minimum.at(early, arrival_position[short], stock[short] / usage[arrival_position[short]])
+    return np.maximum(np.minimum(days, early), 0.0)
+
+
+def forecast_summary(forecast):
+    """Position counts of a forecast: all, projected to stock out, due for a reorder today"""
+    return {
+        'positions': int(len(forecast['inventory_id'])),
+        'projected_stockouts': int(np.isfinite(forecast['days_to_stockout']).sum()),
+        'reorder_now': int(((forecast['reorder_in_days'] == 0) & (forecast['reorder_quantity'] > 0)).sum())
+    }
+
+
+class StockoutForecaster:
+    """Projects stockouts and reorder quantities for every (product, warehouse) position.
+
+    Daily usage comes from stock history: the position's oldest snapshot in ``inventory_history``
+    within the last ``history_days`` days, plus what was delivered since, less what is on hand
+    now. Positions with less than ``min_history_days`` of history use the quantity delivered over
+    the window instead (stock turns over at the rate it is replenished). Open shipments count
+    from their expected arrival date.
+
+    Reorder quantities cover usage over the lead time, stretched by ``RISK_LEAD_FACTORS`` for the
+    supplier's risk level, plus ``review_days``, on top of safety stock. ``reorder_in_days`` is
+    how long an order can wait before that lead time eats into safety stock.
+
+    ``snapshot_history()`` records today's stock, ``compute()`` returns the forecast as arrays
+    and ``write()`` stores a slice of it in ``inventory_forecast``. Every method takes a
+    dictionary cursor; committing is left to the caller.
+    """
+
+    def __init__(self, execute=None, batch_size=1000, history_days=28, min_history_days=7, review_days=7):
+        self.execute = execute or (lambda cursor, query, params=None: cursor.execute(query, params or ()))
+        self.batch_size = max(1, int(batch_size))
+        self.history_days = max(1, int(history_days))
+        self.min_history_days = max(1, int(min_history_days))
+        self.review_days = max(0, int(review_days))
+
+    def _fetch(self, cursor, query, params=()):
+        self.execute(cursor, query, params)
+        return cursor.fetchall()
+
+    def snapshot_history(self, cursor):
+        """Record today's quantity of every position in inventory_history"""
+        self.execute(cursor, HISTORY_SNAPSHOT_QUERY)
+        self.execute(cursor, "DELETE FROM inventory_history WHERE stock_date < CURDATE() - INTERVAL %s DAY",
+                     (self.history_days * 2,))
+
+    def compute(self, cursor):
+        """Forecast of every position as {column: array}, in inventory_id order"""
+        now = self._fetch(cursor, "SELECT NOW() AS now")[0]['now']
+        today = now.date()
+        window_start = today - timedelta(days=self.history_days)
+        rows = self._fetch(cursor, FORECAST_POSITIONS_QUERY, (window_start,))
+        flows = self._fetch(cursor, FORECAST_FLOWS_QUERY, (window_start - timedelta(days=ARRIVAL_LOOKBACK_DAYS),))
+
+        quantity = column(rows, 'quantity', np.float64)
+        safety_stock = column(rows, 'safety_stock', np.float64)
+        lead_time = column(rows, 'lead_time_days', np.float64)
+        risk_level = [row['risk_level'] if row['risk_level'] in RISK_LEAD_FACTORS else 'LOW' for row in rows]
+        lead_factor = np.fromiter((RISK_LEAD_FACTORS[level] for level in risk_level), dtype=np.float64, count=len(rows))
+        history_day = day_numbers([row['history_date'] for row in rows])
+        history_quantity = column(rows, 'history_quantity', np.float64)
+        today_number = today.toordinal()
+
+        # Map flow rows onto positions through sorted (product_id, warehouse_id) keys
+        keys = (column(rows, 'product_id', np.int64) << 32) | column(rows, 'warehouse_id', np.int64)
+        order = np.argsort(keys)
+        flow_keys = (column(flows, 'product_id', np.int64) << 32) | column(flows, 'warehouse_id', np.int64)
+        slots = np.minimum(np.searchsorted(keys[order], flow_keys), max(len(keys) - 1, 0))
+        matched = keys[order][slots] == flow_keys if len(keys) else np.zeros(len(flows), dtype=bool)
+        position = order[slots[matched]]
+        arrival = day_numbers([row['arrival_date'] for row in flows])[matched]
+        delivered = column(flows, 'delivered_quantity', np.float64)[matched]
+        inbound = column(flows, 'inbound_quantity', np.float64)[matched]
+
+        # Usage from history where it is long enough, from deliveries over the window otherwise
+        history_days = today_number - history_day
+        has_history = history_days >= self.min_history_days
+        since_history = (arrival > history_day[position]) & (arrival <= today_number)
+        delivered_since = np.bincount(position[since_history], weights=delivered[since_history], minlength=len(rows))
+        in_window = (arrival > today_number - self.history_days) & (arrival <= today_number)
+        delivered_window = np.bincount(position[in_window], weights=delivered[in_window], minlength=len(rows))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            usage = np.where(has_history,
+                             np.maximum(history_quantity + delivered_since - quantity, 0) / np.where(has_history, history_days, 1),
+                             delivered_window / self.history_days)
+
+        # Open shipments by position and arrival day (overdue ones are due today)
+        open_rows = inbound > 0
+        arrival_position, arrival_day = position[open_rows], np.maximum(arrival[open_rows] - today_number, 0)
+        arrival_quantity = inbound[open_rows]
+        arrival_order = np.lexsort((arrival_day, arrival_position))
+        arrival_position, arrival_day = arrival_position[arrival_order], arrival_day[arrival_order]
+        arrival_quantity = arrival_quantity[arrival_order]
+        inbound_total = np.bincount(arrival_position, weights=arrival_quantity, minlength=len(rows))
+
+        stockout = days_to_stockout(quantity, usage, arrival_position, arrival_day, arrival_quantity)
+        cover_lead = lead_time * lead_factor
+        target = usage * (cover_lead + self.review_days) + safety_stock
+        reorder_quantity = np.maximum(np.ceil(target - quantity - inbound_total), 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            reorder_in = np.where(usage > 0,
+                                  np.maximum(quantity + inbound_total - safety_stock - usage * cover_lead, 0) / usage,
+                                  np.inf)
+        # An order has to go out at least one (stretched) lead time before the projected stockout
+        reorder_in = np.minimum(reorder_in, np.maximum(stockout - cover_lead, 0))
+
+        return {
+            'inventory_id': column(rows, 'inventory_id', np.int64),
+            'product_id': column(rows, 'product_id', np.int64),
+            'warehouse_id': column(rows, 'warehouse_id', np.int64),
+            'quantity': quantity,
+            'inbound_quantity': inbound_total,
+            'daily_usage': usage,
+            'usage_source': np.where(has_history, 'HISTORY', 'DELIVERIES'),
+            'days_to_stockout': stockout,
+            'reorder_in_days': reorder_in,
+            'reorder_quantity': reorder_quantity,
+            'risk_level': risk_level,
+            'today': today,
+            'computed_at': now
+        }
+
+    def write(self, cursor, forecast, start=0, stop=None):
+        """Upsert rows ``start:stop`` of a forecast into inventory_forecast"""
+        stop = len(forecast['inventory_id']) if stop is None else min(stop, len(forecast['inventory_id']))
+        part = slice(start, stop)
+        stockout = forecast['days_to_stockout'][part]
+        reorder_in = forecast['reorder_in_days'][part]
+        finite = np.isfinite(stockout)
+        stockout_dates = [forecast['today'] + timedelta(days=days) if ok else None
+                          for days, ok in zip(np.where(finite, stockout, 0).astype(np.int64).tolist(), finite.tolist())]
+        columns = (
+            forecast['inventory_id'][part].tolist(), forecast['product_id'][part].tolist(),
+            forecast['warehouse_id'][part].tolist(), forecast['quantity'][part].astype(np.int64).tolist(),
+            forecast['inbound_quantity'][part].astype(np.int64).tolist(),
+            np.round(forecast['daily_usage'][part], 3).tolist(), forecast['usage_source'][part].tolist(),
+            [days if ok else None for days, ok in zip(np.round(stockout, 1).tolist(), finite.tolist())],
+            stockout_dates,
+            [days if np.isfinite(days) else None for days in np.round(reorder_in, 1).tolist()],
+            forecast['reorder_quantity'][part].astype(np.int64).tolist(), forecast['risk_level'][part],
+            [forecast['computed_at']] * (stop - start)
+        )
+        rows = list(zip(*columns))
+        placeholder = '(' + ', '.join(['%s'] * len(FORECAST_COLUMNS)) + ')'
+        for chunk_start in range(0, len(rows), self.batch_size):
+            chunk = rows[chunk_start:chunk_start + self.batch_size]
+            self.execute(cursor, f"""
+                INSERT INTO inventory_forecast ({', '.join(FORECAST_COLUMNS)})
+                VALUES {', '.join([placeholder] * len(chunk))}
+                ON DUPLICATE KEY UPDATE {', '.join(f'{c} = VALUES({c})' for c in FORECAST_COLUMNS[1:])}
+            """, tuple(value for row in chunk for value in row))
+
+    def prune(self, cursor, forecast):
+        """Drop forecasts of positions that no longer exist (not rewritten by ``forecast``)"""
+        self.execute(cursor, "DELETE FROM inventory_forecast WHERE computed_at < %s", (forecast['computed_at'],))
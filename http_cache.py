@@ -0,0 +1,77 @@
+"""
+Smart Supply Chain Risk Intelligence - HTTP Compression and Validators
+Content-Encoding negotiation and table-version ETags shared by the Flask app and asgi.py
+"""
+
+import gzip
+import hashlib
+import time
+from datetime import date
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+# Content types worth compressing (prefix match)
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/')
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # fast enough to run on every response, close to gzip -9 in size
+
+
+def accepted_encodings(header):
+    """{coding: q} from an Accept-Encoding header"""
+    accepted = {}
+    for item in (header or '').split(','):
+        coding, _, params = item.strip().partition(';')
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding.strip().lower()] = q
+    return accepted
+
+
+def negotiate_encoding(header):
+    """'br', 'gzip' or None for an Accept-Encoding header; brotli is only offered when installed"""
+    accepted = accepted_encodings(header)
+    wildcard = accepted.get('*', 0.0)
+    candidates = (['br'] if brotli is not None else []) + ['gzip']
+    best, best_q = None, 0.0
+    for coding in candidates:
+        q = accepted.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compressible(content_type):
+    content_type = (content_type or '').lower()
+    return any(content_type.startswith(prefix) for prefix in COMPRESSIBLE_TYPES)
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, GZIP_LEVEL)
+
+
+def version_etag(rule, args, versions, ttl, now=None):
+    """ETag of a list response from its route, query arguments and the versions of the tables it reads.
+
+    The current date and a ``ttl``-second time bucket are part of the tag: some columns are
+    computed from CURDATE(), and a write that did not bump its table's version is picked up
+    within ``ttl`` seconds.
+    """
+    now = time.time() if now is None else now
+    parts = [rule, '&'.join(f'{name}={value}' for name, value in sorted(args)),
+             *(f'{table}:{version}' for table, version in sorted(versions.items())),
+             date.today().isoformat(), str(int(now // ttl))]
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()[:32]
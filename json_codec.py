@@ -0,0 +1,106 @@
+"""
+Smart Supply Chain Risk Intelligence - JSON Encoding
+Pluggable JSON provider (orjson when installed) and the tuple-row result shapes of the list endpoints
+"""
+
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson
+    orjson = None
+
+# ?shape= values accepted by the paginated list endpoints
+SHAPES = ('rows', 'columns')
+
+
+def json_default(value):
+    """The column types MySQL returns that JSON has no type for: ISO dates, exact decimals as strings"""
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def stdlib_dumps(obj):
+    return json.dumps(obj, default=json_default, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def orjson_dumps(obj):
+    # dates and datetimes are encoded natively, in the same ISO format as json_default
+    return orjson.dumps(obj, default=json_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+# name -> (dumps returning UTF-8 bytes, loads)
+ENCODERS = {
+    'stdlib': (stdlib_dumps, json.loads),
+    'orjson': (orjson_dumps, orjson.loads if orjson is not None else None)
+}
+
+
+def select_encoder(name):
+    """Encoder name for a JSON_ENCODER setting; 'auto' is orjson when it is installed"""
+    if name == 'auto':
+        return 'orjson' if orjson is not None else 'stdlib'
+    if name not in ENCODERS:
+        raise ValueError(f"JSON_ENCODER must be auto or one of {', '.join(ENCODERS)}")
+    if name == 'orjson' and orjson is None:
+        raise RuntimeError('JSON_ENCODER=orjson needs orjson (pip install orjson)')
+    return name
+
+
+class FastJSONProvider(JSONProvider):
+    """Flask JSON provider backed by one of ``ENCODERS``.
+
+    Responses are built from the encoder's bytes directly. Both encoders produce the same
+    document: compact, UTF-8, keys in row order, dates as ISO 8601 and Decimals as strings.
+    """
+
+    mimetype = 'application/json'
+
+    def __init__(self, app, encoder='auto'):
+        super().__init__(app)
+        self.encoder = select_encoder(encoder)
+        self._dumps, self._loads = ENCODERS[self.encoder]
+
+    def dumpb(self, obj):
+        """``obj`` as UTF-8 JSON bytes"""
+        return self._dumps(obj)
+
+    def dumps(self, obj, **kwargs):
+        return self._dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return self._loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._dumps(obj) + b'\n', mimetype=self.mimetype)
+
+
+class Rows(list):
+    """Result rows as tuples, with the column names of the statement that produced them"""
+
+    def __init__(self, columns, rows=()):
+        super().__init__(rows)
+        self.columns = list(columns)
+
+
+def row_dicts(rows, columns):
+    """Tuple rows as one dict per row (the default ``rows`` shape)"""
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def column_arrays(rows, columns):
+    """Rows in the ``columns`` shape: {column: [value per row]}"""
+    if columns is None:
+        columns = list(rows[0]) if rows else []
+        return {name: [row[name] for row in rows] for name in columns}
+    if not rows:
+        return {name: [] for name in columns}
+    return dict(zip(columns, zip(*rows)))
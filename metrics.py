@@ -0,0 +1,180 @@
+"""
+Smart Supply Chain Risk Intelligence - Metrics
+In-process counters and latency histograms rendered in the Prometheus text exposition format
+"""
+
+import hashlib
+import re
+import threading
+
+# Latency buckets in seconds, from sub-millisecond cache hits to multi-second batch jobs
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Distinct raw statement strings whose fingerprints are memoized
+MAX_CACHED_STATEMENTS = 10000
+
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|%\(\w+\)s")
+_VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))*")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(sql):
+    """Normalize a statement so that calls differing only in literals, placeholders or
+    the number of VALUES/IN tuples share one fingerprint"""
+    text = _STRING_LITERAL.sub('?', sql)
+    text = _PLACEHOLDER.sub('?', text)
+    text = _NUMBER.sub('?', text)
+    text = _VALUE_LIST.sub('(...)', text)
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def fingerprint_id(normalized):
+    """Short stable id for a fingerprint, used as the metric label"""
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter keyed by label values"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_labels(self.labels, key)} {_number(value)}' for key, value in items]
+
+
+class Gauge:
+    """Value read from a callback at scrape time"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, read):
+        self.name = name
+        self.help = help_text
+        self.read = read
+
+    def samples(self):
+        return [f'{self.name} {_number(self.read())}']
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = 'le="%s"' % _number(bound)
+                lines.append(f'{self.name}_bucket{_labels(self.labels, key, le)} {cumulative}')
+            le = 'le="+Inf"'
+            lines.append(f'{self.name}_bucket{_labels(self.labels, key, le)} {series[-1]}')
+            lines.append(f'{self.name}_sum{_labels(self.labels, key)} {_number(round(series[-2], 6))}')
+            lines.append(f'{self.name}_count{_labels(self.labels, key)} {series[-1]}')
+        return lines
+
+
+class Registry:
+    """Set of metrics rendered together at /api/metrics"""
+
+    def __init__(self):
+        self._metrics = []
+        self._statements = {}  # fingerprint id -> normalized SQL
+        self._fingerprints = {}  # raw SQL -> (fingerprint id, normalized SQL)
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self.register(Counter(name, help_text, labels))
+
+    def gauge(self, name, help_text, read):
+        return self.register(Gauge(name, help_text, read))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    def statement(self, sql):
+        """Fingerprint id and normalized text for ``sql``, cached per distinct statement string"""
+        cached = self._fingerprints.get(sql)
+        if cached is not None:
+            return cached
+        normalized = fingerprint(sql)
+        cached = (fingerprint_id(normalized), normalized)
+        with self._lock:
+            if len(self._fingerprints) < MAX_CACHED_STATEMENTS:
+                self._fingerprints[sql] = cached
+            self._statements.setdefault(cached[0], normalized[:500])
+        return cached
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        with self._lock:
+            statements = sorted(self._statements.items())
+        lines.append('# HELP scri_db_query_info Normalized SQL text for each query fingerprint id')
+        lines.append('# TYPE scri_db_query_info gauge')
+        for query_id, text in statements:
+            lines.append(f'scri_db_query_info{_labels(("query", "statement"), (query_id, text))} 1')
+        return '\n'.join(lines) + '\n'
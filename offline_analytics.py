@@ -0,0 +1,200 @@
+"""
+Smart Supply Chain Risk Intelligence - Offline Analytics
+Answers the analytics page's aggregations from the Parquet snapshots written by snapshot.py (DuckDB)
+"""
+
+import argparse
+import json
+import os
+from datetime import date, datetime, timedelta
+
+try:
+    import duckdb
+except ImportError:  # optional: pip install duckdb
+    duckdb = None
+
+from snapshot import SNAPSHOT_TABLES
+
+# Period expression per bucket; DuckDB weeks start on Monday, like the /api/analytics endpoints
+BUCKETS = {'day': '{0}', 'week': "CAST(date_trunc('week', {0}) AS DATE)"}
+
+# Derived views over the snapshot tables, mirroring the joins and views the application runs on MySQL
+VIEWS = {
+    'shipment_details': """
+        SELECT sh.*, s.name AS supplier_name, p.name AS product_name, w.name AS warehouse_name,
+               GREATEST(date_diff('day', sh.expected_arrival_date, COALESCE(sh.actual_arrival_date, current_date)), 0) AS delay_days
+        FROM shipments sh
+        JOIN suppliers s ON sh.supplier_id = s.supplier_id
+        JOIN products p ON sh.product_id = p.product_id
+        JOIN warehouses w ON sh.warehouse_id = w.warehouse_id
+    """,
+    'supplier_risk_current': """
+        SELECT * FROM supplier_metrics
+        QUALIFY row_number() OVER (PARTITION BY supplier_id ORDER BY record_date DESC) = 1
+    """
+}
+
+
+def plain(value):
+    """JSON-friendly value (ISO dates)"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class OfflineAnalytics:
+    """In-process DuckDB database with one view per snapshot table.
+
+    Tables exported incrementally ('changed' mode) can hold several copies of a row; their view
+    keeps the copy from the newest part file. Views are created for the tables present under
+    ``directory``; the derived views in ``VIEWS`` need all of the tables they join.
+    """
+
+    def __init__(self, directory):
+        if duckdb is None:
+            raise RuntimeError('Offline analytics needs duckdb (pip install duckdb)')
+        self.directory = directory
+        self.conn = duckdb.connect()
+        self.tables = []
+        for table, spec in SNAPSHOT_TABLES.items():
+            folder = os.path.join(directory, table)
+            if not os.path.isdir(folder) or not any(name.endswith('.parquet') for name in os.listdir(folder)):
+                continue
+            files = os.path.join(folder, '*.parquet').replace("'", "''")
+            if spec['mode'] == 'changed':
+                source = f"""
+                    SELECT * EXCLUDE (filename) FROM read_parquet('{files}', filename = true, union_by_name = true)
+                    QUALIFY row_number() OVER (PARTITION BY {spec['key']} ORDER BY filename DESC) = 1
+                """
+            else:
+                source = f"SELECT * FROM read_parquet('{files}', union_by_name = true)"
+            self.conn.execute(f"CREATE VIEW {table} AS {source}")
+            self.tables.append(table)
+        for view, query in VIEWS.items():
+            try:
+                self.conn.execute(f"CREATE VIEW {view} AS {query}")
+            except duckdb.CatalogException:
+                pass  # a joined table has not been exported
+
+    def query(self, sql, params=None):
+        """Rows of an ad-hoc query as dictionaries"""
+        result = self.conn.execute(sql, params or [])
+        columns = [column[0] for column in result.description]
+        return [{name: plain(value) for name, value in zip(columns, row)} for row in result.fetchall()]
+
+    def _range(self, start, end, bucket):
+        if bucket not in BUCKETS:
+            raise ValueError('bucket must be day or week')
+        end = end or date.today()
+        start = start or end - timedelta(days=364)
+        if bucket == 'week':
+            start -= timedelta(days=start.weekday())
+        return start, end
+
+    def delay_rate(self, start=None, end=None, bucket='week', supplier_id=None):
+        """Same rows as GET /api/analytics/delay-rate, computed from the shipments snapshot"""
+        start, end = self._range(start, end, bucket)
+        conditions, params = ["status IS DISTINCT FROM 'CANCELLED'", 'ship_date BETWEEN ? AND ?'], [start, end]
+        if supplier_id is not None:
+            conditions.append('supplier_id = ?')
+            params.append(supplier_id)
+        rows = self.query(f"""
+            SELECT {BUCKETS[bucket].format('ship_date')} AS period, COUNT(*) AS shipment_count,
+                   SUM(CASE WHEN status = 'DELAYED' OR actual_arrival_date > expected_arrival_date THEN 1 ELSE 0 END) AS delayed_count,
+                   SUM(CASE WHEN actual_arrival_date > expected_arrival_date
+                            THEN date_diff('day', expected_arrival_date, actual_arrival_date) ELSE 0 END) AS delay_day_sum
+            FROM shipments
+            WHERE {' AND '.join(conditions)}
+            GROUP BY period
+            ORDER BY period
+        """, params)
+        return [{
+            'period': row['period'],
+            'shipment_count': int(row['shipment_count']),
+            'delayed_count': int(row['delayed_count']),
+            'delay_rate': round(row['delayed_count'] / row['shipment_count'], 4) if row['shipment_count'] else None,
+            'avg_delay_days': round(row['delay_day_sum'] / row['delayed_count'], 2) if row['delayed_count'] else 0
+        } for row in rows]
+
+    def alert_trend(self, start=None, end=None, bucket='week', alert_type=None):
+        """Same rows as GET /api/analytics/alerts, computed from the alerts snapshot"""
+        start, end = self._range(start, end, bucket)
+        conditions, params = ['CAST(created_at AS DATE) BETWEEN ? AND ?'], [start, end]
+        if alert_type:
+            conditions.append('alert_type = ?')
+            params.append(alert_type)
+        periods = {}
+        for row in self.query(f"""
+            SELECT {BUCKETS[bucket].format('CAST(created_at AS DATE)')} AS period, severity, COUNT(*) AS alert_count
+            FROM alerts
+            WHERE {' AND '.join(conditions)}
+            GROUP BY period, severity
+            ORDER BY period
+        """, params):
+            counts = periods.setdefault(row['period'], {'INFO': 0, 'WARN': 0, 'CRITICAL': 0})
+            counts[row['severity']] = int(row['alert_count'])
+        return [{'period': period, **counts, 'total': sum(counts.values())} for period, counts in periods.items()]
+
+    def supplier_risk_summary(self):
+        """Latest metrics per supplier, like the supplier_risk_summary view"""
+        return self.query("""
+            SELECT s.supplier_id, s.name, c.record_date, c.risk_score, c.risk_level, c.on_time_rate,
+                   c.avg_delay_days, c.defect_rate
+            FROM suppliers s
+            LEFT JOIN supplier_risk_current c ON c.supplier_id = s.supplier_id
+            ORDER BY c.risk_score DESC NULLS LAST, s.supplier_id
+        """)
+
+    def delayed_shipments(self, limit=100):
+        """Delayed or overdue shipments, like the delayed_shipments_overview view"""
+        return self.query("""
+            SELECT shipment_id, supplier_id, product_id, warehouse_id, expected_arrival_date, actual_arrival_date, status,
+                   GREATEST(date_diff('day', expected_arrival_date, COALESCE(actual_arrival_date, current_date)), 0) AS delay_days
+            FROM shipments
+            WHERE status = 'DELAYED' OR (expected_arrival_date < current_date AND status <> 'DELIVERED')
+            ORDER BY delay_days DESC
+            LIMIT ?
+        """, [limit])
+
+    def stock_positions(self):
+        """Positions per warehouse out of stock or below safety stock in the latest inventory snapshot"""
+        return self.query("""
+            SELECT i.warehouse_id, w.name AS warehouse_name, COUNT(*) AS position_count,
+                   SUM(CASE WHEN i.quantity <= 0 THEN 1 ELSE 0 END) AS stockout_count,
+                   SUM(CASE WHEN i.quantity < i.safety_stock THEN 1 ELSE 0 END) AS below_safety_count
+            FROM inventory i
+            JOIN warehouses w ON w.warehouse_id = i.warehouse_id
+            GROUP BY i.warehouse_id, w.name
+            ORDER BY stockout_count DESC, i.warehouse_id
+        """)
+
+
+REPORTS = {
+    'delay-rate': lambda engine, args: engine.delay_rate(args.start, args.end, args.bucket, args.supplier_id),
+    'alerts': lambda engine, args: engine.alert_trend(args.start, args.end, args.bucket, args.alert_type),
+    'supplier-risk': lambda engine, args: engine.supplier_risk_summary(),
+    'delayed-shipments': lambda engine, args: engine.delayed_shipments(args.limit),
+    'stock': lambda engine, args: engine.stock_positions()
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query the Parquet snapshots without touching MySQL')
+    parser.add_argument('report', help=f"one of {', '.join(REPORTS)}, or a SQL query over the snapshot views")
+    parser.add_argument('--dir', default=os.getenv('SNAPSHOT_DIR', 'snapshots'), help='snapshot directory')
+    parser.add_argument('--from', dest='start', type=date.fromisoformat, help='first day (YYYY-MM-DD)')
+    parser.add_argument('--to', dest='end', type=date.fromisoformat, help='last day (YYYY-MM-DD)')
+    parser.add_argument('--bucket', default='week', choices=sorted(BUCKETS))
+    parser.add_argument('--supplier-id', type=int)
+    parser.add_argument('--alert-type')
+    parser.add_argument('--limit', type=int, default=100)
+    args = parser.parse_args()
+
+    engine = OfflineAnalytics(args.dir)
+    rows = REPORTS[args.report](engine, args) if args.report in REPORTS else engine.query(args.report)
+    for row in rows:
+        print(json.dumps(row, default=str))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+"""
+Smart Supply Chain Risk Intelligence - Reference Data Cache
+Two-tier cache (in-process LRU, optional shared Redis) for suppliers, products and warehouses
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from json_codec import stdlib_dumps
+
+try:
+    import redis
+except ImportError:  # optional: pip install redis
+    redis = None
+
+log = logging.getLogger('scri.ref_cache')
+
+# Returned by the tiers for a key they do not hold (None is a value some loaders return)
+MISSING = object()
+
+
+class LocalTier:
+    """Thread-safe LRU of ``(namespace, key)`` entries that expire ``ttl`` seconds after being stored"""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = float(ttl)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def drop(self, namespace):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == namespace]:
+                del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SharedTier:
+    """Redis-compatible tier shared by every worker (redis, Valkey, KeyDB, ...).
+
+    Values are stored as JSON under ``prefix:namespace:generation:key``. Invalidating a
+    namespace increments its generation key, so older entries are never read again and expire
+    after ``ttl`` seconds. After a connection error the tier is skipped for ``retry_interval``
+    seconds, and the cache works from the local tier and the database.
+    """
+
+    def __init__(self, url, ttl, prefix='scri:ref', timeout=0.25, retry_interval=5.0):
+        if redis is None:
+            raise RuntimeError('REF_CACHE_REDIS_URL needs redis (pip install redis)')
+        self.client = redis.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        self.ttl = int(ttl)
+        self.prefix = prefix
+        self.retry_interval = float(retry_interval)
+        self.errors = 0
+        self._down_until = 0.0
+
+    @property
+    def available(self):
+        return time.monotonic() >= self._down_until
+
+    def generation(self, namespace):
+        """Current generation of ``namespace``, or None while the tier is unreachable"""
+        value = self._call(self.client.get, f'{self.prefix}:gen:{namespace}')
+        if value is MISSING:
+            return None
+        return int(value) if value is not None else 0
+
+    def get(self, namespace, generation, key):
+        value = self._call(self.client.get, f'{self.prefix}:{namespace}:{generation}:{key}')
+        return MISSING if value is None or value is MISSING else json.loads(value)
+
+    def put(self, namespace, generation, key, value):
+        self._call(self.client.set, f'{self.prefix}:{namespace}:{generation}:{key}', stdlib_dumps(value), ex=self.ttl)
+
+    def bump(self, namespace):
+        self._call(self.client.incr, f'{self.prefix}:gen:{namespace}')
+
+    def _call(self, method, *args, **kwargs):
+        if not self.available:
+            return MISSING
+        try:
+            return method(*args, **kwargs)
+        except redis.RedisError as e:
+            self.errors += 1
+            self._down_until = time.monotonic() + self.retry_interval
+            log.warning("Shared cache unavailable for %ss: %s", self.retry_interval, e)
+            return MISSING
+
+
+class RefCache:
+    """Read-through cache of rarely changing rows, grouped into namespaces that are invalidated as a whole.
+
+    ``get`` answers from the local tier, then the shared tier, then ``load()`` (whose result is
+    stored in both, unless it is None). Writers call ``invalidate`` after their transaction commits.
+    Each namespace has a generation that an invalidation moves on; a load that started before an
+    invalidation is not stored, so a read racing a write cannot cache the old rows.
+
+    With a shared tier, the generations live there too. Each worker reads them at most every
+    ``sync_interval`` seconds and drops its local entries of a namespace another worker
+    invalidated. Without one, changes made by other processes show up after the local ``ttl``.
+    """
+
+    def __init__(self, max_entries=10000, ttl=60.0, shared=None, sync_interval=1.0):
+        self.local = LocalTier(max_entries, ttl)
+        self.shared = shared
+        self.sync_interval = float(sync_interval)
+        self._lock = threading.Lock()
+        self._generations = {}
+        self._shared_generations = {}
+        self._synced_at = {}
+        self._counts = {}
+
+    def get(self, namespace, key, load):
+        value, token = self.lookup(namespace, key)
+        if value is not MISSING:
+            return value
+        value = load()
+        if value is not None:
+            self.store(namespace, key, value, token)
+        return value
+
+    def lookup(self, namespace, key):
+        """(cached value or MISSING, token to pass to ``store`` with the loaded value)"""
+        self._sync(namespace)
+        token = self._token(namespace)
+        value = self.local.get((namespace, key))
+        if value is not MISSING:
+            self._count(namespace, 'local_hits')
+            return value, token
+        if token[1] is not None:
+            value = self.shared.get(namespace, token[1], key)
+            if value is not MISSING:
+                self._count(namespace, 'shared_hits')
+                self._store_local(namespace, key, value, token)
+                return value, token
+        self._count(namespace, 'misses')
+        return MISSING, token
+
+    def store(self, namespace, key, value, token):
+        if self._store_local(namespace, key, value, token) and token[1] is not None:
+            self.shared.put(namespace, token[1], key, value)
+
+    def invalidate(self, *namespaces):
+        for namespace in namespaces:
+            with self._lock:
+                self._generations[namespace] = self._generations.get(namespace, 0) + 1
+                self._synced_at.pop(namespace, None)
+            self.local.drop(namespace)
+            if self.shared is not None:
+                self.shared.bump(namespace)
+            self._count(namespace, 'invalidations')
+
+    def stats(self):
+        with self._lock:
+            namespaces = {namespace: dict(counts) for namespace, counts in self._counts.items()}
+        stats = {'entries': len(self.local), 'max_entries': self.local.max_entries, 'ttl_seconds': self.local.ttl,
+                 'evictions': self.local.evictions, 'namespaces': namespaces}
+        if self.shared is not None:
+            stats['shared'] = {'available': self.shared.available, 'errors': self.shared.errors,
+                               'ttl_seconds': self.shared.ttl}
+        return stats
+
+    def totals(self):
+        """Counts summed over the namespaces"""
+        totals = {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'invalidations': 0}
+        with self._lock:
+            for counts in self._counts.values():
+                for name, count in counts.items():
+                    totals[name] += count
+        return totals
+
+    def _token(self, namespace):
+        with self._lock:
+            return self._generations.get(namespace, 0), self._shared_generations.get(namespace)
+
+    def _store_local(self, namespace, key, value, token):
+        with self._lock:
+            if self._token_stale(namespace, token):
+                return False
+            self.local.put((namespace, key), value)
+            return True
+
+    def _token_stale(self, namespace, token):
+        return (token[0] != self._generations.get(namespace, 0)
+                or token[1] != self._shared_generations.get(namespace))
+
+    def _sync(self, namespace):
+        """Pick up invalidations made by other workers through the shared tier"""
+        if self.shared is None:
+            return
+        with self._lock:
+            synced_at = self._synced_at.get(namespace)
+            if synced_at is not None and time.monotonic() - synced_at < self.sync_interval:
+                return
+            self._synced_at[namespace] = time.monotonic()
+        generation = self.shared.generation(namespace)
+        with self._lock:
+            changed = generation != self._shared_generations.get(namespace)
+            self._shared_generations[namespace] = generation
+        if changed:
+            self.local.drop(namespace)
+
+    def _count(self, namespace, name):
+        with self._lock:
+            counts = self._counts.setdefault(namespace, {'local_hits': 0, 'shared_hits': 0, 'misses': 0,
+                                                         'invalidations': 0})
+            counts[name] += 1
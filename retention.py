@@ -0,0 +1,231 @@
+"""
+Smart Supply Chain Risk Intelligence - Data Retention
+Moves aged rows out of the operational tables in short batches and maintains their monthly partitions
+"""
+
+import logging
+import os
+import re
+import time
+from datetime import date, datetime, timedelta
+
+from snapshot import arrow_schema, arrow_value, pa, pq
+
+log = logging.getLogger('scri.retention')
+
+# What the archive job moves, per table: rows whose ``column`` is older than the table's retention
+# window and that match ``condition``. 'partitioned' tables are range-partitioned by month of
+# ``column`` (migration 012), the others are only archived.
+RETENTION_POLICIES = {
+    # Only finished shipments: open and delayed ones, and deliveries still waiting for an arrival
+    # date (supplier_open_delays), stay however old they are
+    'shipments': {'key': 'shipment_id', 'column': 'ship_date', 'partitioned': False,
+                  'condition': "(status = 'CANCELLED' OR (status = 'DELIVERED' AND actual_arrival_date IS NOT NULL))"},
+    'shipment_events': {'key': 'event_id', 'column': 'event_time', 'partitioned': True},
+    # Open alerts stay until they are resolved
+    'alerts': {'key': 'alert_id', 'column': 'created_at', 'partitioned': True, 'condition': 'resolved = 1'},
+    'audit_logs': {'key': 'audit_id', 'column': 'occurred_at', 'partitioned': True}
+}
+
+# 'table': rows go to <table>_archive (compressed, readable with ?include_archived=true);
+# 'parquet': rows go to <directory>/<table>/ as Parquet files (read them with DuckDB)
+ARCHIVE_TARGETS = ('table', 'parquet')
+
+PARTITIONS_QUERY = """
+    SELECT partition_name, partition_description
+    FROM information_schema.partitions
+    WHERE table_schema = DATABASE() AND table_name = %s AND partition_name IS NOT NULL
+    ORDER BY partition_ordinal_position
+"""
+
+# Partition holding every row past the last monthly boundary
+CATCH_ALL_PARTITION = 'pmax'
+
+
+def archive_table(table):
+    return f'{table}_archive'
+
+
+def archived_source(table):
+    """FROM-clause source reading ``table`` together with its archive table"""
+    return f'(SELECT * FROM {table} UNION ALL SELECT * FROM {archive_table(table)}) AS {table}'
+
+
+def archived_page(query, params, table, order_by):
+    """A ``... ORDER BY ... LIMIT %s`` page query over ``table`` turned into one over ``table`` and its
+    archive: each is read with its own index and LIMIT, and the two pages are merged.
+
+    ``params`` ends with the page size; ``order_by`` is the page order by output column name.
+    """
+    archived = re.sub(rf'\bFROM {table}\b', f'FROM {archive_table(table)}', query, count=1)
+    return f"({query}) UNION ALL ({archived}) ORDER BY {order_by} LIMIT %s", (*params, *params, params[-1])
+
+
+def month_start(value, months=0):
+    """First day of the month ``months`` after the month of ``value``"""
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_bound(description):
+    """Upper bound date of a RANGE COLUMNS partition description, None for MAXVALUE"""
+    if isinstance(description, (bytes, bytearray)):
+        description = description.decode()
+    value = description.strip("'")
+    return None if value == 'MAXVALUE' else date.fromisoformat(value[:10])
+
+
+class RetentionJob:
+    """Archives the rows of ``RETENTION_POLICIES`` tables older than ``retention_days[table]`` days.
+
+    Rows are moved ``batch_size`` at a time, oldest first: one short transaction locks a batch
+    (SELECT ... FOR UPDATE on the rows themselves), copies it to the archive and deletes it, with
+    ``pause`` seconds between batches. No statement scans or locks a whole table or partition, so
+    the job can run while the application is writing.
+
+    On partitioned tables it then adds monthly partitions up to ``months_ahead`` months from now,
+    splitting them off the empty ``pmax``, and drops the expired ones left empty. A partition still
+    holding rows the policy keeps (e.g. an old open alert) is kept.
+    """
+
+    def __init__(self, connect, retention_days, batch_size=5000, pause=0.1, target='table', directory='archive',
+                 months_ahead=3, execute=None):
+        if target not in ARCHIVE_TARGETS:
+            raise ValueError(f"Archive target must be one of {', '.join(ARCHIVE_TARGETS)}")
+        if target == 'parquet' and pa is None:
+            raise RuntimeError('RETENTION_TARGET=parquet needs pyarrow (pip install pyarrow)')
+        self.connect = connect
+        self.retention_days = retention_days
+        self.batch_size = max(1, int(batch_size))
+        self.pause = float(pause)
+        self.target = target
+        self.directory = directory
+        self.months_ahead = int(months_ahead)
+        self.execute = execute or (lambda cursor, query, params=None: cursor.execute(query, params or ()))
+
+    def run(self, tables=None, today=None):
+        """Archive ``tables`` (all by default); returns {table: summary}"""
+        tables = list(tables or RETENTION_POLICIES)
+        unknown = [table for table in tables if table not in RETENTION_POLICIES]
+        if unknown:
+            raise ValueError(f"Unknown retention tables: {', '.join(unknown)}")
+        today = today or date.today()
+
+        results = {}
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            try:
+                for table in tables:
+                    started = time.monotonic()
+                    cutoff = today - timedelta(days=self.retention_days[table])
+                    archived, batches = self._archive(conn, cursor, table, cutoff)
+                    added = dropped = []
+                    if RETENTION_POLICIES[table]['partitioned']:
+                        added, dropped = self._maintain_partitions(conn, cursor, table, cutoff, today)
+                    results[table] = {'cutoff': cutoff.isoformat(), 'archived': archived, 'batches': batches,
+                                      'partitions_added': added, 'partitions_dropped': dropped,
+                                      'elapsed_ms': round((time.monotonic() - started) * 1000, 1)}
+                    log.info("Retention %s: %d rows archived before %s in %d batches, partitions +%d -%d",
+                             table, archived, cutoff, batches, len(added), len(dropped))
+            finally:
+                cursor.close()
+        return results
+
+    def _archive(self, conn, cursor, table, cutoff):
+        """Move the table's expired rows in batches; returns (rows moved, batches)"""
+        spec = RETENTION_POLICIES[table]
+        key, column = spec['key'], spec['column']
+        conditions = [f'{column} < %s'] + ([spec['condition']] if 'condition' in spec else [])
+        moved = batches = 0
+        last = None
+        while True:
+            where, params = list(conditions), [cutoff]
+            if last is not None:
+                # Skip past the rows already handled (and the ones the condition keeps) in (column, key) order
+                where.append(f'({column} > %s OR ({column} = %s AND {key} > %s))')
+                params.extend([last[0], last[0], last[1]])
+            try:
+                self.execute(cursor, f"""
+                    SELECT * FROM {table}
+                    WHERE {' AND '.join(where)}
+                    ORDER BY {column}, {key}
+                    LIMIT %s
+                    FOR UPDATE
+                """, (*params, self.batch_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    conn.rollback()
+                    return moved, batches
+                names = [description[0] for description in cursor.description]
+                key_index, column_index = names.index(key), names.index(column)
+                ids = [row[key_index] for row in rows]
+                placeholders = ', '.join(['%s'] * len(ids))
+                if self.target == 'parquet':
+                    self._write_parquet(table, cursor.description, rows)
+                else:
+                    self.execute(cursor, f"INSERT INTO {archive_table(table)} SELECT * FROM {table} WHERE {key} IN ({placeholders})",
+                                 tuple(ids))
+                self.execute(cursor, f"DELETE FROM {table} WHERE {key} IN ({placeholders})", tuple(ids))
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            moved += len(rows)
+            batches += 1
+            last = (rows[-1][column_index], rows[-1][key_index])
+            if len(rows) < self.batch_size:
+                return moved, batches
+            if self.pause:
+                time.sleep(self.pause)
+
+    def _write_parquet(self, table, description, rows):
+        """Write one batch as a new Parquet file; it is complete on disk before the batch is deleted"""
+        folder = os.path.join(self.directory, table)
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"archive-{datetime.now():%Y%m%d%H%M%S%f}.parquet")
+        schema = arrow_schema(description)
+        columns = list(zip(*rows))
+        pq.write_table(pa.table([
+            pa.array([arrow_value(value) for value in values], type=field.type)
+            for field, values in zip(schema, columns)
+        ], schema=schema), path + '.tmp', compression='zstd')
+        os.replace(path + '.tmp', path)
+
+    def _maintain_partitions(self, conn, cursor, table, cutoff, today):
+        """Add the coming months' partitions and drop expired empty ones; returns (added, dropped) names"""
+        self.execute(cursor, PARTITIONS_QUERY, (table,))
+        partitions = [(name, partition_bound(description)) for name, description in cursor.fetchall()]
+        conn.rollback()
+        if not partitions or partitions[-1][0] != CATCH_ALL_PARTITION:
+            log.warning("Retention %s: not partitioned by month (apply migration 012), skipping partitions", table)
+            return [], []
+
+        added = []
+        bounds = [bound for _, bound in partitions if bound is not None]
+        month = bounds[-1] if bounds else month_start(today)
+        definitions = []
+        while month <= month_start(today, self.months_ahead):
+            name = f'p{month:%Y%m}'
+            definitions.append(f"PARTITION {name} VALUES LESS THAN ('{month_start(month, 1).isoformat()}')")
+            added.append(name)
+            month = month_start(month, 1)
+        if definitions:
+            if self._has_rows(cursor, table, CATCH_ALL_PARTITION):
+                log.warning("Retention %s: %s holds rows, splitting it copies them", table, CATCH_ALL_PARTITION)
+            self.execute(cursor, f"""
+                ALTER TABLE {table} REORGANIZE PARTITION {CATCH_ALL_PARTITION} INTO (
+                    {', '.join(definitions)},
+                    PARTITION {CATCH_ALL_PARTITION} VALUES LESS THAN (MAXVALUE)
+                )
+            """)
+
+        dropped = []
+        for name, bound in partitions[:-1]:
+            if bound <= cutoff and not self._has_rows(cursor, table, name):
+                self.execute(cursor, f"ALTER TABLE {table} DROP PARTITION {name}")
+                dropped.append(name)
+        return added, dropped
+
+    def _has_rows(self, cursor, table, partition):
+        self.execute(cursor, f"SELECT 1 FROM {table} PARTITION ({partition}) LIMIT 1")
+        return bool(cursor.fetchall())
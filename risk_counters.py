@@ -0,0 +1,322 @@
+"""
+Smart Supply Chain Risk Intelligence - Incremental Risk Counters
+Running per-supplier totals of the 90-day shipment window, maintained by the shipment write paths
+"""
+
+from collections import defaultdict
+
+# compute_supplier_risk scores the shipments shipped in the last WINDOW_DAYS days
+WINDOW_DAYS = 90
+
+# Queues a supplier created by the preceding INSERT for its first score
+NEW_SUPPLIER_QUERY = f"""
+    INSERT INTO supplier_risk_counters (supplier_id, window_start, dirty)
+    VALUES (LAST_INSERT_ID(), CURDATE() - INTERVAL {WINDOW_DAYS} DAY, 1)
+"""
+
+SHIPMENT_COLUMNS = "shipment_id, supplier_id, ship_date, status, expected_arrival_date, actual_arrival_date"
+
+
+def contribution(row):
+    """(delivered, delayed, settled delay days, open) for one shipment row.
+
+    Mirrors the aggregates of compute_supplier_risk. A delivered shipment without an
+    actual_arrival_date is "open": its delay is measured against CURDATE() and grows every
+    day, so it is kept in supplier_open_delays instead of being summed into delay_day_sum.
+    """
+    delivered = row['status'] in ('DELIVERED', 'DELAYED')
+    actual = row['actual_arrival_date']
+    delayed = row['status'] == 'DELAYED' or (actual is not None and actual > row['expected_arrival_date'])
+    delay = max((actual - row['expected_arrival_date']).days, 0) if delivered and actual is not None else 0
+    return int(delivered), int(delayed), delay, delivered and actual is None
+
+
+class RiskCounters:
+    """Maintains supplier_risk_counters, supplier_risk_daily and supplier_open_delays.
+
+    ``supplier_risk_counters`` holds, per supplier, the delivered/delayed counts and the
+    settled delay-day sum of the shipments with ``ship_date >= window_start``, plus a dirty
+    flag. ``supplier_risk_daily`` keeps the same totals per (supplier, ship_date) so that days
+    leaving the window can be subtracted without touching ``shipments``.
+
+    Writers call ``apply_changes()`` with the affected shipment rows as they were before and
+    after the write, in the write's transaction. Counter rows are locked in supplier_id order
+    and a supplier's window is advanced before its deltas are applied, so every delta lands
+    on the window it belongs to. ``change_seq`` is bumped on every change; the scorer clears
+    the dirty flag only if it is unchanged since the counters were read.
+
+    Every method takes a dictionary cursor; committing is left to the caller.
+    """
+
+    def __init__(self, execute=None, batch_size=1000):
+        self.execute = execute or (lambda cursor, query, params=None: cursor.execute(query, params or ()))
+        self.batch_size = max(1, int(batch_size))
+
+    def _in(self, count, width=1):
+        placeholder = '%s' if width == 1 else '(' + ', '.join(['%s'] * width) + ')'
+        return ', '.join([placeholder] * count)
+
+    def _chunks(self, items):
+        items = list(items)
+        for start in range(0, len(items), self.batch_size):
+            yield items[start:start + self.batch_size]
+
+    def fetch_shipments(self, cursor, shipment_ids, lock=False):
+        """Risk-relevant columns of ``shipment_ids``, optionally locked for the caller's update"""
+        rows = []
+        for chunk in self._chunks(sorted(set(shipment_ids))):
+            self.execute(cursor, f"""
+                SELECT {SHIPMENT_COLUMNS} FROM shipments
+                WHERE shipment_id IN ({self._in(len(chunk))})
+                {'FOR UPDATE' if lock else ''}
+            """, tuple(chunk))
+            rows.extend(cursor.fetchall())
+        return rows
+
+    def window_start(self, cursor):
+        self.execute(cursor, f"SELECT CURDATE() - INTERVAL {WINDOW_DAYS} DAY AS window_start")
+        return cursor.fetchall()[0]['window_start']
+
+    def _lock(self, cursor, supplier_ids, create=False):
+        """{supplier_id: window_start} for the counter rows of ``supplier_ids``, locked; ``create`` adds missing rows"""
+        windows = {}
+        for chunk in self._chunks(sorted(set(supplier_ids))):
+            if create:
+                self.execute(cursor, f"""
+                    INSERT INTO supplier_risk_counters (supplier_id, window_start)
+                    VALUES {', '.join([f'(%s, CURDATE() - INTERVAL {WINDOW_DAYS} DAY)'] * len(chunk))}
+                    ON DUPLICATE KEY UPDATE supplier_id = supplier_id
+                """, tuple(chunk))
+            self.execute(cursor, f"""
+                SELECT supplier_id, window_start FROM supplier_risk_counters
+                WHERE supplier_id IN ({self._in(len(chunk))})
+                ORDER BY supplier_id
+                FOR UPDATE
+            """, tuple(chunk))
+            windows.update((row['supplier_id'], row['window_start']) for row in cursor.fetchall())
+        return windows
+
+    def _age(self, cursor, windows, start):
+        """Move the locked suppliers in ``windows`` to a window beginning at ``start``.
+
+        Daily totals between their old window_start and ``start`` are subtracted; rows older
+        than ``start`` are then deleted from the daily and open-delay tables. Returns the ids of
+        suppliers whose counters changed.
+        """
+        changed = set()
+        for chunk in self._chunks(sorted(windows)):
+            self.execute(cursor, f"""
+                SELECT supplier_id, ship_date, delivered_count, delayed_count, delay_day_sum
+                FROM supplier_risk_daily
+                WHERE supplier_id IN ({self._in(len(chunk))}) AND ship_date < %s
+            """, (*chunk, start))
+            totals = defaultdict(lambda: [0, 0, 0])
+            for row in cursor.fetchall():
+                # Days before window_start were already subtracted when the window last moved
+                if row['ship_date'] >= windows[row['supplier_id']]:
+                    total = totals[row['supplier_id']]
+                    total[0] += row['delivered_count']
+                    total[1] += row['delayed_count']
+                    total[2] += row['delay_day_sum']
+
+            values = []
+            for supplier_id in chunk:
+                delivered, delayed, delay = totals.get(supplier_id, (0, 0, 0))
+                dirty = int(supplier_id in totals)
+                values.extend((supplier_id, start, -delivered, -delayed, -delay, dirty))
+                if dirty:
+                    changed.add(supplier_id)
+            self.execute(cursor, f"""
+                INSERT INTO supplier_risk_counters (supplier_id, window_start, delivered_count, delayed_count, delay_day_sum, dirty)
+                VALUES {self._in(len(chunk), 6)}
+                ON DUPLICATE KEY UPDATE
+                    window_start = GREATEST(window_start, VALUES(window_start)),
+                    delivered_count = delivered_count + VALUES(delivered_count),
+                    delayed_count = delayed_count + VALUES(delayed_count),
+                    delay_day_sum = delay_day_sum + VALUES(delay_day_sum),
+                    dirty = GREATEST(dirty, VALUES(dirty)),
+                    change_seq = change_seq + VALUES(dirty)
+            """, tuple(values))
+            self.execute(cursor, f"""
+                DELETE FROM supplier_risk_daily WHERE supplier_id IN ({self._in(len(chunk))}) AND ship_date < %s
+            """, (*chunk, start))
+            self.execute(cursor, f"""
+                DELETE FROM supplier_open_delays WHERE supplier_id IN ({self._in(len(chunk))}) AND ship_date < %s
+            """, (*chunk, start))
+            for supplier_id in chunk:
+                windows[supplier_id] = max(windows[supplier_id], start)
+        return changed
+
+    def age_suppliers(self, cursor, supplier_ids):
+        """Bring the windows of ``supplier_ids`` up to date (e.g. before scoring them)"""
+        start = self.window_start(cursor)
+        windows = self._lock(cursor, supplier_ids)
+        stale = {sid: window for sid, window in windows.items() if window < start}
+        return self._age(cursor, stale, start) if stale else set()
+
+    def age_batch(self, cursor):
+        """Advance the window of up to batch_size suppliers that have days leaving it.
+
+        Returns (suppliers processed, suppliers whose counters changed); call it until the
+        first value is 0, committing in between.
+        """
+        start = self.window_start(cursor)
+        self.execute(cursor, """
+            SELECT DISTINCT supplier_id FROM supplier_risk_daily
+            WHERE ship_date < %s
+            ORDER BY supplier_id
+            LIMIT %s
+        """, (start, self.batch_size))
+        supplier_ids = [row['supplier_id'] for row in cursor.fetchall()]
+        if not supplier_ids:
+            return 0, 0
+        windows = self._lock(cursor, supplier_ids)
+        # Daily rows without a counter row cannot be attributed to a window; drop them
+        orphans = [sid for sid in supplier_ids if sid not in windows]
+        if orphans:
+            self.execute(cursor, f"""
+                DELETE FROM supplier_risk_daily WHERE supplier_id IN ({self._in(len(orphans))}) AND ship_date < %s
+            """, (*orphans, start))
+        return len(supplier_ids), len(self._age(cursor, windows, start))
+
+    def apply_changes(self, cursor, before, after):
+        """Apply the shipment rows replaced by a write (``before``) and written by it (``after``).
+
+        Returns the ids of suppliers marked dirty.
+        """
+        rows = [(-1, row) for row in before] + [(1, row) for row in after]
+        if not rows:
+            return set()
+
+        start = self.window_start(cursor)
+        windows = self._lock(cursor, {row['supplier_id'] for _, row in rows}, create=True)
+        stale = {sid: window for sid, window in windows.items() if window < start}
+        if stale:
+            self._age(cursor, stale, start)
+
+        daily = defaultdict(lambda: [0, 0, 0])
+        counters = defaultdict(lambda: [0, 0, 0])
+        open_rows = {}
+        for sign, row in rows:
+            delivered, delayed, delay, is_open = contribution(row)
+            if row['ship_date'] < windows[row['supplier_id']]:
+                continue
+            for totals in (daily[(row['supplier_id'], row['ship_date'])], counters[row['supplier_id']]):
+                totals[0] += sign * delivered
+                totals[1] += sign * delayed
+                totals[2] += sign * delay
+            if is_open and sign > 0:
+                open_rows[row['shipment_id']] = (row['shipment_id'], row['supplier_id'], row['ship_date'],
+                                                 row['expected_arrival_date'])
+
+        changed = [(key, totals) for key, totals in daily.items() if any(totals)]
+        for chunk in self._chunks(changed):
+            self.execute(cursor, f"""
+                INSERT INTO supplier_risk_daily (supplier_id, ship_date, delivered_count, delayed_count, delay_day_sum)
+                VALUES {self._in(len(chunk), 5)}
+                ON DUPLICATE KEY UPDATE
+                    delivered_count = delivered_count + VALUES(delivered_count),
+                    delayed_count = delayed_count + VALUES(delayed_count),
+                    delay_day_sum = delay_day_sum + VALUES(delay_day_sum)
+            """, tuple(value for (supplier_id, ship_date), totals in chunk
+                       for value in (supplier_id, ship_date, *totals)))
+
+        # A shipment in the window always marks its supplier dirty, even if the totals cancel
+        # out: an open delay may have been replaced by a settled one of the same length
+        dirty = sorted(counters)
+        for chunk in self._chunks(dirty):
+            self.execute(cursor, f"""
+                INSERT INTO supplier_risk_counters (supplier_id, window_start, delivered_count, delayed_count, delay_day_sum, dirty)
+                VALUES {self._in(len(chunk), 6)}
+                ON DUPLICATE KEY UPDATE
+                    delivered_count = delivered_count + VALUES(delivered_count),
+                    delayed_count = delayed_count + VALUES(delayed_count),
+                    delay_day_sum = delay_day_sum + VALUES(delay_day_sum),
+                    dirty = 1,
+                    change_seq = change_seq + 1
+            """, tuple(value for supplier_id in chunk
+                       for value in (supplier_id, windows[supplier_id], *counters[supplier_id], 1)))
+
+        for chunk in self._chunks({row['shipment_id'] for _, row in rows}):
+            self.execute(cursor, f"DELETE FROM supplier_open_delays WHERE shipment_id IN ({self._in(len(chunk))})",
+                         tuple(chunk))
+        for chunk in self._chunks(open_rows.values()):
+            self.execute(cursor, f"""
+                INSERT INTO supplier_open_delays (shipment_id, supplier_id, ship_date, expected_arrival_date)
+                VALUES {self._in(len(chunk), 4)}
+            """, tuple(value for row in chunk for value in row))
+        return set(dirty)
+
+    def mark_overdue(self, cursor):
+        """Mark suppliers dirty whose open delays have grown since they were last scored"""
+        self.execute(cursor, """
+            UPDATE supplier_risk_counters k
+            JOIN (SELECT DISTINCT supplier_id FROM supplier_open_delays WHERE expected_arrival_date < CURDATE()) o
+              ON o.supplier_id = k.supplier_id
+            LEFT JOIN supplier_risk_current c ON c.supplier_id = k.supplier_id
+            SET k.dirty = 1, k.change_seq = k.change_seq + 1
+            WHERE k.dirty = 0 AND (c.record_date IS NULL OR c.record_date < CURDATE())
+        """)
+        return max(cursor.rowcount, 0)
+
+    def dirty_batch(self, cursor, after_id=0):
+        """Up to batch_size {supplier_id: change_seq} of dirty suppliers with ids above ``after_id``"""
+        self.execute(cursor, """
+            SELECT supplier_id, change_seq FROM supplier_risk_counters
+            WHERE dirty = 1 AND supplier_id > %s
+            ORDER BY supplier_id
+            LIMIT %s
+        """, (after_id, self.batch_size))
+        return {row['supplier_id']: row['change_seq'] for row in cursor.fetchall()}
+
+    def clear_dirty(self, cursor, versions):
+        """Clear the dirty flag of suppliers whose change_seq still matches ``versions``"""
+        items = sorted(versions.items())
+        for chunk in self._chunks(items):
+            self.execute(cursor, f"""
+                UPDATE supplier_risk_counters SET dirty = 0
+                WHERE (supplier_id, change_seq) IN ({self._in(len(chunk), 2)})
+            """, tuple(value for item in chunk for value in item))
+
+    def rebuild(self, cursor, dirty=True):
+        """Recompute every counter from shipments (repair path after writes that bypassed the app).
+
+        With ``dirty`` every supplier is queued for rescoring; pass False when the caller
+        scores all suppliers itself.
+        """
+        self.execute(cursor, "DELETE FROM supplier_open_delays")
+        self.execute(cursor, "DELETE FROM supplier_risk_daily")
+        self.execute(cursor, f"""
+            INSERT INTO supplier_risk_daily (supplier_id, ship_date, delivered_count, delayed_count, delay_day_sum)
+            SELECT supplier_id, ship_date,
+                   SUM(status IN ('DELIVERED','DELAYED')),
+                   SUM(status = 'DELAYED' OR (actual_arrival_date IS NOT NULL AND actual_arrival_date > expected_arrival_date)),
+                   SUM(CASE WHEN status IN ('DELIVERED','DELAYED') AND actual_arrival_date IS NOT NULL
+                            THEN GREATEST(DATEDIFF(actual_arrival_date, expected_arrival_date), 0) ELSE 0 END)
+            FROM shipments
+            WHERE ship_date >= CURDATE() - INTERVAL {WINDOW_DAYS} DAY
+            GROUP BY supplier_id, ship_date
+        """)
+        self.execute(cursor, f"""
+            INSERT INTO supplier_open_delays (shipment_id, supplier_id, ship_date, expected_arrival_date)
+            SELECT shipment_id, supplier_id, ship_date, expected_arrival_date
+            FROM shipments
+            WHERE ship_date >= CURDATE() - INTERVAL {WINDOW_DAYS} DAY
+              AND status IN ('DELIVERED','DELAYED') AND actual_arrival_date IS NULL
+        """)
+        self.execute(cursor, f"""
+            INSERT INTO supplier_risk_counters (supplier_id, window_start, delivered_count, delayed_count, delay_day_sum, dirty)
+            SELECT s.supplier_id, CURDATE() - INTERVAL {WINDOW_DAYS} DAY,
+                   COALESCE(d.delivered_count, 0), COALESCE(d.delayed_count, 0), COALESCE(d.delay_day_sum, 0), %s
+            FROM suppliers s
+            LEFT JOIN (
+                SELECT supplier_id, SUM(delivered_count) AS delivered_count, SUM(delayed_count) AS delayed_count,
+                       SUM(delay_day_sum) AS delay_day_sum
+                FROM supplier_risk_daily
+                GROUP BY supplier_id
+            ) d ON d.supplier_id = s.supplier_id
+            ON DUPLICATE KEY UPDATE window_start = VALUES(window_start), delivered_count = VALUES(delivered_count),
+                delayed_count = VALUES(delayed_count), delay_day_sum = VALUES(delay_day_sum),
+                dirty = VALUES(dirty), change_seq = change_seq + 1
+        """, (int(dirty),))
+        return max(cursor.rowcount, 0)
@@ -0,0 +1,208 @@
+"""
+Smart Supply Chain Risk Intelligence - Analytics Rollups
+Daily and weekly aggregates behind /api/analytics/*, kept current by the write paths and the rollup job
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+
+from retention import archived_source
+
+# Weeks start on Monday, as with MySQL's WEEKDAY()
+WEEK_START_SQL = "{0} - INTERVAL WEEKDAY({0}) DAY"
+
+SHIPMENT_TOTALS = ('shipment_count', 'delayed_count', 'delay_day_sum')
+STOCK_TOTALS = ('position_count', 'stockout_count', 'below_safety_count')
+
+# Shipment totals per ship date; cancelled shipments are left out, a shipment is delayed when it
+# has status DELAYED or arrived after its expected date
+SHIPMENT_TOTALS_SELECT = """
+    COUNT(*),
+    SUM(IF(status = 'DELAYED' OR actual_arrival_date > expected_arrival_date, 1, 0)),
+    SUM(IF(actual_arrival_date > expected_arrival_date, DATEDIFF(actual_arrival_date, expected_arrival_date), 0))
+"""
+
+STOCK_SNAPSHOT_QUERY = """
+    INSERT INTO rollup_warehouse_stock_daily
+        (warehouse_id, stock_date, position_count, stockout_count, below_safety_count)
+    SELECT warehouse_id, CURDATE(), COUNT(*), SUM(quantity <= 0), SUM(quantity < safety_stock)
+    FROM inventory
+    {where}
+    GROUP BY warehouse_id
+    ON DUPLICATE KEY UPDATE position_count = VALUES(position_count), stockout_count = VALUES(stockout_count),
+        below_safety_count = VALUES(below_safety_count)
+"""
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def shipment_contribution(row):
+    """(shipments, delayed, delay days) a shipment row adds to the rollups of its ship date"""
+    if row['status'] == 'CANCELLED':
+        return 0, 0, 0
+    actual = row['actual_arrival_date']
+    late = actual is not None and actual > row['expected_arrival_date']
+    delayed = row['status'] == 'DELAYED' or late
+    return 1, int(delayed), (actual - row['expected_arrival_date']).days if late else 0
+
+
+def stock_contribution(row):
+    """(positions, stockouts, positions below safety stock) of one inventory row"""
+    return 1, int(row['quantity'] <= 0), int(row['quantity'] < row['safety_stock'])
+
+
+class Rollups:
+    """Maintains the rollup_* tables read by the analytics endpoints.
+
+    ``rollup_shipments_daily`` and ``rollup_supplier_shipments_weekly`` hold shipment and delay
+    totals by ship date (and by supplier and week), ``rollup_alerts_daily`` counts alerts raised
+    per day, severity and type, and ``rollup_warehouse_stock_daily`` is a per-day snapshot of
+    each warehouse's stockouts and positions below safety stock.
+
+    Write paths apply deltas in their own transaction: ``apply_shipment_changes()`` and
+    ``apply_inventory_changes()`` take the affected rows as they were before and after the
+    write, ``bump_alerts()`` takes signed counts. ``refresh()`` recomputes the shipment and
+    alert rollups of recent days from the raw tables and snapshots today's stock; the first
+    inventory write of a day for a warehouse takes that snapshot for the warehouse itself.
+
+    Every method takes a dictionary cursor; committing is left to the caller.
+    """
+
+    def __init__(self, execute=None, batch_size=1000):
+        self.execute = execute or (lambda cursor, query, params=None: cursor.execute(query, params or ()))
+        self.batch_size = max(1, int(batch_size))
+
+    def _chunks(self, items):
+        items = list(items)
+        for start in range(0, len(items), self.batch_size):
+            yield items[start:start + self.batch_size]
+
+    def _add(self, cursor, table, keys, totals, deltas):
+        """Add ``deltas`` ({key tuple: [totals...]}) to ``table``, skipping all-zero deltas"""
+        rows = [(*key, *values) for key, values in sorted(deltas.items()) if any(values)]
+        columns = keys + totals
+        placeholder = '(' + ', '.join(['%s'] * len(columns)) + ')'
+        for chunk in self._chunks(rows):
+            self.execute(cursor, f"""
+                INSERT INTO {table} ({', '.join(columns)})
+                VALUES {', '.join([placeholder] * len(chunk))}
+                ON DUPLICATE KEY UPDATE {', '.join(f'{c} = {c} + VALUES({c})' for c in totals)}
+            """, tuple(value for row in chunk for value in row))
+
+    def apply_shipment_changes(self, cursor, before, after):
+        """Move the rollups from the ``before`` shipment rows to the ``after`` rows"""
+        daily = defaultdict(lambda: [0, 0, 0])
+        weekly = defaultdict(lambda: [0, 0, 0])
+        for sign, rows in ((-1, before), (1, after)):
+            for row in rows:
+                counts = shipment_contribution(row)
+                if not counts[0]:
+                    continue
+                for index, value in enumerate(counts):
+                    daily[(row['ship_date'],)][index] += sign * value
+                    weekly[(row['supplier_id'], week_start(row['ship_date']))][index] += sign * value
+        self._add(cursor, 'rollup_shipments_daily', ('ship_date',), SHIPMENT_TOTALS, daily)
+        self._add(cursor, 'rollup_supplier_shipments_weekly', ('supplier_id', 'week_start'), SHIPMENT_TOTALS, weekly)
+
+    def bump_alerts(self, cursor, deltas):
+        """Add {(alert_date or None for today, severity, alert_type): count} to rollup_alerts_daily"""
+        rows = [(*key, count) for key, count in deltas.items() if count]
+        for chunk in self._chunks(rows):
+            self.execute(cursor, f"""
+                INSERT INTO rollup_alerts_daily (alert_date, severity, alert_type, raised_count)
+                VALUES {', '.join(['(COALESCE(%s, CURDATE()), %s, %s, %s)'] * len(chunk))}
+                ON DUPLICATE KEY UPDATE raised_count = raised_count + VALUES(raised_count)
+            """, tuple(value for row in chunk for value in row))
+
+    def fetch_stock(self, cursor, inventory_ids=(), positions=(), lock=False):
+        """Stock columns of the inventory rows with ``inventory_ids`` or (product_id, warehouse_id)
+        ``positions``, optionally locked for the caller's update"""
+        rows = []
+        for column, keys, placeholder in (('inventory_id', sorted(set(inventory_ids)), '%s'),
+                                          ('(product_id, warehouse_id)', sorted(set(positions)), '(%s, %s)')):
+            for chunk in self._chunks(keys):
+                params = chunk if placeholder == '%s' else [value for key in chunk for value in key]
+                self.execute(cursor, f"""
+                    SELECT inventory_id, product_id, warehouse_id, quantity, safety_stock FROM inventory
+                    WHERE {column} IN ({', '.join([placeholder] * len(chunk))})
+                    {'FOR UPDATE' if lock else ''}
+                """, tuple(params))
+                rows.extend(cursor.fetchall())
+        return rows
+
+    def apply_inventory_changes(self, cursor, before, after):
+        """Move today's stock snapshot of the affected warehouses from ``before`` to ``after``.
+
+        Warehouses without a row for today yet are counted from ``inventory`` instead, which
+        already reflects this transaction's write.
+        """
+        deltas = defaultdict(lambda: [0, 0, 0])
+        for sign, rows in ((-1, before), (1, after)):
+            for row in rows:
+                for index, value in enumerate(stock_contribution(row)):
+                    deltas[row['warehouse_id']][index] += sign * value
+
+        if not deltas:
+            return
+        self.execute(cursor, "SELECT CURDATE() AS today")
+        today = cursor.fetchall()[0]['today']
+        for chunk in self._chunks(sorted(deltas)):
+            self.execute(cursor, f"""
+                SELECT warehouse_id FROM rollup_warehouse_stock_daily
+                WHERE stock_date = %s AND warehouse_id IN ({', '.join(['%s'] * len(chunk))})
+                FOR UPDATE
+            """, (today, *chunk))
+            present = {row['warehouse_id'] for row in cursor.fetchall()}
+            missing = [warehouse_id for warehouse_id in chunk if warehouse_id not in present]
+            if missing:
+                self.snapshot_stock(cursor, missing)
+            self._add(cursor, 'rollup_warehouse_stock_daily', ('warehouse_id', 'stock_date'), STOCK_TOTALS,
+                      {(warehouse_id, today): deltas[warehouse_id] for warehouse_id in chunk if warehouse_id in present})
+
+    def snapshot_stock(self, cursor, warehouse_ids=None):
+        """Count today's stock positions of ``warehouse_ids`` (all warehouses when None)"""
+        if warehouse_ids is None:
+            self.execute(cursor, STOCK_SNAPSHOT_QUERY.format(where=''))
+            return
+        for chunk in self._chunks(warehouse_ids):
+            self.execute(cursor, STOCK_SNAPSHOT_QUERY.format(
+                where=f"WHERE warehouse_id IN ({', '.join(['%s'] * len(chunk))})"), tuple(chunk))
+
+    def refresh(self, cursor, start=None):
+        """Recompute the shipment and alert rollups from the week of ``start`` on (everything when
+        None) from the raw tables and their archives, and snapshot today's stock"""
+        start = week_start(start) if start is not None else None
+        params = (start,) if start is not None else ()
+
+        def where(column, *conditions):
+            conditions = [*conditions, f'{column} >= %s'] if start is not None else list(conditions)
+            return f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        shipped = "NOT (status <=> 'CANCELLED')"
+        self.execute(cursor, f"DELETE FROM rollup_shipments_daily {where('ship_date')}", params)
+        self.execute(cursor, f"""
+            INSERT INTO rollup_shipments_daily (ship_date, {', '.join(SHIPMENT_TOTALS)})
+            SELECT ship_date, {SHIPMENT_TOTALS_SELECT}
+            FROM {archived_source('shipments')}
+            {where('ship_date', shipped)}
+            GROUP BY ship_date
+        """, params)
+        self.execute(cursor, f"DELETE FROM rollup_supplier_shipments_weekly {where('week_start')}", params)
+        self.execute(cursor, f"""
+            INSERT INTO rollup_supplier_shipments_weekly (supplier_id, week_start, {', '.join(SHIPMENT_TOTALS)})
+            SELECT supplier_id, {WEEK_START_SQL.format('ship_date')} AS shipment_week, {SHIPMENT_TOTALS_SELECT}
+            FROM {archived_source('shipments')}
+            {where('ship_date', shipped)}
+            GROUP BY supplier_id, shipment_week
+        """, params)
+        self.execute(cursor, f"DELETE FROM rollup_alerts_daily {where('alert_date')}", params)
+        self.execute(cursor, f"""
+            INSERT INTO rollup_alerts_daily (alert_date, severity, alert_type, raised_count)
+            SELECT DATE(created_at) AS created_date, severity, alert_type, COUNT(*)
+            FROM {archived_source('alerts')}
+            {where('created_at')}
+            GROUP BY created_date, severity, alert_type
+        """, params)
+        self.snapshot_stock(cursor)
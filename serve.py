@@ -0,0 +1,32 @@
+"""
+Smart Supply Chain Risk Intelligence - Production Server
+Runs the ASGI application (asgi.py) under uvicorn instead of the Flask debug server
+
+Usage:
+    python serve.py --port 5000 --workers 4
+"""
+
+import argparse
+import os
+
+import uvicorn
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the SCRI API with uvicorn')
+    parser.add_argument('--host', default=os.getenv('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', 5000)))
+    parser.add_argument('--workers', type=int, default=int(os.getenv('WEB_CONCURRENCY', 1)),
+                        help='worker processes, each with its own connection pools')
+    parser.add_argument('--log-level', default=os.getenv('LOG_LEVEL', 'INFO').lower())
+    parser.add_argument('--access-log', action='store_true', help='log every request (off by default)')
+    args = parser.parse_args()
+
+    # loop/http 'auto' use uvloop and httptools when they are installed
+    uvicorn.run('asgi:application', host=args.host, port=args.port, workers=args.workers,
+                loop='auto', http='auto', lifespan='on', proxy_headers=True,
+                log_level=args.log_level, access_log=args.access_log)
+
+
+if __name__ == '__main__':
+    main()
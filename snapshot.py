@@ -0,0 +1,219 @@
+"""
+Smart Supply Chain Risk Intelligence - Columnar Snapshots
+Incremental Parquet export of the operational tables, read back by offline_analytics.py
+"""
+
+import json
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from mysql.connector import FieldType
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: pip install pyarrow
+    pa = pq = None
+
+log = logging.getLogger('scri.snapshot')
+
+# How each table is exported. 'append': rows whose key is past the last exported key (the table is
+# insert-only). 'changed': rows whose change column is at or past the last exported value, less
+# ``overlap`` seconds for late commits; a row changed several times appears in several part files and
+# readers keep the copy from the newest one. 'full': small dimension tables, rewritten on every run.
+SNAPSHOT_TABLES = {
+    'shipments': {'key': 'shipment_id', 'mode': 'changed', 'column': 'updated_at'},
+    'shipment_events': {'key': 'event_id', 'mode': 'append'},
+    'supplier_metrics': {'key': 'metrics_id', 'mode': 'changed', 'column': 'record_date'},
+    'alerts': {'key': 'alert_id', 'mode': 'changed', 'column': 'updated_at'},
+    'inventory': {'key': 'inventory_id', 'mode': 'changed', 'column': 'last_updated'},
+    'suppliers': {'key': 'supplier_id', 'mode': 'full'},
+    'products': {'key': 'product_id', 'mode': 'full'},
+    'warehouses': {'key': 'warehouse_id', 'mode': 'full'}
+}
+
+STATE_FILE = '_state.json'
+
+# MySQL column types by FieldType name; everything else is exported as a string
+ARROW_TYPES = {
+    'TINY': 'int64', 'SHORT': 'int64', 'INT24': 'int64', 'LONG': 'int64', 'LONGLONG': 'int64', 'YEAR': 'int64',
+    'FLOAT': 'float64', 'DOUBLE': 'float64', 'DECIMAL': 'float64', 'NEWDECIMAL': 'float64',
+    'DATE': 'date32', 'NEWDATE': 'date32', 'DATETIME': 'timestamp', 'TIMESTAMP': 'timestamp'
+}
+
+
+def require_pyarrow():
+    if pa is None:
+        raise RuntimeError('Columnar snapshots need pyarrow (pip install pyarrow)')
+
+
+def arrow_schema(description):
+    """Arrow schema for a cursor.description"""
+    fields = []
+    for column in description:
+        kind = ARROW_TYPES.get(FieldType.get_info(column[1]), 'string')
+        arrow_type = pa.timestamp('s') if kind == 'timestamp' else getattr(pa, kind)()
+        fields.append(pa.field(column[0], arrow_type))
+    return pa.schema(fields)
+
+
+def arrow_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode()
+    return value
+
+
+def state_value(value):
+    """Watermark as stored in the state file"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def parse_state_value(value):
+    """Inverse of state_value for date and datetime watermarks"""
+    return datetime.fromisoformat(value) if 'T' in value else date.fromisoformat(value)
+
+
+class SnapshotExporter:
+    """Writes ``SNAPSHOT_TABLES`` under ``directory`` as ``<table>/part-<n>.parquet`` files.
+
+    Every run reads at most ``batch_size`` rows per query with keyset pagination, so no long
+    statement or large result is held open on the database, and appends each batch as a row
+    group of one new part file per table. The watermark of every table is kept in
+    ``_state.json`` and only advanced once its part file is complete, so an interrupted run
+    is simply repeated by the next one.
+    """
+
+    def __init__(self, connect, directory, batch_size=50000, overlap=300, execute=None):
+        require_pyarrow()
+        self.connect = connect
+        self.directory = directory
+        self.batch_size = max(1, int(batch_size))
+        self.overlap = timedelta(seconds=overlap)
+        self.execute = execute or (lambda cursor, query, params=None: cursor.execute(query, params or ()))
+
+    def load_state(self):
+        path = os.path.join(self.directory, STATE_FILE)
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def save_state(self, state):
+        path = os.path.join(self.directory, STATE_FILE)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+        os.replace(path + '.tmp', path)
+
+    def export(self, tables=None):
+        """Export ``tables`` (all by default); returns {table: rows written}"""
+        tables = list(tables or SNAPSHOT_TABLES)
+        unknown = [table for table in tables if table not in SNAPSHOT_TABLES]
+        if unknown:
+            raise ValueError(f"Unknown snapshot tables: {', '.join(unknown)}")
+        os.makedirs(self.directory, exist_ok=True)
+
+        state = self.load_state()
+        written = {}
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            try:
+                for table in tables:
+                    started = time.monotonic()
+                    written[table], state[table] = self._export_table(cursor, table, state.get(table, {}))
+                    conn.rollback()  # end the read view between tables
+                    self.save_state(state)
+                    log.info("Snapshot %s: %d rows in %.1fs", table, written[table], time.monotonic() - started)
+            finally:
+                cursor.close()
+        return written
+
+    def _export_table(self, cursor, table, table_state):
+        spec = SNAPSHOT_TABLES[table]
+        key = spec['key']
+        folder = os.path.join(self.directory, table)
+        os.makedirs(folder, exist_ok=True)
+        part = table_state.get('parts', 0)
+        path = os.path.join(folder, f'part-{part:06d}.parquet')
+
+        if spec['mode'] == 'changed':
+            batches = self._batches(cursor, self._changed_query(table, key, spec['column'], table_state.get('watermark')))
+        else:
+            start = (table_state.get('watermark') or 0) if spec['mode'] == 'append' else 0
+            batches = self._batches(cursor, lambda last: (
+                f"SELECT * FROM {table} WHERE {key} > %s ORDER BY {key} LIMIT %s",
+                (last[key] if last else start, self.batch_size)))
+
+        rows, last = self._write(path, batches)
+        if spec['mode'] == 'full':
+            for name in os.listdir(folder):
+                if name.endswith('.parquet') and name != os.path.basename(path):
+                    os.remove(os.path.join(folder, name))
+            watermark = None
+        elif not rows:
+            return 0, table_state
+        else:
+            watermark = state_value(last[key] if spec['mode'] == 'append' else last[spec['column']])
+        total = rows if spec['mode'] == 'full' else table_state.get('rows', 0) + rows
+        return rows, {'parts': part + 1, 'watermark': watermark, 'rows': total,
+                      'exported_at': datetime.now().isoformat(timespec='seconds')}
+
+    def _changed_query(self, table, key, column, watermark):
+        """Query builder for rows with ``column`` at or after the watermark, in (column, key) order"""
+        start = parse_state_value(watermark) if watermark is not None else None
+        if isinstance(start, datetime):
+            start -= self.overlap
+
+        def build(last):
+            if last is not None:
+                where, params = f"WHERE {column} >= %s AND ({column} > %s OR {key} > %s)", (last[column], last[column], last[key])
+            elif start is not None:
+                where, params = f"WHERE {column} >= %s", (start,)
+            else:
+                where, params = '', ()
+            return f"SELECT * FROM {table} {where} ORDER BY {column}, {key} LIMIT %s", (*params, self.batch_size)
+        return build
+
+    def _batches(self, cursor, build):
+        """(description, rows) batches of the keyset query ``build(last row or None)``"""
+        last = None
+        while True:
+            self.execute(cursor, *build(last))
+            rows = cursor.fetchall()
+            if not rows:
+                return
+            yield cursor.description, rows
+            last = dict(zip([column[0] for column in cursor.description], rows[-1]))
+            if len(rows) < self.batch_size:
+                return
+
+    def _write(self, path, batches):
+        """Write every batch as a row group of ``path``; returns (rows, last row as a dict)"""
+        writer, schema, rows, last = None, None, 0, None
+        try:
+            for description, batch in batches:
+                if writer is None:
+                    schema = arrow_schema(description)
+                    writer = pq.ParquetWriter(path + '.tmp', schema, compression='zstd')
+                columns = list(zip(*batch))
+                writer.write_table(pa.table([
+                    pa.array([arrow_value(value) for value in values], type=field.type)
+                    for field, values in zip(schema, columns)
+                ], schema=schema))
+                rows += len(batch)
+                last = dict(zip(schema.names, batch[-1]))
+        except BaseException:
+            if writer is not None:
+                writer.close()
+                os.remove(path + '.tmp')
+            raise
+        if writer is not None:
+            writer.close()
+            os.replace(path + '.tmp', path)
+        return rows, last
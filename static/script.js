@@ -1,6 +1,119 @@
 // Smart Supply Chain Risk Intelligence - Frontend JavaScript
 
 const API_BASE = '';
+const PAGE_SIZE = 100;
+
+// next_cursor of the last page loaded into each paginated table (null = no more rows)
+const pageCursors = { shipments: null, alerts: null };
+
+// Pages are requested in the columnar shape ({column: [values]}), which is much smaller on the wire
+function pageUrl(path, cursor, params = {}) {
+  const query = new URLSearchParams({ limit: PAGE_SIZE, shape: 'columns', ...params });
+  if (cursor) {
+    query.set('cursor', cursor);
+  }
+  return `${API_BASE}${path}?${query.toString()}`;
+}
+
+// Parse a page response and turn its columnar data back into one object per row
+async function readPage(response) {
+  const result = await response.json();
+  if (result.success && result.data && !Array.isArray(result.data)) {
+    const columns = Object.keys(result.data);
+    const count = columns.length ? result.data[columns[0]].length : 0;
+    const rows = new Array(count);
+    for (let i = 0; i < count; i++) {
+      const row = {};
+      for (const column of columns) {
+        row[column] = result.data[column][i];
+      }
+      rows[i] = row;
+    }
+    result.data = rows;
+  }
+  return result;
+}
+
+function updateLoadMore(buttonId, cursor) {
+  const button = document.getElementById(buttonId);
+  if (button) {
+    button.style.display = cursor ? 'inline-block' : 'none';
+  }
+}
+
+// Follow next_cursor until every page of a list endpoint has been read
+async function fetchAllPages(path) {
+  let rows = [];
+  let cursor = null;
+  do {
+    const response = await fetch(pageUrl(path, cursor, { limit: 1000 }));
+    const result = await readPage(response);
+    if (!result.success) {
+      return result;
+    }
+    rows = rows.concat(result.data || []);
+    cursor = result.next_cursor;
+  } while (cursor);
+  return { success: true, data: rows };
+}
+
+// ==================== LIVE UPDATES ====================
+
+const POLL_INTERVAL = 30000;
+
+function setLiveStatus(text) {
+  const status = document.getElementById('liveStatus');
+  if (status) {
+    status.textContent = text;
+  }
+}
+
+// Subscribe to /api/stream. handlers maps event names (metrics, alert, alert_resolved) to
+// callbacks; resync() runs after a reconnect, since events sent while disconnected are lost.
+// If the browser has no EventSource or the stream cannot be opened, fallback() starts polling.
+function openLiveStream(handlers, resync, fallback) {
+  if (!window.EventSource) {
+    fallback();
+    return null;
+  }
+
+  const source = new EventSource(`${API_BASE}/api/stream`);
+  let connected = false;
+  let everConnected = false;
+  let fellBack = false;
+
+  source.addEventListener('open', () => {
+    if (everConnected) {
+      resync();
+    }
+    connected = true;
+    everConnected = true;
+    setLiveStatus('● Live');
+  });
+  Object.entries(handlers).forEach(([event, handler]) => {
+    source.addEventListener(event, e => handler(JSON.parse(e.data)));
+  });
+  source.addEventListener('error', () => {
+    // A dropped connection is retried by EventSource itself; one that never opened
+    // (server at its client limit, proxy without streaming) is abandoned for polling
+    if ((!everConnected || source.readyState === EventSource.CLOSED) && !fellBack) {
+      fellBack = true;
+      source.close();
+      fallback();
+      return;
+    }
+    if (connected) {
+      connected = false;
+      setLiveStatus('○ Reconnecting...');
+    }
+  });
+  return source;
+}
+
+function startPolling(load) {
+  setLiveStatus('○ Auto-refresh every 30s');
+  setInterval(load, POLL_INTERVAL);
+}
 
 // Load dashboard metrics on home page
 document.addEventListener('DOMContentLoaded', function() {
@@ -8,16 +121,31 @@ document.addEventListener('DOMContentLoaded', function() {
   
   if (page === 'home') {
     loadDashboardMetrics();
-    setInterval(loadDashboardMetrics, 30000); // Refresh every 30 seconds
+    openLiveStream(
+      { metrics: renderDashboardMetrics },
+      loadDashboardMetrics,
+      () => startPolling(loadDashboardMetrics)
+    );
   } else if (page === 'suppliers') {
     loadSuppliers();
   } else if (page === 'analytics') {
     loadShipments();
     loadSupplierRisk();
     loadDelayedShipments();
+    loadAnalyticsTrends();
     // Don't load form options on page load, only when form is opened
   } else if (page === 'alerts') {
     loadAlerts(false);
+    openLiveStream(
+      { alert: showNewAlert, alert_resolved: removeResolvedAlert },
+      () => loadAlerts(alertsShowingResolved),
+      () => startPolling(() => {
+        // Only refresh when the table shows a single page, so Load More results are kept
+        if (!pageCursors.alerts) {
+          loadAlerts(alertsShowingResolved);
+        }
+      })
+    );
   }
 });
 
@@ -29,17 +157,20 @@ async function loadDashboardMetrics() {
     const result = await response.json();
     
     if (result.success) {
-      const data = result.data;
-      document.getElementById('metricSuppliers').textContent = data.suppliers || 0;
-      document.getElementById('metricTransit').textContent = data.transit || 0;
-      document.getElementById('metricAlerts').textContent = data.alerts || 0;
-      document.getElementById('metricInventory').textContent = data.inventory || 'OK';
+      renderDashboardMetrics(result.data);
     }
   } catch (error) {
     console.error('Error loading metrics:', error);
   }
 }
 
+function renderDashboardMetrics(data) {
+  document.getElementById('metricSuppliers').textContent = data.suppliers || 0;
+  document.getElementById('metricTransit').textContent = data.transit || 0;
+  document.getElementById('metricAlerts').textContent = data.alerts || 0;
+  document.getElementById('metricInventory').textContent = data.inventory || 'OK';
+}
+
 // ==================== SUPPLIERS ====================
 
 async function loadSuppliers() {
@@ -177,7 +308,7 @@ async function computeRisk(supplierId) {
 
 // ==================== SHIPMENTS ====================
 
-async function loadShipments() {
+async function loadShipments(append = false) {
   try {
     console.log('Loading shipments...');
     const tbody = document.getElementById('shipmentsTable');
@@ -186,9 +317,11 @@ async function loadShipments() {
       return;
     }
     
-    tbody.innerHTML = '<tr><td colspan="10">Loading shipments...</td></tr>';
+    if (!append) {
+      tbody.innerHTML = '<tr><td colspan="10">Loading shipments...</td></tr>';
+    }
     
-    const response = await fetch(`${API_BASE}/api/shipments`);
+    const response = await fetch(pageUrl('/api/shipments', append ? pageCursors.shipments : null));
     console.log('Shipments response status:', response.status);
     console.log('Shipments response headers:', response.headers);
     
@@ -198,7 +331,7 @@ async function loadShipments() {
       throw new Error(`HTTP error! status: ${response.status}, message: ${errorText}`);
     }
     
-    const result = await response.json();
+    const result = await readPage(response);
     console.log('Shipments API result:', result);
     console.log('Shipments data type:', typeof result.data);
     console.log('Shipments data:', result.data);
@@ -210,14 +343,17 @@ async function loadShipments() {
         return;
       }
       
-      if (result.data.length === 0) {
+      pageCursors.shipments = result.next_cursor || null;
+      updateLoadMore('shipmentsMore', pageCursors.shipments);
+      
+      if (result.data.length === 0 && !append) {
         console.log('No shipments found in database');
         tbody.innerHTML = '<tr><td colspan="10">No shipments found. Add a new shipment to get started.</td></tr>';
         return;
       }
       
       console.log(`Displaying ${result.data.length} shipments`);
-      tbody.innerHTML = result.data.map(shipment => {
+      const rows = result.data.map(shipment => {
         // Convert delay_days to number if it's a string or Decimal
         const delayDays = parseFloat(shipment.delay_days) || 0;
         const status = (shipment.status || 'CREATED').replace('_', '');
@@ -237,6 +373,11 @@ async function loadShipments() {
         </tr>
       `;
       }).join('');
+      if (append) {
+        tbody.insertAdjacentHTML('beforeend', rows);
+      } else {
+        tbody.innerHTML = rows;
+      }
     } else {
       console.error('API returned success=false:', result.error);
       tbody.innerHTML = `<tr><td colspan="10">Error: ${result.error || 'Failed to load shipments'}</td></tr>`;
@@ -279,8 +420,7 @@ async function loadFormOptions() {
   
   // Load products
   try {
-    const productsRes = await fetch(`${API_BASE}/api/products`);
-    const productsData = await productsRes.json();
+    const productsData = await fetchAllPages('/api/products');
     if (productsData.success) {
       const select = document.getElementById('productSelect');
       if (select) {
@@ -547,19 +687,128 @@ async function addWarehouse(event) {
   }
 }
 
+// ==================== ANALYTICS TRENDS ====================
+
+function isoDaysAgo(days) {
+  const day = new Date();
+  day.setDate(day.getDate() - days);
+  return day.toISOString().slice(0, 10);
+}
+
+async function fetchAnalytics(path, params) {
+  const response = await fetch(`${API_BASE}/api/analytics/${path}?${new URLSearchParams(params)}`);
+  const result = await response.json();
+  if (!response.ok || !result.success) {
+    throw new Error(result.error || `HTTP error! status: ${response.status}`);
+  }
+  return result.data;
+}
+
+function trendBar(label, value, max, text, color) {
+  const width = max > 0 ? Math.max((value / max) * 100, value > 0 ? 1 : 0) : 0;
+  return `
+    <div style="display: flex; align-items: center; gap: 0.5rem; margin: 0.2rem 0; font-size: 0.8rem;">
+      <span style="width: 6.5rem; color: #666;">${label}</span>
+      <div style="flex: 1; background: rgba(102, 126, 234, 0.1); border-radius: 4px; height: 0.8rem;">
+        <div style="width: ${width}%; height: 100%; background: ${color}; border-radius: 4px;"></div>
+      </div>
+      <span style="width: 5rem; text-align: right;">${text}</span>
+    </div>
+  `;
+}
+
+function loadAnalyticsTrends() {
+  loadDelayTrend();
+  loadAlertTrend();
+  loadStockoutTrend();
+}
+
+async function loadDelayTrend() {
+  const container = document.getElementById('delayTrendChart');
+  if (!container) return;
+  try {
+    const data = await fetchAnalytics('delay-rate', { bucket: 'week' });
+    if (data.length === 0) {
+      container.innerHTML = '<p>No shipments in the last 12 months.</p>';
+      return;
+    }
+    const max = Math.max(...data.map(w => w.delay_rate || 0));
+    container.innerHTML = data.map(w => trendBar(
+      w.period, w.delay_rate || 0, max,
+      `${((w.delay_rate || 0) * 100).toFixed(1)}% of ${w.shipment_count}`,
+      'linear-gradient(135deg, #f093fb 0%, #f5576c 100%)'
+    )).join('');
+  } catch (error) {
+    console.error('Error loading delay trend:', error);
+    container.innerHTML = `<p>Error loading delay trend: ${error.message}</p>`;
+  }
+}
+
+async function loadAlertTrend() {
+  const container = document.getElementById('alertTrendChart');
+  if (!container) return;
+  try {
+    const data = await fetchAnalytics('alerts', { bucket: 'day', from: isoDaysAgo(29) });
+    if (data.length === 0) {
+      container.innerHTML = '<p style="color: #667eea; font-weight: 600;">✓ No alerts in the last 30 days.</p>';
+      return;
+    }
+    const max = Math.max(...data.map(d => d.total));
+    container.innerHTML = data.map(d => trendBar(
+      d.period, d.total, max,
+      `<span style="color: #f5576c;">${d.CRITICAL}</span> / ${d.WARN} / ${d.INFO}`,
+      d.CRITICAL > 0 ? 'linear-gradient(135deg, #f5576c 0%, #f093fb 100%)' : 'linear-gradient(135deg, #667eea 0%, #764ba2 100%)'
+    )).join('') + '<p style="font-size: 0.75rem; color: #666;">critical / warn / info</p>';
+  } catch (error) {
+    console.error('Error loading alert trend:', error);
+    container.innerHTML = `<p>Error loading alert trend: ${error.message}</p>`;
+  }
+}
+
+async function loadStockoutTrend() {
+  const container = document.getElementById('stockoutChart');
+  if (!container) return;
+  try {
+    const data = await fetchAnalytics('stockouts', { bucket: 'week', from: isoDaysAgo(89) });
+    // Total stockout days per warehouse over the range, worst first
+    const totals = {};
+    data.forEach(row => {
+      const warehouse = totals[row.warehouse_id] || (totals[row.warehouse_id] = { name: row.warehouse_name, days: 0 });
+      warehouse.days += row.stockout_days;
+    });
+    const warehouses = Object.values(totals).sort((a, b) => b.days - a.days).slice(0, 15);
+    if (warehouses.length === 0) {
+      container.innerHTML = '<p>No stock snapshots recorded yet.</p>';
+      return;
+    }
+    const max = Math.max(...warehouses.map(w => w.days));
+    container.innerHTML = warehouses.map(w => trendBar(
+      w.name, w.days, max, `${w.days} days`, 'linear-gradient(135deg, #4facfe 0%, #00f2fe 100%)'
+    )).join('');
+  } catch (error) {
+    console.error('Error loading stockout trend:', error);
+    container.innerHTML = `<p>Error loading stockout trend: ${error.message}</p>`;
+  }
+}
+
 // ==================== ALERTS ====================
 
-async function loadAlerts(resolved = false) {
+// Which alert list (open/resolved) the alerts table is currently showing
+let alertsShowingResolved = false;
+
+async function loadAlerts(resolved = false, append = false) {
   try {
     console.log('Loading alerts (resolved:', resolved, ')...');
-    const response = await fetch(`${API_BASE}/api/alerts?resolved=${resolved}`);
+    alertsShowingResolved = resolved;
+    const cursor = append ? pageCursors.alerts : null;
+    const response = await fetch(pageUrl('/api/alerts', cursor, { resolved: resolved }));
     console.log('Alerts response status:', response.status);
     
     if (!response.ok) {
       throw new Error(`HTTP error! status: ${response.status}`);
     }
     
-    const result = await response.json();
+    const result = await readPage(response);
     console.log('Alerts data:', result);
     
     const tbody = document.getElementById('alertsTable');
@@ -569,13 +818,35 @@ async function loadAlerts(resolved = false) {
     }
     
     if (result.success) {
-      if (!result.data || result.data.length === 0) {
+      pageCursors.alerts = result.next_cursor || null;
+      updateLoadMore('alertsMore', pageCursors.alerts);
+      
+      if ((!result.data || result.data.length === 0) && !append) {
         tbody.innerHTML = `<tr><td colspan="8">No ${resolved ? 'resolved' : 'open'} alerts found.</td></tr>`;
         return;
       }
       
-      tbody.innerHTML = result.data.map(alert => `
-        <tr>
+      const rows = (result.data || []).map(alertRow).join('');
+      if (append) {
+        tbody.insertAdjacentHTML('beforeend', rows);
+      } else {
+        tbody.innerHTML = rows;
+      }
+    } else {
+      tbody.innerHTML = `<tr><td colspan="8">Error: ${result.error || 'Failed to load alerts'}</td></tr>`;
+    }
+  } catch (error) {
+    console.error('Error loading alerts:', error);
+    const tbody = document.getElementById('alertsTable');
+    if (tbody) {
+      tbody.innerHTML = '<tr><td colspan="8">Error loading alerts. Please check console for details.</td></tr>';
+    }
+  }
+}
+
+function alertRow(alert) {
+  return `
+        <tr data-alert-id="${alert.alert_id}">
           <td>${alert.alert_id || '-'}</td>
           <td>${alert.created_at ? new Date(alert.created_at).toLocaleString() : '-'}</td>
           <td>${alert.alert_type || '-'}</td>
@@ -585,28 +856,44 @@ async function loadAlerts(resolved = false) {
           <td><span class="status ${alert.resolved ? 'DELIVERED' : 'INTRANSIT'}">${alert.resolved ? 'Resolved' : 'Open'}</span></td>
           <td>
             ${!alert.resolved ? 
-              `<button class="btn" onclick="resolveAlert(${alert.alert_id})">Resolve</button>` : 
+              `<button class="btn" onclick="resolveAlert(${alert.alert_id}, '${alert.created_at || ''}')">Resolve</button>` : 
               alert.resolved_at ? `Resolved: ${new Date(alert.resolved_at).toLocaleDateString()}` : '-'
             }
           </td>
         </tr>
-      `).join('');
-    } else {
-      tbody.innerHTML = `<tr><td colspan="8">Error: ${result.error || 'Failed to load alerts'}</td></tr>`;
-    }
-  } catch (error) {
-    console.error('Error loading alerts:', error);
-    const tbody = document.getElementById('alertsTable');
-    if (tbody) {
-      tbody.innerHTML = '<tr><td colspan="8">Error loading alerts. Please check console for details.</td></tr>';
-    }
+      `;
+}
+
+// Live stream: a new alert goes to the top of the open-alerts table
+function showNewAlert(alert) {
+  const tbody = document.getElementById('alertsTable');
+  if (!tbody || alertsShowingResolved || tbody.querySelector(`tr[data-alert-id="${alert.alert_id}"]`)) {
+    return;
   }
+  if (!tbody.querySelector('tr[data-alert-id]')) {
+    tbody.innerHTML = '';  // replace the "No open alerts" placeholder
+  }
+  tbody.insertAdjacentHTML('afterbegin', alertRow(alert));
 }
 
-async function resolveAlert(alertId) {
+// Live stream: a resolved alert leaves the open-alerts table
+function removeResolvedAlert(alert) {
+  if (alertsShowingResolved) {
+    return;
+  }
+  const row = document.querySelector(`#alertsTable tr[data-alert-id="${alert.alert_id}"]`);
+  if (row) {
+    row.remove();
+  }
+}
+
+async function resolveAlert(alertId, createdAt) {
   try {
+    // created_at lets the server update the alert in its own month partition
     const response = await fetch(`${API_BASE}/api/alerts/${alertId}/resolve`, {
-      method: 'POST'
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(createdAt ? { created_at: createdAt } : {})
     });
     
     const result = await response.json();
@@ -0,0 +1,147 @@
+"""Replica reads of the async routes (asgi.py): the read-your-writes pin and the fallback to the primary"""
+
+import asyncio
+import time
+
+import pytest
+from pymysql.err import OperationalError
+
+import asgi
+from db_router import READ_AFTER_WRITE_COOKIE, ReplicaRouter, parse_replicas
+from test_db_router import PRIMARY, StubPool
+
+
+class StubAsyncCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.description = [('shipment_id',), ('status',)]
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, query, params=None):
+        self.conn.executed.append(query)
+        if self.conn.error is not None:
+            raise self.conn.error
+
+    async def fetchall(self):
+        return self.conn.rows
+
+
+class StubAsyncConnection:
+    def __init__(self, rows=(), error=None):
+        self.rows = list(rows)
+        self.error = error
+        self.executed = []
+        self.closed = False
+
+    def cursor(self, cursor_class=None):
+        return StubAsyncCursor(self)
+
+    def close(self):
+        self.closed = True
+
+
+class StubAsyncPool:
+    """The parts of an aiomysql pool AsyncDatabase uses; ``connect_error`` makes acquire() fail"""
+
+    def __init__(self, conn=None, connect_error=None):
+        self.conn = conn
+        self.connect_error = connect_error
+        self.released = []
+
+    async def acquire(self):
+        if self.connect_error is not None:
+            raise self.connect_error
+        return self.conn
+
+    def release(self, conn):
+        self.released.append(conn)
+
+
+@pytest.fixture
+def router(monkeypatch):
+    router = ReplicaRouter(parse_replicas('replica-a', PRIMARY), StubPool)
+    router.start = lambda: None
+    router.check()
+    monkeypatch.setattr(asgi.scri, 'replica_router', router)
+    return router
+
+
+@pytest.fixture
+def databases(router, monkeypatch):
+    """(primary, replica) AsyncDatabases on stub pools, wired like asgi.db and asgi.replica_dbs"""
+    primary = asgi.AsyncDatabase(PRIMARY, 2, 3600)
+    primary.pool = StubAsyncPool(StubAsyncConnection([{'shipment_id': 1, 'status': 'primary'}]))
+    replica = router.replicas[0]
+    replica_db = asgi.AsyncDatabase(replica.config, 2, 3600, replica, primary)
+    replica_db.pool = StubAsyncPool(StubAsyncConnection([{'shipment_id': 1, 'status': 'replica'}]))
+    monkeypatch.setattr(asgi, 'db', primary)
+    monkeypatch.setattr(asgi, 'replica_dbs', {replica.name: replica_db})
+    return primary, replica_db
+
+
+def request(cookie=None):
+    headers = [(b'cookie', f'{READ_AFTER_WRITE_COOKIE}={cookie}'.encode())] if cookie is not None else []
+    return asgi.AsyncRequest({'method': 'GET', 'headers': headers}, '/api/shipments', {})
+
+
+def test_reader_uses_healthy_replica(databases):
+    primary, replica_db = databases
+    req = request()
+    assert asgi.reader(req) is replica_db
+    assert asgi.reader(req) is replica_db  # kept for the rest of the request
+
+
+def test_reader_pinned_to_primary_after_write(databases):
+    primary, replica_db = databases
+    assert asgi.reader(request(time.time() + 5)) is primary
+    assert asgi.reader(request(time.time() - 5)) is replica_db
+
+
+def test_reader_uses_primary_without_healthy_replica(databases, router):
+    primary, _ = databases
+    router.mark_down(router.replicas[0], OperationalError(2013, 'Lost connection'))
+    assert asgi.reader(request()) is primary
+
+
+def test_replica_read(databases):
+    _, replica_db = databases
+    rows = asyncio.run(replica_db.query('SELECT shipment_id, status FROM shipments'))
+    assert rows == [{'shipment_id': 1, 'status': 'replica'}]
+    assert replica_db.pool.released == [replica_db.pool.conn]
+
+
+def test_lost_replica_connection_falls_back_to_primary(databases, router):
+    primary, replica_db = databases
+    replica_db.pool.conn.error = OperationalError(2013, 'Lost connection to MySQL server during query')
+
+    rows = asyncio.run(replica_db.query('SELECT shipment_id, status FROM shipments'))
+
+    assert rows == [{'shipment_id': 1, 'status': 'primary'}]
+    assert replica_db.pool.conn.closed
+    replica = router.replicas[0]
+    assert not replica.healthy and 'Lost connection' in replica.error
+    assert asgi.reader(request()) is primary
+
+
+def test_unreachable_replica_falls_back_to_primary(databases, router):
+    primary, replica_db = databases
+    replica_db.pool = StubAsyncPool(connect_error=OperationalError(2003, "Can't connect to MySQL server"))
+
+    rows = asyncio.run(replica_db.query('SELECT shipment_id, status FROM shipments'))
+
+    assert rows == [{'shipment_id': 1, 'status': 'primary'}]
+    assert not router.replicas[0].healthy
+
+
+def test_statement_error_is_not_a_failover(databases, router):
+    primary, replica_db = databases
+    replica_db.pool.conn.error = OperationalError(1054, "Unknown column 'nope' in 'field list'")
+
+    assert asyncio.run(replica_db.query('SELECT nope FROM shipments')) is None
+    assert router.replicas[0].healthy
+    assert primary.pool.conn.executed == []
@@ -0,0 +1,142 @@
+"""Read replica routing (db_router.py) with stubbed connection pools"""
+
+from contextlib import contextmanager
+
+import pytest
+from mysql.connector import Error
+
+from db_router import ReplicaRouter, is_read_statement, parse_replicas, pinned_to_primary
+
+PRIMARY = {'host': 'primary', 'port': 3306, 'user': 'scri', 'password': 'secret', 'database': 'smart_supply_chain'}
+
+
+class StubCursor:
+    def __init__(self, rows, error):
+        self.rows = rows
+        self.error = error
+
+    def execute(self, query, params=None):
+        if self.error is not None:
+            raise self.error
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class StubConnection:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def cursor(self, dictionary=False):
+        return StubCursor(self.pool.status_rows, self.pool.error)
+
+
+class StubPool:
+    """The parts of db_pool.ConnectionPool the router uses"""
+
+    def __init__(self, config):
+        self.config = config
+        self.in_use = 0
+        self.status_rows = []
+        self.error = None
+
+    @contextmanager
+    def connection(self, timeout=None):
+        yield StubConnection(self)
+
+    def stats(self):
+        return {'in_use': self.in_use}
+
+    def close_idle(self):
+        pass
+
+
+@pytest.fixture
+def router():
+    router = ReplicaRouter(parse_replicas('replica-a, replica-b:3307', PRIMARY), StubPool, max_lag=5)
+    router.start = lambda: None  # no background health checks; the tests call check()
+    return router
+
+
+def test_pinned_to_primary():
+    assert not pinned_to_primary(None)
+    assert not pinned_to_primary('')
+    assert not pinned_to_primary('not-a-time')
+    assert pinned_to_primary('1005.5', now=1000)
+    assert not pinned_to_primary('1000', now=1000)
+    assert not pinned_to_primary('995', now=1000)
+
+
+def test_read_statements():
+    assert is_read_statement('SELECT * FROM shipments')
+    assert is_read_statement('  (SELECT 1) UNION ALL (SELECT 2)')
+    assert is_read_statement('WITH recent AS (SELECT 1) SELECT * FROM recent')
+    assert not is_read_statement('SELECT * FROM shipments WHERE shipment_id = 1 FOR UPDATE')
+    assert not is_read_statement('SELECT * FROM alerts LOCK IN SHARE MODE')
+    assert not is_read_statement('UPDATE alerts SET resolved = 1')
+    assert not is_read_statement('CALL daily_update_supplier_risks()')
+
+
+def test_parse_replicas():
+    replicas = parse_replicas('replica-a, replica-b:3307,', PRIMARY)
+    assert [(r['host'], r['port']) for r in replicas] == [('replica-a', 3306), ('replica-b', 3307)]
+    assert all(r['user'] == 'scri' and r['database'] == 'smart_supply_chain' for r in replicas)
+
+
+def test_pick_uses_primary_until_checked(router):
+    assert router.pick() is None
+    assert router.stats()['primary_reads'] == 1
+
+
+def test_pick_prefers_least_busy_replica(router):
+    router.check()
+    a, b = router.replicas
+    a.pool.in_use, b.pool.in_use = 3, 1
+    assert router.pick() is b
+    assert b.reads == 1
+
+
+def test_pick_rotates_between_equally_busy_replicas(router):
+    router.check()
+    picked = {router.pick().name for _ in range(4)}
+    assert picked == {'replica-a:3306', 'replica-b:3307'}
+
+
+def test_mark_down_until_next_check(router):
+    router.check()
+    a, b = router.replicas
+    router.mark_down(a, Error('Lost connection to MySQL server'))
+    assert not a.healthy and 'Lost connection' in a.error
+    assert all(router.pick() is b for _ in range(3))
+
+    router.mark_down(b, Error('gone'))
+    assert router.pick() is None
+
+    router.check()
+    assert a.healthy and b.healthy and a.error is None
+
+
+def test_check_leaves_out_lagging_and_stopped_replicas(router):
+    a, b = router.replicas
+    a.pool.status_rows = [{'Seconds_Behind_Source': 30}]
+    b.pool.status_rows = [{'Seconds_Behind_Source': None}]
+    router.check()
+    assert (a.healthy, a.lag, a.error) == (False, 30, 'lagging')
+    assert (b.healthy, b.lag, b.error) == (False, None, 'replication stopped')
+    assert router.pick() is None
+
+    a.pool.status_rows = [{'Seconds_Behind_Master': 2}]
+    router.check()
+    assert router.pick() is a
+
+
+def test_check_marks_unreachable_replica_down(router):
+    router.check()
+    a, b = router.replicas
+    a.pool.error = Error('Can\'t connect to MySQL server')
+    router.check()
+    assert not a.healthy and a.lag is None
+    assert router.pick() is b